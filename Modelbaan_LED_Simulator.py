@@ -1,9 +1,36 @@
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import json
 import time
 import random
 import webbrowser
+import argparse
+import heapq
+import bisect
+import threading
+import tracemalloc
+import os
+import tempfile
+import platform
+import queue
+import socket
+import uuid
+import mmap
+import struct
+import re
+import hashlib
+import sys
+import zlib
+import itertools
+import collections
+import array
+import multiprocessing
+from multiprocessing import shared_memory
+
+try:
+    import numpy as np # Optioneel: alleen nodig voor de snelle (gevectoriseerde) analyses
+except ImportError:
+    np = None
 
 # --- ToolTip Class ---
 class ToolTip:
@@ -109,10 +136,148 @@ PWM_PINS = [2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 44, 45, 46]
 # Alle digitale pinnen voor Arduino Mega 2560 (0-53) - Ter referentie
 ALL_DIGITAL_PINS = list(range(0, 54))
 
+# --- Uitgangen: directe PWM-pinnen of PWM-expanders ---
+# Per uitgang: kanalen per chip en de bus-timing waarmee model_output_latency() de verversing voorspelt.
+# Tijden in microseconden, gemeten/afgeleid voor een AVR op 16 MHz.
+OUTPUT_BACKENDS = {
+    "native": {'name': "Directe PWM-pinnen (analogWrite)", 'channels_per_chip': None, 'max_chips': None,
+               'write_us': 6.0},
+    "pca9685": {'name': "PCA9685 (I2C, 16 kanalen per chip)", 'channels_per_chip': 16, 'max_chips': 62,
+                'bus_hz': 400000, 'burst_channels': 7, 'transaction_us': 20.0},
+    "tlc5940": {'name': "TLC5940 (SPI-keten, 16 kanalen per chip)", 'channels_per_chip': 16, 'max_chips': 40,
+                'bus_hz': 8000000, 'bytes_per_chip': 24, 'transaction_us': 10.0, 'latch_period_us': 1024.0},
+}
+LOOP_US_PER_LED = 8.0 # Geschatte rekentijd van de switch in loop() per LED
+
+# Stukken C++ per uitgang: setupOutputs() initialiseert de uitgang, setLed() zet een kanaal en
+# flushLeds() stuurt aan het eind van elke loop() alle wijzigingen in zo min mogelijk bustransacties.
+_OUTPUT_CODE = {
+    "native": """
+// --- Uitgang: directe PWM-pinnen van het bord ---
+void setupOutputs() {
+  for (int i = 0; i < NUM_LEDS; i++) {
+    pinMode(leds[i].pin, OUTPUT);
+    analogWrite(leds[i].pin, 0); // Begin met alle LED's uit
+  }
+}
+
+inline void setLed(int i, int brightness) { analogWrite(leds[i].pin, brightness); }
+inline void flushLeds() {} // analogWrite werkt direct, er valt niets te bundelen
+""",
+    "pca9685": """
+// --- Uitgang: PCA9685 PWM-expanders via I2C (kanaal i = chip i / 16, uitgang i % 16) ---
+#include <Wire.h>
+
+#define PCA9685_BASE_ADDRESS 0x40 // Adres van de eerste chip; de volgende chips op 0x41, 0x42, ...
+#define PCA9685_CHANNELS     16
+#define PCA9685_BURST        7    // (32 bytes Wire-buffer - 1 registerbyte) / 4 bytes per kanaal
+#define PCA9685_MODE1        0x00
+#define PCA9685_LED0_ON_L    0x06
+#define PCA9685_PRESCALE     0xFE
+
+const int NUM_CHIPS = (NUM_LEDS + PCA9685_CHANNELS - 1) / PCA9685_CHANNELS;
+uint8_t ledLevels[NUM_LEDS]; // Gewenste helderheid per kanaal
+bool ledDirty[NUM_LEDS];     // Nog niet naar de chip gestuurd
+
+void flushLeds();
+
+void pca9685WriteRegister(uint8_t chip, uint8_t reg, uint8_t value) {
+  Wire.beginTransmission(PCA9685_BASE_ADDRESS + chip);
+  Wire.write(reg);
+  Wire.write(value);
+  Wire.endTransmission();
+}
+
+void setupOutputs() {
+  Wire.begin();
+  Wire.setClock(400000); // Fast-mode I2C
+  for (int chip = 0; chip < NUM_CHIPS; chip++) {
+    pca9685WriteRegister(chip, PCA9685_MODE1, 0x10);     // Slaapstand, nodig om de prescaler te zetten
+    pca9685WriteRegister(chip, PCA9685_PRESCALE, 3);     // Hoogste PWM-frequentie (~1.5 kHz), geen zichtbaar flikkeren
+    pca9685WriteRegister(chip, PCA9685_MODE1, 0x20);     // Wakker, auto-increment aan
+    delayMicroseconds(500);                              // Oscillator laten opstarten
+    pca9685WriteRegister(chip, PCA9685_MODE1, 0xA0);     // Restart + auto-increment
+  }
+  for (int i = 0; i < NUM_LEDS; i++) {
+    ledLevels[i] = 0;
+    ledDirty[i] = true; // Begin met alle LED's uit
+  }
+  flushLeds();
+}
+
+void setLed(int i, int brightness) {
+  if (ledLevels[i] != brightness) {
+    ledLevels[i] = brightness;
+    ledDirty[i] = true;
+  }
+}
+
+void flushLeds() {
+  int i = 0;
+  while (i < NUM_LEDS) {
+    if (!ledDirty[i]) {
+      i++;
+      continue;
+    }
+    // Eén Wire-transactie voor opeenvolgende kanalen op dezelfde chip (auto-increment)
+    int chip = i / PCA9685_CHANNELS;
+    int limit = min(min(i + PCA9685_BURST, (chip + 1) * PCA9685_CHANNELS), NUM_LEDS);
+    int last = i;
+    for (int j = i + 1; j < limit; j++) {
+      if (ledDirty[j]) last = j;
+    }
+    Wire.beginTransmission(PCA9685_BASE_ADDRESS + chip);
+    Wire.write(PCA9685_LED0_ON_L + 4 * (i % PCA9685_CHANNELS));
+    for (int j = i; j <= last; j++) {
+      // 8-bit helderheid naar 12-bit; 0 en 255 via de 'volledig uit/aan'-bits
+      uint16_t off = (uint16_t)ledLevels[j] * 16 + ledLevels[j] / 16;
+      Wire.write(0);
+      Wire.write(ledLevels[j] == 255 ? 0x10 : 0);
+      Wire.write(ledLevels[j] == 255 ? 0 : lowByte(off));
+      Wire.write(ledLevels[j] == 0 ? 0x10 : (ledLevels[j] == 255 ? 0 : highByte(off)));
+      ledDirty[j] = false;
+    }
+    Wire.endTransmission();
+    i = last + 1;
+  }
+}
+""",
+    "tlc5940": """
+// --- Uitgang: TLC5940 PWM-keten via SPI (kanaal i = uitgang i van de keten) ---
+// Vereist de Arduino Tlc5940-bibliotheek; zet NUM_TLCS in tlc_config.h op {num_chips}.
+#include "Tlc5940.h"
+
+bool ledsChanged = false; // Er staan wijzigingen klaar die nog niet naar de keten zijn geschoven
+
+void setupOutputs() {
+  Tlc.init(0); // Begin met alle LED's uit
+}
+
+void setLed(int i, int brightness) {
+  Tlc.set(i, brightness * 16 + brightness / 16); // 8-bit helderheid naar 12-bit
+  ledsChanged = true;
+}
+
+void flushLeds() {
+  // De hele keten in één SPI-overdracht; update() geeft 1 zolang de vorige nog niet gelatcht is
+  if (ledsChanged && Tlc.update() == 0) {
+    ledsChanged = false;
+  }
+}
+""",
+}
+
+def output_channel_capacity(backend):
+    """Maximaal aantal LEDs voor een uitgang (None = beperkt door de pinnen van het bord)."""
+    spec = OUTPUT_BACKENDS[backend]
+    if spec['channels_per_chip'] is None:
+        return None
+    return spec['channels_per_chip'] * spec['max_chips']
+
 # --- Arduino Code Generatie Functie (aangepast voor variabele helderheid) ---
-def generate_arduino_code(led_configs):
-    """Genereert de Arduino C++ code op basis van de opgegeven LED-configuraties."""
-    arduino_code = """
+# Vaste delen van de sketch. Alleen de LED-rijen en het uitgangsblok verschillen per layout, zodat
+# de uitvoer voor dezelfde configs byte voor byte gelijk is (zie write_arduino_sketch).
+_SKETCH_HEADER = """
 // --- Configuratieparameters voor elke LED ---
 // Pas deze waarden aan naar wens. Tijden zijn in milliseconden.
 
@@ -123,8 +288,8 @@ def generate_arduino_code(led_configs):
 #define MODE_FADE_OUT     3
 #define MODE_BLINKING     4 // Nieuwe modus: knipperen/stroboscoop
 
-struct LedConfig {
-  int pin;
+// Unieke parametersets (profielen); LEDs met dezelfde instellingen delen één rij
+struct LedProfile {
   // Algemene timings
   unsigned long minOnDurationMillis;
   unsigned long maxOnDurationMillis;
@@ -153,33 +318,70 @@ struct LedConfig {
   unsigned long blinkOffDurationMillis; // Hoe lang de LED uit is tijdens knipperen
 };
 
-// Array van LED configuraties
-LedConfig ledConfigs[] = {
+// Tabel met profielen
+const LedProfile ledProfiles[] = {
 """
 
-    for i, config in enumerate(led_configs):
-        # Let op: tijden in config zijn strings (vanwege entry velden). Converteer naar float en dan naar int ms.
-        arduino_code += f"""  // LED {i + 1}
+# Eén rij van ledProfiles[]; ingevuld door _render_profile_row()
+_SKETCH_PROFILE_ROW = """  // Profiel {number}
   {{
-    {config['pin']},                       // Pin
-    {int(float(config['min_on_s']) * 1000)}, {int(float(config['max_on_s']) * 1000)},            // minOnDurationMillis, maxOnDurationMillis
-    {int(float(config['min_off_s']) * 1000)}, {int(float(config['max_off_s']) * 1000)},            // minOffDurationMillis, maxOffDurationMillis
-    {str(config['fade_in']).lower()}, {int(float(config['min_fade_in_s']) * 1000)}, {int(float(config['max_fade_in_s']) * 1000)},        // fadeInEnabled, minFadeInDurationMillis, maxFadeInDurationMillis
-    {str(config['fade_out']).lower()}, {int(float(config['min_fade_out_s']) * 1000)}, {int(float(config['max_fade_out_s']) * 1000)},        // fadeOutEnabled, minFadeOutDurationMillis, maxFadeOutDurationMillis
-    {str(config['var_bright']).lower()}, {config['min_bright']}, {config['max_bright']},          // variableBrightnessEnabled, minBrightnessDuringOn, maxBrightnessDuringOn
-    {int(float(config['bright_interval_s']) * 1000)},                    // brightnessChangeIntervalMillis (deze wordt genegeerd voor var_bright)
-    {str(config['blinking']).lower()}, {int(config['blink_on_ms'])}, {int(config['blink_off_ms'])}              // blinkingEnabled, blinkOnDurationMillis, blinkOffDurationMillis
+    {min_on}, {max_on},            // minOnDurationMillis, maxOnDurationMillis
+    {min_off}, {max_off},            // minOffDurationMillis, maxOffDurationMillis
+    {fade_in}, {min_fade_in}, {max_fade_in},        // fadeInEnabled, minFadeInDurationMillis, maxFadeInDurationMillis
+    {fade_out}, {min_fade_out}, {max_fade_out},        // fadeOutEnabled, minFadeOutDurationMillis, maxFadeOutDurationMillis
+    {var_bright}, {min_bright}, {max_bright},          // variableBrightnessEnabled, minBrightnessDuringOn, maxBrightnessDuringOn
+    {bright_interval},                    // brightnessChangeIntervalMillis (deze wordt genegeerd voor var_bright)
+    {blinking}, {blink_on}, {blink_off}              // blinkingEnabled, blinkOnDurationMillis, blinkOffDurationMillis
   }},
 """
-    # Verwijder de laatste komma en voeg de afsluitende accolades toe
-    arduino_code = arduino_code.rstrip(',\n') + "\n};"
 
-    arduino_code += f"""
+# Eén toestandsmachine per synchrone groep en per losse LED; de types hangen af van de grootste waarde
+_SKETCH_MACHINES = """
+
+// Toestandsmachines: één per synchrone groep (gedeeld door alle leden) en één per losse LED
+struct LedMachine {
+  {profile_type} profile;  // Index in ledProfiles[]
+  {led_type} firstLed;     // Eerste LED in leds[] (zijn pin staat in de seriële log)
+};
+
+const LedMachine machines[] = {
+"""
+
+# Per LED de pin en zijn toestandsmachine; vertraging en schaal alleen als een groep ze gebruikt
+_SKETCH_ASSIGNMENTS = """
+
+#define SYNC_MEMBERS {sync_members} // 1 = leden van synchrone groepen hebben een eigen vertraging/schaal
+
+struct LedAssignment {
+  {pin_type} pin;      // Pin (of kanaal bij een expander)
+  {machine_type} machine;  // Index in ledStates[] en machines[]
+#if SYNC_MEMBERS
+  uint16_t offsetMillis;   // Vertraging t.o.v. de toestandsmachine van de groep
+  uint8_t scalePercent;    // Helderheid in procent van die van de groep
+#endif
+};
+
+// Array van LED's: pin en toestandsmachine (en bij SYNC_MEMBERS vertraging en schaal)
+const LedAssignment leds[] = {
+"""
+
+_SKETCH_BODY = """
 
-const int NUM_LEDS = sizeof(ledConfigs) / sizeof(ledConfigs[0]);
+const int NUM_LEDS = sizeof(leds) / sizeof(leds[0]);
+const int NUM_MACHINES = sizeof(machines) / sizeof(machines[0]);
 
-// --- Variabelen voor elke LED (worden door het programma gebruikt) ---
-struct LedState {{
+#if SYNC_MEMBERS
+// Verloop van een fase als helling: constant (duur 0) of een fade van 'from' naar 'to'
+struct Ramp {
+  unsigned long start;
+  unsigned long duration;
+  uint8_t from;
+  uint8_t to;
+};
+#endif
+
+// --- Variabelen voor elke toestandsmachine (worden door het programma gebruikt) ---
+struct LedState {
   unsigned long lastToggleTime;       // Tijd van laatste aan/uit schakeling of moduswissel
   unsigned long currentDuration;      // De willekeurig bepaalde duur voor de huidige fase (aan/uit/fade)
   int currentMode;                    // Huidige modus van de LED (OFF, ON, FADE_IN, FADE_OUT, BLINKING)
@@ -187,158 +389,471 @@ struct LedState {{
   unsigned long fadeStartTime;        // Starttijd van de fade-animatie
   unsigned long fadeDuration;         // Willekeurig bepaalde duur van de fade
   int fadeTargetBrightness;           // De doelhelderheid voor een fade-in animatie (eenmalig gekozen)
+  int fadeStartBrightness;            // De helderheid bij het begin van een fade-out animatie
   unsigned long lastBrightnessChangeTime; // Voor variabele helderheid (nu alleen bij overgang naar AAN)
   unsigned long lastBlinkToggleTime;  // Voor knipperende modus
   bool blinkState;                    // Huidige knipperstatus (aan/uit)
-}};
+#if SYNC_MEMBERS
+  unsigned long phaseStartTime;       // Begin van de huidige fase
+  Ramp previousRamp;                  // Verloop van de vorige fase, voor leden met een vertraging
+#endif
+};
 
-LedState ledStates[NUM_LEDS];
+LedState ledStates[NUM_MACHINES];
+uint8_t ledShown[NUM_LEDS]; // Laatst naar de uitgang geschreven helderheid per LED
+{output_code}
+#if SYNC_MEMBERS
+// Helderheid van een helling op tijdstip t (zelfde afronding als de fades met map())
+int rampLevel(const Ramp& ramp, unsigned long t) {
+  long elapsed = (long)(t - ramp.start);
+  if (elapsed >= (long)ramp.duration) return ramp.to;
+  if (elapsed <= 0) return ramp.from;
+  return map(elapsed, 0, ramp.duration, ramp.from, ramp.to);
+}
+
+Ramp currentRamp(const LedState& state) {
+  if (state.currentMode == MODE_FADE_IN) {
+    return { state.fadeStartTime, state.fadeDuration, 0, (uint8_t)state.fadeTargetBrightness };
+  }
+  if (state.currentMode == MODE_FADE_OUT) {
+    return { state.fadeStartTime, state.fadeDuration, (uint8_t)state.fadeStartBrightness, 0 };
+  }
+  return { state.phaseStartTime, 0, (uint8_t)state.currentBrightness, (uint8_t)state.currentBrightness };
+}
+#endif
+
+// Helderheid van LED i: die van zijn toestandsmachine, bij een lid van een groep vertraagd en geschaald
+uint8_t ledLevel(int i, unsigned long currentTime) {
+  const LedState& state = ledStates[leds[i].machine];
+#if SYNC_MEMBERS
+  unsigned long shifted = currentTime - leds[i].offsetMillis;
+  int level = (long)(shifted - state.phaseStartTime) < 0 ? rampLevel(state.previousRamp, shifted)
+                                                          : rampLevel(currentRamp(state), shifted);
+  return level * leds[i].scalePercent / 100;
+#else
+  return state.currentBrightness;
+#endif
+}
 
 // --- Setup functie (eenmalig uitgevoerd bij opstarten) ---
-void setup() {{
+void setup() {
   Serial.begin(9600); // Start seriële communicatie voor debugging
 
   // Gebruik een analoge pin (A0) om een willekeurige seed te genereren voor random functies.
   // Zorg dat A0 niet is aangesloten, anders is de willekeurigheid minder.
   randomSeed(analogRead(A0));
 
-  for (int i = 0; i < NUM_LEDS; i++) {{
-    pinMode(ledConfigs[i].pin, OUTPUT);
-    analogWrite(ledConfigs[i].pin, 0); // Begin met alle LED's uit
+  setupOutputs(); // Zet alle uitgangen klaar en alle LED's uit
+  for (int i = 0; i < NUM_MACHINES; i++) {
+    const LedProfile& config = ledProfiles[machines[i].profile];
     ledStates[i].lastToggleTime = millis();
     ledStates[i].currentMode = MODE_OFF; // Begin in UIT-stand
     ledStates[i].currentBrightness = 0;
-    ledStates[i].currentDuration = random(ledConfigs[i].minOffDurationMillis, ledConfigs[i].maxOffDurationMillis + 1); // Eerste off duration
+    ledStates[i].currentDuration = random(config.minOffDurationMillis, config.maxOffDurationMillis + 1); // Eerste off duration
     ledStates[i].blinkState = false; // Begin knipperen in uit-stand
     ledStates[i].fadeTargetBrightness = 0; // Initialize
-  }}
-}}
+#if SYNC_MEMBERS
+    ledStates[i].phaseStartTime = ledStates[i].lastToggleTime;
+    ledStates[i].previousRamp = { 0, 0, 0, 0 };
+#endif
+  }
+}
 
 // --- Loop functie (continu uitgevoerd) ---
-void loop() {{
+void loop() {
   unsigned long currentTime = millis(); // Haal de huidige tijd op in milliseconden
 
-  for (int i = 0; i < NUM_LEDS; i++) {{
-    switch (ledStates[i].currentMode) {{
+  // Elke toestandsmachine één keer; een synchrone groep deelt er één
+  for (int i = 0; i < NUM_MACHINES; i++) {
+    const LedProfile& config = ledProfiles[machines[i].profile]; // Gedeelde parameters van deze machine
+    const int pin = leds[machines[i].firstLed].pin; // Voor de seriële log
+#if SYNC_MEMBERS
+    int previousMode = ledStates[i].currentMode;
+    Ramp previousRamp = currentRamp(ledStates[i]);
+#endif
+    switch (ledStates[i].currentMode) {
       case MODE_OFF:
-        if (currentTime - ledStates[i].lastToggleTime >= ledStates[i].currentDuration) {{
-          if (ledConfigs[i].fadeInEnabled) {{
+        if (currentTime - ledStates[i].lastToggleTime >= ledStates[i].currentDuration) {
+          if (config.fadeInEnabled) {
             ledStates[i].currentMode = MODE_FADE_IN;
             ledStates[i].fadeStartTime = currentTime;
-            ledStates[i].fadeDuration = random(ledConfigs[i].minFadeInDurationMillis, ledConfigs[i].maxFadeInDurationMillis + 1);
+            ledStates[i].fadeDuration = random(config.minFadeInDurationMillis, config.maxFadeInDurationMillis + 1);
             // Bepaal de eenmalige doelhelderheid voor fade-in
-            ledStates[i].fadeTargetBrightness = ledConfigs[i].variableBrightnessEnabled ? \
-                                                random(ledConfigs[i].minBrightnessDuringOn, ledConfigs[i].maxBrightnessDuringOn + 1) : 255;
+            ledStates[i].fadeTargetBrightness = config.variableBrightnessEnabled ? \
+                                                random(config.minBrightnessDuringOn, config.maxBrightnessDuringOn + 1) : 255;
             // Begin de fade vanaf 0 helderheid
             ledStates[i].currentBrightness = 0; 
-            analogWrite(ledConfigs[i].pin, ledStates[i].currentBrightness);
-            Serial.print("LED "); Serial.print(ledConfigs[i].pin); Serial.print(" start FADE_IN naar "); Serial.println(ledStates[i].fadeTargetBrightness);
-          }} else {{
-            if (ledConfigs[i].blinkingEnabled) {{
+            Serial.print("LED "); Serial.print(pin); Serial.print(" start FADE_IN naar "); Serial.println(ledStates[i].fadeTargetBrightness);
+          } else {
+            if (config.blinkingEnabled) {
               ledStates[i].currentMode = MODE_BLINKING;
               ledStates[i].lastToggleTime = currentTime;
               ledStates[i].blinkState = true; // Begin met aan
               // Set initial brightness for blinking (using variable brightness range)
-              ledStates[i].currentBrightness = random(ledConfigs[i].minBrightnessDuringOn, ledConfigs[i].maxBrightnessDuringOn + 1);
-              analogWrite(ledConfigs[i].pin, ledStates[i].currentBrightness);
-              Serial.print("LED "); Serial.print(ledConfigs[i].pin); Serial.println(" start BLINKING");
-            }} else {{
+              ledStates[i].currentBrightness = random(config.minBrightnessDuringOn, config.maxBrightnessDuringOn + 1);
+                Serial.print("LED "); Serial.print(pin); Serial.println(" start BLINKING");
+            } else {
               ledStates[i].currentMode = MODE_ON;
               ledStates[i].lastToggleTime = currentTime;
               // Stel de helderheid in als variabele helderheid is ingeschakeld, anders gewoon 255
-              ledStates[i].currentBrightness = ledConfigs[i].variableBrightnessEnabled ? \
-                                                random(ledConfigs[i].minBrightnessDuringOn, ledConfigs[i].maxBrightnessDuringOn + 1) : 255;
-              analogWrite(ledConfigs[i].pin, ledStates[i].currentBrightness);
-              ledStates[i].currentDuration = random(ledConfigs[i].minOnDurationMillis, ledConfigs[i].maxOnDurationMillis + 1);
-              Serial.print("LED "); Serial.print(ledConfigs[i].pin); Serial.println(" DIRECT AAN");
-            }}
-          }}
-        }}
+              ledStates[i].currentBrightness = config.variableBrightnessEnabled ? \
+                                                random(config.minBrightnessDuringOn, config.maxBrightnessDuringOn + 1) : 255;
+                ledStates[i].currentDuration = random(config.minOnDurationMillis, config.maxOnDurationMillis + 1);
+              Serial.print("LED "); Serial.print(pin); Serial.println(" DIRECT AAN");
+            }
+          }
+        }
         break;
 
       case MODE_ON:
-        if (currentTime - ledStates[i].lastToggleTime >= ledStates[i].currentDuration) {{
-          if (ledConfigs[i].fadeOutEnabled) {{
+        if (currentTime - ledStates[i].lastToggleTime >= ledStates[i].currentDuration) {
+          if (config.fadeOutEnabled) {
             ledStates[i].currentMode = MODE_FADE_OUT;
             ledStates[i].fadeStartTime = currentTime;
-            ledStates[i].fadeDuration = random(ledConfigs[i].minFadeOutDurationMillis, ledConfigs[i].maxFadeOutDurationMillis + 1);
-            Serial.print("LED "); Serial.print(ledConfigs[i].pin); Serial.println(" start FADE_OUT");
-          }} else {{
+            ledStates[i].fadeDuration = random(config.minFadeOutDurationMillis, config.maxFadeOutDurationMillis + 1);
+            ledStates[i].fadeStartBrightness = ledStates[i].currentBrightness; // Vast startpunt voor de hele fade-out
+            Serial.print("LED "); Serial.print(pin); Serial.println(" start FADE_OUT");
+          } else {
             ledStates[i].currentMode = MODE_OFF;
             ledStates[i].lastToggleTime = currentTime;
-            analogWrite(ledConfigs[i].pin, 0); // Zorg dat de LED uit is
-            ledStates[i].currentDuration = random(ledConfigs[i].minOffDurationMillis, ledConfigs[i].maxOffDurationMillis + 1);
-            Serial.print("LED "); Serial.print(ledConfigs[i].pin); Serial.println(" DIRECT UIT");
-          }}
-        }}
+            ledStates[i].currentBrightness = 0; // Zorg dat de LED uit is
+            ledStates[i].currentDuration = random(config.minOffDurationMillis, config.maxOffDurationMillis + 1);
+            Serial.print("LED "); Serial.print(pin); Serial.println(" DIRECT UIT");
+          }
+        }
         break;
 
       case MODE_FADE_IN:
-        if (currentTime - ledStates[i].fadeStartTime < ledStates[i].fadeDuration) {{
+        if (currentTime - ledStates[i].fadeStartTime < ledStates[i].fadeDuration) {
           unsigned long elapsedTime = currentTime - ledStates[i].fadeStartTime;
           // Map current brightness based on elapsed time to the target brightness (eenmalig gekozen)
           // Fade van 0 naar fadeTargetBrightness
           ledStates[i].currentBrightness = map(elapsedTime, 0, ledStates[i].fadeDuration, 0, ledStates[i].fadeTargetBrightness);
-          analogWrite(ledConfigs[i].pin, ledStates[i].currentBrightness);
-        }} else {{
+        } else {
           ledStates[i].currentMode = MODE_ON;
           ledStates[i].lastToggleTime = currentTime;
           // Zorg dat de LED op de definitieve helderheid staat (gelijk aan fadeTargetBrightness)
           ledStates[i].currentBrightness = ledStates[i].fadeTargetBrightness; 
-          analogWrite(ledConfigs[i].pin, ledStates[i].currentBrightness); 
-          ledStates[i].currentDuration = random(ledConfigs[i].minOnDurationMillis, ledConfigs[i].maxOnDurationMillis + 1);
-          Serial.print("LED "); Serial.print(ledConfigs[i].pin); Serial.print(" einde FADE_IN, nu AAN op helderheid "); Serial.println(ledStates[i].currentBrightness);
-        }}
+          ledStates[i].currentDuration = random(config.minOnDurationMillis, config.maxOnDurationMillis + 1);
+          Serial.print("LED "); Serial.print(pin); Serial.print(" einde FADE_IN, nu AAN op helderheid "); Serial.println(ledStates[i].currentBrightness);
+        }
         break;
 
       case MODE_FADE_OUT:
-        if (currentTime - ledStates[i].fadeStartTime < ledStates[i].fadeDuration) {{
+        if (currentTime - ledStates[i].fadeStartTime < ledStates[i].fadeDuration) {
           unsigned long elapsedTime = currentTime - ledStates[i].fadeStartTime;
-          // Fade from current brightness (or 255 if not variable) down to 0
-          int startBrightness = ledStates[i].currentBrightness; // Use current brightness as starting point
-          ledStates[i].currentBrightness = map(elapsedTime, 0, ledStates[i].fadeDuration, startBrightness, 0);
-          analogWrite(ledConfigs[i].pin, ledStates[i].currentBrightness);
-        }} else {{
+          // Fade van de helderheid bij het begin van de fade-out lineair naar 0
+          ledStates[i].currentBrightness = map(elapsedTime, 0, ledStates[i].fadeDuration, ledStates[i].fadeStartBrightness, 0);
+        } else {
           ledStates[i].currentMode = MODE_OFF;
           ledStates[i].lastToggleTime = currentTime;
-          analogWrite(ledConfigs[i].pin, 0); // Zorg dat de LED volledig uit is
-          ledStates[i].currentDuration = random(ledConfigs[i].minOffDurationMillis, ledConfigs[i].maxOffDurationMillis + 1);
-          Serial.print("LED "); Serial.print(ledConfigs[i].pin); Serial.println(" einde FADE_OUT, nu UIT");
-        }}
+          ledStates[i].currentBrightness = 0; // Zorg dat de LED volledig uit is
+          ledStates[i].currentDuration = random(config.minOffDurationMillis, config.maxOffDurationMillis + 1);
+          Serial.print("LED "); Serial.print(pin); Serial.println(" einde FADE_OUT, nu UIT");
+        }
         break;
 
       case MODE_BLINKING:
         // Als de hoofdtijd voor 'TV aan' is verstreken, ga dan naar de uit-stand
-        if (currentTime - ledStates[i].lastToggleTime >= ledStates[i].currentDuration) {{
+        if (currentTime - ledStates[i].lastToggleTime >= ledStates[i].currentDuration) {
             ledStates[i].currentMode = MODE_OFF;
             ledStates[i].lastToggleTime = currentTime;
-            analogWrite(ledConfigs[i].pin, 0); // Zet LED uit
-            ledStates[i].currentDuration = random(ledConfigs[i].minOffDurationMillis, ledConfigs[i].maxOffDurationMillis + 1);
-            Serial.print("LED "); Serial.print(ledConfigs[i].pin); Serial.println(" einde BLINKING periode, nu UIT");
+            ledStates[i].currentBrightness = 0; // Zet LED uit
+            ledStates[i].currentDuration = random(config.minOffDurationMillis, config.maxOffDurationMillis + 1);
+            Serial.print("LED "); Serial.print(pin); Serial.println(" einde BLINKING periode, nu UIT");
             break; // Spring uit deze case om direct naar de volgende status te gaan
-        }}
+        }
 
         // Knipperlogica binnen de BLINKING periode
-        if (ledStates[i].blinkState == true) {{ // LED is momenteel aan in knipper-modus
-          if (currentTime - ledStates[i].lastBlinkToggleTime >= ledConfigs[i].blinkOnDurationMillis) {{
-            analogWrite(ledConfigs[i].pin, 0); // Zet LED uit
+        if (ledStates[i].blinkState == true) { // LED is momenteel aan in knipper-modus
+          if (currentTime - ledStates[i].lastBlinkToggleTime >= config.blinkOnDurationMillis) {
+            ledStates[i].currentBrightness = 0; // Zet LED uit
             ledStates[i].blinkState = false;
             ledStates[i].lastBlinkToggleTime = currentTime;
-          }}
-        }} else {{ // LED is momenteel uit in knipper-modus
-          if (currentTime - ledStates[i].lastBlinkToggleTime >= ledConfigs[i].blinkOffDurationMillis) {{
+          }
+        } else { // LED is momenteel uit in knipper-modus
+          if (currentTime - ledStates[i].lastBlinkToggleTime >= config.blinkOffDurationMillis) {
             // Zet LED aan met een willekeurige helderheid voor een realistischer TV-effect
-            analogWrite(ledConfigs[i].pin, random(ledConfigs[i].minBrightnessDuringOn, ledConfigs[i].maxBrightnessDuringOn + 1));
+            ledStates[i].currentBrightness = random(config.minBrightnessDuringOn, config.maxBrightnessDuringOn + 1);
             ledStates[i].blinkState = true;
             ledStates[i].lastBlinkToggleTime = currentTime;
-          }}
-        }}
+          }
+        }
         break;
-    }}
-  }}
-}}
+    }
+#if SYNC_MEMBERS
+    if (ledStates[i].currentMode != previousMode) {
+      ledStates[i].phaseStartTime = currentTime;
+      ledStates[i].previousRamp = previousRamp;
+    }
+#endif
+  }
+
+  // Alle LEDs: alleen een gewijzigde helderheid gaat naar de uitgang
+  for (int i = 0; i < NUM_LEDS; i++) {
+    uint8_t level = ledLevel(i, currentTime);
+    if (level != ledShown[i]) {
+      ledShown[i] = level;
+      setLed(i, level);
+    }
+  }
+  flushLeds(); // Alle wijzigingen van deze ronde in zo min mogelijk bustransacties
+}
 """
-    return arduino_code
+
+# Plaatsen in _SKETCH_PROFILE_ROW, in de volgorde van sketch_profile_values()
+_PROFILE_ROW_FIELDS = ('min_on', 'max_on', 'min_off', 'max_off', 'fade_in', 'min_fade_in', 'max_fade_in',
+                       'fade_out', 'min_fade_out', 'max_fade_out', 'var_bright', 'min_bright', 'max_bright',
+                       'bright_interval', 'blinking', 'blink_on', 'blink_off')
+SKETCH_MANIFEST_VERSION = 2
+
+# Geschat SRAM-gebruik op een AVR (int = 2, unsigned long = 4, bool = 1 byte)
+SKETCH_PROFILE_BYTES = 52 # Eén rij van ledProfiles[]
+SKETCH_LEGACY_CONFIG_BYTES = 54 # De vroegere LedConfig-rij per LED (profiel + int pin)
+SKETCH_STATE_BYTES = 33 # LedState per toestandsmachine
+SKETCH_SYNC_STATE_BYTES = 14 # phaseStartTime + previousRamp in LedState, alleen bij SYNC_MEMBERS
+SKETCH_SRAM_BASE = 700 # Serial-buffers, de Serial.print-teksten (zonder F() in SRAM) en een reserve voor de stack
+
+def sketch_profile_values(config):
+    """De waarden van een LED zoals ze in ledProfiles[] komen; LEDs met gelijke waarden delen een profiel."""
+    # Let op: tijden in config zijn strings (vanwege entry velden). Converteer naar float en dan naar int ms.
+    def ms(field):
+        return str(int(float(config[field]) * 1000))
+    return (ms('min_on_s'), ms('max_on_s'), ms('min_off_s'), ms('max_off_s'),
+            str(config['fade_in']).lower(), ms('min_fade_in_s'), ms('max_fade_in_s'),
+            str(config['fade_out']).lower(), ms('min_fade_out_s'), ms('max_fade_out_s'),
+            str(config['var_bright']).lower(), str(config['min_bright']), str(config['max_bright']),
+            ms('bright_interval_s'),
+            str(config['blinking']).lower(), str(int(config['blink_on_ms'])), str(int(config['blink_off_ms'])))
+
+def _render_profile_row(profile_index, values):
+    """Rendert de rij van één profiel in ledProfiles[]."""
+    return _SKETCH_PROFILE_ROW.format(number=profile_index, **dict(zip(_PROFILE_ROW_FIELDS, values)))
+
+def _profile_row_key(profile_index, values):
+    """Hash van alles wat de rij van een profiel bepaalt: zijn index, de waarden en het rij-sjabloon."""
+    data = json.dumps([profile_index, _SKETCH_PROFILE_ROW, list(values)])
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+def build_profile_table(led_configs):
+    """Ontdubbelt de parameters van een layout: retourneert (unieke waarden per profiel, profielindex per LED)."""
+    profiles = {}
+    indices = []
+    for config in led_configs:
+        indices.append(profiles.setdefault(sketch_profile_values(config), len(profiles)))
+    return list(profiles), indices
+
+def estimate_sketch_sram(led_configs, backend="native"):
+    """Schat het SRAM-gebruik van de sketch, vergeleken met één LedConfig en LedState per LED."""
+    profiles, _ = build_profile_table(led_configs)
+    machine_of_led, leaders = build_led_machines(led_configs)
+    sync_members = any(sync_member_params(config)[1:] != (0, 100) for config in led_configs)
+    max_pin = len(led_configs) - 1 if output_channel_capacity(backend) is not None else \
+        max((int(config['pin']) for config in led_configs), default=0)
+    assignment_bytes = (1 if max_pin <= 255 else 2) + (1 if len(leaders) <= 256 else 2) + (3 if sync_members else 0)
+    machine_bytes = (1 if len(profiles) <= 256 else 2) + (1 if len(led_configs) <= 256 else 2)
+    config_bytes = SKETCH_PROFILE_BYTES * len(profiles) + assignment_bytes * len(led_configs) + machine_bytes * len(leaders)
+    legacy_config_bytes = SKETCH_LEGACY_CONFIG_BYTES * len(led_configs)
+    state_bytes = (SKETCH_STATE_BYTES + (SKETCH_SYNC_STATE_BYTES if sync_members else 0)) * len(leaders) + len(led_configs)
+    legacy_state_bytes = SKETCH_STATE_BYTES * len(led_configs)
+    return {
+        'leds': len(led_configs), 'profiles': len(profiles), 'machines': len(leaders),
+        'config_bytes': config_bytes, 'legacy_config_bytes': legacy_config_bytes,
+        'state_bytes': state_bytes, 'legacy_state_bytes': legacy_state_bytes,
+        'total_bytes': SKETCH_SRAM_BASE + state_bytes + config_bytes,
+        'legacy_total_bytes': SKETCH_SRAM_BASE + legacy_state_bytes + legacy_config_bytes,
+    }
+
+def format_sketch_sram(estimate):
+    """Eén regel met de besparing van de profieltabel en de synchrone groepen (zie estimate_sketch_sram)."""
+    saved = estimate['legacy_config_bytes'] - estimate['config_bytes']
+    percentage = saved / estimate['legacy_config_bytes'] * 100 if estimate['legacy_config_bytes'] else 0.0
+    machines = ""
+    if estimate['machines'] < estimate['leds']:
+        machines = (f", {estimate['machines']} toestandsmachine(s): toestand {estimate['state_bytes']} bytes "
+                    f"i.p.v. {estimate['legacy_state_bytes']}")
+    return (f"{estimate['leds']} LEDs delen {estimate['profiles']} profiel(en): configuratie {estimate['config_bytes']} bytes "
+            f"i.p.v. {estimate['legacy_config_bytes']} ({percentage:.0f}% minder){machines}; "
+            f"SRAM totaal ~{estimate['total_bytes']} i.p.v. ~{estimate['legacy_total_bytes']} bytes")
+
+def generate_arduino_code(led_configs, backend="native", row_cache=None):
+    """Genereert de Arduino C++ code op basis van de opgegeven LED-configuraties.
+
+    backend kiest de uitgang (zie OUTPUT_BACKENDS). Bij een expander is de pin van elke LED zijn
+    kanaalnummer (de volgorde in led_configs) en worden de configs' pinnen genegeerd.
+    LEDs met dezelfde parameters delen één rij in ledProfiles[]. Elke synchrone groep (sync_group)
+    en elke losse LED krijgt één toestandsmachine in machines[] en ledStates[]; per LED staan de pin,
+    de machine en (alleen als een groep ze gebruikt) vertraging en schaal in leds[].
+    row_cache (optioneel, dict hash -> rij) levert eerder gerenderde profielrijen; na afloop bevat
+    hij precies de rijen van deze sketch.
+    """
+    if backend not in OUTPUT_BACKENDS:
+        raise ValueError(f"Onbekende uitgang '{backend}' (kies uit {', '.join(OUTPUT_BACKENDS)}).")
+    capacity = output_channel_capacity(backend)
+    if capacity is not None:
+        if len(led_configs) > capacity:
+            raise ValueError(f"{OUTPUT_BACKENDS[backend]['name']} ondersteunt maximaal {capacity} LEDs.")
+        led_configs = [dict(config, pin=i) for i, config in enumerate(led_configs)]
+        num_chips = -(-len(led_configs) // OUTPUT_BACKENDS[backend]['channels_per_chip'])
+    else:
+        num_chips = 0
+    output_code = _OUTPUT_CODE[backend].replace("{num_chips}", str(num_chips))
+    profiles, profile_indices = build_profile_table(led_configs)
+    rows = {}
+    for index, values in enumerate(profiles):
+        key = _profile_row_key(index, values)
+        fragment = row_cache.get(key) if row_cache is not None else None
+        rows[key] = fragment if fragment is not None else _render_profile_row(index, values)
+    if row_cache is not None:
+        row_cache.clear()
+        row_cache.update(rows)
+
+    machine_of_led, leaders = build_led_machines(led_configs)
+    members = [sync_member_params(config) for config in led_configs]
+    sync_members = any((offset, scale) != (0, 100) for _, offset, scale in members)
+    machines = _SKETCH_MACHINES.replace("{profile_type}", "uint8_t" if len(profiles) <= 256 else "uint16_t") \
+                               .replace("{led_type}", "uint8_t" if len(led_configs) <= 256 else "uint16_t")
+    machine_rows = []
+    for machine, first_led in enumerate(leaders):
+        name = members[first_led][0]
+        label = f"Groep {name} ({machine_of_led.count(machine)} LEDs)" if name else f"LED {first_led + 1}"
+        machine_rows.append(f"  {{ {profile_indices[first_led]}, {first_led} }}, // {label}\n")
+
+    max_pin = max((int(config['pin']) for config in led_configs), default=0)
+    assignments = _SKETCH_ASSIGNMENTS.replace("{sync_members}", "1" if sync_members else "0") \
+                                     .replace("{pin_type}", "uint8_t" if max_pin <= 255 else "uint16_t") \
+                                     .replace("{machine_type}", "uint8_t" if len(leaders) <= 256 else "uint16_t")
+    led_rows = []
+    for i, (config, machine, (name, offset, scale)) in enumerate(zip(led_configs, machine_of_led, members)):
+        fields = f"{config['pin']}, {machine}, {offset}, {scale}" if sync_members else f"{config['pin']}, {machine}"
+        led_rows.append(f"  {{ {fields} }}, // LED {i + 1}{f' (groep {name})' if name else ''}\n")
+    # Verwijder de laatste komma en voeg de afsluitende accolades toe
+    return "".join([
+        (_SKETCH_HEADER + "".join(rows.values())).rstrip(',\n'), "\n};",
+        (machines + "".join(machine_rows)).rstrip(',\n'), "\n};",
+        (assignments + "".join(led_rows)).rstrip(',\n'), "\n};",
+        _SKETCH_BODY.replace("{output_code}", output_code),
+    ])
+
+def write_arduino_sketch(file_path, led_configs, backend="native", header=""):
+    """Schrijft de sketch alleen als de inhoud verandert, zodat de Arduino IDE niet onnodig opnieuw bouwt.
+
+    Naast de sketch staat een manifest (<sketch>.manifest.json) met de gerenderde rij per profielhash;
+    alleen rijen van gewijzigde profielen worden opnieuw gerenderd. Het bestand wordt als UTF-8 met LF
+    geschreven, dus dezelfde configs geven op elk platform exact dezelfde bytes.
+    Retourneert {'written': bool, 'rendered': aantal nieuwe profielrijen, 'reused': aantal hergebruikte}.
+    """
+    manifest_path = file_path + ".manifest.json"
+    cached_rows = {}
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == SKETCH_MANIFEST_VERSION:
+            cached_rows = manifest.get("rows", {})
+    except (OSError, ValueError):
+        pass # Geen (bruikbaar) manifest: alles opnieuw renderen
+
+    rows = dict(cached_rows)
+    code = (header + generate_arduino_code(led_configs, backend=backend, row_cache=rows)).encode("utf-8")
+    reused = sum(1 for key in rows if key in cached_rows)
+
+    try:
+        with open(file_path, "rb") as f:
+            unchanged = f.read() == code
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        with open(file_path, "wb") as f:
+            f.write(code)
+    if rows != cached_rows:
+        with open(manifest_path, "w") as f:
+            json.dump({"version": SKETCH_MANIFEST_VERSION, "rows": rows}, f, indent=1, sort_keys=True)
+    return {'written': not unchanged, 'rendered': len(rows) - reused, 'reused': reused}
+
+# --- Fades (gevectoriseerd) ---
+FADE_VECTOR_MIN = 128 # Vanaf zoveel fadende LEDs per frame loont de NumPy-weg (FADE_TABLES.gather) boven losse update()-aanroepen
+
+def fade_levels(durations, starts, ends, elapsed):
+    """Helderheden van veel fades tegelijk; alle argumenten zijn gelijk lange reeksen (ms resp. 0-255).
+
+    Zelfde afronding als LedSimulator._map_range() (Arduino's map()): het product is exact in int64
+    en de deling in float64 rondt net zo af als Python's int / int. Vóór het begin geldt de begin-,
+    vanaf het einde de eindhelderheid.
+    """
+    _require_numpy("fade_levels()")
+    durations, starts, ends, elapsed = (np.asarray(column, dtype=np.int64) for column in (durations, starts, ends, elapsed))
+    safe = np.maximum(durations, 1)
+    levels = np.trunc(np.clip(elapsed, 0, safe) * (ends - starts) / safe + starts).astype(np.int64)
+    return np.where(elapsed >= durations, ends, levels)
+
+FADE_TABLE_STEP_MS = 10 # Eén tabelwaarde per tick van het standaard simulatieraster
+FADE_TABLE_MAX_MS = 600000 # Langere fades krijgen geen tabel; exact blijft de tabel zolang duur * 255 < 2^32
+FADE_TABLE_BYTES = 16 * 1024 * 1024 # Vaste bovengrens van de gedeelde arena
+
+class FadeTableCache:
+    """Vooraf berekende fadehellingen op het tickraster, gedeeld door alle LEDs en profielen.
+
+    Een fade volgt Arduino's map(): van + verstreken * (naar - van) / duur, afgekapt. Per duur en
+    richting is er één helling in Q32-vaste komma, verstreken * 2^32 / duur per step_ms: naar boven
+    afgerond voor stijgende en naar beneden voor dalende fades. Daarmee is
+    van + (((naar - van) * helling[k]) >> 32) exact gelijk aan _map_range(), voor elke begin- en
+    eindhelderheid; die zitten dus niet in de sleutel en alle LEDs met dezelfde getrokken duur
+    delen een tabel.
+
+    Alle hellingen staan achter elkaar in één vooraf gereserveerde array('I') van max_bytes (met
+    NumPy zonder kopie te lezen via ramps). Past een nieuwe helling niet meer, dan wordt de arena
+    in zijn geheel geleegd en gaat generation omhoog: wie een offset bewaart, bewaart de generatie
+    erbij en vraagt de offset opnieuw op zodra die niet meer klopt.
+    """
+
+    def __init__(self, step_ms=FADE_TABLE_STEP_MS, max_bytes=FADE_TABLE_BYTES, max_duration_ms=FADE_TABLE_MAX_MS):
+        self.step_ms = step_ms
+        self.max_duration_ms = max_duration_ms
+        self.arena = array.array('I', bytes(max_bytes // 4 * 4))
+        self.ramps = np.frombuffer(self.arena, dtype=np.uint32) if np is not None else None
+        self.used = 0 # Bezette waarden in de arena
+        self.offsets = {} # (duur, stijgend) -> offset van de helling in de arena
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.clears = 0
+
+    def offset(self, duration, rising):
+        """Offset van de helling voor een fade van duration ms in de arena, of -1 zonder tabel."""
+        key = (duration, rising)
+        offset = self.offsets.get(key)
+        if offset is not None:
+            self.hits += 1
+            return offset
+        length = -(-duration // self.step_ms)
+        if not 0 < duration <= self.max_duration_ms or length > len(self.arena):
+            return -1
+        self.misses += 1
+        if self.used + length > len(self.arena):
+            self.offsets.clear()
+            self.used = 0
+            self.generation += 1
+            self.clears += 1
+        offset = self.used
+        step = self.step_ms << 32
+        round_up = duration - 1 if rising else 0
+        if self.ramps is not None:
+            self.ramps[offset:offset + length] = (np.arange(length, dtype=np.int64) * step + round_up) // duration
+        else:
+            self.arena[offset:offset + length] = array.array('I', [(k * step + round_up) // duration for k in range(length)])
+        self.used += length
+        self.offsets[key] = offset
+        return offset
+
+    def level(self, offset, start, end, elapsed):
+        """Helderheid na elapsed ms; elapsed ligt op het raster en vóór het einde van de fade."""
+        return start + (((end - start) * self.arena[offset + elapsed // self.step_ms]) >> 32)
+
+    def gather(self, positions, starts, ends):
+        """Helderheden van veel fades tegelijk (NumPy); positions zijn offset + verstreken // step_ms."""
+        return starts + (((np.asarray(ends, dtype=np.int64) - starts) * self.ramps[positions]) >> 32)
+
+FADE_TABLES = FadeTableCache()
 
 # --- Simulatie Logica ---
 class LedSimulator:
@@ -356,11 +871,14 @@ class LedSimulator:
         4: "KNIPPERT"
     }
 
-    def __init__(self, config):
+    def __init__(self, config, seed=None):
         self.config = config # Dit is de gevalideerde config dict
-        
-        # Initialiseer random_state hier, voordat het wordt gebruikt
-        self.random_state = {'seed': time.time()} # Simpele manier om random te initialiseren
+        # Eenmalig omgerekend naar milliseconden, zodat update() niet elke tick hoeft te parsen
+        self.cfg = compile_led_config(config)
+
+        # Eigen random generator per LED. Met een vaste seed is de simulatie reproduceerbaar.
+        self.seed = seed
+        self.rng = random.Random(seed)
 
         # Simulatie status variabelen
         self.current_brightness = 0
@@ -369,33 +887,30 @@ class LedSimulator:
         # Nieuwe variabele voor de starttijd van de huidige aan/uit/fade/blink-fase
         self.last_phase_start_time = 0 
         
-        # Gebruik de correcte sleutels en zorg dat ze naar int worden omgezet
-        # Zorg dat de standaard waarden van config.get() numeriek zijn (0)
-        # Gebruik float() voor conversie naar milliseconden
         # Belangrijk: Voor "Uitgeschakeld" is min_off_s/max_off_s nu een groot getal
-        self.current_duration = self._get_random_duration(float(self.config.get('min_off_s', '0')) * 1000, float(self.config.get('max_off_s', '0')) * 1000) # Initial off duration
+        self.current_duration = self._get_random_duration(self.cfg['min_off_ms'], self.cfg['max_off_ms']) # Initial off duration
         self.fade_start_time = 0
         self.fade_duration = 0
         self.fade_in_target_brightness = 0 # Nieuw: Doelhelderheid voor fade-in
+        self.fade_start_brightness = 0 # Helderheid bij het begin van een fade-out
         # self.last_brightness_change_time = 0 # Niet meer nodig voor variabele helderheid
         self.last_blink_toggle_time = 0
         self.blink_state = False # True = AAN, False = UIT tijdens knipperen
+        self._fade_table = None # (generatie, offset) van de lopende fade in FADE_TABLES; afgeleid, niet in STATE_FIELDS
 
     
-    def _get_random_duration(self, min_ms, max_ms):
+    def _get_random_duration(self, min_ms, max_ms, rng=None):
         """Simuleert Arduino's random()."""
         # Python's random is anders dan Arduino's, maar voor simulatie voldoet dit.
-        # We gebruiken een pseudo-random seed om de sequentie te herhalen voor debugging.
-        
-        # Gebruik self.random_state['seed'] voor de seed
-        random.seed(self.random_state['seed'] + time.time()) # Beetje extra randomheid per oproep
+        # Elke LED heeft een eigen generator (self.rng), zodat een seed de sequentie herhaalt.
+
         # Zorg ervoor dat min_ms <= max_ms, anders kan random.randint falen
         if min_ms > max_ms:
             # Als min_ms groter is dan max_ms, geeft dit een probleem.
             # We kunnen ervoor kiezen om de waarden om te draaien of een default te geven.
             # Voor nu geven we min_ms terug als de enige optie
             return int(min_ms) 
-        return random.randint(int(min_ms), int(max_ms))
+        return (rng or self.rng).randint(int(min_ms), int(max_ms))
 
     def _map_range(self, x, in_min, in_max, out_min, out_max):
         """Simuleert de Arduino map() functie."""
@@ -403,34 +918,26 @@ class LedSimulator:
             return out_min 
         return int((x - in_min) * (out_max - out_min) / (in_max - in_min) + out_min)
 
+    def fade_key(self):
+        """(duur, van, naar) van de lopende fade, zoals fade_levels() ze verwacht."""
+        if self.current_mode == self.MODE_FADE_IN:
+            return self.fade_duration, 0, self.fade_in_target_brightness
+        return self.fade_duration, self.fade_start_brightness, 0
+
+    def _fade_level(self, elapsed_time, start, end):
+        """Helderheid van de lopende fade; op het tickraster uit de gedeelde FADE_TABLES, anders via _map_range()."""
+        table = self._fade_table
+        if table is None or table[0] != FADE_TABLES.generation:
+            offset = FADE_TABLES.offset(self.fade_duration, end >= start)
+            table = self._fade_table = (FADE_TABLES.generation, offset)
+        offset = table[1]
+        if offset < 0 or elapsed_time % FADE_TABLE_STEP_MS:
+            return self._map_range(elapsed_time, 0, self.fade_duration, start, end)
+        return start + (((end - start) * FADE_TABLES.arena[offset + int(elapsed_time) // FADE_TABLE_STEP_MS]) >> 32)
+
     def update(self, current_time_ms):
-        # Converteer seconden van config naar milliseconden voor simulatie
-        # Zorg ervoor dat alle numerieke waarden integers zijn en booleans booleans
-        # Gebruik .get(key, '0') om lege strings te vermijden die ValueError geven bij int()
-        cfg = {}
-        for k, v in self.config.items():
-            if '_s' in k and not isinstance(v, bool):
-                # Speciaal geval voor '0' string: converteer naar 0.0, anders float
-                cfg[k] = float(v) * 1000 if str(v).replace('.', '', 1).isdigit() else 0 # Converteer naar float, dan milliseconden, default 0
-            elif k.endswith('_ms') or k.endswith('_bright'):
-                cfg[k] = int(v) if str(v).isdigit() else 0 # Converteer naar int, default 0
-            else:
-                cfg[k] = v
-        
-        # Converteer booleaanse waarden die mogelijk als strings zijn opgeslagen naar echte booleans
-        cfg['fadeInEnabled'] = bool(self.config.get('fade_in', False))
-        cfg['fadeOutEnabled'] = bool(self.config.get('fade_out', False))
-        cfg['variableBrightnessEnabled'] = bool(self.config.get('var_bright', False))
-        cfg['blinkingEnabled'] = bool(self.config.get('blinking', False))
-
-        # Helderheid min/max zijn al nummers na de eerste conversie, geen verdere conversie nodig
-        cfg['minBrightnessDuringOn'] = int(self.config.get('min_bright', 0))
-        cfg['maxBrightnessDuringOn'] = int(self.config.get('max_bright', 255))
-        
-        # Timings voor knipperen, moeten als ms worden doorgegeven (al omgezet via de loop hierboven)
-        # Gebruik .get(key, 0) voor de zekerheid als de config geen string heeft
-        cfg['blinkOnDurationMillis'] = int(self.config.get('blink_on_ms', 0))
-        cfg['blinkOffDurationMillis'] = int(self.config.get('blink_off_ms', 0))
+        # De config is in __init__ al eenmalig omgerekend naar milliseconden (zie compile_led_config)
+        cfg = self.cfg
 
         # Logic from Arduino's loop() function
         previous_mode = self.current_mode # Sla de vorige modus op voor detectie van verandering
@@ -438,61 +945,63 @@ class LedSimulator:
         if self.current_mode == self.MODE_OFF:
             if current_time_ms - self.last_toggle_time >= self.current_duration:
                 # Als het "Uitgeschakeld" profiel is gekozen, moet de LED uit blijven.
-                if (float(self.config.get('min_on_s', '0')) == 0 and float(self.config.get('max_on_s', '0')) == 0) and \
-                   (float(self.config.get('min_off_s', '0')) > 0 or float(self.config.get('max_off_s', '0')) > 0): 
+                if cfg['always_off']:
                     self.current_mode = self.MODE_OFF
                     self.last_toggle_time = current_time_ms
                     self.current_brightness = 0
-                    self.current_duration = self._get_random_duration(cfg['min_off_s'], cfg['max_off_s'])
+                    self.current_duration = self._get_random_duration(cfg['min_off_ms'], cfg['max_off_ms'])
                     self.last_phase_start_time = self.last_toggle_time # Update phase start time
                     return self.current_brightness, self.current_mode, self.current_duration, self.last_phase_start_time
 
-                if cfg['fadeInEnabled']:
+                if cfg['fade_in']:
                     self.current_mode = self.MODE_FADE_IN
                     self.last_phase_start_time = current_time_ms # Start nieuwe fase
                     self.fade_start_time = current_time_ms
-                    self.fade_duration = self._get_random_duration(cfg['min_fade_in_s'], cfg['max_fade_in_s'])
+                    self.fade_duration = self._get_random_duration(cfg['min_fade_in_ms'], cfg['max_fade_in_ms'])
+                    self._fade_table = None
                     self.current_brightness = 0 # Start fading from off
                     # NIEUW: Bepaal de eenmalige doelhelderheid voor de fade-in
-                    self.fade_in_target_brightness = self._get_random_duration(cfg['minBrightnessDuringOn'], cfg['maxBrightnessDuringOn']) if cfg['variableBrightnessEnabled'] else 255
+                    self.fade_in_target_brightness = self._get_random_duration(cfg['min_bright'], cfg['max_bright']) if cfg['var_bright'] else 255
                 else:
-                    if cfg['blinkingEnabled']:
+                    if cfg['blinking']:
                         self.current_mode = self.MODE_BLINKING
                         self.last_phase_start_time = current_time_ms # Start nieuwe fase
                         self.last_toggle_time = current_time_ms # Start de hoofdtimer voor blinking
                         # min_on_s/max_on_s bepalen de totale duur van de BLINKING periode
-                        self.current_duration = self._get_random_duration(cfg['min_on_s'], cfg['max_on_s']) 
+                        self.current_duration = self._get_random_duration(cfg['min_on_ms'], cfg['max_on_ms']) 
                         self.last_blink_toggle_time = current_time_ms
                         self.blink_state = True # Begin met aan
-                        self.current_brightness = self._get_random_duration(cfg['minBrightnessDuringOn'], cfg['maxBrightnessDuringOn'])
+                        self.current_brightness = self._get_random_duration(cfg['min_bright'], cfg['max_bright'])
                     else:
                         self.current_mode = self.MODE_ON
                         self.last_phase_start_time = current_time_ms # Start nieuwe fase
                         self.last_toggle_time = current_time_ms
                         # Stel de helderheid in als variabele helderheid is ingeschakeld, anders gewoon 255
-                        self.current_brightness = self._get_random_duration(cfg['minBrightnessDuringOn'], cfg['maxBrightnessDuringOn']) if cfg['variableBrightnessEnabled'] else 255
-                        self.current_duration = self._get_random_duration(cfg['min_on_s'], cfg['max_on_s'])
+                        self.current_brightness = self._get_random_duration(cfg['min_bright'], cfg['max_bright']) if cfg['var_bright'] else 255
+                        self.current_duration = self._get_random_duration(cfg['min_on_ms'], cfg['max_on_ms'])
 
         elif self.current_mode == self.MODE_ON:
             if current_time_ms - self.last_toggle_time >= self.current_duration:
-                if cfg['fadeOutEnabled']:
+                if cfg['fade_out']:
                     self.current_mode = self.MODE_FADE_OUT
                     self.last_phase_start_time = current_time_ms # Start nieuwe fase
                     self.fade_start_time = current_time_ms
-                    self.fade_duration = self._get_random_duration(cfg['min_fade_out_s'], cfg['max_fade_out_s'])
+                    self.fade_duration = self._get_random_duration(cfg['min_fade_out_ms'], cfg['max_fade_out_ms'])
+                    self._fade_table = None
+                    self.fade_start_brightness = self.current_brightness # Vast startpunt voor de hele fade-out
                 else:
                     self.current_mode = self.MODE_OFF
                     self.last_phase_start_time = current_time_ms # Start nieuwe fase
                     self.last_toggle_time = current_time_ms
                     self.current_brightness = 0
-                    self.current_duration = self._get_random_duration(cfg['min_off_s'], cfg['max_off_s'])
+                    self.current_duration = self._get_random_duration(cfg['min_off_ms'], cfg['max_off_ms'])
 
         elif self.current_mode == self.MODE_FADE_IN:
             if current_time_ms - self.fade_start_time < self.fade_duration:
                 elapsed_time = current_time_ms - self.fade_start_time
                 
-                # Gebruik de _map_range functie die de Arduino map() nabootst
-                self.current_brightness = self._map_range(elapsed_time, 0, self.fade_duration, 0, self.fade_in_target_brightness)
+                # Zelfde waarde als de _map_range functie die de Arduino map() nabootst
+                self.current_brightness = self._fade_level(elapsed_time, 0, self.fade_in_target_brightness)
                 
             else:
                 self.current_mode = self.MODE_ON
@@ -500,21 +1009,20 @@ class LedSimulator:
                 self.last_toggle_time = current_time_ms
                 # Zorg dat de LED op de definitieve helderheid staat (gelijk aan fade_in_target_brightness)
                 self.current_brightness = self.fade_in_target_brightness
-                self.current_duration = self._get_random_duration(cfg['min_on_s'], cfg['max_on_s'])
+                self.current_duration = self._get_random_duration(cfg['min_on_ms'], cfg['max_on_ms'])
 
         elif self.current_mode == self.MODE_FADE_OUT:
             if current_time_ms - self.fade_start_time < self.fade_duration:
                 elapsed_time = current_time_ms - self.fade_start_time
                 # Fade from the brightness the LED was at when fade_out started
-                start_brightness_for_fade_out = self.current_brightness # Use the current brightness
-                # Gebruik de _map_range functie die de Arduino map() nabootst
-                self.current_brightness = self._map_range(elapsed_time, 0, self.fade_duration, start_brightness_for_fade_out, 0)
+                # Zelfde waarde als de _map_range functie die de Arduino map() nabootst
+                self.current_brightness = self._fade_level(elapsed_time, self.fade_start_brightness, 0)
             else:
                 self.current_mode = self.MODE_OFF
                 self.last_phase_start_time = current_time_ms # Start nieuwe fase
                 self.last_toggle_time = current_time_ms
                 self.current_brightness = 0
-                self.current_duration = self._get_random_duration(cfg['min_off_s'], cfg['max_off_s'])
+                self.current_duration = self._get_random_duration(cfg['min_off_ms'], cfg['max_off_ms'])
         
         elif self.current_mode == self.MODE_BLINKING:
             # Als de hoofdtijd voor 'TV aan' is verstreken, ga dan naar de uit-stand
@@ -524,19 +1032,19 @@ class LedSimulator:
                 self.last_toggle_time = current_time_ms
                 # analogWrite(self.config['pin'], 0); # Zet LED uit (Simulatie, geen echte schrijf)
                 self.current_brightness = 0
-                self.current_duration = self._get_random_duration(cfg['min_off_s'], cfg['max_off_s'])
+                self.current_duration = self._get_random_duration(cfg['min_off_ms'], cfg['max_off_ms'])
                 self.blink_state = False # Reset knipperstatus
             else:
                 # Knipperlogica binnen de BLINKING periode
                 if self.blink_state: # LED is momenteel aan
-                    if current_time_ms - self.last_blink_toggle_time >= cfg['blinkOnDurationMillis']:
+                    if current_time_ms - self.last_blink_toggle_time >= cfg['blink_on_ms']:
                         self.current_brightness = 0 # Zet LED uit
                         self.blink_state = False
                         self.last_blink_toggle_time = current_time_ms
                 else: # LED is momenteel uit
-                    if current_time_ms - self.last_blink_toggle_time >= cfg['blinkOffDurationMillis']:
+                    if current_time_ms - self.last_blink_toggle_time >= cfg['blink_off_ms']:
                         # Zet LED aan met een willekeurige helderheid voor een realistischer TV-effect
-                        self.current_brightness = self._get_random_duration(cfg['minBrightnessDuringOn'], cfg['maxBrightnessDuringOn'])
+                        self.current_brightness = self._get_random_duration(cfg['min_bright'], cfg['max_bright'])
                         self.blink_state = True
                         self.last_blink_toggle_time = current_time_ms
 
@@ -554,25 +1062,4596 @@ class LedSimulator:
         return self.current_brightness, self.current_mode, self.current_duration, self.last_phase_start_time # Return mode and current_duration
 
 
+    def next_event_time(self):
+        """Eerste tijdstip (ms) waarop update() de toestand verandert, anders dan de helderheid binnen een fade."""
+        if self.current_mode in (self.MODE_FADE_IN, self.MODE_FADE_OUT):
+            return self.fade_start_time + self.fade_duration
+        phase_end = self.last_toggle_time + self.current_duration
+        if self.current_mode == self.MODE_BLINKING:
+            blink_ms = self.cfg['blink_on_ms'] if self.blink_state else self.cfg['blink_off_ms']
+            return min(phase_end, self.last_blink_toggle_time + blink_ms)
+        return phase_end
+
+    def phase_bounds(self):
+        """Begin en (gepland) einde van de huidige fase in ms simulatietijd."""
+        if self.current_mode in (self.MODE_FADE_IN, self.MODE_FADE_OUT):
+            return self.fade_start_time, self.fade_start_time + self.fade_duration
+        return self.last_toggle_time, self.last_toggle_time + self.current_duration
+
+    def brightness_at(self, t_ms):
+        """Helderheid op tijdstip(pen) t_ms binnen de huidige fase, zonder de toestand te wijzigen.
+
+        Binnen een fase is de helderheid een pure functie van de faseparameters en de tijd.
+        t_ms mag een getal, een lijst of een NumPy-array zijn; het resultaat heeft dezelfde vorm.
+        Bij knipperen worden de volgende pulsen voorspeld met een kopie van de random generator
+        (geldig vanaf de laatste knipperwissel). Tijden buiten de fase geven een ValueError.
+        """
+        start, end = self.phase_bounds()
+        if self.current_mode == self.MODE_BLINKING:
+            start = self.last_blink_toggle_time # Eerdere pulsen zijn niet meer te reconstrueren
+
+        # Alleen een echte (niet 0-d) NumPy-array gaat gevectoriseerd; NumPy-scalars zijn gewone getallen
+        vectorized = np is not None and isinstance(t_ms, np.ndarray) and t_ms.ndim > 0
+        scalar = not vectorized and not isinstance(t_ms, (list, tuple, range))
+        if scalar and hasattr(t_ms, 'item'):
+            t_ms = t_ms.item() # np.float64, np.int64 of een 0-d array
+        times = np.asarray(t_ms, dtype=float) if vectorized else ([t_ms] if scalar else list(t_ms))
+        if vectorized:
+            outside = times.size and (times.min() < start or times.max() >= end)
+        else:
+            outside = times and (min(times) < start or max(times) >= end)
+        if outside:
+            raise ValueError(f"Tijdstip valt buiten de huidige fase ({start} - {end} ms).")
+
+        if vectorized:
+            return self._phase_brightness(times - start, np).astype(np.int64)
+        values = [int(self._phase_brightness(t - start, None)) for t in times]
+        return values[0] if scalar else values
+
+    def _phase_brightness(self, elapsed, xp):
+        """Closed-form helderheid van de huidige fase; elapsed is een float of (met xp=np) een array."""
+        if self.current_mode == self.MODE_FADE_IN:
+            if self.fade_duration == 0:
+                return elapsed * 0
+            # Zelfde afkapping als _map_range / Arduino map() (waarden zijn hier niet-negatief)
+            return (elapsed * self.fade_in_target_brightness / self.fade_duration) // 1
+        if self.current_mode == self.MODE_FADE_OUT:
+            if self.fade_duration == 0:
+                return elapsed * 0 + self.fade_start_brightness
+            return (self.fade_start_brightness - elapsed * self.fade_start_brightness / self.fade_duration) // 1
+        if self.current_mode == self.MODE_BLINKING:
+            return self._blink_brightness(elapsed, xp)
+        if self.current_mode == self.MODE_ON:
+            return elapsed * 0 + self.current_brightness
+        return elapsed * 0
+
+    def _blink_brightness(self, elapsed, xp):
+        """Knipperpatroon vanaf de laatste knipperwissel: puls 0 is de huidige, latere pulsen worden voorspeld."""
+        on_ms, off_ms = self.cfg['blink_on_ms'], self.cfg['blink_off_ms']
+        period = max(1, on_ms + off_ms)
+        # Na de (eventueel lopende) AAN-puls herhaalt het patroon zich als: off_ms UIT, on_ms AAN
+        shifted = elapsed - (on_ms if self.blink_state else 0)
+        cycle = shifted // period
+        pulse = cycle + 1
+        lit = (shifted - cycle * period) >= off_ms
+
+        _, end = self.phase_bounds()
+        needed = int((end - self.last_blink_toggle_time) // period) + 2
+        predictor = random.Random()
+        predictor.setstate(self.rng.getstate())
+        table = [self.current_brightness if self.blink_state else 0] + \
+                [self._get_random_duration(self.cfg['min_bright'], self.cfg['max_bright'], predictor) for _ in range(needed)]
+
+        if xp is None:
+            if shifted < 0:
+                return table[0]
+            return table[int(pulse)] if lit else 0
+        table = xp.asarray(table, dtype=float)
+        pulse = xp.clip(pulse, 0, len(table) - 1).astype(xp.int64)
+        return xp.where(shifted < 0, table[0], xp.where(lit, table[pulse], 0.0))
+
+    def sample_phase(self, step_ms):
+        """Bemonstert de huidige fase met een vaste stap; retourneert (tijden, helderheden)."""
+        start, end = self.phase_bounds()
+        if self.current_mode == self.MODE_BLINKING:
+            start = self.last_blink_toggle_time
+        if np is not None:
+            times = np.arange(start, end, step_ms, dtype=float)
+        else:
+            times = [start + i * step_ms for i in range(int(-(-(end - start) // step_ms)))]
+        return times, self.brightness_at(times)
+
+    # Alle velden die samen de toestand van de simulatie vormen (zie get_state/set_state)
+    STATE_FIELDS = ('current_brightness', 'current_mode', 'last_toggle_time', 'last_phase_start_time',
+                    'current_duration', 'fade_start_time', 'fade_duration', 'fade_in_target_brightness',
+                    'fade_start_brightness', 'last_blink_toggle_time', 'blink_state')
+
+    def get_state(self):
+        """Retourneert een JSON-serialiseerbare momentopname van de toestand, inclusief de random generator."""
+        state = {field: getattr(self, field) for field in self.STATE_FIELDS}
+        version, internal, gauss = self.rng.getstate()
+        state['rng_state'] = [version, list(internal), gauss]
+        return state
+
+    def set_state(self, state):
+        """Herstelt een momentopname van get_state()."""
+        for field in self.STATE_FIELDS:
+            setattr(self, field, state[field])
+        version, internal, gauss = state['rng_state']
+        self.rng.setstate((version, tuple(internal), gauss))
+        self._fade_table = None
+
     def reset(self):
+        # Zonder vaste seed een nieuwe random reeks, met vaste seed weer exact dezelfde reeks
+        self.rng.seed(self.seed)
         self.current_brightness = 0
         self.current_mode = self.MODE_OFF
         self.last_toggle_time = 0
         self.last_phase_start_time = 0 # Reset ook deze bij een volledige reset
         # Genereer een nieuwe initiële duur voor de off-periode bij reset
-        self.current_duration = self._get_random_duration(
-            float(self.config.get('min_off_s', '0')) * 1000, # Gebruik '0' als default
-            float(self.config.get('max_off_s', '0')) * 1000
-        )
+        self.current_duration = self._get_random_duration(self.cfg['min_off_ms'], self.cfg['max_off_ms'])
         self.fade_start_time = 0
         self.fade_duration = 0
         self.fade_in_target_brightness = 0 # Reset ook deze
+        self.fade_start_brightness = 0
+        self._fade_table = None
         # self.last_brightness_change_time = 0 # Niet meer nodig voor variabele helderheid
         self.last_blink_toggle_time = 0
         self.blink_state = False
-        self.random_state['seed'] = time.time() # Nieuwe seed voor nieuwe random reeks
 
 
+# --- Synchrone Groepen (gedeelde toestandsmachine) ---
+SYNC_FIELDS = ('sync_group', 'sync_offset_ms', 'sync_scale_pct') # Optioneel per LED
+
+def sync_member_params(config):
+    """(groepsnaam, vertraging in ms, helderheid in procent) van een LED; naam '' = geen groep."""
+    name = str(config.get('sync_group', '') or '').strip()
+    if not name:
+        return '', 0, 100
+    offset = str(config.get('sync_offset_ms', '')).strip()
+    scale = str(config.get('sync_scale_pct', '')).strip()
+    return name, int(float(offset)) if offset else 0, int(float(scale)) if scale else 100
+
+def build_sync_groups(led_configs):
+    """Retourneert {groepsnaam: [LED-indices]} in volgorde van de layout.
+
+    De leden van een groep delen één toestandsmachine en moeten dus dezelfde (gecompileerde)
+    parameters hebben; anders volgt een ValueError.
+    """
+    groups = {}
+    for i, config in enumerate(led_configs):
+        name = sync_member_params(config)[0]
+        if name:
+            groups.setdefault(name, []).append(i)
+    for name, members in groups.items():
+        reference = compile_led_config(led_configs[members[0]])
+        for i in members[1:]:
+            if compile_led_config(led_configs[i]) != reference:
+                raise ValueError(f"LED {i + 1} zit in synchrone groep '{name}' maar heeft andere instellingen dan "
+                                 f"LED {members[0] + 1}; de leden van een groep delen één toestandsmachine.")
+    return groups
+
+def build_led_machines(led_configs):
+    """Eén toestandsmachine per synchrone groep en per losse LED.
+
+    Retourneert (machine-index per LED, eerste LED van elke machine); de machines staan in de
+    volgorde van hun eerste LED.
+    """
+    build_sync_groups(led_configs) # Controleert dat de leden van elke groep gelijk zijn
+    machine_of_group = {}
+    machine_of_led = []
+    leaders = []
+    for i, config in enumerate(led_configs):
+        name = sync_member_params(config)[0]
+        if name and name in machine_of_group:
+            machine_of_led.append(machine_of_group[name])
+            continue
+        if name:
+            machine_of_group[name] = len(leaders)
+        machine_of_led.append(len(leaders))
+        leaders.append(i)
+    return machine_of_led, leaders
+
+def derive_group_seed(seed, name):
+    """Seed van de machine van een synchrone groep; hangt alleen van de naam af, niet van de plaats van de leden."""
+    if seed is None:
+        return None
+    return seed * 1000003 + int.from_bytes(hashlib.sha1(name.encode("utf-8")).digest()[:4], "little")
+
+def ramp_level(ramp, t_ms):
+    """Helderheid van een helling (begin, duur, van, naar) op t_ms, afgerond zoals Arduino's map()."""
+    start, duration, first, last = ramp
+    elapsed = t_ms - start
+    if elapsed >= duration:
+        return last
+    if elapsed <= 0:
+        return first
+    return int(elapsed * (last - first) / duration + first)
+
+class SyncedLedGroup:
+    """De gedeelde toestandsmachine van een synchrone groep.
+
+    De machine wordt per tijdstip één keer bijgewerkt, door het eerste lid dat erom vraagt (zie
+    SyncedLedMember.update). Voor leden met een vertraging wordt het verloop van de vorige fase
+    bewaard als helling (begin, duur, van, naar), net als previousRamp in de sketch.
+    """
+
+    def __init__(self, config, seed=None):
+        self.machine = LedSimulator(config, seed=seed)
+        self.updated_ms = None
+        self.previous_mode = LedSimulator.MODE_OFF
+        self.previous_ramp = (0, 0, 0, 0)
+
+    def current_ramp(self):
+        machine = self.machine
+        if machine.current_mode == LedSimulator.MODE_FADE_IN:
+            return machine.fade_start_time, machine.fade_duration, 0, machine.fade_in_target_brightness
+        if machine.current_mode == LedSimulator.MODE_FADE_OUT:
+            return machine.fade_start_time, machine.fade_duration, machine.fade_start_brightness, 0
+        return machine.last_phase_start_time, 0, machine.current_brightness, machine.current_brightness
+
+    def advance(self, t_ms):
+        """Werkt de machine bij tot t_ms, tenzij een ander lid dat al gedaan heeft."""
+        if self.updated_ms is not None and t_ms <= self.updated_ms:
+            return
+        mode, ramp = self.machine.current_mode, self.current_ramp()
+        self.machine.update(t_ms)
+        if self.machine.current_mode != mode:
+            self.previous_mode, self.previous_ramp = mode, ramp
+        self.updated_ms = t_ms
+
+    def get_state(self):
+        return {'machine': self.machine.get_state(), 'updated_ms': self.updated_ms,
+                'previous_mode': self.previous_mode, 'previous_ramp': list(self.previous_ramp)}
+
+    def set_state(self, state):
+        self.machine.set_state(state['machine'])
+        self.updated_ms = state['updated_ms']
+        self.previous_mode = state['previous_mode']
+        self.previous_ramp = tuple(state['previous_ramp'])
+
+    def reset(self):
+        self.machine.reset()
+        self.updated_ms = None
+        self.previous_mode = LedSimulator.MODE_OFF
+        self.previous_ramp = (0, 0, 0, 0)
+
+class SyncedLedMember:
+    """Eén LED van een synchrone groep: volgt de gedeelde machine met een eigen vertraging en schaal.
+
+    Voor SimulationTimeline en SimulationWorker gedraagt een lid zich als een LedSimulator. Het
+    eerste lid (leader) neemt de toestand van de groep mee in zijn checkpoints.
+    """
+
+    def __init__(self, group, offset_ms=0, scale_pct=100, leader=False):
+        self.group = group
+        self.offset_ms = offset_ms
+        self.scale_pct = scale_pct
+        self.leader = leader
+        self.config = group.machine.config
+        self.cfg = group.machine.cfg
+        self.updated_ms = None
+        self.current_brightness = 0
+        self.current_mode = LedSimulator.MODE_OFF
+
+    # Voor de statusweergave: de fase van de groep, verschoven met de vertraging van dit lid
+    @property
+    def current_duration(self):
+        return self.group.machine.current_duration
+
+    @property
+    def last_phase_start_time(self):
+        return self.group.machine.last_phase_start_time + self.offset_ms
+
+    @property
+    def blink_state(self):
+        return self.group.machine.blink_state
+
+    def update(self, current_time_ms):
+        group = self.group
+        group.advance(current_time_ms)
+        machine = group.machine
+        shifted = current_time_ms - self.offset_ms
+        if shifted < machine.last_phase_start_time: # Dit lid zit nog in de vorige fase van de groep
+            level, self.current_mode = ramp_level(group.previous_ramp, shifted), group.previous_mode
+        else:
+            level, self.current_mode = ramp_level(group.current_ramp(), shifted), machine.current_mode
+        self.current_brightness = level * self.scale_pct // 100
+        self.updated_ms = current_time_ms
+        return self.current_brightness, self.current_mode, self.current_duration, self.last_phase_start_time
+
+    def next_event_time(self):
+        due = self.group.machine.next_event_time()
+        # De (vertraagde) fasewissel van dit lid; ook als een ander lid de machine al verder heeft gezet
+        switch_ms = self.group.machine.last_phase_start_time + self.offset_ms
+        if self.updated_ms is None or switch_ms > self.updated_ms:
+            due = min(due, switch_ms)
+        return due
+
+    def get_state(self):
+        state = {'current_brightness': self.current_brightness, 'current_mode': self.current_mode,
+                 'updated_ms': self.updated_ms}
+        if self.leader:
+            state['group'] = self.group.get_state()
+        return state
+
+    def set_state(self, state):
+        self.current_brightness = state['current_brightness']
+        self.current_mode = state['current_mode']
+        self.updated_ms = state['updated_ms']
+        if self.leader:
+            self.group.set_state(state['group'])
+
+    def reset(self):
+        if self.leader:
+            self.group.reset()
+        self.updated_ms = None
+        self.current_brightness = 0
+        self.current_mode = LedSimulator.MODE_OFF
+
+def build_simulators(led_configs, seed=None, first_led=0):
+    """Eén simulator per LED; de LEDs van een synchrone groep delen één SyncedLedGroup.
+
+    first_led is de index van led_configs[0] in de hele layout (voor de seeds van losse LEDs).
+    """
+    build_sync_groups(led_configs)
+    groups = {}
+    sims = []
+    for i, config in enumerate(led_configs):
+        name, offset, scale = sync_member_params(config)
+        if not name:
+            sims.append(LedSimulator(config, seed=derive_led_seed(seed, first_led + i)))
+            continue
+        leader = name not in groups
+        if leader:
+            groups[name] = SyncedLedGroup(config, seed=derive_group_seed(seed, name))
+        sims.append(SyncedLedMember(groups[name], offset, scale, leader=leader))
+    return sims
+
+# --- Tijdlijn met Checkpoints (seek / terugspoelen) ---
+class TimingWheel:
+    """Hiërarchisch tijdwiel: plant sleutels op een deadline (ms) en levert ze per tick op volgorde af.
+
+    Niveau 0 heeft `slots` vakjes van tick_ms, elk hoger niveau vakjes die `slots` keer zo breed zijn;
+    deadlines voorbij het laatste niveau wachten in een heap. Plannen kost O(1), en stukken tijd
+    zonder deadlines worden in één keer overgeslagen. Een sleutel heeft hoogstens één deadline:
+    opnieuw plannen vervangt de vorige (de oude vermelding wordt lui opgeruimd).
+    """
+
+    def __init__(self, tick_ms=10, slots=64, levels=4, start_ms=0):
+        if slots < 2 or slots & (slots - 1):
+            raise ValueError("Het aantal slots moet een macht van 2 zijn.")
+        self.tick_ms = tick_ms
+        self.bits = slots.bit_length() - 1
+        self.mask = slots - 1
+        self.levels = levels
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.counts = [0] * levels # Aantal vermeldingen per niveau (inclusief vervallen)
+        self.overflow = [] # heap van (tick, seq, key)
+        self.current_tick = int(start_ms // tick_ms) # Laatst afgehandelde tick
+        self._entries = {} # key -> (seq, deadline_ms)
+        self._ready = [] # Gepland op of vóór de huidige tick; komt mee met de volgende pop_due()
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def deadline(self, key):
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def schedule(self, key, deadline_ms):
+        """Plant (of verplaatst) key naar deadline_ms."""
+        self._seq += 1
+        self._entries[key] = (self._seq, deadline_ms)
+        tick = int(-(-deadline_ms // self.tick_ms)) # Afgerond naar boven: nooit te vroeg afgeleverd
+        if tick <= self.current_tick:
+            self._ready.append((tick, self._seq, key))
+        else:
+            self._place(tick, self._seq, key)
+
+    def cancel(self, key):
+        self._entries.pop(key, None)
+
+    def _place(self, tick, seq, key):
+        for level in range(self.levels):
+            shift = self.bits * (level + 1)
+            if tick >> shift == self.current_tick >> shift:
+                self.wheels[level][(tick >> (self.bits * level)) & self.mask].append((tick, seq, key))
+                self.counts[level] += 1
+                return
+        heapq.heappush(self.overflow, (tick, seq, key))
+
+    def _valid(self, seq, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] == seq
+
+    def _enter_tick(self, tick):
+        """Maakt tick de huidige tick en schuift de vakjes van hogere niveaus door die nu beginnen."""
+        self.current_tick = tick
+        top = 0
+        while top < self.levels and not tick & ((1 << (self.bits * (top + 1))) - 1):
+            top += 1 # tick ligt op de grens van niveau top+1
+        if top == self.levels:
+            block = tick >> (self.bits * self.levels)
+            while self.overflow and self.overflow[0][0] >> (self.bits * self.levels) == block:
+                entry = heapq.heappop(self.overflow)
+                if self._valid(entry[1], entry[2]):
+                    self._place(*entry)
+        for level in range(min(top, self.levels - 1), 0, -1):
+            index = (tick >> (self.bits * level)) & self.mask
+            entries = self.wheels[level][index]
+            if entries:
+                self.wheels[level][index] = []
+                self.counts[level] -= len(entries)
+                for entry in entries:
+                    if self._valid(entry[1], entry[2]):
+                        self._place(*entry)
+
+    def _idle_until(self):
+        """Laatste tick vóór het eerstvolgende vakje dat afgeleverd of doorgeschoven moet worden."""
+        for level in range(self.levels):
+            if self.counts[level]:
+                shift = self.bits * level
+                block_start = self.current_tick >> (shift + self.bits) << (shift + self.bits)
+                for index in range(((self.current_tick >> shift) & self.mask) + 1, self.mask + 1):
+                    if self.wheels[level][index]:
+                        return block_start + (index << shift) - 1
+                return block_start + (1 << (shift + self.bits)) - 1
+        if self.overflow:
+            shift = self.bits * self.levels
+            return (self.overflow[0][0] >> shift << shift) - 1
+        return None
+
+    def pop_due(self, now_ms):
+        """Geeft de sleutels met een deadline op of vóór now_ms, in volgorde van tick."""
+        due = [key for tick, seq, key in sorted(self._ready) if self._valid(seq, key)] # Ook te laat geplande sleutels op volgorde van tick
+        self._ready = []
+        target = int(now_ms // self.tick_ms)
+        while self.current_tick < target:
+            idle_until = self._idle_until()
+            if idle_until is None: # Niets gepland
+                self.current_tick = target
+                break
+            if idle_until > self.current_tick:
+                self.current_tick = min(target, idle_until)
+                continue
+            self._enter_tick(self.current_tick + 1)
+            index = self.current_tick & self.mask
+            entries = self.wheels[0][index]
+            if entries:
+                self.wheels[0][index] = []
+                self.counts[0] -= len(entries)
+                for tick, seq, key in entries:
+                    if self._valid(seq, key):
+                        due.append(key)
+        for key in due:
+            self._entries.pop(key, None)
+        return due
+
+    def next_deadline(self):
+        """Vroegste geplande deadline in ms, of None als er niets gepland is."""
+        deadlines = [self._entries[key][1] for tick, seq, key in self._ready if self._valid(seq, key)]
+        if deadlines:
+            return min(deadlines)
+        for level in range(self.levels):
+            if not self.counts[level]:
+                continue
+            start = ((self.current_tick >> (self.bits * level)) & self.mask) + 1
+            for index in range(start, self.mask + 1):
+                deadlines = [self._entries[key][1] for tick, seq, key in self.wheels[level][index] if self._valid(seq, key)]
+                if deadlines:
+                    return min(deadlines)
+        while self.overflow and not self._valid(self.overflow[0][1], self.overflow[0][2]):
+            heapq.heappop(self.overflow)
+        if not self.overflow:
+            return None
+        first_tick = self.overflow[0][0]
+        return min(self._entries[key][1] for tick, seq, key in self.overflow
+                   if tick == first_tick and self._valid(seq, key))
+
+class SimulationTimeline:
+    """Laat één of meer LedSimulators lopen op een vast raster van tick_ms simulatietijd.
+
+    Elke checkpoint_interval_ms wordt automatisch een momentopname van alle simulators bewaard.
+    Omdat het raster vast ligt en de random generator in de momentopname zit, is het verloop
+    deterministisch: seek() herstelt het dichtstbijzijnde eerdere checkpoint en speelt vanaf daar
+    vooruit, dus de kosten zijn begrensd door het checkpoint-interval en niet door de afstand tot t=0.
+    Ticks waarop niets verandert worden overgeslagen: een TimingWheel houdt per simulator de
+    eerstvolgende tick bij waarop iets gebeurt (zie LedSimulator.next_event_time), zodat alleen
+    simulators met een gebeurtenis worden bijgewerkt. Met vectorize_fades=False krijgt elke fadende
+    simulator per frame een eigen update() (ook als NumPy beschikbaar is), bijv. als referentie.
+    """
+
+    def __init__(self, simulators, tick_ms=10, checkpoint_interval_ms=60000, max_checkpoints=512, vectorize_fades=True):
+        self.simulators = list(simulators)
+        self.tick_ms = int(tick_ms)
+        self.vectorize_fades = vectorize_fades
+        # Het interval moet op het raster liggen
+        self.checkpoint_interval_ms = max(self.tick_ms, int(checkpoint_interval_ms) // self.tick_ms * self.tick_ms)
+        self.max_checkpoints = max_checkpoints
+        self.time_ms = 0 # Laatst verwerkte tick
+        self.checkpoint_times = []
+        self.checkpoints = []
+        self._reschedule_all()
+        self._capture()
+
+    def _next_tick(self, sim, after_ms):
+        """Eerste tick na after_ms waarop sim iets te doen heeft."""
+        due = sim.next_event_time()
+        return max(-(-due // self.tick_ms) * self.tick_ms, after_ms + self.tick_ms)
+
+    def _reschedule_all(self):
+        """Bouwt het tijdwiel opnieuw op vanuit de huidige toestand van de simulators."""
+        self.wheel = TimingWheel(tick_ms=self.tick_ms, start_ms=self.time_ms)
+        self.fading = set() # Indices van simulators in een fade (helderheid verandert elke tick)
+        self.pending_ticks = [self._next_tick(sim, self.time_ms) for sim in self.simulators]
+        # Fadeparameters als NumPy-kolommen, zodat _refresh_fades() ze in één keer uit FADE_TABLES kan halen
+        self.fade_columns = np.zeros((6, len(self.simulators)), dtype=np.int64) if np is not None and self.vectorize_fades else None
+        for index, sim in enumerate(self.simulators):
+            self.wheel.schedule(index, self.pending_ticks[index])
+            if sim.current_mode in (LedSimulator.MODE_FADE_IN, LedSimulator.MODE_FADE_OUT):
+                self.fading.add(index)
+                self._store_fade(index, sim)
+
+    def _store_fade(self, index, sim):
+        """Legt de fade van sim vast in fade_columns; duur -1 = geen gewone LedSimulator.
+
+        Rijen: duur, van, naar, starttijd, tabelbasis en tabelgeneratie. De tabelbasis is de offset
+        van de helling in FADE_TABLES min starttijd // FADE_TABLE_STEP_MS, zodat basis + t // stap de
+        waarde op tick t aanwijst; generatie -1 = geen tabel (te lang of starttijd buiten het raster).
+        """
+        if self.fade_columns is None:
+            return
+        if type(sim) is not LedSimulator:
+            self.fade_columns[0, index] = -1 # Synchrone leden volgen hun groep via update()
+            return
+        duration, start, end = sim.fade_key()
+        step, off_grid = divmod(sim.fade_start_time, FADE_TABLE_STEP_MS)
+        offset = FADE_TABLES.offset(duration, end >= start)
+        generation = FADE_TABLES.generation if offset >= 0 and not off_grid else -1
+        self.fade_columns[:, index] = (duration, start, end, sim.fade_start_time, offset - step, generation)
+
+    def _refresh_fades(self, t_ms):
+        """Zet de helderheid van alle fadende simulators op t_ms; faseovergangen zijn al verwerkt.
+
+        Bij veel fades tegelijk komen de helderheden van gewone LedSimulators in één indexering uit
+        de gedeelde FADE_TABLES, in plaats van per LED update() aan te roepen. Fades zonder geldige
+        tabel (of tijden buiten het raster) rekent fade_levels() uit. Is de arena sinds _store_fade()
+        geleegd, dan worden de verouderde offsets eerst opnieuw opgevraagd.
+        """
+        if self.fade_columns is None or len(self.fading) < FADE_VECTOR_MIN:
+            for index in self.fading:
+                self.simulators[index].update(t_ms)
+            return
+        simulators = self.simulators
+        indices = np.fromiter(self.fading, dtype=np.int64, count=len(self.fading))
+        columns = self.fade_columns[:, indices]
+        synced = columns[0] < 0
+        if synced.any():
+            for index in indices[synced].tolist():
+                simulators[index].update(t_ms)
+            indices, columns = indices[~synced], columns[:, ~synced]
+        stale = (columns[5] >= 0) & (columns[5] != FADE_TABLES.generation)
+        if stale.any():
+            for index in indices[stale].tolist():
+                self._store_fade(index, simulators[index])
+            columns = self.fade_columns[:, indices]
+        durations, starts, ends, fade_starts, bases, generations = columns
+        step, off_grid = divmod(t_ms, FADE_TABLE_STEP_MS)
+        usable = generations == FADE_TABLES.generation # Na nog een lediging tijdens het opvragen via fade_levels()
+        if not off_grid and usable.all():
+            levels = FADE_TABLES.gather(bases + int(step), starts, ends)
+        else:
+            levels = fade_levels(durations, starts, ends, t_ms - fade_starts)
+            if not off_grid:
+                levels[usable] = FADE_TABLES.gather(bases[usable] + int(step), starts[usable], ends[usable])
+        for index, level in zip(indices.tolist(), levels.tolist()):
+            simulators[index].current_brightness = level
+
+    def next_deadline(self):
+        """Eerstvolgende tick (ms) waarop een van de simulators van fase of knipperstand wisselt."""
+        return self.wheel.next_deadline()
+
+    def _capture(self):
+        self.checkpoint_times.append(self.time_ms)
+        self.checkpoints.append([sim.get_state() for sim in self.simulators])
+        if len(self.checkpoints) > self.max_checkpoints:
+            # Dun uit in plaats van onbeperkt te groeien: elk tweede checkpoint vervalt, het interval verdubbelt
+            self.checkpoint_interval_ms *= 2
+            keep = [i for i, t in enumerate(self.checkpoint_times) if t % self.checkpoint_interval_ms == 0]
+            self.checkpoint_times = [self.checkpoint_times[i] for i in keep]
+            self.checkpoints = [self.checkpoints[i] for i in keep]
+
+    def _advance_simulators(self, t_end):
+        """Verwerkt alle gebeurtenissen tot en met t_end en zet de helderheid van fades op t_end."""
+        fade_modes = (LedSimulator.MODE_FADE_IN, LedSimulator.MODE_FADE_OUT)
+        for index in self.wheel.pop_due(t_end):
+            sim = self.simulators[index]
+            t = self.pending_ticks[index]
+            while t <= t_end:
+                sim.update(t)
+                t = self._next_tick(sim, t)
+            self.pending_ticks[index] = t
+            self.wheel.schedule(index, t)
+            if sim.current_mode in fade_modes:
+                self.fading.add(index)
+                self._store_fade(index, sim)
+            else:
+                self.fading.discard(index)
+        self._refresh_fades(t_end) # Alleen nog de helderheid binnen een fade
+
+    def advance_to(self, t_ms):
+        """Loopt vooruit tot de laatste tick op of vóór t_ms en bewaart onderweg checkpoints."""
+        t_end = int(t_ms // self.tick_ms) * self.tick_ms
+        while self.time_ms < t_end:
+            boundary = (self.time_ms // self.checkpoint_interval_ms + 1) * self.checkpoint_interval_ms
+            step_end = min(t_end, boundary)
+            self._advance_simulators(step_end)
+            self.time_ms = step_end
+            if step_end == boundary and boundary > self.checkpoint_times[-1]:
+                self._capture()
+
+    def seek(self, t_ms):
+        """Springt naar simulatietijd t_ms, vooruit of terug."""
+        t_end = int(max(0, t_ms) // self.tick_ms) * self.tick_ms
+        if t_end < self.time_ms:
+            index = bisect.bisect_right(self.checkpoint_times, t_end) - 1
+            self.time_ms = self.checkpoint_times[index]
+            for sim, state in zip(self.simulators, self.checkpoints[index]):
+                sim.set_state(state)
+            self._reschedule_all()
+        self.advance_to(t_end)
+
+    def reset(self):
+        """Zet alle simulators terug naar t=0 en wist de checkpoints."""
+        for sim in self.simulators:
+            sim.reset()
+        self.time_ms = 0
+        self.checkpoint_times = []
+        self.checkpoints = []
+        self._reschedule_all()
+        self._capture()
+
+class SimulationWorker(threading.Thread):
+    """Laat een SimulationTimeline op een eigen thread lopen en publiceert helderheidsframes.
+
+    De worker schrijft elk frame in een achterbuffer (een bytearray met één byte per simulator) en
+    wisselt die onder een lock om met de voorbuffer. De GUI haalt met latest_frame() op haar eigen
+    tempo het nieuwste frame op: een trage redraw houdt de simulatietijd niet op en een grote
+    simulatiestap bevriest de GUI niet. Besturing (resume, pause, seek, snelheid, reset) is thread-safe:
+    de worker houdt de lock niet vast tijdens een stap; een seek of reset die dan binnenkomt wordt
+    direct na de stap uitgevoerd en het (dan verouderde) resultaat van de stap wordt niet gepubliceerd.
+    """
+
+    def __init__(self, timeline, speed_factor=1.0, frame_interval_ms=50, watch_index=0):
+        super().__init__(name="SimulationWorker", daemon=True)
+        self.timeline = timeline
+        self.speed_factor = float(speed_factor)
+        self.frame_interval_ms = frame_interval_ms # Publicatie-interval tijdens fades
+        self.watch_index = watch_index # Simulator waarvan ook de fasegegevens in het frame komen
+        self.profiler = None # Optionele TickProfiler voor de stappen 'simulatie' en 'publiceren'
+        self.outputs = [] # Extra uitvoer (bijv. DmxUdpOutput) die elk gepubliceerd frame krijgt
+        self.running = False
+        self._stopped = False
+        self._start_perf_ms = 0.0
+        self._cond = threading.Condition() # Beschermt de tijdlijn buiten een stap; wekt de worker bij een opdracht
+        self._stepping = False # De worker zet de tijdlijn (zonder lock) vooruit
+        self._request = None # Seek/reset die tijdens een stap binnenkwam: (methode, argumenten)
+        self._frame_lock = threading.Lock() # Beschermt alleen de voorbuffer
+        count = len(timeline.simulators)
+        self._back = (bytearray(count), bytearray(count)) # (helderheid, modus)
+        self._front = (bytearray(count), bytearray(count))
+        self._front_info = None
+        self._seq = 0
+        self._last_read_seq = 0
+        self.metrics = {
+            'frames_published': 0, 'frames_rendered': 0, 'frames_dropped': 0,
+            'last_step_ms': 0.0, 'max_step_ms': 0.0,
+            'render_lag_ms': 0.0, 'max_render_lag_ms': 0.0,
+            'sim_lag_ms': 0.0, 'max_sim_lag_ms': 0.0,
+        }
+        self._anchor()
+        self._publish()
+
+    # --- Klok ---
+    def _anchor(self):
+        """Laat de simulatieklok doorlopen vanaf de huidige tijd van de tijdlijn."""
+        self._start_perf_ms = time.perf_counter() * 1000 - self.timeline.time_ms / self.speed_factor
+
+    def sim_time_ms(self):
+        """Huidige simulatietijd volgens de klok (staat stil tijdens pauze)."""
+        if not self.running:
+            return self.timeline.time_ms
+        return (time.perf_counter() * 1000 - self._start_perf_ms) * self.speed_factor
+
+    # --- Besturing (vanuit elke thread) ---
+    def resume(self):
+        with self._cond:
+            self._anchor()
+            self.running = True
+            self._cond.notify()
+
+    def pause(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+
+    def set_speed(self, speed_factor):
+        with self._cond:
+            current_ms = self.sim_time_ms()
+            self.speed_factor = float(speed_factor)
+            # De nieuwe snelheid geldt vanaf het huidige moment: geen sprong in simulatietijd
+            self._start_perf_ms = time.perf_counter() * 1000 - current_ms / self.speed_factor
+            self._cond.notify()
+
+    def seek(self, t_ms):
+        self._control(self.timeline.seek, t_ms)
+
+    def reset(self):
+        self._control(self.timeline.reset)
+
+    def _control(self, method, *args):
+        """Voert een seek/reset op de tijdlijn uit, of laat de worker dat na de lopende stap doen."""
+        with self._cond:
+            if self._stepping:
+                self._request = (method, args) # Een latere opdracht vervangt een eerdere
+            else:
+                self._apply(method, args)
+            self._cond.notify()
+
+    def _apply(self, method, args):
+        method(*args)
+        self._anchor()
+        self._publish()
+
+    def stop(self, timeout=1.0):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self.is_alive():
+            self.join(timeout)
+
+    # --- Worker ---
+    def run(self):
+        with self._cond:
+            while not self._stopped:
+                timeout = None
+                if self.running:
+                    target_ms = self.sim_time_ms()
+                    self._stepping = True
+                    self._cond.release() # Besturing blijft mogelijk tijdens een (lange) stap
+                    try:
+                        step_start = time.perf_counter()
+                        self.timeline.advance_to(target_ms)
+                        step_ms = (time.perf_counter() - step_start) * 1000
+                    finally:
+                        self._cond.acquire()
+                        self._stepping = False
+                    self.metrics['last_step_ms'] = step_ms
+                    self.metrics['max_step_ms'] = max(self.metrics['max_step_ms'], step_ms)
+                    profiler = self.profiler
+                    if profiler:
+                        profiler.record('simulatie', step_ms)
+                    if self._request:
+                        request, self._request = self._request, None
+                        self._apply(*request) # Het resultaat van de stap is achterhaald
+                        continue
+                    publish_start = time.perf_counter()
+                    self._publish()
+                    if profiler:
+                        profiler.record('publiceren', (time.perf_counter() - publish_start) * 1000)
+                    timeout = self._wait_ms(target_ms) / 1000.0
+                self._cond.wait(timeout)
+
+    def _wait_ms(self, current_sim_time_ms):
+        """Echte ms tot het volgende frame: elk interval tijdens een fade, anders bij de volgende wissel."""
+        if self.timeline.fading:
+            return self.frame_interval_ms
+        deadline = self.timeline.next_deadline()
+        if deadline is None:
+            return 1000.0
+        return min(1000.0, max(1.0, (deadline - current_sim_time_ms) / self.speed_factor))
+
+    def _publish(self):
+        brightness, modes = self._back
+        for index, sim in enumerate(self.timeline.simulators):
+            brightness[index] = sim.current_brightness
+            modes[index] = sim.current_mode
+        watched = self.timeline.simulators[self.watch_index]
+        info = {
+            'sim_time_ms': self.timeline.time_ms,
+            'published_ms': time.perf_counter() * 1000,
+            'watched': (watched.current_brightness, watched.current_mode, watched.current_duration,
+                        watched.last_phase_start_time, watched.blink_state),
+            'fading': bool(self.timeline.fading),
+            'next_deadline_ms': self.timeline.next_deadline(),
+        }
+        with self._frame_lock:
+            self._back, self._front = self._front, self._back
+            self._seq += 1
+            info['seq'] = self._seq
+            self._front_info = info
+        self.metrics['frames_published'] += 1
+        # De voorbuffer wordt alleen door deze thread beschreven (na de volgende wissel), dus lezen mag zonder lock
+        for output in self.outputs:
+            output.send_frame(self._front[0], info['sim_time_ms'])
+
+    # --- Uitlezen (GUI-thread) ---
+    def latest_frame(self):
+        """Het nieuwste frame als dict, of None als er sinds de vorige aanroep niets nieuws is.
+
+        Frames die tussen twee aanroepen zijn gepubliceerd en nooit zijn opgehaald tellen als
+        'frames_dropped'; de vertraging tussen publiceren en ophalen komt in 'render_lag_ms'.
+        """
+        with self._frame_lock:
+            info = self._front_info
+            if info is None or info['seq'] == self._last_read_seq:
+                return None
+            frame = dict(info, brightness=bytes(self._front[0]), modes=bytes(self._front[1]))
+        metrics = self.metrics
+        metrics['frames_dropped'] += max(0, frame['seq'] - self._last_read_seq - 1)
+        metrics['frames_rendered'] += 1
+        self._last_read_seq = frame['seq']
+        render_lag_ms = time.perf_counter() * 1000 - frame['published_ms']
+        sim_lag_ms = max(0.0, self.sim_time_ms() - frame['sim_time_ms'])
+        metrics['render_lag_ms'] = render_lag_ms
+        metrics['max_render_lag_ms'] = max(metrics['max_render_lag_ms'], render_lag_ms)
+        metrics['sim_lag_ms'] = sim_lag_ms
+        metrics['max_sim_lag_ms'] = max(metrics['max_sim_lag_ms'], sim_lag_ms)
+        return frame
+
+class TickProfiler:
+    """Meet per tick waar de tijd heen gaat: duur per stap, te laat gestarte ticks, Tk-aanroepen en geheugen.
+
+    Elke stap (bijv. 'simulatie', 'frame', 'weergave') krijgt een histogram met vaste grenzen in ms.
+    Met memory=True wordt tracemalloc gestart; memory_usage() geeft goedkoop het actuele/piekgebruik en
+    memory_snapshot() bewaart op verzoek ook de grootste allocaties (duur: loopt alle allocaties langs).
+    record() mag vanuit meerdere threads worden aangeroepen.
+    """
+
+    BUCKET_EDGES_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 50, 100, 250)
+
+    def __init__(self, memory=True, max_snapshots=20):
+        self.memory = memory
+        self.max_snapshots = max_snapshots
+        self._lock = threading.Lock()
+        self._own_tracemalloc = False
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.lateness = self._new_stat()
+            self.tk_calls = self._new_stat()
+            self._frame_tk_calls = 0
+            self.snapshots = []
+            self.started_at = time.perf_counter()
+
+    def _new_stat(self):
+        return {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'buckets': [0] * (len(self.BUCKET_EDGES_MS) + 1)}
+
+    def _add(self, stat, value):
+        stat['count'] += 1
+        stat['total_ms'] += value
+        stat['max_ms'] = max(stat['max_ms'], value)
+        stat['buckets'][bisect.bisect_left(self.BUCKET_EDGES_MS, value)] += 1
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+
+    def stop(self):
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+            self._own_tracemalloc = False
+
+    def record(self, stage, duration_ms):
+        with self._lock:
+            stat = self.stages.get(stage)
+            if stat is None:
+                stat = self.stages[stage] = self._new_stat()
+            self._add(stat, duration_ms)
+
+    def record_lateness(self, late_ms):
+        """Hoeveel ms een tick later begon dan gepland (negatief telt als 0)."""
+        with self._lock:
+            self._add(self.lateness, max(0.0, late_ms))
+
+    def count_tk(self, calls=1):
+        self._frame_tk_calls += calls
+
+    def end_frame(self):
+        """Sluit een frame af: het aantal Tk-aanroepen sinds het vorige frame gaat in de statistiek."""
+        with self._lock:
+            self._add(self.tk_calls, self._frame_tk_calls)
+            self._frame_tk_calls = 0
+
+    def memory_usage(self):
+        """(actueel, piek) in kB zonder snapshot, of None als tracemalloc niet loopt."""
+        if not tracemalloc.is_tracing():
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        return round(current / 1024, 1), round(peak / 1024, 1)
+
+    def memory_snapshot(self, top=10):
+        """Legt het geheugengebruik en de grootste allocaties vast (alleen als tracemalloc loopt)."""
+        if not tracemalloc.is_tracing():
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().statistics('lineno')[:top]
+        snapshot = {
+            'elapsed_s': round(time.perf_counter() - self.started_at, 3),
+            'current_kb': round(current / 1024, 1), 'peak_kb': round(peak / 1024, 1),
+            'top': [{'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                     'size_kb': round(stat.size / 1024, 1), 'count': stat.count} for stat in statistics],
+        }
+        with self._lock:
+            self.snapshots.append(snapshot)
+            del self.snapshots[:-self.max_snapshots]
+        return snapshot
+
+    def _summarize(self, stat):
+        labels = [f"<={edge}" for edge in self.BUCKET_EDGES_MS] + [f">{self.BUCKET_EDGES_MS[-1]}"]
+        return {
+            'count': stat['count'],
+            'mean_ms': round(stat['total_ms'] / stat['count'], 4) if stat['count'] else 0.0,
+            'max_ms': round(stat['max_ms'], 4),
+            'total_ms': round(stat['total_ms'], 3),
+            'histogram': dict(zip(labels, stat['buckets'])),
+        }
+
+    def summary(self):
+        """Alle metingen als JSON-vriendelijke dict."""
+        with self._lock:
+            tk_calls = self._summarize(self.tk_calls)
+            # Tk-aanroepen zijn aantallen, geen milliseconden
+            tk_calls = {'frames': tk_calls['count'], 'mean_per_frame': tk_calls['mean_ms'],
+                        'max_per_frame': int(tk_calls['max_ms']), 'total': int(tk_calls['total_ms'])}
+            return {
+                'elapsed_s': round(time.perf_counter() - self.started_at, 3),
+                'stages': {name: self._summarize(stat) for name, stat in self.stages.items()},
+                'tick_lateness': self._summarize(self.lateness),
+                'tk_calls': tk_calls,
+                'memory': list(self.snapshots),
+            }
+
+    def export_json(self, file_path):
+        with open(file_path, "w") as f:
+            json.dump(self.summary(), f, indent=4)
+
+    def format_overlay(self):
+        """Korte tekst voor de overlay in de GUI."""
+        summary = self.summary()
+        lines = [f"{'Stap':<12}{'n':>7}{'gem ms':>9}{'max ms':>9}"]
+        for name, stat in list(summary['stages'].items()) + [('te laat', summary['tick_lateness'])]:
+            lines.append(f"{name:<12}{stat['count']:>7}{stat['mean_ms']:>9.3f}{stat['max_ms']:>9.2f}")
+        tk_calls = summary['tk_calls']
+        lines.append(f"Tk-aanroepen/frame: gem {tk_calls['mean_per_frame']:.1f}, max {tk_calls['max_per_frame']}")
+        usage = self.memory_usage()
+        if usage:
+            lines.append(f"Geheugen: {usage[0]:.0f} kB (piek {usage[1]:.0f} kB)")
+        return "\n".join(lines)
+
+# --- Multi-process Simulatie (shards met shared memory) ---
+def derive_led_seed(seed, led_index):
+    """Eigen, reproduceerbare seed per LED, onafhankelijk van hoe de layout over shards is verdeeld."""
+    return None if seed is None else seed * 1000003 + led_index
+
+def _shard_worker(shm_name, num_shards, shard_index, first_led, configs, seed, tick_ms, commands, done):
+    """Hoofdlus van één shard-proces: stapt zijn eigen LEDs en schrijft de helderheid in het gedeelde frame."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    header = shm.buf[:8 * num_shards].cast('q')
+    frame = shm.buf[8 * num_shards + first_led:8 * num_shards + first_led + len(configs)]
+    try:
+        sims = build_simulators(configs, seed=seed, first_led=first_led)
+        # Shards hoeven niet terug te spoelen: geen periodieke checkpoints
+        timeline = SimulationTimeline(sims, tick_ms=tick_ms, checkpoint_interval_ms=1 << 62)
+        done.put((shard_index, None))
+        while True:
+            t_ms = commands.get()
+            if t_ms is None:
+                break
+            timeline.advance_to(t_ms)
+            frame[:] = bytes([sim.current_brightness for sim in sims])
+            header[shard_index] = timeline.time_ms
+            done.put((shard_index, None))
+    except Exception as e:
+        done.put((shard_index, f"{type(e).__name__}: {e}"))
+    finally:
+        header.release()
+        frame.release()
+        shm.close()
+
+class ShardedSimulation:
+    """Verdeelt een layout over meerdere processen die elk hun deel van de LEDs simuleren.
+
+    Elke shard draait een eigen SimulationTimeline; elke LED krijgt een eigen seed (derive_led_seed),
+    dus het resultaat hangt niet af van het aantal shards. Een synchrone groep die over twee shards
+    valt draait in beide met dezelfde seed (derive_group_seed) en blijft dus gelijk lopen. De shards schrijven hun helderheden rechtstreeks
+    in één multiprocessing.shared_memory-blok; `brightness` is een memoryview daarop (één byte per LED)
+    en wordt zonder kopiëren gelezen. advance_to() wacht tot alle shards klaar zijn; met
+    advance_to_async() en wait() kan de coördinator intussen iets anders doen.
+    """
+
+    def __init__(self, led_configs, num_shards=None, tick_ms=10, seed=None):
+        num_leds = len(led_configs)
+        if num_leds == 0:
+            raise ValueError("De layout bevat geen LEDs.")
+        self.num_leds = num_leds
+        self.num_shards = max(1, min(num_shards or os.cpu_count() or 1, num_leds))
+        self.tick_ms = tick_ms
+        self.time_ms = 0
+        build_sync_groups(led_configs) # Fouten in de groepen hier melden, niet pas in een shard
+        if seed is None:
+            seed = random.randrange(1 << 31) # Gedeelde seed: een gesplitste groep moet in elke shard gelijk lopen
+        # 'spawn' in plaats van 'fork': veilig naast een draaiende Tk-GUI
+        context = multiprocessing.get_context("spawn")
+        header_size = 8 * self.num_shards # Per shard de laatst verwerkte tick (int64)
+        self.shm = shared_memory.SharedMemory(create=True, size=header_size + num_leds)
+        self.shm.buf[:header_size + num_leds] = bytes(header_size + num_leds)
+        self.brightness = self.shm.buf[header_size:header_size + num_leds]
+        self.shard_times = self.shm.buf[:header_size].cast('q')
+        bounds = [num_leds * i // self.num_shards for i in range(self.num_shards + 1)]
+        self.shard_bounds = list(zip(bounds, bounds[1:]))
+        self._done = context.Queue()
+        self._commands = []
+        self._processes = []
+        for shard_index, (first, last) in enumerate(self.shard_bounds):
+            commands = context.Queue()
+            process = context.Process(target=_shard_worker, daemon=True,
+                                      args=(self.shm.name, self.num_shards, shard_index, first,
+                                            led_configs[first:last], seed, tick_ms, commands, self._done))
+            process.start()
+            self._commands.append(commands)
+            self._processes.append(process)
+        self._pending = self.num_shards # Wacht tot alle shards hun simulators hebben opgebouwd
+        self.wait()
+
+    def advance_to_async(self, t_ms):
+        """Laat alle shards (parallel) doorlopen tot t_ms; gebruik wait() om op het resultaat te wachten."""
+        if self._pending:
+            raise RuntimeError("De vorige stap is nog niet afgerond (roep eerst wait() aan).")
+        for commands in self._commands:
+            commands.put(t_ms)
+        self._pending = self.num_shards
+
+    def wait(self, poll_s=1.0):
+        """Wacht tot alle shards hun laatste opdracht hebben verwerkt."""
+        while self._pending:
+            try:
+                shard_index, error = self._done.get(timeout=poll_s)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self._processes):
+                    raise RuntimeError("Een shard-proces is onverwacht gestopt.")
+                continue
+            if error:
+                raise RuntimeError(f"Shard {shard_index} faalde: {error}")
+            self._pending -= 1
+        self.time_ms = min(self.shard_times)
+
+    def advance_to(self, t_ms):
+        self.advance_to_async(t_ms)
+        self.wait()
+
+    def lit_count(self):
+        """Aantal LEDs met helderheid > 0 in het huidige frame."""
+        return self.num_leds - bytes(self.brightness).count(0)
+
+    def close(self):
+        """Stopt de shard-processen en geeft het gedeelde geheugen vrij."""
+        for commands in self._commands:
+            commands.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._commands = []
+        self._processes = []
+        self.brightness.release()
+        self.shard_times.release()
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+# --- Netwerkuitvoer (E1.31 / Art-Net) ---
+E131_PORT = 5568
+ARTNET_PORT = 6454
+
+class DmxUdpOutput:
+    """Verstuurt helderheidsframes als E1.31 (sACN) of Art-Net over UDP, bijv. naar een lichtvisualizer.
+
+    LED i komt op universe start_universe + i // channels_per_universe, kanaal i % channels_per_universe.
+    Per universe wordt één pakketbuffer vooraf opgebouwd; send_frame() kopieert alleen de data van
+    gewijzigde universes in hun buffer en verstuurt die. Ongewijzigde universes worden elke
+    keepalive_s opnieuw verstuurd, zodat ontvangers ze niet als weggevallen beschouwen.
+    Zonder host gaat E1.31 naar het multicastadres van de universe (239.255.x.y).
+    """
+
+    E131_HEADER_SIZE = 126
+    ARTNET_HEADER_SIZE = 18
+
+    def __init__(self, num_leds, protocol="e131", host="127.0.0.1", port=None, start_universe=1,
+                 channels_per_universe=512, source_name="Modelbaan LED Simulator", priority=100, keepalive_s=1.0):
+        if protocol not in ("e131", "artnet"):
+            raise ValueError(f"Onbekend protocol '{protocol}' (kies 'e131' of 'artnet').")
+        if not 1 <= channels_per_universe <= 512:
+            raise ValueError("Het aantal kanalen per universe moet tussen 1 en 512 liggen.")
+        if host is None and protocol != "e131":
+            raise ValueError("Art-Net heeft een host nodig (multicast bestaat alleen voor E1.31).")
+        self.protocol = protocol
+        self.num_leds = num_leds
+        self.channels_per_universe = channels_per_universe
+        self.keepalive_s = keepalive_s
+        port = port or (E131_PORT if protocol == "e131" else ARTNET_PORT)
+        cid = uuid.uuid4().bytes
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if host is None:
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        self.sequence_index = 111 if protocol == "e131" else 12 # Positie van het volgnummer in het pakket
+        self.universes = [] # Per universe: [universe, eerste LED, aantal LEDs, pakket, dataview, adres, laatst verstuurd]
+        for first in range(0, num_leds, channels_per_universe):
+            universe = start_universe + first // channels_per_universe
+            count = min(channels_per_universe, num_leds - first)
+            if protocol == "e131":
+                packet = self._e131_packet(universe, count, cid, source_name, priority)
+                data_offset = self.E131_HEADER_SIZE
+                address = (host or f"239.255.{universe >> 8 & 0xff}.{universe & 0xff}", port)
+            else:
+                packet = self._artnet_packet(universe, count)
+                data_offset = self.ARTNET_HEADER_SIZE
+                address = (host, port)
+            data_view = memoryview(packet)[data_offset:data_offset + count] # Vaste view op het datadeel
+            self.universes.append([universe, first, count, packet, data_view, address, 0.0])
+        self.metrics = {'frames': 0, 'packets_sent': 0, 'universes_unchanged': 0}
+
+    @staticmethod
+    def _e131_packet(universe, count, cid, source_name, priority):
+        packet = bytearray(DmxUdpOutput.E131_HEADER_SIZE + count)
+        length = len(packet)
+        # Root layer
+        packet[0:2] = (0x0010).to_bytes(2, 'big') # Preamble size
+        packet[4:16] = b"ASC-E1.17\x00\x00\x00"
+        packet[16:18] = (0x7000 | (length - 16)).to_bytes(2, 'big')
+        packet[18:22] = (0x00000004).to_bytes(4, 'big') # VECTOR_ROOT_E131_DATA
+        packet[22:38] = cid
+        # Framing layer
+        packet[38:40] = (0x7000 | (length - 38)).to_bytes(2, 'big')
+        packet[40:44] = (0x00000002).to_bytes(4, 'big') # VECTOR_E131_DATA_PACKET
+        packet[44:108] = source_name.encode('utf-8')[:63].ljust(64, b"\x00")
+        packet[108] = priority
+        packet[113:115] = universe.to_bytes(2, 'big')
+        # DMP layer
+        packet[115:117] = (0x7000 | (length - 115)).to_bytes(2, 'big')
+        packet[117] = 0x02 # VECTOR_DMP_SET_PROPERTY
+        packet[118] = 0xa1 # Address type & data type
+        packet[121:123] = (1).to_bytes(2, 'big') # Address increment
+        packet[123:125] = (count + 1).to_bytes(2, 'big') # Property value count (inclusief start code)
+        return packet # Start code (byte 125) is 0: gewone DMX-data
+
+    @staticmethod
+    def _artnet_packet(universe, count):
+        packet = bytearray(DmxUdpOutput.ARTNET_HEADER_SIZE + count + (count & 1)) # Lengte moet even zijn
+        packet[0:8] = b"Art-Net\x00"
+        packet[8:10] = (0x5000).to_bytes(2, 'little') # OpDmx
+        packet[10:12] = (14).to_bytes(2, 'big') # Protocolversie
+        packet[14] = universe & 0xff # SubUni
+        packet[15] = (universe >> 8) & 0x7f # Net
+        packet[16:18] = (count + (count & 1)).to_bytes(2, 'big')
+        return packet
+
+    def send_frame(self, brightness, sim_time_ms=None, force=False):
+        """Verstuurt de universes waarvan de data is veranderd (of waarvan de keepalive verloopt).
+
+        brightness is bytes-achtig (bytes, bytearray of memoryview), één byte per LED;
+        sim_time_ms wordt niet gebruikt (zelfde aanroep als bij MmapFrameWriter).
+        Retourneert het aantal verstuurde pakketten.
+        """
+        frame = memoryview(brightness)
+        now = time.monotonic()
+        sent = 0
+        for entry in self.universes:
+            universe, first, count, packet, data_view, address, last_sent = entry
+            data = frame[first:first + count]
+            if data_view == data and not force and now - last_sent < self.keepalive_s:
+                self.metrics['universes_unchanged'] += 1
+                continue
+            data_view[:] = data
+            # Volgnummer 1..255; 0 betekent bij Art-Net 'geen volgorde'
+            packet[self.sequence_index] = packet[self.sequence_index] % 255 + 1
+            self.sock.sendto(packet, address)
+            entry[6] = now
+            sent += 1
+        self.metrics['frames'] += 1
+        self.metrics['packets_sent'] += sent
+        return sent
+
+    def close(self):
+        for entry in self.universes:
+            entry[4].release()
+        self.sock.close()
+
+# --- Frame-uitvoer via een memory-mapped bestand ---
+# Indeling (little-endian):
+#   header (64 bytes): magic, versie, aantal LEDs, ringgrootte, slotgrootte, seq, laatste framenummer, simulatietijd
+#   ring_size slots:   seq, framenummer, simulatietijd (elk 8 bytes) gevolgd door één byte per LED
+# Zowel de header als elk slot gebruiken een seqlock: de schrijver maakt seq oneven, schrijft, en maakt
+# seq weer even. Een lezer kopieert de gegevens en accepteert ze alleen als seq voor en na gelijk en even is.
+MMAP_MAGIC = b"MLEDFB01"
+MMAP_HEADER = struct.Struct("<8sIIIIQqq") # magic, versie, num_leds, ring_size, slot_size, seq, laatste frame, sim-tijd
+MMAP_HEADER_SIZE = 64
+MMAP_SEQ_OFFSET = 24 # Positie van seq in de header
+MMAP_LATEST_OFFSET = 32 # Positie van (laatste frame, sim-tijd) in de header
+MMAP_SLOT_HEADER = struct.Struct("<Qqq") # seq, framenummer, sim-tijd
+MMAP_VERSION = 1
+
+class MmapFrameWriter:
+    """Publiceert het huidige frame en een ring van recente frames in een memory-mapped bestand.
+
+    Externe tools openen het bestand met MmapFrameReader (of zelf met mmap) en lezen de helderheid
+    rechtstreeks, zonder sockets of serialisatie. Schrijven kost één kopie van het frame en een paar
+    struct-velden, dus de simulatielus merkt er vrijwel niets van.
+    """
+
+    def __init__(self, file_path, num_leds, ring_size=64):
+        if num_leds <= 0 or ring_size <= 0:
+            raise ValueError("Aantal LEDs en ringgrootte moeten groter dan 0 zijn.")
+        self.file_path = file_path
+        self.num_leds = num_leds
+        self.ring_size = ring_size
+        self.slot_size = (MMAP_SLOT_HEADER.size + num_leds + 7) // 8 * 8 # Slots op 8 bytes uitgelijnd
+        size = MMAP_HEADER_SIZE + ring_size * self.slot_size
+        with open(file_path, "wb") as f:
+            f.truncate(size)
+        self._file = open(file_path, "r+b")
+        self.buffer = mmap.mmap(self._file.fileno(), size)
+        self.frame_number = 0
+        MMAP_HEADER.pack_into(self.buffer, 0, MMAP_MAGIC, MMAP_VERSION, num_leds, ring_size, self.slot_size, 0, -1, 0)
+
+    def send_frame(self, brightness, sim_time_ms=0):
+        """Schrijft een frame (bytes-achtig, één byte per LED) in het volgende slot van de ring."""
+        frame_number = self.frame_number
+        offset = MMAP_HEADER_SIZE + (frame_number % self.ring_size) * self.slot_size
+        seq = struct.unpack_from("<Q", self.buffer, offset)[0]
+        struct.pack_into("<Q", self.buffer, offset, seq + 1) # Oneven: slot wordt beschreven
+        data_offset = offset + MMAP_SLOT_HEADER.size
+        self.buffer[data_offset:data_offset + self.num_leds] = brightness
+        MMAP_SLOT_HEADER.pack_into(self.buffer, offset, seq + 2, frame_number, int(sim_time_ms))
+        # Daarna de header naar het nieuwe frame laten wijzen (ook onder seqlock)
+        header_seq = struct.unpack_from("<Q", self.buffer, MMAP_SEQ_OFFSET)[0]
+        struct.pack_into("<Q", self.buffer, MMAP_SEQ_OFFSET, header_seq + 1)
+        struct.pack_into("<qq", self.buffer, MMAP_LATEST_OFFSET, frame_number, int(sim_time_ms))
+        struct.pack_into("<Q", self.buffer, MMAP_SEQ_OFFSET, header_seq + 2)
+        self.frame_number += 1
+
+    def close(self):
+        self.buffer.close()
+        self._file.close()
+
+class MmapFrameReader:
+    """Leest frames uit een bestand van MmapFrameWriter volgens het seqlock-protocol."""
+
+    def __init__(self, file_path, timeout_s=1.0):
+        self._file = open(file_path, "rb")
+        self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.num_leds, self.ring_size, self.slot_size, _, _, _ = MMAP_HEADER.unpack_from(self.buffer, 0)
+        if magic != MMAP_MAGIC or version != MMAP_VERSION:
+            raise ValueError(f"{file_path} is geen frame-bestand (versie {MMAP_VERSION}).")
+        self.timeout_s = timeout_s
+
+    def _attempts(self):
+        """Pogingen voor een seqlock-lezing: eerst kort spinnen, daarna de schrijver ruimte geven."""
+        deadline = time.monotonic() + self.timeout_s
+        attempt = 0
+        while attempt < 100 or time.monotonic() < deadline:
+            yield attempt
+            attempt += 1
+            if attempt >= 100:
+                time.sleep(0.0001) # Schrijver zit midden in een frame (of is niet ingepland)
+
+    def latest_frame_number(self):
+        """Nummer van het laatst geschreven frame (-1 als er nog niets is geschreven)."""
+        for _ in self._attempts():
+            seq_before = struct.unpack_from("<Q", self.buffer, MMAP_SEQ_OFFSET)[0]
+            if seq_before & 1:
+                continue
+            frame_number = struct.unpack_from("<q", self.buffer, MMAP_LATEST_OFFSET)[0]
+            if struct.unpack_from("<Q", self.buffer, MMAP_SEQ_OFFSET)[0] == seq_before:
+                return frame_number
+        raise RuntimeError("Geen consistente header gelezen: de schrijver is te snel of gestopt midden in een frame.")
+
+    def read_frame(self, frame_number):
+        """(sim-tijd in ms, helderheid als bytes) van een frame, of None als het al is overschreven."""
+        if frame_number < 0:
+            return None
+        offset = MMAP_HEADER_SIZE + (frame_number % self.ring_size) * self.slot_size
+        data_offset = offset + MMAP_SLOT_HEADER.size
+        for _ in self._attempts():
+            seq_before, slot_frame, sim_time_ms = MMAP_SLOT_HEADER.unpack_from(self.buffer, offset)
+            if seq_before & 1:
+                continue
+            data = self.buffer[data_offset:data_offset + self.num_leds]
+            if struct.unpack_from("<Q", self.buffer, offset)[0] != seq_before:
+                continue # Tijdens het kopiëren overschreven: opnieuw
+            return (sim_time_ms, data) if slot_frame == frame_number else None
+        raise RuntimeError("Geen consistent frame gelezen: de schrijver is te snel of gestopt midden in een frame.")
+
+    def latest(self):
+        """(framenummer, sim-tijd in ms, helderheid) van het nieuwste frame, of None."""
+        while True:
+            frame_number = self.latest_frame_number()
+            if frame_number < 0:
+                return None
+            result = self.read_frame(frame_number)
+            if result is not None: # Anders is de ring intussen rond: het nieuwste frame opnieuw opvragen
+                return (frame_number,) + result
+
+    def recent(self, count):
+        """De laatste count frames die nog in de ring staan, oudste eerst."""
+        newest = self.latest_frame_number()
+        frames = []
+        for frame_number in range(max(0, newest - min(count, self.ring_size) + 1), newest + 1):
+            result = self.read_frame(frame_number)
+            if result is not None:
+                frames.append((frame_number,) + result)
+        return frames
+
+    def close(self):
+        self.buffer.close()
+        self._file.close()
+
+# --- Seriële Log Replay en Vergelijking ---
+# Overgangsregels die de gegenereerde sketch via Serial print: (patroon, nieuwe modus, groep met helderheid)
+SERIAL_LOG_PATTERNS = [
+    (re.compile(r"LED (\d+) start FADE_IN naar (\d+)"), LedSimulator.MODE_FADE_IN, 2),
+    (re.compile(r"LED (\d+) start BLINKING"), LedSimulator.MODE_BLINKING, None),
+    (re.compile(r"LED (\d+) DIRECT AAN"), LedSimulator.MODE_ON, None),
+    (re.compile(r"LED (\d+) einde FADE_IN, nu AAN op helderheid (\d+)"), LedSimulator.MODE_ON, 2),
+    (re.compile(r"LED (\d+) start FADE_OUT"), LedSimulator.MODE_FADE_OUT, None),
+    (re.compile(r"LED (\d+) DIRECT UIT"), LedSimulator.MODE_OFF, None),
+    (re.compile(r"LED (\d+) einde FADE_OUT, nu UIT"), LedSimulator.MODE_OFF, None),
+    (re.compile(r"LED (\d+) einde BLINKING periode, nu UIT"), LedSimulator.MODE_OFF, None),
+]
+# Tijdstempel vooraan de regel: "12:34:56.789 -> " (Arduino IDE), "2026-10-19 12:34:56.789 " of "[123456] " (ms)
+_LOG_CLOCK = re.compile(r"^\s*(?:(\d{4})-(\d{2})-(\d{2})[ T])?(\d{1,2}):(\d{2}):(\d{2}(?:\.\d+)?)")
+_LOG_MILLIS = re.compile(r"^\s*\[?(\d+)\]?\s*(?:->|:)?\s*LED ")
+
+def parse_serial_log(lines, stats=None):
+    """Zet regels van een seriële log om in overgangen (tijd_ms, pin, modus, helderheid of None).
+
+    Werkt als generator op een willekeurige iterabele van regels (bijv. een geopend bestand), dus ook
+    logs van honderden MB worden in constant geheugen verwerkt. Tijden zijn relatief aan de eerste
+    tijdstempel; een kloktijd zonder datum die terugspringt telt als een nieuwe dag en een millis()-
+    tijdstempel die terugspringt als een overloop van de 32-bits teller (na ~49,7 dagen).
+    Regels zonder overgang worden overgeslagen, net als overgangen zonder (herkende) tijdstempel.
+    stats (optioneel, dict) krijgt de tellers 'lines', 'transitions', 'skipped' (alle overgeslagen
+    regels) en 'untimed' (het deel daarvan dat wel een overgang bevatte).
+    """
+    if stats is None:
+        stats = {}
+    stats.update(lines=0, transitions=0, skipped=0, untimed=0)
+    first_ms = None
+    previous_ms = None
+    day_offset_ms = 0
+    previous_millis = None
+    wrap_offset_ms = 0
+    for line in lines:
+        stats['lines'] += 1
+        for pattern, mode, brightness_group in SERIAL_LOG_PATTERNS:
+            match = pattern.search(line)
+            if match:
+                break
+        else:
+            stats['skipped'] += 1
+            continue
+
+        clock = _LOG_CLOCK.match(line)
+        if clock:
+            year, month, day, hours, minutes, seconds = clock.groups()
+            stamp_ms = int((int(hours) * 3600 + int(minutes) * 60 + float(seconds)) * 1000)
+            if year:
+                stamp_ms += int(time.mktime((int(year), int(month), int(day), 0, 0, 0, 0, 0, -1))) * 1000
+            elif previous_ms is not None and stamp_ms + day_offset_ms < previous_ms - 12 * 3600000:
+                day_offset_ms += 86400000 # Over middernacht heen
+            stamp_ms += day_offset_ms
+        else:
+            millis = _LOG_MILLIS.match(line)
+            if not millis:
+                stats['skipped'] += 1
+                stats['untimed'] += 1
+                continue
+            raw_ms = int(millis.group(1))
+            if previous_millis is not None and raw_ms < previous_millis - (1 << 31):
+                wrap_offset_ms += 1 << 32 # millis() is overgelopen
+            previous_millis = raw_ms
+            stamp_ms = raw_ms + wrap_offset_ms
+        if first_ms is None:
+            first_ms = stamp_ms
+        previous_ms = stamp_ms
+        stats['transitions'] += 1
+        brightness = int(match.group(brightness_group)) if brightness_group else None
+        yield stamp_ms - first_ms, int(match.group(1)), mode, brightness
+
+def serial_log_phases(transitions, led_configs=()):
+    """Bouwt per LED een fasetijdlijn uit de overgangen van parse_serial_log().
+
+    Levert een fase (dict met pin, mode, start_ms, end_ms, start_brightness, end_brightness) zodra de
+    volgende overgang van dezelfde pin binnenkomt; aan het eind volgen de nog open fasen met end_ms None.
+    Per pin wordt alleen de open fase bewaard. Helderheden die de sketch niet print (DIRECT AAN met
+    variabele helderheid, knipperen) worden geschat uit de config van die pin (midden van het bereik).
+    """
+    configs = {}
+    for config in led_configs:
+        pin_str = str(config.get('pin', ''))
+        if pin_str.isdigit():
+            configs[int(pin_str)] = compile_led_config(config)
+    open_phases = {}
+    for t_ms, pin, mode, brightness in transitions:
+        previous = open_phases.pop(pin, None)
+        if previous is not None:
+            previous['end_ms'] = t_ms
+            yield previous
+        cfg = configs.get(pin)
+        typical = (cfg['min_bright'] + cfg['max_bright']) // 2 if cfg and cfg['var_bright'] else 255
+        if mode == LedSimulator.MODE_FADE_IN:
+            start, end = 0, brightness
+        elif mode == LedSimulator.MODE_FADE_OUT:
+            start = previous['end_brightness'] if previous is not None else typical
+            end = 0
+        elif mode == LedSimulator.MODE_ON:
+            start = end = brightness if brightness is not None else typical
+        elif mode == LedSimulator.MODE_BLINKING:
+            start = end = (cfg['min_bright'] + cfg['max_bright']) // 2 if cfg else 255
+        else:
+            start = end = 0
+        open_phases[pin] = {'pin': pin, 'mode': mode, 'start_ms': t_ms, 'end_ms': None,
+                            'start_brightness': start, 'end_brightness': end}
+    for phase in open_phases.values():
+        yield phase
+
+def phase_brightness(phase, t_ms, cfg=None):
+    """Helderheid binnen een fase op tijdstip t_ms (lineaire fades, knipperen volgens cfg)."""
+    elapsed = t_ms - phase['start_ms']
+    if phase['mode'] in (LedSimulator.MODE_FADE_IN, LedSimulator.MODE_FADE_OUT):
+        if phase['end_ms'] is None or phase['end_ms'] <= phase['start_ms']:
+            return phase['end_brightness']
+        fraction = min(1.0, max(0.0, elapsed / (phase['end_ms'] - phase['start_ms'])))
+        return int(phase['start_brightness'] + (phase['end_brightness'] - phase['start_brightness']) * fraction)
+    if phase['mode'] == LedSimulator.MODE_BLINKING and cfg and cfg['blink_on_ms'] + cfg['blink_off_ms'] > 0:
+        # De sketch print de afzonderlijke pulsen niet: toon het vaste ritme van de config
+        return phase['start_brightness'] if elapsed % (cfg['blink_on_ms'] + cfg['blink_off_ms']) < cfg['blink_on_ms'] else 0
+    return phase['start_brightness']
+
+class SerialLogReplay:
+    """Speelt de fasetijdlijn van één pin uit een seriële log af, alleen vooruit en in constant geheugen.
+
+    state_at(t_ms) levert (helderheid, modus, faseduur_ms, fasestart_ms) zoals LedSimulator.update(),
+    zodat de bestaande visualisatie ongewijzigd gebruikt kan worden. Het bestand wordt pas gelezen
+    naarmate de afspeeltijd vordert; vóór de eerste overgang staat de LED uit.
+    """
+
+    def __init__(self, file_path, pin, led_config=None):
+        self.pin = int(pin)
+        self.cfg = compile_led_config(led_config) if led_config else None
+        self._file = open(file_path, "r", errors="replace")
+        self.stats = {}
+        transitions = (event for event in parse_serial_log(self._file, self.stats) if event[1] == self.pin)
+        self._phases = serial_log_phases(transitions, [led_config] if led_config else ())
+        self.phase = {'pin': self.pin, 'mode': LedSimulator.MODE_OFF, 'start_ms': 0, 'end_ms': None,
+                      'start_brightness': 0, 'end_brightness': 0}
+        self._next_phase = next(self._phases, None)
+        if self._next_phase is not None:
+            self.phase['end_ms'] = self._next_phase['start_ms']
+        self.finished = False
+
+    def state_at(self, t_ms):
+        while self._next_phase is not None and self._next_phase['start_ms'] <= t_ms:
+            self.phase = self._next_phase
+            self._next_phase = next(self._phases, None)
+        if self._next_phase is None and (self.phase['end_ms'] is None or t_ms >= self.phase['end_ms']):
+            self.finished = True
+        end_ms = self.phase['end_ms']
+        duration = (end_ms - self.phase['start_ms']) if end_ms is not None else 0
+        return phase_brightness(self.phase, t_ms, self.cfg), self.phase['mode'], duration, self.phase['start_ms']
+
+    def close(self):
+        self._file.close()
+
+def simulate_phases(config, pin, duration_ms, seed=None, tick_ms=10, cache=None):
+    """Fasetijdlijn (zelfde vorm als serial_log_phases) die LedSimulator voorspelt voor duration_ms.
+
+    Met een TraceCache en een vaste seed wordt de tijdlijn van dezelfde (gecompileerde) config één
+    keer gesimuleerd en daarna van schijf gelezen.
+    """
+    if cache is None or seed is None:
+        trace = _simulate_trace(config, duration_ms, seed, tick_ms)
+    else:
+        key = TraceCache.key(config, seed, duration_ms, tick_ms)
+        trace = cache.load(key)
+        if trace is None:
+            trace = list(_simulate_trace(config, duration_ms, seed, tick_ms))
+            cache.store(key, trace)
+    phase = None
+    for mode, start_ms, start, end in trace:
+        if phase is not None:
+            phase['end_ms'] = start_ms
+            yield phase
+        phase = {'pin': pin, 'mode': mode, 'start_ms': start_ms, 'end_ms': None,
+                 'start_brightness': start, 'end_brightness': end}
+    if phase is not None:
+        yield phase
+
+def _simulate_trace(config, duration_ms, seed, tick_ms):
+    """De fasen van één LED als (modus, begin_ms, beginhelderheid, eindhelderheid)."""
+    sim = LedSimulator(config, seed=seed)
+    t = 0
+    while True:
+        due = sim.next_event_time()
+        t = max(-(-due // tick_ms) * tick_ms, t + tick_ms)
+        if t > duration_ms:
+            break
+        previous_start = sim.last_phase_start_time
+        previous_mode = sim.current_mode
+        sim.update(t)
+        if sim.current_mode == previous_mode and sim.last_phase_start_time == previous_start:
+            continue # Alleen een knipperwissel of niets
+        if sim.current_mode == LedSimulator.MODE_OFF and previous_mode == LedSimulator.MODE_OFF:
+            continue # "Uitgeschakeld" blijft uit; de sketch print dan ook niets
+        if sim.current_mode == LedSimulator.MODE_FADE_IN:
+            start, end = 0, sim.fade_in_target_brightness
+        elif sim.current_mode == LedSimulator.MODE_FADE_OUT:
+            start, end = sim.fade_start_brightness, 0
+        else:
+            start = end = sim.current_brightness
+        yield sim.current_mode, t, start, end
+
+def _expected_next_mode(cfg, mode):
+    """De modus die LedSimulator (en de sketch) na `mode` kiest."""
+    if mode == LedSimulator.MODE_OFF:
+        if cfg['fade_in']:
+            return LedSimulator.MODE_FADE_IN
+        return LedSimulator.MODE_BLINKING if cfg['blinking'] else LedSimulator.MODE_ON
+    if mode == LedSimulator.MODE_FADE_IN:
+        return LedSimulator.MODE_ON
+    if mode == LedSimulator.MODE_ON:
+        return LedSimulator.MODE_FADE_OUT if cfg['fade_out'] else LedSimulator.MODE_OFF
+    return LedSimulator.MODE_OFF # Na FADE_OUT en BLINKING
+
+def _phase_duration_range(cfg, mode):
+    if mode == LedSimulator.MODE_OFF:
+        return cfg['min_off_ms'], cfg['max_off_ms']
+    if mode == LedSimulator.MODE_FADE_IN:
+        return cfg['min_fade_in_ms'], cfg['max_fade_in_ms']
+    if mode == LedSimulator.MODE_FADE_OUT:
+        return cfg['min_fade_out_ms'], cfg['max_fade_out_ms']
+    return cfg['min_on_ms'], cfg['max_on_ms'] # AAN en de hele knipperperiode
+
+def summarize_phases(phases):
+    """Lopende statistiek per pin en modus: aantal, totale/min/max duur, en de tijd dat de LED brandde."""
+    summary = {}
+    for phase in phases:
+        if phase['end_ms'] is None:
+            continue
+        per_pin = summary.setdefault(phase['pin'], {'modes': {}, 'lit_ms': 0, 'span_ms': 0})
+        duration = phase['end_ms'] - phase['start_ms']
+        stat = per_pin['modes'].setdefault(LedSimulator.MODE_NAMES[phase['mode']],
+                                           {'count': 0, 'total_ms': 0, 'min_ms': duration, 'max_ms': duration})
+        stat['count'] += 1
+        stat['total_ms'] += duration
+        stat['min_ms'] = min(stat['min_ms'], duration)
+        stat['max_ms'] = max(stat['max_ms'], duration)
+        per_pin['span_ms'] += duration
+        if phase['mode'] != LedSimulator.MODE_OFF:
+            per_pin['lit_ms'] += duration
+    return summary
+
+def diff_serial_log(log_lines, led_configs, tolerance_ms=100, seed=None, max_violations=50, cache=None):
+    """Vergelijkt een seriële log met wat LedSimulator voor dezelfde configs voorspelt.
+
+    Controleert elke gelogde fase op een overgang die de simulator nooit maakt, een duur buiten het
+    ingestelde bereik (± tolerance_ms voor looplatentie en tijdstempels) en een doelhelderheid buiten
+    het bereik; daarnaast worden per pin de fasestatistieken van log en simulatie naast elkaar gezet.
+    Alles gebeurt in één streaming-passage; alleen de eerste max_violations afwijkingen worden bewaard.
+    Met een seed en een TraceCache worden de simulaties van ongewijzigde LEDs uit de cache gelezen.
+    """
+    configs = {}
+    for config in led_configs:
+        pin_str = str(config.get('pin', ''))
+        if pin_str.isdigit():
+            configs[int(pin_str)] = (config, compile_led_config(config))
+    stats = {}
+    violations = []
+    violation_count = 0
+    unknown_pins = set()
+    last_mode = {}
+    span_ms = 0
+
+    def violation(phase, message):
+        nonlocal violation_count
+        violation_count += 1
+        if len(violations) < max_violations:
+            violations.append({'pin': phase['pin'], 'start_ms': phase['start_ms'], 'message': message})
+
+    def checked(phases):
+        nonlocal span_ms
+        for phase in phases:
+            span_ms = max(span_ms, phase['end_ms'] or phase['start_ms'])
+            pin = phase['pin']
+            if pin not in configs:
+                unknown_pins.add(pin)
+                continue
+            cfg = configs[pin][1]
+            previous = last_mode.get(pin)
+            if previous is not None and phase['mode'] != _expected_next_mode(cfg, previous):
+                violation(phase, f"overgang {LedSimulator.MODE_NAMES[previous]} -> {LedSimulator.MODE_NAMES[phase['mode']]} "
+                                 f"(verwacht {LedSimulator.MODE_NAMES[_expected_next_mode(cfg, previous)]})")
+            last_mode[pin] = phase['mode']
+            if phase['end_ms'] is not None and previous is not None: # De eerste fase kan al eerder begonnen zijn
+                low, high = _phase_duration_range(cfg, phase['mode'])
+                duration = phase['end_ms'] - phase['start_ms']
+                if not low - tolerance_ms <= duration <= high + tolerance_ms:
+                    violation(phase, f"{LedSimulator.MODE_NAMES[phase['mode']]} duurde {duration} ms (bereik {low}-{high} ms)")
+            if phase['mode'] == LedSimulator.MODE_FADE_IN and cfg['var_bright'] and \
+                    not cfg['min_bright'] <= phase['end_brightness'] <= cfg['max_bright']:
+                violation(phase, f"doelhelderheid {phase['end_brightness']} buiten {cfg['min_bright']}-{cfg['max_bright']}")
+            yield phase
+
+    log_summary = summarize_phases(checked(serial_log_phases(parse_serial_log(log_lines, stats),
+                                                             [config for config, _ in configs.values()])))
+    leds = {}
+    for pin, (config, _) in sorted(configs.items()):
+        sim_summary = summarize_phases(simulate_phases(config, pin, span_ms, seed=derive_led_seed(seed, pin),
+                                                       cache=cache)).get(pin)
+        leds[pin] = {'log': log_summary.get(pin), 'simulator': sim_summary}
+    return {
+        'lines': stats['lines'], 'transitions': stats['transitions'], 'skipped_lines': stats['skipped'],
+        'untimed_lines': stats['untimed'],
+        'span_ms': span_ms, 'leds': leds, 'unknown_pins': sorted(unknown_pins),
+        'violation_count': violation_count, 'violations': violations,
+    }
+
+def format_serial_log_diff(result):
+    """Maakt een leesbaar rapport van diff_serial_log()."""
+    lines = [
+        f"Seriële log: {result['lines']} regels, {result['transitions']} overgangen over {format_sim_time(result['span_ms'])}",
+        f"Afwijkingen t.o.v. de simulator: {result['violation_count']}",
+    ]
+    if result['untimed_lines']:
+        lines.append(f"Overgangen zonder tijdstempel (overgeslagen): {result['untimed_lines']}")
+    if result['unknown_pins']:
+        lines.append(f"Pinnen in de log zonder config: {', '.join(map(str, result['unknown_pins']))}")
+    for item in result['violations']:
+        lines.append(f"  pin {item['pin']} op {format_sim_time(item['start_ms'])}: {item['message']}")
+    if result['violation_count'] > len(result['violations']):
+        lines.append(f"  ... en nog {result['violation_count'] - len(result['violations'])}")
+    lines.append("")
+    lines.append(f"{'Pin':>4} {'Modus':<9}{'log n':>7}{'gem s':>9}{'sim n':>7}{'gem s':>9}")
+    for pin, entry in result['leds'].items():
+        log_modes = (entry['log'] or {}).get('modes', {})
+        sim_modes = (entry['simulator'] or {}).get('modes', {})
+        for mode_name in LedSimulator.MODE_NAMES.values():
+            log_stat, sim_stat = log_modes.get(mode_name), sim_modes.get(mode_name)
+            if not log_stat and not sim_stat:
+                continue
+            log_text = f"{log_stat['count']:>7}{log_stat['total_ms'] / log_stat['count'] / 1000:>9.2f}" if log_stat else f"{'-':>7}{'-':>9}"
+            sim_text = f"{sim_stat['count']:>7}{sim_stat['total_ms'] / sim_stat['count'] / 1000:>9.2f}" if sim_stat else f"{'-':>7}{'-':>9}"
+            lines.append(f"{pin:>4} {mode_name:<9}{log_text}{sim_text}")
+        for label, summary in (("log", entry['log']), ("simulator", entry['simulator'])):
+            if summary and summary['span_ms']:
+                lines.append(f"{'':>4} aan {summary['lit_ms'] / summary['span_ms'] * 100:5.1f}% van de tijd ({label})")
+    return "\n".join(lines)
+
+# --- Trace-cache op schijf ---
+TRACE_ENGINE_VERSION = 1 # Ophogen zodra LedSimulator voor dezelfde config en seed andere fasen geeft
+TRACE_FILE_MAGIC = b"MLTR"
+_TRACE_HEADER = struct.Struct("<4sHI") # magic, engine-versie, aantal fasen
+
+def default_trace_cache_dir():
+    """Standaardmap voor de trace-cache: XDG_CACHE_HOME of LOCALAPPDATA, anders ~/.cache."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "modelbaan_led_simulator", "traces")
+
+class TraceCache:
+    """Schijfcache van gesimuleerde fasetijdlijnen (zie simulate_phases), één bestand per sleutel.
+
+    De sleutel is een hash van de gecompileerde config (compile_led_config), de seed, de duur, de
+    tick en TRACE_ENGINE_VERSION. Een LED met dezelfde parameters (ook onder een andere pin of naam)
+    vindt dus dezelfde trace; een gewijzigd veld geeft alleen voor die LED een nieuwe sleutel.
+    Een trace wordt kolomsgewijs opgeslagen (modi, helderheden, tijdsverschillen) en met zlib
+    gecomprimeerd. De map is begrensd tot max_bytes: bij een overschrijding verdwijnen de minst
+    recent gelezen bestanden (de volgorde volgt uit de wijzigingstijd, die bij elke treffer wordt bijgewerkt).
+    """
+
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024):
+        self.directory = directory or default_trace_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".trace"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, name, stat.st_size))
+        self.entries = collections.OrderedDict((name, size) for _, name, size in sorted(found)) # Oudste eerst
+        self.size_bytes = sum(self.entries.values())
+
+    @staticmethod
+    def key(config, seed, duration_ms, tick_ms=10):
+        compiled = compile_led_config(config)
+        data = json.dumps([TRACE_ENGINE_VERSION, sorted(compiled.items()), seed, int(duration_ms), int(tick_ms)])
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".trace")
+
+    @staticmethod
+    def encode(trace):
+        """Zet een lijst (modus, begin_ms, beginhelderheid, eindhelderheid) om naar bytes."""
+        modes, starts, first, last = zip(*trace) if trace else ((), (), (), ())
+        deltas = [start - previous for previous, start in zip((0,) + starts, starts)]
+        body = bytes(modes) + bytes(first) + bytes(last) + struct.pack(f"<{len(deltas)}q", *deltas)
+        return _TRACE_HEADER.pack(TRACE_FILE_MAGIC, TRACE_ENGINE_VERSION, len(trace)) + zlib.compress(body)
+
+    @staticmethod
+    def decode(data):
+        """Omgekeerde van encode(); een ValueError bij een onbekend of beschadigd bestand."""
+        try:
+            magic, version, count = _TRACE_HEADER.unpack_from(data)
+            body = zlib.decompress(data[_TRACE_HEADER.size:])
+        except (struct.error, zlib.error) as e:
+            raise ValueError(f"Beschadigde trace: {e}")
+        if magic != TRACE_FILE_MAGIC or version != TRACE_ENGINE_VERSION or len(body) != 11 * count:
+            raise ValueError("Onbekende of beschadigde trace.")
+        modes, first, last = body[:count], body[count:2 * count], body[2 * count:3 * count]
+        starts = itertools.accumulate(struct.unpack_from(f"<{count}q", body, 3 * count))
+        return list(zip(modes, starts, first, last))
+
+    def load(self, key):
+        """De trace onder key, of None (niet aanwezig of onleesbaar; dat laatste wordt opgeruimd)."""
+        name = key + ".trace"
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                trace = self.decode(f.read())
+        except (OSError, ValueError):
+            self.misses += 1
+            self._forget(name, remove=os.path.exists(path))
+            return None
+        self.hits += 1
+        try:
+            os.utime(path) # Recent gebruikt: als laatste aan de beurt bij het opruimen
+        except OSError:
+            pass
+        if name in self.entries:
+            self.entries.move_to_end(name)
+        return trace
+
+    def store(self, key, trace):
+        """Schrijft een trace (atomair) en ruimt daarna zo nodig de oudste bestanden op."""
+        name = key + ".trace"
+        data = self.encode(trace)
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._forget(name)
+        self.entries[name] = len(data)
+        self.size_bytes += len(data)
+        while self.size_bytes > self.max_bytes and len(self.entries) > 1:
+            self._forget(next(iter(self.entries)), remove=True)
+
+    def _forget(self, name, remove=False):
+        size = self.entries.pop(name, None)
+        if size is not None:
+            self.size_bytes -= size
+        if remove:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def clear(self):
+        for name in list(self.entries):
+            self._forget(name, remove=True)
+
+# --- Parametersweep voor lichtprofielen ---
+SWEEP_METRICS = (('duty_pct', "aan %"), ('mean_brightness', "gem. helderh."), ('transitions_per_hour', "overg./uur"),
+                 ('flicker_per_min', "knipper/min")) # (sleutel, kolomkop)
+_SWEEP_CACHE = None # TraceCache van een werkproces (zie _sweep_init)
+
+def parse_sweep_range(spec):
+    """Zet 'veld=begin:eind:stap' of 'veld=a,b,c' om in (veld, lijst waarden als strings).
+
+    Een numeriek bereik is inclusief het eind; waarden worden geschreven zoals in een config
+    (bijv. '2.5', '40'). Booleaanse velden accepteren 'true,false'.
+    """
+    field, sep, values = spec.partition("=")
+    field = field.strip()
+    if not sep or not values.strip():
+        raise ValueError(f"Gebruik VELD=BEGIN:EIND:STAP of VELD=A,B,C (niet '{spec}').")
+    if field not in PROFILE_FIELDS:
+        raise ValueError(f"Onbekend profielveld '{field}' (kies uit {', '.join(PROFILE_FIELDS)}).")
+    if field in BOOLEAN_FIELDS:
+        result = [str(value.strip().lower() in ("1", "true", "ja", "aan")) for value in values.split(",")]
+    elif ":" in values:
+        try:
+            start, end, step = (float(part) for part in values.split(":"))
+        except ValueError:
+            raise ValueError(f"Ongeldig bereik voor {field}: '{values}' (verwacht BEGIN:EIND:STAP).")
+        if step <= 0 or end < start:
+            raise ValueError(f"Bereik voor {field} moet oplopen met een stap groter dan 0.")
+        count = int((end - start) / step + 1e-9) + 1
+        result = [f"{round(start + i * step, 6):g}" for i in range(count)]
+    else:
+        result = [value.strip() for value in values.split(",") if value.strip()]
+    return field, list(dict.fromkeys(result)) # Dubbele waarden één keer
+
+def sweep_combinations(base_config, ranges):
+    """Alle combinaties van de waarden in ranges ([(veld, waarden)]) toegepast op base_config."""
+    fields = [field for field, _ in ranges]
+    for values in itertools.product(*(values for _, values in ranges)):
+        config = dict(base_config)
+        config.update((field, value == "True" if field in BOOLEAN_FIELDS else value) for field, value in zip(fields, values))
+        yield dict(zip(fields, values)), config
+
+def trace_metrics(trace, cfg, duration_ms, tick_ms=10):
+    """Kengetallen van een fasetijdlijn (_simulate_trace) over duration_ms.
+
+    duty_pct: percentage van de tijd dat de LED brandt; mean_brightness: tijdgemiddelde 0-255;
+    transitions_per_hour: fasewissels per uur; flicker_per_min: aan/uit-wissels binnen KNIPPERT
+    per minuut. Binnen een knipperfase worden de pulsen afgeleid uit blink_on_ms/blink_off_ms,
+    afgerond op de tick zoals LedSimulator ze uitvoert; elke puls na de eerste krijgt de gemiddelde
+    helderheid van het ingestelde bereik.
+    """
+    on_ms = max(tick_ms, -(-cfg['blink_on_ms'] // tick_ms) * tick_ms)
+    period = on_ms + max(tick_ms, -(-cfg['blink_off_ms'] // tick_ms) * tick_ms)
+    pulse_level = (cfg['min_bright'] + max(cfg['min_bright'], cfg['max_bright'])) / 2
+    lit_ms = 0
+    level_ms = 0.0
+    toggles = 0
+    starts = [start for _, start, _, _ in trace] + [duration_ms]
+    for (mode, start, first, last), end in zip(trace, starts[1:]):
+        length = max(0, min(end, duration_ms) - start)
+        if mode == LedSimulator.MODE_BLINKING:
+            pulses, rest = divmod(length, period)
+            lit = pulses * on_ms + min(rest, on_ms)
+            count = pulses + (1 if rest else 0)
+            lit_ms += lit
+            level_ms += min(lit, on_ms) * first + max(0, lit - on_ms) * pulse_level
+            toggles += 2 * count - (1 if rest and rest <= on_ms else 0)
+        elif mode != LedSimulator.MODE_OFF:
+            if max(first, last) > 0:
+                lit_ms += length
+            level_ms += length * (first + last) / 2
+    hours = duration_ms / 3600000
+    return {
+        'duty_pct': round(100 * lit_ms / duration_ms, 2) if duration_ms else 0.0,
+        'mean_brightness': round(level_ms / duration_ms, 2) if duration_ms else 0.0,
+        'transitions_per_hour': round(len(trace) / hours, 2) if hours else 0.0,
+        'flicker_per_min': round(toggles / (duration_ms / 60000), 2) if duration_ms else 0.0,
+    }
+
+def _sweep_init(cache_dir, cache_max_bytes):
+    global _SWEEP_CACHE
+    _SWEEP_CACHE = TraceCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+
+def _sweep_worker(job):
+    """Simuleert (of leest uit de cache) één combinatie en berekent de kengetallen."""
+    index, values, config, duration_ms, seed, tick_ms = job
+    started = time.perf_counter()
+    validated, errors, _ = validate_led_config(config, 0, {})
+    row = {'index': index, 'values': values}
+    if validated is None:
+        row['errors'] = errors
+        return row
+    hits = _SWEEP_CACHE.hits if _SWEEP_CACHE is not None else 0
+    phases = simulate_phases(validated, validated['pin'], duration_ms, seed=seed, tick_ms=tick_ms, cache=_SWEEP_CACHE)
+    trace = [(phase['mode'], phase['start_ms'], phase['start_brightness'], phase['end_brightness']) for phase in phases]
+    row.update(trace_metrics(trace, compile_led_config(validated), duration_ms, tick_ms))
+    row['cached'] = _SWEEP_CACHE is not None and _SWEEP_CACHE.hits > hits
+    row['seconds'] = round(time.perf_counter() - started, 3)
+    return row
+
+def sweep_profile(base_config, ranges, duration_ms, seed=0, processes=None, tick_ms=10,
+                  cache_dir=None, cache_max_bytes=64 * 1024 * 1024):
+    """Evalueert elke combinatie van ranges op base_config; levert rijen zodra ze klaar zijn.
+
+    Elke rij is een dict met 'index' (volgorde van de combinatie), 'values' (veld -> waarde) en de
+    kengetallen van trace_metrics(), of 'errors' als de combinatie niet valideert. Alle combinaties
+    gebruiken dezelfde seed, zodat verschillen uit de parameters komen en niet uit het toeval.
+    Met cache_dir worden traces in een TraceCache bewaard en bij een volgende sweep hergebruikt.
+    De combinaties worden over een procespool verdeeld (processes=1: in dit proces).
+    """
+    if duration_ms <= 0:
+        raise ValueError("De gesimuleerde duur moet groter zijn dan 0.")
+    base = dict(base_config)
+    base.setdefault('pin', PWM_PINS[0]) # Alleen om te kunnen valideren
+    jobs = [(index, values, config, int(duration_ms), seed, tick_ms)
+            for index, (values, config) in enumerate(sweep_combinations(base, ranges))]
+    processes = max(1, min(processes or os.cpu_count() or 1, len(jobs)))
+    if processes == 1:
+        _sweep_init(cache_dir, cache_max_bytes)
+        for job in jobs:
+            yield _sweep_worker(job)
+        return
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes, initializer=_sweep_init, initargs=(cache_dir, cache_max_bytes)) as pool:
+        for row in pool.imap_unordered(_sweep_worker, jobs):
+            yield row
+
+def format_sweep_row(row, fields, header=False):
+    """Eén regel van de sweep-tabel (of de kop), met de velden in de volgorde van fields."""
+    if header:
+        return " ".join([f"{'#':>4}"] + [f"{field:>14}" for field in fields] + [f"{title:>14}" for _, title in SWEEP_METRICS])
+    cells = [f"{row['index'] + 1:>4}"] + [f"{row['values'][field]:>14}" for field in fields]
+    if 'errors' in row:
+        return " ".join(cells + ["ongeldig: " + "; ".join(row['errors'])])
+    cells += [f"{row[key]:>14.2f}" for key, _ in SWEEP_METRICS]
+    return " ".join(cells) + (" (cache)" if row.get('cached') else "")
+
+# --- Flikker- en Spectrumanalyse (NumPy) ---
+# Een opgenomen helderheidsverloop is een reeks wisselpunten (tijden_ms, helderheden): de helderheid blijft
+# staan tot het volgende punt. Een uur "Uitgeschakeld" is zo één punt en een fade hooguit 256 punten.
+# Opnames op schijf (CSV) hebben de regels "tijd_ms,kanaal,helderheid"; het kanaal is een pinnummer,
+# een profielnaam of een vrij label (bijv. 'tv' voor een meting met een lichtsensor aan een echte tv).
+FLICKER_STEP_EDGES = (1, 2, 3, 5, 9, 17, 33, 65, 129, 256) # Klassen van de stapgroottehistogram (niveaus per stap)
+FLICKER_BANDS = ((0.0, 0.5), (0.5, 3.0), (3.0, 10.0), (10.0, None)) # Hz; None = tot de Nyquist-frequentie
+FLICKER_SPECTRUM_BANDS = 40 # Logaritmische banden van het opgeslagen spectrum
+FLICKER_SPECTRUM_MIN_HZ = 0.05
+FLICKER_MIN_HZ = 0.5 # De dominante flikkerfrequentie wordt vanaf hier gezocht (langzamer is geen flikkeren)
+FLICKER_SEGMENT = 16384 # Samples per FFT-segment (bij 10 ms: 164 s, resolutie 0,006 Hz)
+FLICKER_BATCH_SAMPLES = 1 << 22 # Zoveel samples (LEDs x tijd) worden tegelijk geanalyseerd
+FLICKER_METRICS = [('mean_brightness', "gem. helderh."), ('duty_pct', "aan %"), ('mean_lightness', "gem. L*"),
+                   ('flicker_index', "flikkerindex"), ('percent_flicker', "flikker %"), ('steps_per_min', "stappen/min"),
+                   ('step_lightness_p95', "stap L* p95"), ('dominant_hz', "dominant Hz")]
+
+def record_brightness_trace(config, duration_ms, seed=None, tick_ms=10):
+    """Neemt het helderheidsverloop van LedSimulator op als wisselpunten (tijden_ms, helderheden).
+
+    De simulator springt van gebeurtenis naar gebeurtenis (zoals _simulate_trace); de helderheden
+    binnen een fade komen per tick in één keer uit de gedeelde helling in FADE_TABLES (via
+    FADE_TABLES.offset() en gather()), of met fade_levels() als de fade geen tabel heeft of de ticks
+    niet op het tabelraster liggen. Beide geven exact wat update() op het tickraster zou zetten.
+    Elke knipperpuls krijgt zijn eigen getrokken helderheid.
+    """
+    _require_numpy("record_brightness_trace()")
+    sim = LedSimulator(config, seed=seed)
+    fading = (LedSimulator.MODE_FADE_IN, LedSimulator.MODE_FADE_OUT)
+    times, levels = [0], [sim.current_brightness]
+    t = 0
+    while True:
+        due = sim.next_event_time()
+        next_t = max(-(-due // tick_ms) * tick_ms, t + tick_ms)
+        if sim.current_mode in fading:
+            ticks = np.arange(t + tick_ms, min(next_t, duration_ms + 1), tick_ms, dtype=np.int64)
+            if len(ticks):
+                duration, start, end = sim.fade_key()
+                offset = FADE_TABLES.offset(duration, end >= start)
+                if offset >= 0 and not (tick_ms % FADE_TABLE_STEP_MS or sim.fade_start_time % FADE_TABLE_STEP_MS):
+                    ramp = FADE_TABLES.gather(offset + (ticks - sim.fade_start_time) // FADE_TABLE_STEP_MS, start, end)
+                else:
+                    key = [np.full(len(ticks), value) for value in (duration, start, end)]
+                    ramp = fade_levels(*key, ticks - sim.fade_start_time)
+                changed = np.flatnonzero(np.diff(ramp, prepend=levels[-1]))
+                times.extend(ticks[changed].tolist())
+                levels.extend(ramp[changed].tolist())
+        if next_t > duration_ms:
+            break
+        sim.update(next_t)
+        if sim.current_brightness != levels[-1]:
+            times.append(next_t)
+            levels.append(sim.current_brightness)
+        t = next_t
+    return np.array(times, dtype=np.int64), np.array(levels, dtype=np.uint8)
+
+def _hold_changes(times, levels):
+    """Laat wisselpunten weg die de helderheid niet veranderen (het eerste punt blijft)."""
+    keep = np.ones(len(levels), dtype=bool)
+    keep[1:] = levels[1:] != levels[:-1]
+    return times[keep], levels[keep]
+
+def _ramp_levels(ramp, t_ms):
+    """ramp_level() voor een array tijdstippen."""
+    start, duration, first, last = ramp
+    elapsed = t_ms - start
+    inside = np.trunc(np.clip(elapsed, 0, max(duration, 1)) * (last - first) / max(duration, 1) + first)
+    return np.where(elapsed >= duration, last, np.where(elapsed <= 0, first, inside)).astype(np.int64)
+
+def record_sync_group(members, duration_ms, tick_ms=10):
+    """Neemt de leden (SyncedLedMember) van één synchrone groep samen op; één (tijden, helderheden) per lid.
+
+    Alle leden worden op de gebeurtenissen van de groep en hun eigen (vertraagde) fasewissels
+    bijgewerkt; daartussen volgt elk lid de helling van de groep die op dat moment voor hem geldt.
+    """
+    _require_numpy("record_sync_group()")
+    records = [([0], [member.current_brightness]) for member in members]
+    machine = members[0].group.machine
+    t = 0
+    while True:
+        due = min(member.next_event_time() for member in members)
+        next_t = max(-(-due // tick_ms) * tick_ms, t + tick_ms)
+        ticks = np.arange(t + tick_ms, min(next_t, duration_ms + 1), tick_ms, dtype=np.int64)
+        for member, (times, levels) in zip(members, records):
+            ramps = (member.group.previous_ramp, member.group.current_ramp())
+            if not len(ticks) or not (ramps[0][1] or ramps[1][1]):
+                continue # Geen helling: de helderheid verandert alleen bij een gebeurtenis
+            shifted = ticks - member.offset_ms
+            ramp = np.where(shifted < machine.last_phase_start_time, _ramp_levels(ramps[0], shifted), _ramp_levels(ramps[1], shifted))
+            ramp = ramp * member.scale_pct // 100
+            changed = np.flatnonzero(np.diff(ramp, prepend=levels[-1]))
+            times.extend(ticks[changed].tolist())
+            levels.extend(ramp[changed].tolist())
+        if next_t > duration_ms:
+            break
+        for member, (times, levels) in zip(members, records):
+            member.update(next_t)
+            if member.current_brightness != levels[-1]:
+                times.append(next_t)
+                levels.append(member.current_brightness)
+        t = next_t
+    return [(np.array(times, dtype=np.int64), np.array(levels, dtype=np.uint8)) for times, levels in records]
+
+def record_layout_traces(led_configs, duration_ms, seed=None, tick_ms=10, indices=None):
+    """Opnames van de LEDs in indices (standaard alle), met dezelfde seeds als build_simulators().
+
+    De gevraagde leden van een synchrone groep worden samen opgenomen met record_sync_group().
+    Retourneert {LED-index: (tijden_ms, helderheden)}.
+    """
+    wanted = list(range(len(led_configs)) if indices is None else indices)
+    members = {}
+    traces = {}
+    build_sync_groups(led_configs) # Controleert dat de leden van elke groep gelijk zijn
+    for i in wanted:
+        name = sync_member_params(led_configs[i])[0]
+        if name:
+            members.setdefault(name, []).append(i)
+        else:
+            traces[i] = record_brightness_trace(led_configs[i], duration_ms, derive_led_seed(seed, i), tick_ms)
+    for name, group_leds in members.items():
+        group = SyncedLedGroup(led_configs[group_leds[0]], seed=derive_group_seed(seed, name))
+        group_members = [SyncedLedMember(group, *sync_member_params(led_configs[i])[1:], leader=not k)
+                         for k, i in enumerate(group_leds)]
+        traces.update(zip(group_leds, record_sync_group(group_members, duration_ms, tick_ms)))
+    return {i: traces[i] for i in wanted}
+
+def phase_trace(phases, cfg, duration_ms, tick_ms=10):
+    """Wisselpunten uit een fasetijdlijn (serial_log_phases of simulate_phases).
+
+    Fades worden lineair per tick ingevuld; knipperpulsen volgen het vaste ritme van cfg met de
+    helderheid van de fase (de sketch print de afzonderlijke pulsen niet, zie phase_brightness).
+    """
+    _require_numpy("phase_trace()")
+    parts_t, parts_b = [np.zeros(1, dtype=np.int64)], [np.zeros(1, dtype=np.int64)]
+    for phase in phases:
+        start = phase['start_ms']
+        end = min(duration_ms + 1, phase['end_ms'] if phase['end_ms'] is not None else duration_ms + 1)
+        if start >= end:
+            continue
+        first, last = phase['start_brightness'], phase['end_brightness']
+        if phase['mode'] in (LedSimulator.MODE_FADE_IN, LedSimulator.MODE_FADE_OUT) and phase['end_ms'] is not None:
+            ticks = np.arange(start, end, tick_ms, dtype=np.int64)
+            span = max(1, phase['end_ms'] - start)
+            parts_t.append(ticks)
+            parts_b.append(np.trunc(first + (last - first) * (ticks - start) / span).astype(np.int64))
+        elif phase['mode'] == LedSimulator.MODE_BLINKING and cfg and cfg['blink_on_ms'] + cfg['blink_off_ms'] > 0:
+            period = cfg['blink_on_ms'] + cfg['blink_off_ms']
+            pulses = np.arange(start, end, period, dtype=np.int64)
+            parts_t.append(np.column_stack((pulses, np.minimum(pulses + cfg['blink_on_ms'], end))).ravel())
+            parts_b.append(np.tile(np.array([first, 0], dtype=np.int64), len(pulses)))
+        else:
+            parts_t.append(np.array([start], dtype=np.int64))
+            parts_b.append(np.array([first], dtype=np.int64))
+    times, levels = np.concatenate(parts_t), np.concatenate(parts_b)
+    order = np.argsort(times, kind="stable") # Bij gelijke tijden wint het laatste punt (zie resample_traces)
+    return _hold_changes(times[order], np.clip(levels[order], 0, 255).astype(np.uint8))
+
+def read_brightness_capture(lines):
+    """Leest een opname ("tijd_ms,kanaal,helderheid" per regel) in als {kanaal: (tijden_ms, helderheden)}.
+
+    Een kopregel, lege regels en regels die met '#' beginnen worden overgeslagen; de regels hoeven
+    niet op tijd gesorteerd te zijn. Tijden zijn daarna relatief aan het vroegste punt van de opname.
+    """
+    _require_numpy("read_brightness_capture()")
+    columns = {}
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = [part.strip() for part in line.split(",")]
+        try:
+            t_ms, level = float(parts[0]), int(float(parts[2]))
+        except (ValueError, IndexError):
+            if line_number == 1 or not columns:
+                continue # Kopregel
+            raise ValueError(f"Regel {line_number} van de opname is geen 'tijd_ms,kanaal,helderheid': {line}")
+        if not 0 <= level <= 255:
+            raise ValueError(f"Regel {line_number} van de opname: helderheid {level} ligt niet tussen 0 en 255.")
+        times, levels = columns.setdefault(parts[1], ([], []))
+        times.append(int(t_ms))
+        levels.append(level)
+    traces = {}
+    origin = min((min(times) for times, _ in columns.values()), default=0)
+    for channel, (times, levels) in columns.items():
+        times = np.array(times, dtype=np.int64) - origin
+        order = np.argsort(times, kind="stable")
+        traces[channel] = _hold_changes(times[order], np.array(levels, dtype=np.uint8)[order])
+    return traces
+
+def write_brightness_capture(file_obj, traces):
+    """Schrijft opnames ({kanaal: (tijden_ms, helderheden)}) in het formaat van read_brightness_capture()."""
+    file_obj.write("tijd_ms,kanaal,helderheid\n")
+    for channel, (times, levels) in traces.items():
+        file_obj.writelines(f"{t},{channel},{level}\n" for t, level in zip(times.tolist(), levels.tolist()))
+
+def resample_traces(traces, duration_ms, step_ms=10):
+    """Bemonstert opnames op een uniform raster (0, step_ms, ...); retourneert een uint8-array (LEDs x samples).
+
+    Elk wisselpunt wordt op het eerste rastersample vanaf zijn tijd gezet (per sample wint het laatste
+    punt), waarna np.maximum.accumulate het nummer van het geldende punt over de hele rij doortrekt.
+    Vóór het eerste wisselpunt is de LED uit.
+    """
+    _require_numpy("resample_traces()")
+    samples = int(duration_ms) // step_ms
+    positions = [np.arange(len(traces), dtype=np.int64) * samples] # Per rij een nulpunt op sample 0
+    values = [np.zeros(len(traces), dtype=np.uint8)]
+    for row, (times, levels) in enumerate(traces):
+        slots = -(-times // step_ms)
+        keep = (times >= 0) & (slots < samples)
+        positions.append(slots[keep] + row * samples)
+        values.append(levels[keep])
+    positions, values = np.concatenate(positions), np.concatenate(values)
+    order = np.argsort(positions, kind="stable")
+    positions, values = positions[order], values[order]
+    last = np.ones(len(positions), dtype=bool)
+    last[:-1] = positions[1:] != positions[:-1]
+    current = np.zeros(len(traces) * samples, dtype=np.int32)
+    current[positions[last]] = np.flatnonzero(last)
+    np.maximum.accumulate(current, out=current)
+    return values[current].reshape(len(traces), samples)
+
+def _lightness_table():
+    """CIE L* (0-100) per PWM-niveau; de lichtopbrengst van een LED is evenredig met de duty cycle."""
+    luminance = np.arange(256) / 255.0
+    return np.where(luminance > 216 / 24389, 116 * np.cbrt(luminance) - 16, luminance * 24389 / 27).astype(np.float32)
+
+def _row_percentile(rows, values, num_rows, q):
+    """Percentiel q (0-100) van niet-negatieve values per rij (rows oplopend); rijen zonder waarden krijgen 0."""
+    result = np.zeros(num_rows)
+    if not len(values):
+        return result
+    counts = np.bincount(rows, minlength=num_rows)
+    starts = np.cumsum(counts) - counts
+    has = counts > 0
+    if q >= 100:
+        result[has] = np.maximum.reduceat(values, starts[has])
+        return result
+    span = float(values.max()) + 1 # Eén sortering: rij * span + waarde houdt de rijen gescheiden
+    ordered = np.sort(rows * span + values)
+    picks = starts[has] + np.clip(np.ceil(q / 100 * counts[has]).astype(np.int64) - 1, 0, None)
+    result[has] = ordered[picks] - rows[picks] * span
+    return result
+
+def _flicker_batch(samples, step_ms, window_ms, segment):
+    """Kengetallen en genormaliseerde spectra voor een blok LEDs (rijen van samples)."""
+    rows, count = samples.shape
+    lightness = _lightness_table()
+    levels = samples.astype(np.float32)
+    # Helderheid en L* uit één histogram van de niveaus per rij
+    occurrence = np.bincount((np.arange(rows)[:, None] * 256 + samples).ravel(), minlength=rows * 256).reshape(rows, 256) / count
+    mean_lightness = occurrence @ lightness
+    metrics = {'mean_brightness': occurrence @ np.arange(256), 'duty_pct': 100 * (1 - occurrence[:, 0]),
+               'mean_lightness': mean_lightness,
+               'lightness_std': np.sqrt(np.maximum(occurrence @ lightness.astype(np.float64) ** 2 - mean_lightness ** 2, 0))}
+
+    # Flikkerindex (IES) en percentage flikkering per venster; alleen vensters waarin de LED brandt tellen mee
+    width = max(1, window_ms // step_ms)
+    windows = levels[:, :count // width * width].reshape(rows, -1, width)
+    total = windows.sum(axis=2)
+    lit = total > 0
+    above = np.clip(windows - windows.mean(axis=2, keepdims=True), 0, None).sum(axis=2)
+    index = np.divide(above, total, out=np.zeros_like(total), where=lit)
+    high, low = windows.max(axis=2), windows.min(axis=2)
+    percent = np.divide(100 * (high - low), high + low, out=np.zeros_like(total), where=lit)
+    lit_windows = np.maximum(lit.sum(axis=1), 1)
+    metrics['flicker_index'] = index.sum(axis=1) / lit_windows
+    metrics['percent_flicker'] = percent.sum(axis=1) / lit_windows
+    lit_rows, lit_cols = np.nonzero(lit)
+    metrics['flicker_index_p95'] = _row_percentile(lit_rows, index[lit_rows, lit_cols], rows, 95)
+    del windows
+
+    # Stapgroottes: alleen de samples waarop de helderheid verandert
+    step_rows, step_cols = np.nonzero(samples[:, 1:] != samples[:, :-1])
+    before, after = samples[step_rows, step_cols], samples[step_rows, step_cols + 1]
+    steps = np.abs(after.astype(np.int16) - before).astype(np.int64)
+    step_lightness = np.abs(lightness[after] - lightness[before]).astype(np.float64)
+    classes = np.searchsorted(FLICKER_STEP_EDGES, steps, side="right") - 1
+    bins = len(FLICKER_STEP_EDGES) - 1
+    histogram = np.bincount(step_rows * bins + classes, minlength=rows * bins).reshape(rows, bins)
+    metrics['steps_per_min'] = histogram.sum(axis=1) / (count * step_ms / 60000)
+    metrics['max_step'] = _row_percentile(step_rows, steps, rows, 100)
+    metrics['step_lightness_p95'] = _row_percentile(step_rows, step_lightness, rows, 95)
+    metrics['max_step_lightness'] = _row_percentile(step_rows, step_lightness, rows, 100)
+
+    # Gemiddeld vermogensspectrum (Hann-venster, segmenten zonder overlap, gemiddelde per segment eraf)
+    segments = levels[:, :count // segment * segment].reshape(rows, -1, segment)
+    segments = (segments - segments.mean(axis=2, keepdims=True)) * np.hanning(segment).astype(np.float32)
+    power = (np.abs(np.fft.rfft(segments, axis=2)) ** 2).mean(axis=1)
+    del segments
+    power[:, 0] = 0 # Gelijkstroomdeel
+    ac = power.sum(axis=1, keepdims=True)
+    power = np.divide(power, ac, out=np.zeros_like(power), where=ac > 0)
+    return metrics, histogram, power
+
+def _band_spectrum(power, freqs, edges):
+    """Tel een spectrum (per rij genormaliseerd) op in banden [edges[i], edges[i+1])."""
+    cumulative = np.concatenate((np.zeros((len(power), 1)), np.cumsum(power, axis=1)), axis=1)
+    positions = np.searchsorted(freqs, edges)
+    return cumulative[:, positions[1:]] - cumulative[:, positions[:-1]]
+
+def _dominant_hz(power, freqs):
+    """Sterkste frequentie vanaf FLICKER_MIN_HZ, of None als daar (vrijwel) geen vermogen zit."""
+    visible = freqs >= FLICKER_MIN_HZ
+    if not visible.any() or power[visible].sum() < 0.01:
+        return None
+    return round(float(freqs[visible][np.argmax(power[visible])]), 3)
+
+def analyze_flicker(traces, duration_ms, step_ms=10, window_ms=1000, labels=None, groups=None, pins=None):
+    """Spectrum, flikkerindex, stapgroottes en waargenomen helderheid van opnames.
+
+    traces is een lijst van (tijden_ms, helderheden) (zie record_layout_traces en
+    read_brightness_capture), labels de bijbehorende unieke sleutels (standaard '1', '2', ..., het
+    LED-nummer), groups per opname een groepsnaam (bijv. het profiel) waarover ook een gemiddelde
+    wordt gemaakt en pins (optioneel) de pin per opname, alleen om met een seriële log te koppelen.
+    De opnames worden op een raster van step_ms bemonsterd en in blokken van ongeveer
+    FLICKER_BATCH_SAMPLES samples gevectoriseerd geanalyseerd; de flikkerindex (IES: oppervlak boven
+    het gemiddelde / totale oppervlak) en het percentage flikkering ((max - min) / (max + min)) worden
+    per venster van window_ms bepaald en gemiddeld over de vensters waarin de LED brandt. Stappen
+    worden ook in CIE L* uitgedrukt, zodat een zichtbare sprong onderin een fade opvalt. Het spectrum
+    is genormaliseerd op het wisselstroomvermogen en wordt in logaritmische banden bewaard.
+    """
+    _require_numpy("analyze_flicker()")
+    samples = int(duration_ms) // step_ms
+    if not traces:
+        raise ValueError("Geen opnames om te analyseren.")
+    if samples < 2 or window_ms < step_ms:
+        raise ValueError("De opname moet minstens twee samples lang zijn en het venster minstens één sample.")
+    labels = [str(label) for label in labels] if labels is not None else [str(i + 1) for i in range(len(traces))]
+    groups = list(groups) if groups is not None else [None] * len(traces)
+    pins = [int(pin) if str(pin).isdigit() else None for pin in pins] if pins is not None else [None] * len(traces)
+    segment = min(FLICKER_SEGMENT, 1 << (samples.bit_length() - 1))
+    freqs = np.fft.rfftfreq(segment, step_ms / 1000)
+    nyquist = 500 / step_ms
+    edges = np.geomspace(FLICKER_SPECTRUM_MIN_HZ, nyquist, FLICKER_SPECTRUM_BANDS + 1)
+    edges[-1] = np.nextafter(nyquist, np.inf) # Het Nyquist-bin hoort bij de laatste band
+    band_edges = [low for low, _ in FLICKER_BANDS] + [np.nextafter(nyquist, np.inf)]
+
+    leds = []
+    group_power = {name: None for name in groups if name is not None} # Volgorde van eerste voorkomen
+    group_power['alle'] = None
+    batch = max(1, FLICKER_BATCH_SAMPLES // samples)
+    for first in range(0, len(traces), batch):
+        block = traces[first:first + batch]
+        metrics, histogram, power = _flicker_batch(resample_traces(block, duration_ms, step_ms), step_ms,
+                                                   window_ms, segment)
+        bands = _band_spectrum(power, freqs, band_edges)
+        spectrum = _band_spectrum(power, freqs, edges)
+        for row in range(len(block)):
+            index = first + row
+            entry = {'key': labels[index], 'group': groups[index], 'pin': pins[index]}
+            entry.update((name, round(float(values[row]), 3)) for name, values in metrics.items())
+            entry['dominant_hz'] = _dominant_hz(power[row], freqs)
+            entry['step_histogram'] = histogram[row].tolist()
+            entry['band_pct'] = [round(100 * float(value), 2) for value in bands[row]]
+            entry['spectrum'] = [round(float(value), 6) for value in spectrum[row]]
+            leds.append(entry)
+            for name in {groups[index], 'alle'} - {None}:
+                if group_power[name] is None:
+                    group_power[name] = [np.zeros(len(freqs)), 0]
+                group_power[name][0] += power[row]
+                group_power[name][1] += 1
+
+    summaries = {}
+    for name, (power_sum, members) in group_power.items():
+        entries = [entry for entry in leds if name == 'alle' or entry['group'] == name]
+        summary = {'key': name, 'leds': members}
+        for metric in leds[0]:
+            values = [entry[metric] for entry in entries]
+            if metric == 'step_histogram':
+                summary[metric] = np.sum(values, axis=0).tolist()
+            elif metric in ('band_pct', 'spectrum'):
+                summary[metric] = np.round(np.mean(values, axis=0), 6).tolist()
+            elif metric not in ('key', 'group', 'pin', 'dominant_hz'):
+                summary[metric] = round(float(np.mean(values)), 3)
+        summary['dominant_hz'] = _dominant_hz(power_sum / members, freqs)
+        summaries[name] = summary
+    return {
+        'duration_ms': int(duration_ms), 'step_ms': step_ms, 'window_ms': window_ms, 'segment_samples': segment,
+        'spectrum_edges_hz': [round(float(edge), 4) for edge in edges], 'leds': leds, 'groups': summaries,
+    }
+
+def analyze_flicker_reference(file_path, led_configs=(), step_ms=10, window_ms=1000):
+    """Analyse van een referentie: een eerdere analyse (.json), een opname (.csv) of een seriële log.
+
+    Een seriële log wordt per pin met phase_trace() omgezet en gegroepeerd op het profiel van die
+    pin in led_configs (sleutel 'pin N'); bij een opname zijn de kanalen de sleutels.
+    """
+    if file_path.lower().endswith(".json"):
+        with open(file_path, "r") as f:
+            return json.load(f)
+    with open(file_path, "r", errors="replace") as f:
+        if file_path.lower().endswith(".csv"):
+            traces = read_brightness_capture(f)
+            duration_ms = max(int(times[-1]) for times, _ in traces.values()) if traces else 0
+            return analyze_flicker(list(traces.values()), duration_ms, step_ms, window_ms, labels=list(traces))
+        configs = {int(config['pin']): config for config in led_configs if str(config.get('pin', '')).isdigit()}
+        phases = {}
+        for phase in serial_log_phases(parse_serial_log(f), list(configs.values())):
+            phases.setdefault(phase['pin'], []).append(phase)
+    duration_ms = max((phase['end_ms'] or phase['start_ms'] for pin_phases in phases.values() for phase in pin_phases), default=0)
+    pins = sorted(phases)
+    traces = [phase_trace(sorted(phases[pin], key=lambda phase: phase['start_ms']),
+                          compile_led_config(configs[pin]) if pin in configs else None, duration_ms, step_ms) for pin in pins]
+    return analyze_flicker(traces, duration_ms, step_ms, window_ms, labels=[f"pin {pin}" for pin in pins],
+                           groups=[configs[pin].get('light_type') if pin in configs else None for pin in pins], pins=pins)
+
+def _spectral_distance_db(spectrum, reference):
+    """RMS-verschil in dB tussen twee bandspectra, over de banden waar één van beide vermogen heeft."""
+    spectrum, reference = np.asarray(spectrum), np.asarray(reference)
+    floor = 1e-6 # -60 dB: lege banden tellen niet als oneindig verschil
+    used = (spectrum > floor) | (reference > floor)
+    if not used.any():
+        return 0.0
+    difference = 10 * np.log10(np.maximum(spectrum[used], floor) / np.maximum(reference[used], floor))
+    return round(float(np.sqrt(np.mean(difference ** 2))), 2)
+
+def compare_flicker(result, reference, tolerance_db=3.0):
+    """Vergelijkt analyze_flicker() met een referentie-analyse (bijv. van een echte opname).
+
+    Een referentie wordt gekoppeld aan de LED met dezelfde sleutel (LED-nummer) of, voor een seriële
+    log, aan de enige LED met die pin; anders aan de groep met dezelfde naam (profiel) of van hetzelfde
+    profiel (ook als de pin op meerdere borden voorkomt); een referentie zonder profiel (bijv. een meting
+    aan een echte tv) wordt anders met het gemiddelde van alle geanalyseerde LEDs vergeleken. Per paar worden het
+    spectrale verschil in dB en de verschillen in de kengetallen gegeven; een paar met een spectraal
+    verschil boven tolerance_db heet 'afwijkend'.
+    """
+    if (reference['step_ms'], reference['spectrum_edges_hz']) != (result['step_ms'], result['spectrum_edges_hz']):
+        raise ValueError("De referentie is met een andere stap of andere spectrumbanden geanalyseerd (gebruik dezelfde --stap-ms).")
+    leds = {entry['key']: entry for entry in result['leds']}
+    by_pin = {}
+    for entry in result['leds']:
+        if entry.get('pin') is not None:
+            by_pin.setdefault(entry['pin'], []).append(entry)
+    groups = result['groups']
+
+    def match(entry):
+        led = leds.get(entry['key'])
+        if led is None and entry.get('pin') is not None: # Seriële log ('pin N'): alleen een unieke pin koppelt
+            same_pin = by_pin.get(entry['pin'], [])
+            led = same_pin[0] if len(same_pin) == 1 else None
+        return led or groups.get(entry['key']) or (groups.get(entry['group']) if entry['group'] else groups.get('alle'))
+
+    pairs = [(entry, match(entry)) for entry in reference['leds']]
+    pairs += [(entry, groups.get(name)) for name, entry in reference['groups'].items() if name != 'alle']
+    comparison = []
+    seen = set()
+    for ref_entry, entry in pairs:
+        if entry is None or (ref_entry['key'], entry['key']) in seen:
+            continue
+        seen.add((ref_entry['key'], entry['key']))
+        distance = _spectral_distance_db(entry['spectrum'], ref_entry['spectrum'])
+        metrics = {metric: {'value': entry[metric], 'reference': ref_entry[metric],
+                            'difference': round(entry[metric] - ref_entry[metric], 3)
+                            if entry[metric] is not None and ref_entry[metric] is not None else None}
+                   for metric, _ in FLICKER_METRICS}
+        comparison.append({'reference': ref_entry['key'], 'against': entry['key'], 'spectral_distance_db': distance,
+                           'status': "afwijkend" if distance > tolerance_db else "ok", 'metrics': metrics})
+    return comparison
+
+def _format_flicker_cell(value):
+    return f"{'-':>13}" if value is None else f"{value:>13.2f}"
+
+def format_flicker_report(result, comparison=None, per_led=False):
+    """Maakt een leesbaar rapport van analyze_flicker() en (optioneel) compare_flicker()."""
+    lines = [f"Analyse over {format_sim_time(result['duration_ms'])} per {result['step_ms']} ms, "
+             f"vensters van {result['window_ms']} ms, FFT-segmenten van {result['segment_samples']} samples"]
+    lines.append(" ".join([f"{'':<24}"] + [f"{title:>13}" for _, title in FLICKER_METRICS]))
+    entries = list(result['groups'].values())
+    if per_led:
+        entries = result['leds'] + [result['groups']['alle']]
+    for entry in entries:
+        if per_led and entry in result['leds']:
+            name = f"LED {entry['key']}" + (f" (pin {entry['pin']})" if entry.get('pin') is not None else "")
+        else:
+            name = f"{entry['key']} ({entry['leds']})"
+        lines.append(" ".join([f"{name[:24]:<24}"] + [_format_flicker_cell(entry[metric]) for metric, _ in FLICKER_METRICS]))
+    labels = [f"{FLICKER_STEP_EDGES[i]}" if FLICKER_STEP_EDGES[i + 1] - FLICKER_STEP_EDGES[i] == 1 else
+              f"{FLICKER_STEP_EDGES[i]}-{FLICKER_STEP_EDGES[i + 1] - 1}" for i in range(len(FLICKER_STEP_EDGES) - 1)]
+    overall = result['groups']['alle']
+    lines.append("Stapgroottes (alle LEDs): " + ", ".join(f"{label}: {count}" for label, count in zip(labels, overall['step_histogram'])))
+    bands = [f"{low:g}-{high:g} Hz" if high else f">{low:g} Hz" for low, high in FLICKER_BANDS]
+    lines.append("Vermogen per band (alle LEDs): " + ", ".join(f"{band}: {pct:.1f}%" for band, pct in zip(bands, overall['band_pct'])))
+    if comparison is not None:
+        lines.append("Vergelijking met de referentie:")
+        if not comparison:
+            lines.append("  (geen overeenkomende opnames)")
+        for item in comparison:
+            deltas = ", ".join(f"{title} {item['metrics'][metric]['difference']:+.2f}" for metric, title in FLICKER_METRICS
+                               if item['metrics'][metric]['difference'] is not None)
+            lines.append(f"  {item['reference']} vs {item['against']}: spectrum {item['spectral_distance_db']:.2f} dB "
+                         f"[{item['status']}]; {deltas}")
+    return "\n".join(lines)
+
+# --- Soaktest: de sketch met 32-bit millis() en long-rekenkunde ---
+ULONG_MASK = 0xFFFFFFFF # unsigned long op een AVR
+LONG_MAX = 0x7FFFFFFF # long op een AVR; random() zonder argumenten geeft 0..LONG_MAX
+MILLIS_WRAP_MS = 1 << 32 # millis() loopt na ~49,7 dagen over
+SOAK_KINDS = {'overflow': "Overgelopen duur", 'stuck': "Vastgelopen LED", 'rollover': "Rollover/overloop-glitch"}
+_ULONG_ROW_FIELDS = ('min_on', 'max_on', 'min_off', 'max_off', 'min_fade_in', 'max_fade_in',
+                     'min_fade_out', 'max_fade_out', 'bright_interval', 'blink_on', 'blink_off')
+_RANDOM_RANGES = (('min_on', 'max_on'), ('min_off', 'max_off'), ('min_fade_in', 'max_fade_in'), ('min_fade_out', 'max_fade_out'))
+
+def to_long(value):
+    """Twee-complement naar 32-bit long, zoals een (long)-cast op de chip."""
+    value &= ULONG_MASK
+    return value - MILLIS_WRAP_MS if value > LONG_MAX else value
+
+def _c_div(a, b):
+    """Gehele deling zoals in C: afkappen richting nul."""
+    quotient = abs(a) // abs(b)
+    return quotient if (a >= 0) == (b >= 0) else -quotient
+
+def arduino_random(rng, howsmall, howbig):
+    """random(long, long) van de AVR-core, inclusief het omzetten van de argumenten naar long."""
+    if 0 <= howsmall < howbig <= LONG_MAX: # Gewone geval: niets loopt over
+        return rng.getrandbits(31) % (howbig - howsmall) + howsmall
+    howsmall, howbig = to_long(howsmall), to_long(howbig)
+    if howsmall >= howbig:
+        return howsmall
+    diff = to_long(howbig - howsmall)
+    value = rng.getrandbits(31) # random()
+    value = value - diff * _c_div(value, diff) if diff else 0 # random() % diff, met het teken van C
+    return to_long(value + howsmall)
+
+def arduino_map(x, in_min, in_max, out_min, out_max):
+    """map() van de AVR-core: long-rekenkunde, de vermenigvuldiging loopt over zoals op de chip."""
+    x, in_min, in_max, out_min, out_max = (to_long(value) for value in (x, in_min, in_max, out_min, out_max))
+    product = to_long(to_long(x - in_min) * to_long(out_max - out_min))
+    return to_long(_c_div(product, to_long(in_max - in_min)) + out_min)
+
+def random_range_fits(howsmall, howbig):
+    """True als random(howsmall, howbig) met long-argumenten precies howsmall..howbig-1 kan trekken.
+
+    Een bereik boven LONG_MAX werkt nog (de uitkomst klapt terug als unsigned long), maar niet
+    als het de grens van long overspant, groter is dan LONG_MAX of howbig tot 0 is overgelopen.
+    """
+    return howsmall < howbig and to_long(howsmall) < to_long(howbig) and 0 < to_long(howbig - howsmall)
+
+def firmware_profile(config):
+    """De profielrij van een LED zoals de chip hem ziet: tijden afgekapt tot unsigned long (32 bit).
+
+    Retourneert (profiel, meldingen); de meldingen beschrijven waarden die niet in hun C-type passen.
+    """
+    values = dict(zip(_PROFILE_ROW_FIELDS, sketch_profile_values(config)))
+    profile = {}
+    notes = []
+    for field, value in values.items():
+        if value in ("true", "false"):
+            profile[field] = value == "true"
+            continue
+        profile[field] = int(value)
+        if field in _ULONG_ROW_FIELDS and profile[field] > ULONG_MASK:
+            notes.append(f"{field} = {profile[field]} ms past niet in unsigned long en wordt {profile[field] & ULONG_MASK} ms")
+            profile[field] &= ULONG_MASK
+    for low, high in _RANDOM_RANGES:
+        howbig = (profile[high] + 1) & ULONG_MASK
+        if profile[low] <= profile[high] and not random_range_fits(profile[low], howbig):
+            notes.append(f"random({low}, {high} + 1) met {profile[low]}..{howbig} past niet in long: het bereik klapt om")
+    return profile, notes
+
+class FirmwareMachine:
+    """Eén toestandsmachine van de gegenereerde sketch, stap voor stap met de types van de chip.
+
+    Tijden zijn 32-bit (millis() & ULONG_MASK), random() en map() rekenen met 32-bit long. step()
+    is één doorgang van de switch in loop(); next_due() geeft het eerste tijdstip waarop die
+    doorgang iets verandert, zodat een soaktest van maanden alleen de overgangen hoeft te doorlopen.
+    De knipperwissels binnen KNIPPERT worden niet nagebootst: ze raken alleen de helderheid en
+    lastBlinkToggleTime, niet de fasen. Elke machine heeft een eigen random-generator; op de chip
+    delen alle machines er één, dus de exacte volgorde is toch niet na te spelen.
+    Getrokken duren van de velden in record worden in draws bijgehouden; previousRamp alleen met
+    track_ramps (de sketch doet dat alleen bij SYNC_MEMBERS).
+    """
+
+    def __init__(self, profile, seed=None, start_ms=0, record=(), track_ramps=False):
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.record = frozenset(record)
+        self.track_ramps = track_ramps
+        self.draws = [] # (veld, getrokken duur) sinds de vorige keer leegmaken
+        # setup()
+        self.last_toggle = start_ms & ULONG_MASK
+        self.mode = LedSimulator.MODE_OFF
+        self.brightness = 0
+        self.duration = self.random_duration('min_off', 'max_off')
+        self.fade_start = 0
+        self.fade_duration = 0
+        self.fade_target = 0
+        self.fade_start_brightness = 0
+        self.phase_start = self.last_toggle
+        self.previous_ramp = (0, 0, 0, 0)
+
+    def random_duration(self, low, high):
+        """random(config.low, config.high + 1), toegekend aan een unsigned long."""
+        value = arduino_random(self.rng, self.profile[low], (self.profile[high] + 1) & ULONG_MASK) & ULONG_MASK
+        if low in self.record:
+            self.draws.append((low, value))
+        return value
+
+    def random_brightness(self):
+        return arduino_random(self.rng, self.profile['min_bright'], self.profile['max_bright'] + 1)
+
+    def current_ramp(self):
+        if self.mode == LedSimulator.MODE_FADE_IN:
+            return self.fade_start, self.fade_duration, 0, self.fade_target & 0xFF
+        if self.mode == LedSimulator.MODE_FADE_OUT:
+            return self.fade_start, self.fade_duration, self.fade_start_brightness & 0xFF, 0
+        return self.phase_start, 0, self.brightness & 0xFF, self.brightness & 0xFF
+
+    def next_due(self, now_ms):
+        """Eerste tijdstip (absoluut, ms) vanaf now_ms waarop step() van fase wisselt."""
+        if self.mode in (LedSimulator.MODE_FADE_IN, LedSimulator.MODE_FADE_OUT):
+            reference, duration = self.fade_start, self.fade_duration
+        else:
+            reference, duration = self.last_toggle, self.duration
+        elapsed = (now_ms - reference) & ULONG_MASK # Zelfde aftrekking als in de sketch
+        return now_ms + max(0, duration - elapsed)
+
+    def step(self, now_ms):
+        """Eén doorgang van de switch in loop() op millis() = now_ms & ULONG_MASK."""
+        t = now_ms & ULONG_MASK
+        profile = self.profile
+        mode = self.mode
+        ramp = self.current_ramp() if self.track_ramps else None
+        if mode == LedSimulator.MODE_OFF:
+            if (t - self.last_toggle) & ULONG_MASK >= self.duration:
+                if profile['fade_in']:
+                    self.mode = LedSimulator.MODE_FADE_IN
+                    self.fade_start = t
+                    self.fade_duration = self.random_duration('min_fade_in', 'max_fade_in')
+                    self.fade_target = self.random_brightness() if profile['var_bright'] else 255
+                    self.brightness = 0
+                elif profile['blinking']:
+                    self.mode = LedSimulator.MODE_BLINKING
+                    self.last_toggle = t # currentDuration blijft die van de UIT-fase, net als in de sketch
+                    self.brightness = self.random_brightness()
+                else:
+                    self.mode = LedSimulator.MODE_ON
+                    self.last_toggle = t
+                    self.brightness = self.random_brightness() if profile['var_bright'] else 255
+                    self.duration = self.random_duration('min_on', 'max_on')
+        elif mode == LedSimulator.MODE_ON:
+            if (t - self.last_toggle) & ULONG_MASK >= self.duration:
+                if profile['fade_out']:
+                    self.mode = LedSimulator.MODE_FADE_OUT
+                    self.fade_start = t
+                    self.fade_duration = self.random_duration('min_fade_out', 'max_fade_out')
+                    self.fade_start_brightness = self.brightness
+                else:
+                    self.mode = LedSimulator.MODE_OFF
+                    self.last_toggle = t
+                    self.brightness = 0
+                    self.duration = self.random_duration('min_off', 'max_off')
+        elif mode == LedSimulator.MODE_FADE_IN:
+            if (t - self.fade_start) & ULONG_MASK < self.fade_duration:
+                self.brightness = arduino_map((t - self.fade_start) & ULONG_MASK, 0, self.fade_duration, 0, self.fade_target)
+            else:
+                self.mode = LedSimulator.MODE_ON
+                self.last_toggle = t
+                self.brightness = self.fade_target
+                self.duration = self.random_duration('min_on', 'max_on')
+        elif mode == LedSimulator.MODE_FADE_OUT:
+            if (t - self.fade_start) & ULONG_MASK < self.fade_duration:
+                self.brightness = arduino_map((t - self.fade_start) & ULONG_MASK, 0, self.fade_duration, self.fade_start_brightness, 0)
+            else:
+                self.mode = LedSimulator.MODE_OFF
+                self.last_toggle = t
+                self.brightness = 0
+                self.duration = self.random_duration('min_off', 'max_off')
+        elif mode == LedSimulator.MODE_BLINKING:
+            if (t - self.last_toggle) & ULONG_MASK >= self.duration:
+                self.mode = LedSimulator.MODE_OFF
+                self.last_toggle = t
+                self.brightness = 0
+                self.duration = self.random_duration('min_off', 'max_off')
+        if ramp is not None and self.mode != mode:
+            self.phase_start = t
+            self.previous_ramp = ramp
+
+def firmware_ramp_level(ramp, t):
+    """rampLevel() van de sketch: het verschil wordt als long vergeleken."""
+    start, duration, first, last = ramp
+    elapsed = to_long(t - start)
+    if elapsed >= to_long(duration):
+        return last
+    if elapsed <= 0:
+        return first
+    return arduino_map(elapsed, 0, duration, first, last)
+
+def soak_test(led_configs, duration_ms, seed=None, loop_ms=1, start_ms=0, max_findings=20):
+    """Laat de sketch van een layout weken tot maanden lopen met exacte 32-bit rekenkunde.
+
+    Elke toestandsmachine loopt event-driven van overgang naar overgang, met millis() = (start_ms + t)
+    modulo 2^32 en een loop()-doorgang elke loop_ms. Gemeld worden:
+    - 'overflow': tijden die niet in hun C-type passen, getrokken duren buiten het ingestelde bereik
+      en "Uitgeschakeld"-LEDs die toch aangaan;
+    - 'stuck': fasen die langer duren dan het ingestelde maximum (ook een fase die aan het eind nog loopt);
+    - 'rollover': fades waarin map() overloopt en leden van een synchrone groep die na 2^31 ms in
+      dezelfde fase de helling van de vorige fase tonen (de long-vergelijking in ledLevel()).
+    Alleen de eerste max_findings meldingen per soort worden bewaard; de tellers zijn volledig.
+    """
+    if duration_ms <= 0:
+        raise ValueError("De duur van de soaktest moet groter zijn dan 0.")
+    if loop_ms < 1:
+        raise ValueError("De looptijd van loop() moet minstens 1 ms zijn.")
+    machine_of_led, leaders = build_led_machines(led_configs)
+    members = [sync_member_params(config) for config in led_configs]
+    sync_members = any((offset, scale) != (0, 100) for _, offset, scale in members)
+    leds_of_machine = [[] for _ in leaders]
+    for i, machine in enumerate(machine_of_led):
+        leds_of_machine[machine].append(i)
+    counts = dict.fromkeys(SOAK_KINDS, 0)
+    findings = {kind: [] for kind in SOAK_KINDS}
+
+    def report(kind, pin, t_ms, message):
+        counts[kind] += 1
+        if len(findings[kind]) < max_findings:
+            findings[kind].append({'pin': pin, 'time_ms': t_ms, 'message': message})
+
+    limits = {LedSimulator.MODE_OFF: 'max_off_ms', LedSimulator.MODE_ON: 'max_on_ms', LedSimulator.MODE_FADE_IN: 'max_fade_in_ms',
+              LedSimulator.MODE_FADE_OUT: 'max_fade_out_ms', LedSimulator.MODE_BLINKING: 'max_on_ms'}
+    transitions = 0
+    end_ms = start_ms + duration_ms
+    for machine_index, leader in enumerate(leaders):
+        config = led_configs[leader]
+        pin = config['pin']
+        cfg = compile_led_config(config)
+        profile, notes = firmware_profile(config)
+        for note in notes:
+            report('overflow', pin, 0, note)
+        name = members[leader][0]
+        # Alleen bereiken die afgekapt zijn of buiten long vallen kunnen iets anders trekken dan ingesteld
+        record = [low for low, high in _RANDOM_RANGES
+                  if (profile[low], profile[high]) != (cfg[low + '_ms'], cfg[high + '_ms'])
+                  or not random_range_fits(profile[low], (profile[high] + 1) & ULONG_MASK)]
+        machine = FirmwareMachine(profile, seed=derive_group_seed(seed, name) if name else derive_led_seed(seed, leader),
+                                  start_ms=start_ms, record=record, track_ramps=sync_members)
+
+        def check_phase(mode, phase_start_ms, until_ms, previous_ramp, level, ended):
+            """Controleert een fase van phase_start_ms tot until_ms (ended=False: loopt aan het eind nog)."""
+            length = until_ms - phase_start_ms
+            if length > cfg[limits[mode]] + loop_ms:
+                what = "duurde" if ended else "loopt aan het eind al"
+                report('stuck', pin, phase_start_ms - start_ms, f"{LedSimulator.MODE_NAMES[mode]} {what} {format_sim_time(length)} "
+                                                              f"(ingesteld max {format_sim_time(cfg[limits[mode]])})")
+            if not sync_members or length < 1 << 31:
+                return
+            for led in leds_of_machine[machine_index]:
+                offset = members[led][1]
+                flip_ms = phase_start_ms + offset + (1 << 31) # Hier wordt (long)(shifted - phaseStartTime) negatief
+                if flip_ms > min(until_ms + offset, end_ms):
+                    continue
+                shown = firmware_ramp_level(previous_ramp, flip_ms - offset)
+                if shown != level:
+                    report('rollover', led_configs[led]['pin'], flip_ms - start_ms,
+                           f"ledLevel() toont na 2^31 ms in {LedSimulator.MODE_NAMES[mode]} de vorige helling ({shown} i.p.v. {level})")
+
+        def check_draws(t_rel):
+            for low, value in machine.draws:
+                high = 'max' + low[3:]
+                if not cfg[low + '_ms'] <= value <= cfg[high + '_ms']:
+                    report('overflow', pin, t_rel, f"random() gaf {value} ms voor {low}..{high} "
+                                                   f"(ingesteld {cfg[low + '_ms']}-{cfg[high + '_ms']} ms)")
+            machine.draws.clear()
+
+        # Kortere fasen zijn altijd in orde; alleen langere gaan door check_phase()
+        quiet_ms = {mode: min(cfg[field] + loop_ms, (1 << 31) - 1 if sync_members else cfg[field] + loop_ms)
+                    for mode, field in limits.items()}
+        check_draws(0) # De eerste UIT-duur uit setup()
+        now_ms = phase_start_ms = start_ms
+        while True:
+            # De eerstvolgende loop()-doorgang op of na het moment van de overgang
+            now_ms += max(1, -(-(machine.next_due(now_ms) - now_ms) // loop_ms)) * loop_ms
+            if now_ms > end_ms:
+                break
+            mode, previous_ramp, level = machine.mode, machine.previous_ramp, machine.brightness & 0xFF
+            machine.step(now_ms)
+            if machine.mode == mode:
+                continue
+            transitions += 1
+            t_rel = now_ms - start_ms
+            if now_ms - phase_start_ms > quiet_ms[mode]:
+                check_phase(mode, phase_start_ms, now_ms, previous_ramp, level, ended=True)
+            if machine.draws:
+                check_draws(t_rel)
+            if cfg['always_off'] and machine.mode != LedSimulator.MODE_OFF:
+                report('overflow', pin, t_rel, f"'Uitgeschakeld' gaat aan ({LedSimulator.MODE_NAMES[machine.mode]}, "
+                                               f"helderheid {machine.brightness})")
+            if machine.mode in (LedSimulator.MODE_FADE_IN, LedSimulator.MODE_FADE_OUT):
+                delta = machine.fade_target if machine.mode == LedSimulator.MODE_FADE_IN else machine.fade_start_brightness
+                if machine.fade_duration > LONG_MAX or (machine.fade_duration - 1) * abs(delta) > LONG_MAX:
+                    report('rollover', pin, t_rel, f"{LedSimulator.MODE_NAMES[machine.mode]} van {machine.fade_duration} ms "
+                                                   f"laat map() overlopen (long)")
+            phase_start_ms = now_ms
+        check_phase(machine.mode, phase_start_ms, end_ms, machine.previous_ramp, machine.brightness & 0xFF, ended=False)
+    return {
+        'duration_ms': duration_ms, 'start_ms': start_ms, 'loop_ms': loop_ms,
+        'millis_wraps': end_ms // MILLIS_WRAP_MS - start_ms // MILLIS_WRAP_MS,
+        'leds': len(led_configs), 'machines': len(leaders), 'transitions': transitions,
+        'counts': counts, 'findings': findings,
+    }
+
+def format_soak_report(result):
+    """Maakt een leesbaar rapport van soak_test()."""
+    lines = [
+        f"Soaktest: {result['leds']} LEDs ({result['machines']} toestandsmachines) over {format_sim_time(result['duration_ms'])}, "
+        f"{result['transitions']} overgangen, millis() {result['millis_wraps']} keer overgelopen",
+    ]
+    for kind, title in SOAK_KINDS.items():
+        lines.append(f"{title}: {result['counts'][kind]}")
+        for item in result['findings'][kind]:
+            lines.append(f"  pin {item['pin']} op {format_sim_time(item['time_ms'])}: {item['message']}")
+        if result['counts'][kind] > len(result['findings'][kind]):
+            lines.append(f"  ... en nog {result['counts'][kind] - len(result['findings'][kind])}")
+    return "\n".join(lines)
+
+# --- Configuratie Hulpfuncties (headless) ---
+def read_layout_file(file_path):
+    """Leest een opgeslagen layout (JSON) en retourneert (led_configs, simulation_settings)."""
+    with open(file_path, "r") as f:
+        loaded_data = json.load(f)
+
+    # Controleer of het een nieuw formaat is met simulation_settings
+    if isinstance(loaded_data, dict) and "led_configurations" in loaded_data:
+        led_configs = loaded_data["led_configurations"]
+        sim_settings = loaded_data.get("simulation_settings", {})
+    elif isinstance(loaded_data, list): # Ouder formaat
+        led_configs = loaded_data
+        sim_settings = {} # Geen sim settings in oud formaat
+    else:
+        raise ValueError("Bestand bevat geen geldige lijst of dict van configuraties.")
+
+    if not isinstance(led_configs, list):
+        raise ValueError("Bestand bevat geen geldige lijst van LED configuraties.")
+    return led_configs, sim_settings
+
+def build_pin_index(led_configs):
+    """Koppelt elke (geldige) pin aan de indices van de LEDs die hem gebruiken, in volgorde."""
+    pin_index = {}
+    for i, config in enumerate(led_configs):
+        pin_str = str(config.get('pin', ''))
+        if pin_str.isdigit():
+            pin_index.setdefault(int(pin_str), []).append(i)
+    return pin_index
+
+def validate_led_config(config, led_index, pin_index):
+    """Valideert de configuratie van één LED.
+
+    pin_index komt uit build_pin_index() voor de hele layout. Retourneert
+    (opgeschoonde config, fouten, waarschuwingen); bij fouten is de config None.
+    """
+    validated_config = config.copy()
+    errors = []
+    warnings = []
+    
+    # Validatie van 'pin'
+    # CONVERTEER ALTIJD NAAR STRING VOORDAT JE .isdigit() GEBRUIKT
+    pin_str = str(validated_config.get('pin', '')) 
+    
+    if not pin_str.isdigit():
+        errors.append(f"LED {led_index+1}: Pin moet een nummer zijn.")
+    else:
+        pin = int(pin_str)
+        if pin not in PWM_PINS:
+            errors.append(f"LED {led_index+1}: Pin {pin} is geen geldige Arduino Mega PWM pin ({PWM_PINS}).")
+        # Controleer op dubbele pinnen (via de index in plaats van alle LEDs langs te lopen)
+        for i in pin_index.get(pin, ()):
+            if i != led_index:
+                errors.append(f"LED {led_index+1}: Pin {pin} is al toegewezen aan LED {i+1}.")
+                break
+        validated_config['pin'] = pin # Converteer naar int voor opslag en Arduino code
+
+    # Optionele positie op de plattegrond (zie FloorPlanWindow)
+    for field in POSITION_FIELDS:
+        if validated_config.get(field, '') not in ('', None):
+            try:
+                validated_config[field] = float(validated_config[field])
+            except (TypeError, ValueError):
+                errors.append(f"LED {led_index+1}: Positie '{field}' moet een getal zijn.")
+
+    # Optionele synchrone groep: vertraging (ms) en helderheid (%) van dit lid t.o.v. de groep
+    if str(validated_config.get('sync_group', '') or '').strip():
+        for field, max_val in (('sync_offset_ms', 65535), ('sync_scale_pct', 100)):
+            value_str = str(validated_config.get(field, '')).strip()
+            if value_str == '':
+                continue
+            try:
+                value = int(float(value_str))
+            except ValueError:
+                errors.append(f"LED {led_index+1}: '{field}' moet een geldig nummer zijn.")
+                continue
+            if not 0 <= value <= max_val:
+                errors.append(f"LED {led_index+1}: '{field}' ({value}) moet tussen 0 en {max_val} zijn.")
+            validated_config[field] = str(value)
+
+    # Validatie van numerieke velden (tijden en helderheid)
+    time_fields = ['min_on_s', 'max_on_s', 'min_off_s', 'max_off_s',
+                   'min_fade_in_s', 'max_fade_in_s', 'min_fade_out_s', 'max_fade_out_s',
+                   'bright_interval_s']
+    ms_fields = ['blink_on_ms', 'blink_off_ms']
+    brightness_fields = ['min_bright', 'max_bright']
+
+    # Hulpfunctie voor numerieke validatie
+    def validate_numeric_field(field_name, min_val=0, max_val=float('inf')):
+        value_str = str(validated_config.get(field_name, '')) # Zorg dat het een string is
+        if value_str == '': # Lege string, behandel als 0 voor numerieke conversie
+            validated_config[field_name] = '0'
+            value = 0.0 # Gebruik float voor seconden
+        else:
+            try:
+                # Check voor float of int, afhankelijk van het veld
+                if '_s' in field_name:
+                    value = float(value_str)
+                else:
+                    value = int(value_str)
+
+                if not (min_val <= value <= max_val):
+                    errors.append(f"LED {led_index+1}: '{field_name}' ({value}) moet tussen {min_val} en {max_val} zijn.")
+                validated_config[field_name] = str(value) if '_s' in field_name else str(int(value)) # Sla als string op (voor UI consistentie)
+            except ValueError:
+                errors.append(f"LED {led_index+1}: '{field_name}' moet een geldig nummer zijn.")
+    
+    for field in time_fields:
+        validate_numeric_field(field, 0)
+    for field in ms_fields:
+        validate_numeric_field(field, 0)
+    for field in brightness_fields:
+        validate_numeric_field(field, 0, 255)
+
+    # Validatie van min/max relaties
+    if float(validated_config.get('min_on_s', '0')) > float(validated_config.get('max_on_s', '0')):
+        errors.append(f"LED {led_index+1}: 'Min Aan' kan niet groter zijn dan 'Max Aan'.")
+    if float(validated_config.get('min_off_s', '0')) > float(validated_config.get('max_off_s', '0')):
+        errors.append(f"LED {led_index+1}: 'Min Uit' kan niet groter zijn dan 'Max Uit'.")
+    if float(validated_config.get('min_fade_in_s', '0')) > float(validated_config.get('max_fade_in_s', '0')):
+        errors.append(f"LED {led_index+1}: 'Min Fade In' kan niet groter zijn dan 'Max Fade In'.")
+    if float(validated_config.get('min_fade_out_s', '0')) > float(validated_config.get('max_fade_out_s', '0')):
+        errors.append(f"LED {led_index+1}: 'Min Fade Out' kan niet groter zijn dan 'Max Fade Out'.")
+    if int(float(validated_config.get('min_bright', '0'))) > int(float(validated_config.get('max_bright', '0'))): # Gebruik float voor consistentie met parse
+        errors.append(f"LED {led_index+1}: 'Min Helderheid' kan niet groter zijn dan 'Max Helderheid'.")
+    if int(validated_config.get('blink_on_ms', '0')) > 0 and int(validated_config.get('blink_off_ms', '0')) == 0:
+        warnings.append(f"LED {led_index+1}: 'Knipper Aan' is ingesteld, maar 'Knipper Uit' is 0ms. Dit kan onverwacht gedrag veroorzaken.")
+    if int(validated_config.get('blink_off_ms', '0')) > 0 and int(validated_config.get('blink_on_ms', '0')) == 0:
+        warnings.append(f"LED {led_index+1}: 'Knipper Uit' is ingesteld, maar 'Knipper Aan' is 0ms. Dit kan onverwacht gedrag veroorzaken.")
+
+    # Specifieke validatie voor Blinking mode
+    # Haal de light_type van de _gevalideerde_ configuratie op.
+    current_light_type = validated_config.get('light_type', 'Uitgeschakeld')
+    blinking_allowed_by_profile = LIGHT_PROFILES.get(current_light_type, {}).get('blinking', False)
+
+    if validated_config.get('blinking'): # Alleen als blinking is aangevinkt
+        # Als profiel knipperen niet toestaat, is dit een fout
+        if not blinking_allowed_by_profile:
+            errors.append(f"LED {led_index+1}: Knippermodus is alleen toegestaan voor het 'TV Simulatie' profiel. Schakel 'Knipperen?' uit of kies het 'TV Simulatie' profiel.")
+        else: # Als blinking wel toegestaan is door het profiel (d.w.z. TV Simulatie)
+            # Fading is niet toegestaan in knippermodus
+            if validated_config.get('fade_in') or validated_config.get('fade_out'):
+                errors.append(f"LED {led_index+1}: Fading is niet toegestaan in knippermodus. Schakel 'Fade In?' en 'Fade Out?' uit.")
+            
+            # bright_interval_s heeft geen effect
+            if float(validated_config.get('bright_interval_s', '0')) > 0:
+                warnings.append(f"LED {led_index+1}: 'Interval Helderheid' heeft geen effect in knippermodus en wordt genegeerd.")
+
+            # Zorg dat min_bright en max_bright geldig zijn voor knipperen
+            if not (0 <= int(float(validated_config.get('min_bright', '0'))) <= 255) or \
+               not (0 <= int(float(validated_config.get('max_bright', '0'))) <= 255):
+               errors.append(f"LED {led_index+1}: Min/Max Helderheid moet tussen 0 en 255 zijn voor knipperen.")
+            
+            # Zorg dat blink_on_ms en blink_off_ms zinvolle waarden hebben
+            if int(validated_config.get('blink_on_ms', '0')) <= 0 or int(validated_config.get('blink_off_ms', '0')) <= 0:
+                errors.append(f"LED {led_index+1}: 'Knipper Aan (ms)' en 'Knipper Uit (ms)' moeten groter zijn dan 0 in knippermodus.")
+        
+    if errors:
+        return None, errors, warnings
+    return validated_config, errors, warnings
+
+def validate_layout(led_configs, check_pins=True):
+    """Valideert alle LEDs van een layout; retourneert een lijst van (config, fouten, waarschuwingen).
+
+    Met check_pins=False wordt niet op dubbele pinnen gecontroleerd (zoals plan_boards() doet, dat de
+    pinnen zelf kiest); elke pin moet nog wel een geldige PWM-pin zijn.
+    """
+    pin_index = build_pin_index(led_configs) if check_pins else {}
+    return [validate_led_config(config, i, pin_index) for i, config in enumerate(led_configs)]
+
+def write_layout_file(file_path, led_configs, sim_settings):
+    """Schrijft een layout (JSON) in het formaat dat read_layout_file() leest."""
+    data_to_save = {
+        "led_configurations": led_configs,
+        "simulation_settings": sim_settings,
+    }
+    with open(file_path, "w") as f:
+        json.dump(data_to_save, f, indent=4)
+
+# Velden van een LED-config die compile_led_config() gebruikt
+PROFILE_FIELDS = ('min_on_s', 'max_on_s', 'min_off_s', 'max_off_s',
+                  'fade_in', 'min_fade_in_s', 'max_fade_in_s', 'fade_out', 'min_fade_out_s', 'max_fade_out_s',
+                  'var_bright', 'min_bright', 'max_bright', 'blinking', 'blink_on_ms', 'blink_off_ms')
+_COMPILED_CONFIGS = {} # Gedeelde gecompileerde parameters, per unieke combinatie van PROFILE_FIELDS
+_COMPILED_CONFIGS_MAX = 4096
+
+def compile_led_config(config):
+    """Zet een LED-config (strings, seconden) eenmalig om naar gehele milliseconden en helderheden.
+
+    De omrekening is gelijk aan die in generate_arduino_code: int(float(seconden) * 1000).
+    LEDs met dezelfde parameters krijgen hetzelfde dict terug (net als de profieltabel in de sketch);
+    het resultaat is daarom alleen-lezen.
+    """
+    key = tuple(repr(config.get(field)) for field in PROFILE_FIELDS)
+    compiled = _COMPILED_CONFIGS.get(key)
+    if compiled is None:
+        if len(_COMPILED_CONFIGS) >= _COMPILED_CONFIGS_MAX:
+            _COMPILED_CONFIGS.clear()
+        compiled = _COMPILED_CONFIGS[key] = _compile_led_config(config)
+    return compiled
+
+def _compile_led_config(config):
+    def to_ms(key):
+        try:
+            return max(0, int(float(config.get(key, 0) or 0) * 1000))
+        except (TypeError, ValueError):
+            return 0
+
+    def to_int(key, default):
+        try:
+            return max(0, int(float(config.get(key, default) or 0)))
+        except (TypeError, ValueError):
+            return default
+
+    compiled = {
+        'min_on_ms': to_ms('min_on_s'), 'max_on_ms': to_ms('max_on_s'),
+        'min_off_ms': to_ms('min_off_s'), 'max_off_ms': to_ms('max_off_s'),
+        'fade_in': bool(config.get('fade_in', False)),
+        'min_fade_in_ms': to_ms('min_fade_in_s'), 'max_fade_in_ms': to_ms('max_fade_in_s'),
+        'fade_out': bool(config.get('fade_out', False)),
+        'min_fade_out_ms': to_ms('min_fade_out_s'), 'max_fade_out_ms': to_ms('max_fade_out_s'),
+        'var_bright': bool(config.get('var_bright', False)),
+        'min_bright': min(255, to_int('min_bright', 0)), 'max_bright': min(255, to_int('max_bright', 255)),
+        'blinking': bool(config.get('blinking', False)),
+        'blink_on_ms': to_int('blink_on_ms', 0), 'blink_off_ms': to_int('blink_off_ms', 0),
+    }
+    # Zelfde regel als in LedSimulator.update(): "Uitgeschakeld" blijft altijd uit
+    compiled['always_off'] = compiled['min_on_ms'] == 0 and compiled['max_on_ms'] == 0 and \
+                             (compiled['min_off_ms'] > 0 or compiled['max_off_ms'] > 0)
+    return compiled
+
+def format_sim_time(ms):
+    """Formatteert een simulatietijd in ms als 'Xd HH:MM:SS.mmm'."""
+    ms = int(ms)
+    days, rest = divmod(ms, 86400000)
+    hours, rest = divmod(rest, 3600000)
+    minutes, rest = divmod(rest, 60000)
+    seconds, millis = divmod(rest, 1000)
+    return f"{days}d {hours:02d}:{minutes:02d}:{seconds:02d}.{millis:03d}"
+
+def _require_numpy(feature):
+    if np is None:
+        raise RuntimeError(f"{feature} vereist NumPy. Installeer het met: pip install numpy")
+
+# --- Bewerkingsgeschiedenis (undo/redo) ---
+_FIELD_MISSING = object() # Markeert een veld dat voor of na een wijziging niet in de config stond
+
+def diff_led_configs(led_index, old, new):
+    """Per-veld verschillen tussen twee configs van één LED, als (led_index, veld, oud, nieuw).
+
+    Waarden die alleen in type verschillen ('2' tegenover 2, zoals na validatie) tellen niet als wijziging.
+    """
+    changes = []
+    for field in list(old) + [field for field in new if field not in old]:
+        old_value = old.get(field, _FIELD_MISSING)
+        new_value = new.get(field, _FIELD_MISSING)
+        if old_value is _FIELD_MISSING or new_value is _FIELD_MISSING:
+            if old_value is not new_value:
+                changes.append((led_index, field, old_value, new_value))
+        elif old_value != new_value and str(old_value) != str(new_value):
+            changes.append((led_index, field, old_value, new_value))
+    return changes
+
+def apply_led_changes(led_data, changes, undo=False):
+    """Past wijzigingen uit diff_led_configs() toe op led_data (of draait ze terug met undo=True).
+
+    Elke geraakte LED krijgt een nieuwe snapshot-dict; lopende simulators houden zo hun eigen config.
+    Retourneert de indices van de geraakte LEDs, oplopend. Een wijziging voor een LED die niet (meer)
+    in led_data staat geeft een ValueError, voordat er iets is aangepast.
+    """
+    for led_index, _, _, _ in changes:
+        if not 0 <= led_index < len(led_data):
+            raise ValueError(f"Wijziging voor LED {led_index+1}, maar de layout heeft {len(led_data)} LEDs.")
+    touched = {}
+    for led_index, field, old_value, new_value in (reversed(changes) if undo else changes):
+        value = old_value if undo else new_value
+        snapshot = touched.get(led_index)
+        if snapshot is None:
+            snapshot = touched[led_index] = dict(led_data[led_index]['vars_snapshot'])
+        if value is _FIELD_MISSING:
+            snapshot.pop(field, None)
+        else:
+            snapshot[field] = value
+    for led_index, snapshot in touched.items():
+        led_data[led_index]['vars_snapshot'] = snapshot
+    return sorted(touched)
+
+class EditHistory:
+    """Undo/redo voor LED-bewerkingen, opgeslagen als per-veld verschillen.
+
+    Een stap kost alleen de gewijzigde velden (de waarden worden gedeeld met de snapshots, niet
+    gekopieerd). De geschiedenis blijft binnen max_bytes (geschat met sys.getsizeof) en max_steps;
+    daarboven vallen de oudste stappen weg. Tussen begin_group() en end_group() worden alle
+    wijzigingen één stap, zodat bijv. een bulkbewerking in één keer terug kan.
+    """
+
+    CHANGE_OVERHEAD_BYTES = 72 # De 4-tuple van één wijziging
+    STEP_OVERHEAD_BYTES = 120 # Label, tuple met wijzigingen en de ingang in de deque
+
+    def __init__(self, max_bytes=4 * 1024 * 1024, max_steps=10000):
+        self.max_bytes = max_bytes
+        self.max_steps = max_steps
+        self.undo_steps = collections.deque() # (label, wijzigingen, grootte); de nieuwste rechts
+        self.redo_steps = collections.deque()
+        self.memory_bytes = 0
+        self._group_changes = None
+        self._group_label = None
+        self._group_depth = 0
+
+    def _step_size(self, changes):
+        size = self.STEP_OVERHEAD_BYTES
+        for _, _, old_value, new_value in changes:
+            size += self.CHANGE_OVERHEAD_BYTES
+            if old_value is not _FIELD_MISSING:
+                size += sys.getsizeof(old_value)
+            if new_value is not _FIELD_MISSING:
+                size += sys.getsizeof(new_value)
+        return size
+
+    def push(self, changes, label):
+        """Legt een stap vast; een nieuwe bewerking maakt redo ongedaan."""
+        if not changes:
+            return
+        if self._group_changes is not None:
+            self._group_changes.extend(changes)
+            return
+        for _, _, size in self.redo_steps:
+            self.memory_bytes -= size
+        self.redo_steps.clear()
+        changes = tuple(changes)
+        size = self._step_size(changes)
+        self.undo_steps.append((label, changes, size))
+        self.memory_bytes += size
+        self._trim()
+
+    def _trim(self):
+        while self.undo_steps and (self.memory_bytes > self.max_bytes or len(self.undo_steps) > self.max_steps):
+            self.memory_bytes -= self.undo_steps.popleft()[2]
+
+    def begin_group(self, label):
+        """Start een groep; geneste groepen vallen samen met de buitenste."""
+        if self._group_depth == 0:
+            self._group_changes = []
+            self._group_label = label
+        self._group_depth += 1
+
+    def end_group(self):
+        self._group_depth -= 1
+        if self._group_depth == 0:
+            changes, self._group_changes = self._group_changes, None
+            self.push(changes, self._group_label)
+
+    def clear(self):
+        """Vergeet alle stappen, bijv. wanneer een andere layout wordt geladen."""
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self.memory_bytes = 0
+        self._group_changes = None
+        self._group_label = None
+        self._group_depth = 0
+
+    def can_undo(self):
+        return bool(self.undo_steps)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    def undo(self, led_data):
+        """Draait de laatste stap terug; retourneert (label, geraakte LEDs) of None."""
+        if not self.undo_steps:
+            return None
+        touched = apply_led_changes(led_data, self.undo_steps[-1][1], undo=True)
+        step = self.undo_steps.pop()
+        self.redo_steps.append(step)
+        return step[0], touched
+
+    def redo(self, led_data):
+        """Voert de laatst teruggedraaide stap opnieuw uit; retourneert (label, geraakte LEDs) of None."""
+        if not self.redo_steps:
+            return None
+        touched = apply_led_changes(led_data, self.redo_steps[-1][1])
+        step = self.redo_steps.pop()
+        self.undo_steps.append(step)
+        return step[0], touched
+
+# --- Bulkbewerking ---
+BOOLEAN_FIELDS = ('fade_in', 'fade_out', 'var_bright', 'blinking')
+BULK_EDIT_FIELDS = ('pin', 'light_type', 'group', 'bright_interval_s') + PROFILE_FIELDS + SYNC_FIELDS
+
+def _parse_number_ranges(text):
+    """Zet "1-20,25" om in een lijst (begin, eind) paren (inclusief)."""
+    ranges = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        try:
+            ranges.append((int(first), int(last) if last else int(first)))
+        except ValueError:
+            raise ValueError(f"Ongeldig bereik '{part}' (verwacht bijv. 1-20,25).")
+    return ranges
+
+def select_leds(led_configs, spec):
+    """Selecteert LEDs met een tekstuele selectie; retourneert hun indices (oplopend).
+
+    Termen, gescheiden door ';', moeten allemaal gelden:
+      alle               alle LEDs
+      1-20,25            LED-nummers (vanaf 1, zoals in de lijst)
+      type:Hal Licht     lichttype (profiel)
+      groep:Station      de optionele groep van de LED
+      pin:2-13           pinnummers
+      veld=waarde        een willekeurig configveld, bijv. fade_in=True
+    """
+    selected = set(range(len(led_configs)))
+    for term in spec.split(";"):
+        term = term.strip()
+        if not term or term.lower() == "alle":
+            continue
+        if "=" in term:
+            field, _, value = (part.strip() for part in term.partition("="))
+            selected = {i for i in selected if str(led_configs[i].get(field, '')).lower() == value.lower()}
+        elif term.lower().startswith("type:"):
+            value = term[5:].strip().lower()
+            selected = {i for i in selected if str(led_configs[i].get('light_type', '')).lower() == value}
+        elif term.lower().startswith("groep:"):
+            value = term[6:].strip().lower()
+            selected = {i for i in selected if str(led_configs[i].get('group', '')).strip().lower() == value}
+        elif term.lower().startswith("pin:"):
+            ranges = _parse_number_ranges(term[4:])
+            selected = {i for i in selected if str(led_configs[i].get('pin', '')).isdigit() and
+                        any(first <= int(led_configs[i]['pin']) <= last for first, last in ranges)}
+        else:
+            ranges = _parse_number_ranges(term)
+            selected = {i for i in selected if any(first <= i + 1 <= last for first, last in ranges)}
+    return sorted(selected)
+
+def bulk_edit(led_configs, indices, profile=None, changes=None):
+    """Past een profiel en/of veldwijzigingen toe op meerdere LEDs en valideert ze in één keer.
+
+    profile is een naam uit LIGHT_PROFILES (pin en groep blijven behouden); changes is een dict
+    veld -> waarde, toegepast na het profiel. Dubbele pinnen worden alleen gezocht als 'pin' een van
+    de gewijzigde velden is, en dan alleen tussen de bewerkte LEDs: de overige LEDs houden hun pin, en
+    een layout met meer LEDs dan PWM-pinnen (verdeeld over borden) zou anders elke LED afkeuren.
+    Retourneert (bijgewerkte configs per index, fouten, waarschuwingen); bij fouten is de dict leeg.
+    """
+    if profile is not None and profile not in LIGHT_PROFILES:
+        raise ValueError(f"Onbekend profiel '{profile}'.")
+    changes = dict(changes or {})
+    for field, value in changes.items():
+        if field not in BULK_EDIT_FIELDS:
+            raise ValueError(f"Onbekend veld '{field}' (kies uit {', '.join(BULK_EDIT_FIELDS)}).")
+        if field in BOOLEAN_FIELDS and isinstance(value, str):
+            changes[field] = value.strip().lower() in ("1", "true", "ja", "aan")
+
+    layout = list(led_configs)
+    for i in indices:
+        config = dict(led_configs[i])
+        if profile is not None:
+            config.update(LIGHT_PROFILES[profile])
+            config['light_type'] = profile
+        config.update(changes)
+        layout[i] = config
+    pin_index = {}
+    if 'pin' in changes:
+        edited = list(indices)
+        for pin, positions in build_pin_index([layout[i] for i in edited]).items():
+            pin_index[pin] = [edited[position] for position in positions]
+    updated = {}
+    errors = []
+    warnings = []
+    for i in indices:
+        validated, led_errors, led_warnings = validate_led_config(layout[i], i, pin_index)
+        errors.extend(led_errors)
+        warnings.extend(led_warnings)
+        if validated is not None:
+            updated[i] = validated
+    if not errors:
+        try:
+            build_sync_groups([updated.get(i, config) for i, config in enumerate(layout)])
+        except ValueError as e:
+            errors.append(str(e))
+    if errors:
+        return {}, errors, warnings
+    return updated, errors, warnings
+
+# --- Plattegrond (posities en ruimtelijke index) ---
+POSITION_FIELDS = ('x', 'y') # Optionele positie van een LED op de plattegrond, in pixels van de afbeelding
+
+def led_position(config):
+    """(x, y) van een LED op de plattegrond, of None als hij (nog) niet geplaatst is."""
+    try:
+        return float(config['x']), float(config['y'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def format_number_ranges(indices):
+    """Zet LED-indices (vanaf 0) om in de selectietekst van select_leds(), bijv. "1-20,25"."""
+    parts = []
+    start = previous = None
+    for number in sorted(i + 1 for i in indices):
+        if previous is not None and number == previous + 1:
+            previous = number
+            continue
+        if start is not None:
+            parts.append(str(start) if start == previous else f"{start}-{previous}")
+        start = previous = number
+    if start is not None:
+        parts.append(str(start) if start == previous else f"{start}-{previous}")
+    return ",".join(parts)
+
+class SpatialGrid:
+    """Uniform raster (spatial hash) van LED-posities voor hit-testing op de plattegrond.
+
+    Elke cel van cell_size bij cell_size bevat de indices van de LEDs die erin liggen. Een klik of
+    hover kijkt alleen in de cellen rond het punt en een rechthoek (rubber band of het zichtbare
+    deel) alleen in de cellen die hij overlapt; de kosten hangen dus af van het aantal LEDs in de
+    buurt en niet van de grootte van de layout.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {} # (cx, cy) -> lijst van LED-indices
+        self.positions = {} # LED-index -> (x, y)
+
+    @classmethod
+    def from_configs(cls, led_configs, cell_size=64):
+        grid = cls(cell_size)
+        for i, config in enumerate(led_configs):
+            position = led_position(config)
+            if position is not None:
+                grid.insert(i, *position)
+        return grid
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, index, x, y):
+        """Plaatst (of verplaatst) een LED."""
+        self.remove(index)
+        self.positions[index] = (x, y)
+        self.cells.setdefault(self._cell(x, y), []).append(index)
+
+    def remove(self, index):
+        position = self.positions.pop(index, None)
+        if position is not None:
+            cell = self._cell(*position)
+            members = self.cells[cell]
+            members.remove(index)
+            if not members:
+                del self.cells[cell]
+
+    def query_rect(self, x0, y0, x1, y1):
+        """Indices (oplopend) van de LEDs binnen de rechthoek; de hoeken mogen in willekeurige volgorde."""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cells):
+            # Rechthoek groter dan de bezette cellen: loop alleen de bestaande cellen langs
+            cells = [members for (cx, cy), members in self.cells.items() if cx0 <= cx <= cx1 and cy0 <= cy <= cy1]
+        else:
+            cells = [self.cells[cell] for cell in
+                     ((cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)) if cell in self.cells]
+        positions = self.positions
+        return sorted(i for members in cells for i in members
+                      if x0 <= positions[i][0] <= x1 and y0 <= positions[i][1] <= y1)
+
+    def nearest(self, x, y, radius):
+        """Index van de dichtstbijzijnde LED binnen radius van (x, y), of None."""
+        best, best_distance = None, radius * radius
+        for i in self.query_rect(x - radius, y - radius, x + radius, y + radius):
+            px, py = self.positions[i]
+            distance = (px - x) ** 2 + (py - y) ** 2
+            if distance <= best_distance:
+                best, best_distance = i, distance
+        return best
+
+# --- Verdeling over Meerdere Borden ---
+# Ondersteunde borden: PWM-pinnen, beschikbaar SRAM en het standaard aantal LEDs dat tegelijk mag faden
+BOARD_TYPES = {
+    "mega2560": {'name': "Arduino Mega 2560", 'pwm_pins': PWM_PINS, 'sram_bytes': 8192, 'max_fading': 8},
+    "uno": {'name': "Arduino Uno", 'pwm_pins': [3, 5, 6, 9, 10, 11], 'sram_bytes': 2048, 'max_fading': 4},
+    "nano": {'name': "Arduino Nano", 'pwm_pins': [3, 5, 6, 9, 10, 11], 'sram_bytes': 2048, 'max_fading': 4},
+    "leonardo": {'name': "Arduino Leonardo", 'pwm_pins': [3, 5, 6, 9, 10, 11, 13], 'sram_bytes': 2560, 'max_fading': 4},
+}
+
+def parse_board_spec(spec):
+    """Zet een bordspecificatie als "mega2560:2,uno" om in een lijst bordtypes (één per bord)."""
+    boards = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        board_type, _, count = part.partition(":")
+        board_type = board_type.strip().lower()
+        if board_type not in BOARD_TYPES:
+            raise ValueError(f"Onbekend bordtype '{board_type}' (kies uit {', '.join(BOARD_TYPES)}).")
+        try:
+            count = int(count) if count else 1
+        except ValueError:
+            raise ValueError(f"Ongeldig aantal borden in '{part}'.")
+        boards.extend([board_type] * count)
+    if not boards:
+        raise ValueError("Geef minstens één bord op.")
+    return boards
+
+def fading_load(config):
+    """Verwacht aantal fades van deze LED per loop-doorgang: het deel van de cyclus dat hij fadet."""
+    cfg = compile_led_config(config)
+    fade_ms = 0
+    if cfg['fade_in']:
+        fade_ms += (cfg['min_fade_in_ms'] + cfg['max_fade_in_ms']) / 2
+    if cfg['fade_out']:
+        fade_ms += (cfg['min_fade_out_ms'] + cfg['max_fade_out_ms']) / 2
+    if fade_ms == 0 or cfg['always_off']:
+        return 0.0
+    cycle_ms = fade_ms + (cfg['min_on_ms'] + cfg['max_on_ms'] + cfg['min_off_ms'] + cfg['max_off_ms']) / 2
+    return fade_ms / cycle_ms
+
+def partition_layout(led_configs, boards, max_fading=None):
+    """Verdeelt een layout over meerdere borden en kiest per LED een PWM-pin op zijn bord.
+
+    boards is een lijst bordtypes uit BOARD_TYPES (zie parse_board_spec). Per bord gelden het aantal
+    PWM-pinnen, het SRAM-budget (zie estimate_sketch_sram; elk uniek profiel op het bord telt één keer) en het maximum aantal
+    gelijktijdig fadende LEDs (verwachte waarde volgens fading_load(); max_fading overschrijft de
+    standaard van het bord). LEDs met hetzelfde 'group' (bijv. een gebouw of straat) blijven op één bord,
+    tenzij de groep op geen enkel bord past; LEDs zonder groep worden los verdeeld. Groepen worden van
+    groot naar klein op het eerste bord geplaatst waar ze passen. Een LED houdt zijn huidige pin als die
+    op het toegewezen bord vrij en geldig is, zodat bestaande bedrading zoveel mogelijk blijft kloppen.
+
+    Retourneert {'boards': [...], 'warnings': [...]}; elk bord heeft name, type, leds (lijst van
+    {'led_index', 'pin', 'group'}), configs (klaar voor generate_arduino_code), sram_bytes en fading_load.
+    Geeft een ValueError als de layout ongeldig is of niet op de opgegeven borden past.
+    """
+    errors = []
+    validated = []
+    for i, config in enumerate(led_configs):
+        # De pin wordt hier opnieuw gekozen; valideer alleen de overige velden
+        checked, led_errors, _ = validate_led_config(dict(config, pin=PWM_PINS[0]), i, {})
+        errors.extend(led_errors)
+        validated.append(checked)
+    if errors:
+        raise ValueError("De layout bevat fouten:\n" + "\n".join(errors))
+
+    plan = []
+    for number, board_type in enumerate(boards, start=1):
+        spec = BOARD_TYPES[board_type]
+        plan.append({'name': f"bord{number}", 'type': board_type, 'leds': [], 'configs': [], 'profiles': set(),
+                     'capacity': len(spec['pwm_pins']),
+                     'max_fading': spec['max_fading'] if max_fading is None else max_fading,
+                     'fading_load': 0.0, 'sram_bytes': SKETCH_SRAM_BASE})
+
+    groups = {}
+    for i, config in enumerate(led_configs):
+        # Een synchrone groep deelt één toestandsmachine en moet dus op één bord blijven
+        group = sync_member_params(config)[0] or str(config.get('group', '')).strip()
+        groups.setdefault(group or None, []).append(i)
+    units = [(group, members) for group, members in groups.items() if group is not None]
+    units += [(None, [i]) for i in groups.get(None, ())]
+    loads = [fading_load(config) for config in validated]
+    profiles = [sketch_profile_values(config) for config in validated]
+    units.sort(key=lambda unit: (-len(unit[1]), -sum(loads[i] for i in unit[1])))
+
+    def fits(board, members):
+        num_leds = len(board['leds']) + len(members)
+        num_profiles = len(board['profiles'].union(profiles[i] for i in members))
+        # Pin + profielindex (2 bytes) en LedState per LED, plus één rij per uniek profiel
+        sram = SKETCH_SRAM_BASE + (SKETCH_STATE_BYTES + 2) * num_leds + SKETCH_PROFILE_BYTES * num_profiles
+        return num_leds <= board['capacity'] and sram <= BOARD_TYPES[board['type']]['sram_bytes'] and \
+               board['fading_load'] + sum(loads[i] for i in members) <= board['max_fading'] + 1e-9
+
+    def place(board, members, group):
+        for i in members:
+            board['leds'].append({'led_index': i, 'pin': None, 'group': group})
+            board['fading_load'] += loads[i]
+            board['profiles'].add(profiles[i])
+
+    warnings = []
+    for group, members in units:
+        board = next((board for board in plan if fits(board, members)), None)
+        if board is not None:
+            place(board, members, group)
+            continue
+        if group is None:
+            raise ValueError(f"LED {members[0] + 1} past op geen enkel bord meer: voeg borden toe of verhoog het fade-maximum.")
+        # De groep is te groot voor één bord: verdeel hem over zo min mogelijk borden
+        warnings.append(f"Groep '{group}' ({len(members)} LEDs) past niet op één bord en wordt verdeeld.")
+        remaining = list(members)
+        for board in sorted(plan, key=lambda board: board['capacity'] - len(board['leds']), reverse=True):
+            taken = []
+            for i in remaining:
+                if fits(board, taken + [i]):
+                    taken.append(i)
+            place(board, taken, group)
+            remaining = [i for i in remaining if i not in taken]
+            if not remaining:
+                break
+        if remaining:
+            raise ValueError(f"Groep '{group}' past niet op de opgegeven borden: nog {len(remaining)} LEDs over.")
+
+    for board in plan:
+        free_pins = list(BOARD_TYPES[board['type']]['pwm_pins'])
+        board['leds'].sort(key=lambda led: led['led_index'])
+        for led in board['leds']: # Eerst de LEDs waarvan de huidige pin op dit bord beschikbaar is
+            pin_str = str(led_configs[led['led_index']].get('pin', ''))
+            if pin_str.isdigit() and int(pin_str) in free_pins:
+                led['pin'] = int(pin_str)
+                free_pins.remove(led['pin'])
+        for led in board['leds']:
+            if led['pin'] is None:
+                led['pin'] = free_pins.pop(0)
+            board['configs'].append(dict(validated[led['led_index']], pin=led['pin']))
+        board['sram'] = estimate_sketch_sram(board['configs'])
+        board['sram_bytes'] = board['sram']['total_bytes']
+    return {'boards': plan, 'warnings': warnings}
+
+def generate_board_sketches(plan):
+    """Genereert per bord uit partition_layout() een sketch; retourneert {bordnaam: code}."""
+    return {board['name']: _board_sketch_header(board) + generate_arduino_code(board['configs'])
+            for board in plan['boards'] if board['leds']}
+
+def _board_sketch_header(board):
+    return (f"// {board['name']}: {BOARD_TYPES[board['type']]['name']}, {len(board['leds'])} LEDs\n"
+            f"// Gegenereerd door de Modelbaan LED Simulator; zie het bedradingsrapport voor de aansluitingen.\n")
+
+def format_wiring_report(plan, led_configs):
+    """Bedradingsrapport: per bord welke LED (nummer, lichttype, groep) op welke pin komt."""
+    lines = []
+    for board in plan['boards']:
+        spec = BOARD_TYPES[board['type']]
+        lines.append(f"{board['name']} ({spec['name']}): {len(board['leds'])}/{len(spec['pwm_pins'])} PWM-pinnen, "
+                     f"~{board['sram_bytes']}/{spec['sram_bytes']} bytes SRAM, "
+                     f"gem. {board['fading_load']:.2f}/{board['max_fading']} LEDs tegelijk aan het faden")
+        if board['leds']:
+            lines.append(f"  {format_sketch_sram(board['sram'])}")
+        for led in sorted(board['leds'], key=lambda led: led['pin']):
+            config = led_configs[led['led_index']]
+            old_pin = str(config.get('pin', ''))
+            moved = f" (was pin {old_pin})" if old_pin.isdigit() and int(old_pin) != led['pin'] else ""
+            lines.append(f"  pin {led['pin']:>2} <- LED {led['led_index'] + 1:<5} {config.get('light_type', ''):<20} "
+                         f"{led['group'] or '-'}{moved}")
+        lines.append("")
+    lines.extend(plan['warnings'])
+    return "\n".join(lines).rstrip()
+
+def write_board_sketches(plan, led_configs, output_dir):
+    """Schrijft elke sketch naar <output_dir>/<bord>/<bord>.ino (zoals de Arduino IDE verwacht) plus bedrading.txt.
+
+    Retourneert de paden die daadwerkelijk (opnieuw) geschreven zijn.
+    """
+    written = []
+    for board in plan['boards']:
+        if not board['leds']:
+            continue
+        sketch_dir = os.path.join(output_dir, board['name'])
+        os.makedirs(sketch_dir, exist_ok=True)
+        path = os.path.join(sketch_dir, f"{board['name']}.ino")
+        if write_arduino_sketch(path, board['configs'], header=_board_sketch_header(board))['written']:
+            written.append(path) # Ongewijzigde sketches blijven onaangeroerd
+    report_path = os.path.join(output_dir, "bedrading.txt")
+    with open(report_path, "w") as f:
+        f.write(format_wiring_report(plan, led_configs) + "\n")
+    written.append(report_path)
+    return written
+
+# --- Piekstroom Analyse (event-driven, gevectoriseerd) ---
+class _LedPhaseTimeline:
+    """Genereert de helderheidsgebeurtenissen van een groep LEDs met identieke (gecompileerde) config.
+
+    In plaats van elke tick te simuleren worden complete aan/uit-cycli voor alle LEDs van de groep
+    tegelijk in blokken getrokken (zelfde volgorde van fases als LedSimulator:
+    UIT -> [FADE IN] -> AAN/KNIPPERT -> [FADE UIT]). Een fade is een helling over hele tijdstappen
+    van resolution_ms; de totale helderheid is daardoor stuksgewijs lineair en volledig beschreven
+    door sprongen ('jump'), hellingswijzigingen ('slope') en het aantal brandende LEDs ('lit').
+    De pulsen van een knipperfase vormen een kam (zie _EventBuffer): aan- en uittijden worden, net
+    als in LedSimulator, naar hele tijdstappen afgerond en alle pulsen van één fase krijgen dezelfde
+    getrokken helderheid. Per moment is de verdeling van de helderheid daardoor gelijk aan die van
+    losse pulsen, maar een fase kost een vast aantal gebeurtenissen in plaats van vier per puls.
+    Een synchrone groep is één tijdlijn (count=1) met members LEDs en weight = som van hun schalen.
+    """
+
+    MAX_EVENTS_PER_BLOCK = 2000000 # Begrenst het geheugengebruik per blok
+
+    def __init__(self, compiled, count, rng, resolution_ms, block_ms, weight=1.0, members=1):
+        self.c = compiled
+        self.count = count
+        self.weight = weight # Helderheid van een gebeurtenis telt zoveel keer mee
+        self.members = members # Aantal LEDs dat per gebeurtenis aan/uit gaat
+        self.rng = rng
+        self.resolution_ms = resolution_ms # Elke fase duurt minstens één loop()-doorgang
+        self.horizon = np.zeros(count, dtype=np.int64) # Per LED: begin van de eerstvolgende nog niet gegenereerde cyclus
+
+        c = compiled
+        if c['fade_in']:
+            self.mode = 'fade'
+        elif c['blinking']:
+            self.mode = 'blink'
+        else:
+            self.mode = 'on'
+        self.use_fade_out = self.mode != 'blink' and c['fade_out']
+        # Knipperritme op hele tijdstappen, zoals LedSimulator het met een tick van resolution_ms uitvoert
+        self.blink_on_ms = max(1, -(-c['blink_on_ms'] // resolution_ms)) * resolution_ms
+        self.blink_period_ms = self.blink_on_ms + max(1, -(-c['blink_off_ms'] // resolution_ms)) * resolution_ms
+
+        # Grenzen voor alle willekeurige duren in één rng-aanroep: uit, fade in, aan, fade uit
+        self.low = np.array([c['min_off_ms'], c['min_fade_in_ms'], c['min_on_ms'], c['min_fade_out_ms']])
+        self.high = np.maximum(self.low, [c['max_off_ms'], c['max_fade_in_ms'], c['max_on_ms'], c['max_fade_out_ms']]) + 1
+        self.used = np.array([True, self.mode == 'fade', True, self.use_fade_out])
+
+        mean_cycle = max(float(((self.low + self.high - 1) / 2)[self.used].sum()), 2 * resolution_ms)
+        self.block_cycles = int(max(1, min(1.25 * block_ms / mean_cycle, self.MAX_EVENTS_PER_BLOCK / (count * 6))))
+
+    def _brightness(self, shape, variable=True):
+        c = self.c
+        if not variable:
+            return np.full(shape, 255.0)
+        return self.rng.integers(c['min_bright'], max(c['min_bright'], c['max_bright']) + 1, size=shape).astype(float)
+
+    def _ramp(self, events, t_start, t_end, delta, at_start=None, at_end=None):
+        """Voegt een lineaire overgang van delta tussen t_start en t_end toe aan events.
+
+        at_start/at_end (soort -> waarden) vallen op hetzelfde moment en delen daardoor de index.
+        """
+        steps = t_end // self.resolution_ms - t_start // self.resolution_ms
+        slope = np.divide(delta, steps, out=np.zeros_like(delta), where=steps > 0)
+        instant = steps == 0 # Korter dan één tijdstap: directe sprong
+        start = {'slope': slope, **(at_start or {})}
+        if instant.any():
+            start['jump'] = np.where(instant, delta, 0.0)
+        events.append((t_start, start))
+        events.append((t_end, {'slope': -slope, **(at_end or {})}))
+
+    def generate_block(self):
+        """Trekt het volgende blok cycli; retourneert een lijst van (tijden_ms, {soort: waarden})."""
+        c = self.c
+        shape = (self.count, self.block_cycles)
+        # Per soort duur een eigen trekking met vaste grenzen (veel sneller dan één trekking met grenzen per kolom)
+        unused = np.zeros(shape, dtype=np.int64)
+        off, fi, on, fo = (np.maximum(self.rng.integers(low, high, size=shape), self.resolution_ms) if used else unused
+                           for low, high, used in zip(self.low.tolist(), self.high.tolist(), self.used))
+        active = fi + on + fo
+        cycle_end = self.horizon[:, None] + np.cumsum(off + active, axis=1)
+        lit_start = cycle_end - active
+        self.horizon = cycle_end[:, -1]
+
+        events = []
+        if self.mode == 'blink':
+            # Hele pulsen als één kam per fase; alleen de laatste, afgebroken puls los
+            on_ms, period = self.blink_on_ms, self.blink_period_ms
+            comb = ('jump', period // self.resolution_ms), ('lit', period // self.resolution_ms)
+            lit_start, on = lit_start.ravel(), on.ravel()
+            full = on // period
+            level = self._brightness(lit_start.shape)
+            lit = (level > 0).astype(float) * self.members
+            level *= self.weight
+            comb_end = lit_start + full * period
+            events += [(lit_start, {comb[0]: level, comb[1]: lit}), (lit_start + on_ms, {comb[0]: -level, comb[1]: -lit}),
+                       (comb_end, {comb[0]: -level, comb[1]: -lit}), (comb_end + on_ms, {comb[0]: level, comb[1]: lit})]
+            partial = on > full * period
+            last_end = comb_end[partial] + np.minimum(on[partial] - full[partial] * period, on_ms)
+            events += [(comb_end[partial], {'jump': level[partial], 'lit': lit[partial]}),
+                       (last_end, {'jump': -level[partial], 'lit': -lit[partial]})]
+        else:
+            target = self._brightness(shape, c['var_bright'])
+            lit = (target > 0).astype(float) * self.members
+            target *= self.weight
+            on_start = lit_start + fi
+            on_end = on_start + on
+            if self.mode == 'fade':
+                self._ramp(events, lit_start, on_start, target, at_start={'lit': lit})
+            else:
+                events.append((on_start, {'jump': target, 'lit': lit}))
+            if self.use_fade_out:
+                self._ramp(events, on_end, on_end + fo, -target, at_end={'lit': -lit})
+            else:
+                events.append((on_end, {'jump': -target, 'lit': -lit}))
+        return events
+
+class _EventBuffer:
+    """Rollende verschilarrays (per tijdstap) waarin gebeurtenissen direct worden opgeteld.
+
+    Naast 'jump', 'slope' en 'lit' bestaan kammen: de soort (soort, periode) telt een waarde op
+    elke periode-ste tijdstap vanaf het gebeurtenismoment op de gewone soort op, tot een tegengestelde
+    waarde de kam stopt. pop() rolt een kam uit met een cumulatieve som over kolommen van periode
+    tijdstappen; de laatste periode van die som gaat mee naar het volgende brok.
+    De arrays zijn ringbuffers (head is de tijdstap van start_ms), zodat pop() niets hoeft te verschuiven.
+    Gebeurtenissen die (nog) buiten de capaciteit vallen worden apart bewaard tot ze binnen bereik komen.
+    """
+
+    KINDS = ('jump', 'slope', 'lit')
+    MAX_PENDING = 4000000 # Zoveel gebeurtenissen worden verzameld voordat ze worden opgeteld
+
+    def __init__(self, resolution_ms, capacity_bins, end_ms):
+        self.resolution_ms = resolution_ms
+        self.capacity = capacity_bins
+        self.end_ms = end_ms # Gebeurtenissen na het einde van de simulatie zijn niet relevant
+        self.start_ms = 0
+        self.head = 0
+        self.bins = {kind: np.zeros(capacity_bins) for kind in self.KINDS}
+        self.carry = {} # Kam -> de laatste periode van de uitgerolde som
+        self.far = []
+        self.pending = {} # Soort -> [(indices, waarden)], pas bij _flush() opgeteld
+        self.pending_count = 0
+
+    def add(self, events):
+        for times, values in events:
+            times = times.ravel()
+            index = (times - self.start_ms) // self.resolution_ms
+            near = index < self.capacity
+            values = {kind: value.ravel() for kind, value in values.items()}
+            if not near.all():
+                far = ~near & (times < self.end_ms)
+                self.far.append((times[far], {kind: value[far] for kind, value in values.items()}))
+                index = index[near]
+                values = {kind: value[near] for kind, value in values.items()}
+            for kind, value in values.items():
+                self.pending.setdefault(kind, []).append((index, value))
+            self.pending_count += len(index)
+        if self.pending_count > self.MAX_PENDING:
+            self._flush()
+
+    def _flush(self):
+        """Telt de verzamelde gebeurtenissen per soort op bij de verschilarrays."""
+        for kind, parts in self.pending.items():
+            if kind not in self.bins:
+                self.bins[kind] = np.zeros(self.capacity)
+                self.carry[kind] = np.zeros(kind[1])
+            index = np.concatenate([index for index, _ in parts])
+            values = np.concatenate([value for _, value in parts])
+            bins = self.bins[kind]
+            if len(index) * 8 < self.capacity: # Weinig gebeurtenissen: geen array ter grootte van de buffer aanmaken
+                np.add.at(bins, (index + self.head) % self.capacity, values)
+                continue
+            counts = np.bincount(index, values) # Relatief aan head; daarna in (hooguit) twee delen in de ring
+            wrap = self.capacity - self.head
+            bins[self.head:self.head + len(counts)] += counts[:wrap]
+            if len(counts) > wrap:
+                bins[:len(counts) - wrap] += counts[wrap:]
+        self.pending = {}
+        self.pending_count = 0
+
+    def _unroll(self, kind, values):
+        """Rolt de kam kind uit over values (de eerstvolgende tijdstappen)."""
+        period = kind[1]
+        padded = np.zeros(-(-(len(values) + period) // period) * period)
+        padded[:period] = self.carry[kind]
+        padded[period:period + len(values)] = values
+        total = padded.reshape(-1, period).cumsum(axis=0).ravel()
+        carry = total[len(values):len(values) + period]
+        self.carry[kind] = np.where(np.abs(carry) < 1e-6, 0.0, carry) # Afgesloten kammen: afrondingsrest weg
+        return total[period:period + len(values)]
+
+    def pop(self, n_bins):
+        """Geeft de eerste n_bins tijdstappen per soort terug en schuift de buffer op."""
+        self._flush()
+        out = {}
+        positions = (self.head + np.arange(n_bins)) % self.capacity if self.head + n_bins > self.capacity else \
+            slice(self.head, self.head + n_bins)
+        for kind in list(self.bins):
+            values = self.bins[kind][positions].copy()
+            self.bins[kind][positions] = 0
+            if kind in self.KINDS:
+                out[kind] = values
+            else:
+                out[kind[0]] = out[kind[0]] + self._unroll(kind, values)
+        self.start_ms += n_bins * self.resolution_ms
+        self.head = (self.head + n_bins) % self.capacity
+        far, self.far = self.far, []
+        self.add(far)
+        return out
+
+def sweep_peak_current(led_configs, duration_ms, ma_per_led=20.0, resolution_ms=10, window_ms=1000,
+                       top_windows=10, percentile=99.9, seed=None):
+    """Simuleert de hele layout event-driven over een (lange) periode en analyseert de totale stroom.
+
+    Retourneert een dict met de tijdsverdeling van het aantal gelijktijdig brandende LEDs,
+    de piekstroom, het gevraagde percentiel van de stroom en de zwaarste tijdvensters.
+    Stroom per LED wordt lineair met de PWM-waarde geschaald: ma_per_led bij helderheid 255.
+    De leden van een synchrone groep schakelen samen (hun vertragingen worden genegeerd, wat de
+    piek hooguit overschat).
+    """
+    _require_numpy("De piekstroom analyse")
+    resolution_ms = int(resolution_ms)
+    window_ms = int(window_ms)
+    if resolution_ms <= 0 or window_ms <= 0 or window_ms % resolution_ms:
+        raise ValueError("window_ms moet een positief veelvoud van resolution_ms zijn.")
+    duration_ms = int(duration_ms)
+    if duration_ms <= 0:
+        raise ValueError("De simulatieduur moet groter dan 0 zijn.")
+
+    num_leds = len(led_configs)
+    # LEDs met identieke parameters worden als één groep gevectoriseerd gegenereerd
+    groups = {}
+    sync_groups = {} # Synchrone groep -> [gecompileerde config, aantal leden, som van de schalen]
+    for config in led_configs:
+        compiled = compile_led_config(config)
+        if compiled['always_off']:
+            continue
+        name, _, scale = sync_member_params(config)
+        if name:
+            entry = sync_groups.setdefault(name, [compiled, 0, 0])
+            entry[1] += 1
+            entry[2] += scale
+            continue
+        key = tuple(sorted(compiled.items()))
+        groups[key] = groups.get(key, 0) + 1
+    # Verwerk de tijd in brokken van ~2 uur zodat het geheugengebruik begrensd blijft
+    chunk_ms = max(window_ms, (2 * 3600 * 1000 // window_ms) * window_ms)
+    seeds = np.random.SeedSequence(seed).spawn(len(groups) + len(sync_groups))
+    timelines = [_LedPhaseTimeline(dict(key), count, np.random.Generator(np.random.PCG64(s)), resolution_ms, chunk_ms)
+                 for (key, count), s in zip(groups.items(), seeds)]
+    timelines += [_LedPhaseTimeline(compiled, 1, np.random.Generator(np.random.PCG64(s)), resolution_ms, chunk_ms,
+                                    weight=scale_sum / 100, members=members)
+                  for (compiled, members, scale_sum), s in zip(sync_groups.values(), seeds[len(groups):])]
+
+    window_bins = window_ms // resolution_ms
+    chunk_bins = chunk_ms // resolution_ms
+    buffer = _EventBuffer(resolution_ms, 3 * chunk_bins, duration_ms)
+
+    lit_time_ms = np.zeros(num_leds + 1)
+    level_hist = np.zeros(255 * num_leds + 1)
+    level_sum = 0.0
+    peak_level, peak_time = 0.0, 0
+    worst = [] # (piekniveau, vensterstart, piektijd, aantal brandend)
+    level_carry, slope_carry, lit_carry = 0.0, 0.0, 0
+
+    chunk_start = 0
+    while chunk_start < duration_ms:
+        chunk_end = min(duration_ms, chunk_start + chunk_ms)
+        n_bins = -(-(chunk_end - chunk_start) // window_ms) * window_bins
+        for timeline in timelines:
+            while timeline.horizon.min() < chunk_end:
+                buffer.add(timeline.generate_block())
+        diffs = buffer.pop(chunk_bins)
+
+        # Integreer de verschilarrays, vanaf de stand aan het eind van het vorige brok
+        slope_acc = slope_carry + np.cumsum(diffs['slope'][:n_bins])
+        level = level_carry + np.cumsum(diffs['jump'][:n_bins] + np.concatenate(([slope_carry], slope_acc[:-1])))
+        lit = lit_carry + np.rint(np.cumsum(diffs['lit'][:n_bins])).astype(np.int64)
+
+        valid = (chunk_end - chunk_start) // resolution_ms # Laatste brok kan korter zijn dan de vensters
+        level_carry, slope_carry, lit_carry = level[valid - 1], slope_acc[valid - 1], lit[valid - 1]
+        if lit_carry == 0:
+            level_carry = slope_carry = 0.0 # Voorkom opstapelende afrondingsfouten
+        level[valid:] = 0
+        lit[valid:] = 0
+        np.maximum(level, 0, out=level)
+
+        lit_time_ms += np.bincount(lit[:valid], minlength=num_leds + 1) * resolution_ms
+        level_hist += np.bincount(np.rint(level[:valid]).astype(np.int64), minlength=level_hist.size)[:level_hist.size]
+        level_sum += level[:valid].sum()
+
+        per_window = level.reshape(-1, window_bins)
+        window_peak = per_window.max(axis=1)
+        window_arg = per_window.argmax(axis=1)
+        candidates = np.argsort(window_peak)[::-1][:top_windows]
+        for w in candidates:
+            peak_bin = w * window_bins + window_arg[w]
+            worst.append((float(window_peak[w]), chunk_start + int(w) * window_ms,
+                          chunk_start + int(peak_bin) * resolution_ms, int(lit[peak_bin])))
+        worst = heapq.nlargest(top_windows, worst)
+
+        chunk_peak = int(level.argmax())
+        if level[chunk_peak] > peak_level:
+            peak_level, peak_time = float(level[chunk_peak]), chunk_start + chunk_peak * resolution_ms
+        chunk_start = chunk_end
+
+    to_ma = ma_per_led / 255.0
+    cumulative = np.cumsum(level_hist)
+    percentile_level = int(np.searchsorted(cumulative, cumulative[-1] * percentile / 100.0))
+    lit_fraction = lit_time_ms / lit_time_ms.sum()
+    max_lit = int(np.nonzero(lit_time_ms)[0].max())
+
+    return {
+        'num_leds': num_leds,
+        'duration_ms': duration_ms,
+        'resolution_ms': resolution_ms,
+        'ma_per_led': ma_per_led,
+        'lit_distribution': [float(f) for f in lit_fraction[:max_lit + 1]],
+        'max_lit': max_lit,
+        'mean_ma': level_sum / (duration_ms // resolution_ms) * to_ma,
+        'peak_ma': peak_level * to_ma,
+        'peak_time_ms': peak_time,
+        'percentile': percentile,
+        'percentile_ma': percentile_level * to_ma,
+        'worst_windows': [{'window_start_ms': w_start, 'window_ms': window_ms, 'peak_time_ms': t_peak,
+                           'peak_ma': level_value * to_ma, 'lit': lit_count}
+                          for level_value, w_start, t_peak, lit_count in worst],
+    }
+
+def format_peak_current_report(result):
+    """Maakt een leesbaar rapport van het resultaat van sweep_peak_current."""
+    lines = [
+        f"Piekstroom analyse: {result['num_leds']} LEDs over {format_sim_time(result['duration_ms'])} "
+        f"(resolutie {result['resolution_ms']} ms, {result['ma_per_led']:.1f} mA per LED op helderheid 255)",
+        f"Gemiddelde stroom: {result['mean_ma']:.1f} mA",
+        f"Piekstroom: {result['peak_ma']:.1f} mA op {format_sim_time(result['peak_time_ms'])}",
+        f"{result['percentile']}e percentiel: {result['percentile_ma']:.1f} mA",
+        f"Maximaal gelijktijdig brandend: {result['max_lit']} LEDs",
+        "",
+        "Verdeling gelijktijdig brandende LEDs (aandeel van de tijd):",
+    ]
+    # Bij grote layouts worden de aantallen in maximaal ~25 klassen samengevoegd
+    distribution = result['lit_distribution']
+    step = max(1, -(-len(distribution) // 25))
+    for first in range(0, len(distribution), step):
+        fraction = sum(distribution[first:first + step])
+        if fraction > 0:
+            label = f"{first:5d}" if step == 1 else f"{first:5d}-{min(first + step, len(distribution)) - 1:<5d}"
+            lines.append(f"  {label} LEDs: {fraction * 100:8.4f}%")
+    lines.append("")
+    lines.append("Zwaarste tijdvensters:")
+    for w in result['worst_windows']:
+        lines.append(f"  {format_sim_time(w['window_start_ms'])} (+{w['window_ms']} ms): "
+                     f"{w['peak_ma']:.1f} mA op {format_sim_time(w['peak_time_ms'])}, {w['lit']} LEDs aan")
+    return "\n".join(lines)
+
+
+# --- Bus-latentie van de Uitgang ---
+def output_bus_time_us(backend, dirty_channels, num_leds):
+    """Bustijd (µs) van één flushLeds() in de sketch als de gegeven kanalen (oplopend) gewijzigd zijn."""
+    spec = OUTPUT_BACKENDS[backend]
+    if not dirty_channels:
+        return 0.0
+    if backend == "native":
+        return spec['write_us'] * len(dirty_channels)
+    byte_us = 1e6 * (9 if backend == "pca9685" else 8) / spec['bus_hz'] # I2C heeft een ACK-bit per byte
+    if backend == "tlc5940":
+        # Bij elke wijziging wordt de hele keten opnieuw geschoven
+        num_chips = -(-num_leds // spec['channels_per_chip'])
+        return spec['transaction_us'] + num_chips * spec['bytes_per_chip'] * byte_us
+    # PCA9685: dezelfde bursts als flushLeds(): opeenvolgende kanalen op één chip, max burst_channels per transactie
+    total_us = 0.0
+    channels = spec['channels_per_chip']
+    position = 0
+    while position < len(dirty_channels):
+        first = dirty_channels[position]
+        limit = min(first + spec['burst_channels'], (first // channels + 1) * channels, num_leds)
+        last = first
+        while position < len(dirty_channels) and dirty_channels[position] < limit:
+            last = dirty_channels[position]
+            position += 1
+        total_us += spec['transaction_us'] + (2 + 4 * (last - first + 1)) * byte_us # Adres + register + 4 bytes per kanaal
+    return total_us
+
+def model_output_latency(led_configs, backend, duration_ms=60000, tick_ms=10, seed=None):
+    """Voorspelt de bustijd per loop() en de haalbare verversing van een layout op een uitgang.
+
+    Simuleert de layout met SimulationTimeline en telt per tick welke kanalen van helderheid wisselen
+    (wat de sketch in die tijd via setLed() zou markeren). Per tick wordt de bustijd van flushLeds()
+    berekend met output_bus_time_us(), plus LOOP_US_PER_LED rekentijd per LED; de verversing is
+    1 / (rekentijd + bustijd). Bij de TLC5940 begrenst ook de latch-periode van de keten de verversing.
+    """
+    if backend not in OUTPUT_BACKENDS:
+        raise ValueError(f"Onbekende uitgang '{backend}' (kies uit {', '.join(OUTPUT_BACKENDS)}).")
+    num_leds = len(led_configs)
+    capacity = output_channel_capacity(backend)
+    if capacity is not None and num_leds > capacity:
+        raise ValueError(f"{OUTPUT_BACKENDS[backend]['name']} ondersteunt maximaal {capacity} LEDs.")
+    sims = build_simulators(led_configs, seed=seed)
+    timeline = SimulationTimeline(sims, tick_ms=tick_ms)
+    previous = [0] * num_leds
+    bus_times = []
+    dirty_counts = []
+    for t_ms in range(tick_ms, duration_ms + tick_ms, tick_ms):
+        timeline.advance_to(t_ms)
+        dirty = []
+        for i, sim in enumerate(sims):
+            if sim.current_brightness != previous[i]:
+                previous[i] = sim.current_brightness
+                dirty.append(i)
+        dirty_counts.append(len(dirty))
+        bus_times.append(output_bus_time_us(backend, dirty, num_leds))
+
+    cpu_us = LOOP_US_PER_LED * num_leds
+    latch_us = OUTPUT_BACKENDS[backend].get('latch_period_us', 0.0)
+    ordered = sorted(bus_times)
+
+    def refresh_hz(bus_us):
+        return 1e6 / max(cpu_us + bus_us, latch_us, 1.0)
+
+    p99_us = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else 0.0
+    worst_us = output_bus_time_us(backend, list(range(num_leds)), num_leds)
+    return {
+        'backend': backend, 'num_leds': num_leds, 'duration_ms': duration_ms, 'tick_ms': tick_ms,
+        'loop_cpu_us': cpu_us,
+        'dirty_mean': sum(dirty_counts) / max(len(dirty_counts), 1), 'dirty_max': max(dirty_counts, default=0),
+        'bus_us_mean': sum(bus_times) / max(len(bus_times), 1), 'bus_us_p99': p99_us,
+        'bus_us_max': ordered[-1] if ordered else 0.0, 'bus_us_all_channels': worst_us,
+        'refresh_hz_mean': refresh_hz(sum(bus_times) / max(len(bus_times), 1)),
+        'refresh_hz_p99': refresh_hz(p99_us), 'refresh_hz_all_channels': refresh_hz(worst_us),
+    }
+
+def format_output_latency_report(result):
+    """Maakt een leesbaar rapport van model_output_latency()."""
+    spec = OUTPUT_BACKENDS[result['backend']]
+    return "\n".join([
+        f"{spec['name']}: {result['num_leds']} LEDs, {format_sim_time(result['duration_ms'])} gesimuleerd (tick {result['tick_ms']} ms)",
+        f"Gewijzigde kanalen per tick: gemiddeld {result['dirty_mean']:.1f}, maximaal {result['dirty_max']}",
+        f"Rekentijd loop(): ~{result['loop_cpu_us']:.0f} µs",
+        f"Bustijd per loop(): gemiddeld {result['bus_us_mean']:.0f} µs, p99 {result['bus_us_p99']:.0f} µs, "
+        f"max {result['bus_us_max']:.0f} µs, alle kanalen {result['bus_us_all_channels']:.0f} µs",
+        f"Haalbare verversing: {result['refresh_hz_mean']:.0f} Hz gemiddeld, {result['refresh_hz_p99']:.0f} Hz (p99), "
+        f"{result['refresh_hz_all_channels']:.0f} Hz als alle kanalen tegelijk wijzigen",
+    ])
+
+# --- Heatmap van de hele layout (PhotoImage) ---
+def _heatmap_channel_tables():
+    """Vertaaltabellen (bytes.translate) van helderheid naar rood, groen en blauw: zwart -> oranje -> warmwit."""
+    red, green, blue = bytearray(256), bytearray(256), bytearray(256)
+    for value in range(256):
+        red[value] = min(255, 40 + value) if value else 25
+        green[value] = min(255, value * value // 300 + value // 4) if value else 25
+        blue[value] = value * value // 700 if value else 30
+    return bytes(red), bytes(green), bytes(blue)
+
+class HeatmapRenderer:
+    """Zet een helderheidsarray in één keer om naar een PPM-afbeelding met één pixel per LED.
+
+    De LEDs staan in een raster van `columns` breed (standaard zo vierkant mogelijk). Het omzetten
+    gebeurt volledig in C: drie bytes.translate() aanroepen voor de kleurkanalen en slice-toewijzing
+    om ze te verweven, dus ook 10.000+ LEDs kosten minder dan een milliseconde. In het venster
+    vergroot Tk de afbeelding (PhotoImage-zoom); render(scale=...) is voor headless uitvoer.
+    """
+
+    def __init__(self, num_leds, columns=None):
+        self.num_leds = num_leds
+        self.columns = columns or max(1, int(-(-num_leds ** 0.5 // 1)))
+        self.rows = max(1, -(-num_leds // self.columns))
+        self.header = f"P6 {self.columns} {self.rows} 255\n".encode("ascii")
+        self._padding = bytes(self.columns * self.rows - num_leds)
+        self._tables = _heatmap_channel_tables()
+        self._pixels = bytearray(3 * self.columns * self.rows)
+
+    def render(self, brightness, scale=1):
+        """Retourneert de PPM-bytes (P6) voor een bytes-achtige reeks helderheden (0-255).
+
+        Met scale > 1 wordt elke LED een blok van scale x scale pixels.
+        """
+        values = bytes(brightness[:self.num_leds]) + self._padding
+        header, pixels = self.header, self._pixels
+        if scale > 1:
+            values = self._enlarge(values, scale)
+            header = f"P6 {self.columns * scale} {self.rows * scale} 255\n".encode("ascii")
+            pixels = bytearray(3 * len(values))
+        red, green, blue = self._tables
+        pixels[0::3] = values.translate(red)
+        pixels[1::3] = values.translate(green)
+        pixels[2::3] = values.translate(blue)
+        return header + pixels
+
+    def _enlarge(self, values, scale):
+        # Eerst elke waarde scale keer naast elkaar (slice-toewijzing), daarna elke rij scale keer onder elkaar
+        wide = bytearray(len(values) * scale)
+        for offset in range(scale):
+            wide[offset::scale] = values
+        width = self.columns * scale
+        return b"".join(bytes(wide[row * width:(row + 1) * width]) * scale for row in range(self.rows))
+
+    def led_at(self, x, y):
+        """Index van de LED op pixel (x, y) van de onvergrote afbeelding, of None."""
+        if not (0 <= x < self.columns and 0 <= y < self.rows):
+            return None
+        index = int(y) * self.columns + int(x)
+        return index if index < self.num_leds else None
+
+def render_layout_heatmaps(led_configs, times_ms, columns=None, scale=1, seed=None):
+    """Simuleert de hele layout headless en rendert de heatmap op elk tijdstip uit times_ms (oplopend).
+
+    Generator: levert per tijdstip een dict met sim_time_ms, ppm (P6-bytes van HeatmapRenderer),
+    lit (aantal LEDs aan), sim_ms en render_ms (rekentijd van de simulatiestap en van het renderen).
+    Geeft een ValueError bij een lege layout of een schaal kleiner dan 1.
+    """
+    if not led_configs:
+        raise ValueError("De layout bevat geen LEDs.")
+    if scale < 1:
+        raise ValueError("De schaal moet minstens 1 zijn.")
+    renderer = HeatmapRenderer(len(led_configs), columns)
+    timeline = SimulationTimeline(build_simulators(led_configs, seed=seed))
+    for t_ms in times_ms:
+        started = time.perf_counter()
+        timeline.advance_to(t_ms)
+        brightness = bytes(sim.current_brightness for sim in timeline.simulators)
+        simulated = time.perf_counter()
+        ppm = renderer.render(brightness, scale)
+        yield {'sim_time_ms': timeline.time_ms, 'ppm': ppm, 'lit': len(brightness) - brightness.count(0),
+               'sim_ms': (simulated - started) * 1000, 'render_ms': (time.perf_counter() - simulated) * 1000}
+
+# --- Benchmarks (headless) ---
+BENCHMARK_SIZES = (15, 1000, 100000)
+# Per simulatiemodus het profiel waarmee die modus in de praktijk voorkomt
+BENCHMARK_MODE_PROFILES = {
+    LedSimulator.MODE_OFF: "Woonkamer Licht",
+    LedSimulator.MODE_ON: "Woonkamer Licht",
+    LedSimulator.MODE_FADE_IN: "Woonkamer Licht",
+    LedSimulator.MODE_FADE_OUT: "Woonkamer Licht",
+    LedSimulator.MODE_BLINKING: "TV Simulatie",
+}
+
+def make_benchmark_layout(num_leds):
+    """Vaste, reproduceerbare layout: de profielen en PWM-pinnen om de beurt.
+
+    De pinnen zijn alleen uniek tot len(PWM_PINS) LEDs; daarboven herhalen ze zich.
+    """
+    names = list(LIGHT_PROFILES)
+    layout = []
+    for i in range(num_leds):
+        config = dict(LIGHT_PROFILES[names[i % len(names)]])
+        config['light_type'] = names[i % len(names)]
+        config['pin'] = str(PWM_PINS[i % len(PWM_PINS)])
+        layout.append(config)
+    return layout
+
+def _best_time(func, repeat, min_time_s=0.05):
+    """Kortste looptijd (s) van één aanroep van func, zoals timeit dat meet.
+
+    Korte functies worden per poging zo vaak herhaald dat een poging minstens min_time_s duurt,
+    zodat kleine layouts geen ruis van de klok meten.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time_s:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+def _bench_simulator_update(mode, num_leds, repeat, update_budget):
+    """update()-ticks per seconde voor num_leds simulators die in de gegeven modus blijven."""
+    config = LIGHT_PROFILES[BENCHMARK_MODE_PROFILES[mode]]
+    shared_rng = random.Random(0) # Eén generator voor alle simulators houdt 100.000 LEDs klein in geheugen
+    sims = []
+    for _ in range(num_leds):
+        sim = LedSimulator(config)
+        sim.rng = shared_rng
+        # Houd de simulator vast in deze modus: de fase (en een eventuele fade) duurt 'eeuwig'
+        sim.current_mode = mode
+        sim.last_toggle_time = sim.fade_start_time = sim.last_blink_toggle_time = 0
+        sim.current_duration = sim.fade_duration = 2 ** 31
+        sim.fade_in_target_brightness = sim.fade_start_brightness = 255
+        sims.append(sim)
+    ticks = max(1, update_budget // num_leds)
+    clock = [0]
+
+    def run():
+        for _ in range(ticks):
+            clock[0] += 10
+            t = clock[0]
+            for sim in sims:
+                sim.update(t)
+
+    seconds = _best_time(run, repeat)
+    return {'operations': ticks * num_leds, 'seconds': seconds, 'unit': 'updates',
+            'latency_ms': seconds / ticks * 1000} # Eén tick voor alle LEDs
+
+def _bench_fading_timeline(num_leds, vectorize_fades=True):
+    """SimulationTimeline waarin alle num_leds simulators midden in een fade-in van 1-4 s zitten."""
+    config = LIGHT_PROFILES[BENCHMARK_MODE_PROFILES[LedSimulator.MODE_FADE_IN]]
+    rng = random.Random(num_leds)
+    sims = []
+    for _ in range(num_leds):
+        sim = LedSimulator(config)
+        sim.current_mode = LedSimulator.MODE_FADE_IN
+        sim.fade_duration = rng.choice((1000, 2000, 3000, 4000))
+        sim.fade_in_target_brightness = rng.choice((128, 200, 255))
+        sims.append(sim)
+    return SimulationTimeline(sims, max_checkpoints=1, vectorize_fades=vectorize_fades)
+
+def run_benchmarks(sizes=BENCHMARK_SIZES, repeat=3, update_budget=300000):
+    """Meet doorvoer en latentie van de hete paden bij elk aantal LEDs in sizes.
+
+    Scenario's: LedSimulator.update per modus, de fades van een hele tijdlijn in één frame (uit de
+    gedeelde FADE_TABLES en ter vergelijking met update() per LED),
+    validatie van een hele layout, het renderen van een heatmap-frame, generate_arduino_code en opslaan/laden van een layout. Retourneert een JSON-vriendelijke dict.
+    """
+    results = {}
+
+    def add(key, entry):
+        entry['throughput_per_s'] = entry['operations'] / entry['seconds'] if entry['seconds'] > 0 else float('inf')
+        results[key] = {name: (round(value, 6) if isinstance(value, float) else value) for name, value in entry.items()}
+
+    for num_leds in sizes:
+        for mode, mode_name in LedSimulator.MODE_NAMES.items():
+            add(f"simulator_update/{mode_name}/n={num_leds}",
+                _bench_simulator_update(mode, num_leds, repeat, update_budget))
+
+        timeline = _bench_fading_timeline(num_leds, vectorize_fades=False)
+        reference = _best_time(lambda: timeline._refresh_fades(500), repeat)
+        timeline = _bench_fading_timeline(num_leds)
+        seconds = _best_time(lambda: timeline._refresh_fades(500), repeat)
+        add(f"timeline_fades/n={num_leds}",
+            {'operations': num_leds, 'seconds': seconds, 'unit': 'LEDs', 'latency_ms': seconds * 1000,
+             'speedup_vs_update': reference / seconds})
+        add(f"timeline_fades_per_led/n={num_leds}",
+            {'operations': num_leds, 'seconds': reference, 'unit': 'LEDs', 'latency_ms': reference * 1000})
+
+        layout = make_benchmark_layout(num_leds)
+        # Meer LEDs dan PWM-pinnen kan niet zonder dubbele pinnen: meet dan zonder die controle,
+        # anders meet het scenario alleen het foutpad
+        check_pins = num_leds <= len(PWM_PINS)
+        if any(errors for _, errors, _ in validate_layout(layout, check_pins)):
+            raise RuntimeError(f"De benchmark-layout van {num_leds} LEDs is ongeldig.")
+        seconds = _best_time(lambda: validate_layout(layout, check_pins), repeat)
+        add(f"validate_layout/n={num_leds}",
+            {'operations': num_leds, 'seconds': seconds, 'unit': 'LEDs', 'latency_ms': seconds * 1000,
+             'pin_check': check_pins})
+
+        renderer = HeatmapRenderer(num_leds)
+        frame = bytes(random.Random(num_leds).randrange(256) for _ in range(num_leds))
+        seconds = _best_time(lambda: renderer.render(frame), repeat)
+        add(f"heatmap_render/n={num_leds}",
+            {'operations': num_leds, 'seconds': seconds, 'unit': 'LEDs', 'latency_ms': seconds * 1000})
+
+        code = generate_arduino_code(layout)
+        seconds = _best_time(lambda: generate_arduino_code(layout), repeat)
+        add(f"generate_arduino_code/n={num_leds}",
+            {'operations': num_leds, 'seconds': seconds, 'unit': 'LEDs', 'latency_ms': seconds * 1000,
+             'output_bytes': len(code.encode('utf-8'))})
+
+        handle, file_path = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        try:
+            def roundtrip():
+                write_layout_file(file_path, layout, {"simulation_speed_factor": 1.0})
+                read_layout_file(file_path)
+            seconds = _best_time(roundtrip, repeat)
+            add(f"layout_roundtrip/n={num_leds}",
+                {'operations': num_leds, 'seconds': seconds, 'unit': 'LEDs', 'latency_ms': seconds * 1000,
+                 'file_bytes': os.path.getsize(file_path)})
+        finally:
+            os.remove(file_path)
+
+    return {
+        'meta': {
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'numpy': np is not None, 'sizes': list(sizes), 'repeat': repeat,
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        'results': results,
+    }
+
+def compare_benchmarks(current, baseline, tolerance=0.2):
+    """Vergelijkt doorvoer met een eerder opgeslagen baseline.
+
+    Een scenario is een regressie als de doorvoer meer dan tolerance (fractie) onder de baseline ligt.
+    Retourneert een lijst met per gemeenschappelijk scenario de baseline, de huidige waarde en de status.
+    """
+    comparison = []
+    for key, entry in current['results'].items():
+        base = baseline.get('results', {}).get(key)
+        if not base or not base.get('throughput_per_s'):
+            continue
+        ratio = entry['throughput_per_s'] / base['throughput_per_s']
+        if ratio < 1 - tolerance:
+            status = "regressie"
+        elif ratio > 1 + tolerance:
+            status = "sneller"
+        else:
+            status = "ok"
+        comparison.append({'scenario': key, 'baseline_per_s': base['throughput_per_s'],
+                           'current_per_s': entry['throughput_per_s'],
+                           'change_pct': round((ratio - 1) * 100, 1), 'status': status})
+    return comparison
+
+def format_benchmark_report(result, comparison=None):
+    """Maakt een leesbare tabel van run_benchmarks() en (optioneel) compare_benchmarks()."""
+    meta = result['meta']
+    lines = [f"Benchmarks (Python {meta['python']}, NumPy {'ja' if meta['numpy'] else 'nee'}, beste van {meta['repeat']})",
+             f"{'Scenario':<45}{'doorvoer/s':>15}{'latentie ms':>14}"]
+    for key, entry in result['results'].items():
+        label = f"{key} (zonder pincontrole)" if entry.get('pin_check') is False else key
+        lines.append(f"{label:<45}{entry['throughput_per_s']:>15,.0f}{entry['latency_ms']:>14.3f}")
+    if comparison is not None:
+        lines.append("")
+        lines.append(f"Vergelijking met baseline ({len(comparison)} scenario's):")
+        for item in comparison:
+            lines.append(f"  {item['scenario']:<45}{item['change_pct']:>+8.1f}%  {item['status']}")
+    return "\n".join(lines)
+
+
+class LayoutHeatmapWindow:
+    """Venster met de hele layout als heatmap: één canvas-item met een PhotoImage, één pixelblok per LED.
+
+    De layout draait op een eigen SimulationWorker. Per frame wordt de helderheidsarray met
+    HeatmapRenderer in één keer in een basisafbeelding (1 pixel per LED) geladen en met Tk's
+    copy -zoom vergroot in de getoonde afbeelding. Zoomen (muiswiel) en slepen veranderen alleen de
+    zoomfactor en de positie van dat ene item.
+    """
+
+    MAX_SCALE = 32
+
+    def __init__(self, master, led_configs, speed_factor=1.0, frame_interval_ms=50):
+        self.top = tk.Toplevel(master)
+        self.top.title(f"Layout Heatmap ({len(led_configs)} LEDs)")
+        self.renderer = HeatmapRenderer(len(led_configs))
+        self.scale = max(1, min(self.MAX_SCALE, 600 // max(self.renderer.columns, self.renderer.rows)))
+        self.frame_interval_ms = frame_interval_ms
+
+        self.canvas = tk.Canvas(self.top, width=600, height=600, bg="black", highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)
+        self.status_label = ttk.Label(self.top, text="", font=('Arial', 8))
+        self.status_label.pack(fill="x")
+        self.base_image = tk.PhotoImage(width=self.renderer.columns, height=self.renderer.rows)
+        self.image = tk.PhotoImage(width=self.renderer.columns * self.scale, height=self.renderer.rows * self.scale)
+        self.item = self.canvas.create_image(0, 0, anchor="nw", image=self.image)
+        self._drag_start = None
+        self._render_ms = 0.0
+        self._last_frame = None
+
+        sims = build_simulators(led_configs)
+        self.worker = SimulationWorker(SimulationTimeline(sims), speed_factor=speed_factor,
+                                       frame_interval_ms=frame_interval_ms)
+        self.worker.start()
+        self.worker.resume()
+
+        self.canvas.bind("<MouseWheel>", lambda event: self._zoom(event, 1 if event.delta > 0 else -1))
+        self.canvas.bind("<Button-4>", lambda event: self._zoom(event, 1)) # Linux
+        self.canvas.bind("<Button-5>", lambda event: self._zoom(event, -1))
+        self.canvas.bind("<ButtonPress-1>", self._start_drag)
+        self.canvas.bind("<B1-Motion>", self._drag)
+        self.canvas.bind("<Motion>", self._hover)
+        self.top.protocol("WM_DELETE_WINDOW", self.close)
+        self._job = self.top.after(0, self._poll)
+
+    def _blit(self):
+        # Eén aanroep vergroot de basisafbeelding in de getoonde afbeelding (in C, geen items per LED)
+        self.image.tk.call(self.image.name, "copy", self.base_image.name, "-zoom", self.scale, self.scale,
+                           "-compositingrule", "set")
+
+    def _poll(self):
+        frame = self.worker.latest_frame()
+        if frame is not None:
+            started = time.perf_counter()
+            self.base_image.configure(data=self.renderer.render(frame['brightness']), format="PPM")
+            self._blit()
+            self._render_ms = (time.perf_counter() - started) * 1000
+            self._last_frame = frame
+            lit = len(frame['brightness']) - frame['brightness'].count(0)
+            self.status_label.config(text=f"{format_sim_time(frame['sim_time_ms'])} | {lit} aan | "
+                                          f"frame {self._render_ms:.1f} ms | zoom {self.scale}x")
+        self._job = self.top.after(self.frame_interval_ms, self._poll)
+
+    def _zoom(self, event, direction):
+        new_scale = max(1, min(self.MAX_SCALE, self.scale * 2 if direction > 0 else self.scale // 2))
+        if new_scale == self.scale:
+            return
+        # Houd het punt onder de muis op zijn plaats: alleen het ene item verschuift
+        x, y = self.canvas.coords(self.item)
+        factor = new_scale / self.scale
+        self.canvas.coords(self.item, event.x - (event.x - x) * factor, event.y - (event.y - y) * factor)
+        self.scale = new_scale
+        self.image.blank()
+        self.image.configure(width=self.renderer.columns * self.scale, height=self.renderer.rows * self.scale)
+        self._blit()
+
+    def _start_drag(self, event):
+        self._drag_start = (event.x, event.y)
+
+    def _drag(self, event):
+        if self._drag_start is not None:
+            self.canvas.move(self.item, event.x - self._drag_start[0], event.y - self._drag_start[1])
+            self._drag_start = (event.x, event.y)
+
+    def _hover(self, event):
+        if self._last_frame is None:
+            return
+        x, y = self.canvas.coords(self.item)
+        index = self.renderer.led_at((event.x - x) // self.scale, (event.y - y) // self.scale)
+        if index is not None:
+            self.top.title(f"Layout Heatmap: LED {index + 1} = {self._last_frame['brightness'][index]}")
+
+    def close(self):
+        self.top.after_cancel(self._job)
+        self.worker.stop()
+        self.top.destroy()
+
+class FloorPlanWindow:
+    """Plattegrond: elke LED op zijn x/y-positie boven een geïmporteerde afbeelding van de baan.
+
+    Klikken, hover en rubber band-selectie gaan via een SpatialGrid, en alleen de LEDs binnen het
+    zichtbare deel worden als canvas-items getekend. Ook de achtergrond wordt per weergave alleen
+    voor het zichtbare deel uitgesneden en geschaald (Tk copy -zoom/-subsample).
+
+    Bediening: klik een LED om hem te bewerken, sleep hem om hem te verplaatsen, sleep over een
+    lege plek voor een selectie, rechtermuisknop slepen verschuift en het muiswiel zoomt.
+    """
+
+    LED_RADIUS = 6 # Schermpixels
+    MIN_ZOOM_LEVEL = -3 # 1/8x
+    MAX_ZOOM_LEVEL = 3 # 8x
+
+    def __init__(self, app):
+        self.app = app
+        self.top = tk.Toplevel(app.master)
+        self.top.title("Plattegrond")
+
+        toolbar = ttk.Frame(self.top)
+        toolbar.pack(fill="x")
+        ttk.Button(toolbar, text="Afbeelding Importeren", command=self.import_image).pack(side=tk.LEFT, padx=2, pady=2)
+        place_button = ttk.Button(toolbar, text="Plaats Ongeplaatste", command=self.place_unplaced)
+        place_button.pack(side=tk.LEFT, padx=2, pady=2)
+        ToolTip(place_button, "Zet LEDs zonder positie in een raster linksboven in het zichtbare deel, zodat je ze kunt verslepen.")
+        self.bulk_button = ttk.Button(toolbar, text="Bulk Bewerken (selectie)", state="disabled",
+                                      command=lambda: app.bulk_edit_action(format_number_ranges(self.selection)))
+        self.bulk_button.pack(side=tk.LEFT, padx=2, pady=2)
+        self.status_label = ttk.Label(toolbar, text="", font=('Arial', 8))
+        self.status_label.pack(side=tk.LEFT, padx=10)
+
+        self.canvas = tk.Canvas(self.top, width=800, height=600, bg="#303030", highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)
+        self.view_image = tk.PhotoImage(width=1, height=1) # Zichtbaar, geschaald deel van de achtergrond
+        self.canvas.create_image(0, 0, anchor="nw", image=self.view_image)
+        self.background = None
+        self.zoom_level = 0
+        self.offset_x = 0 # Wereldcoördinaat (pixels van de afbeelding) linksboven in beeld
+        self.offset_y = 0
+        self.selection = set()
+        self.items = {} # LED-index -> canvas-item, alleen voor de zichtbare LEDs
+        self._press = None
+        self._pan_start = None
+        self._redraw_job = None
+        self.index = SpatialGrid()
+
+        self.canvas.bind("<ButtonPress-1>", self._on_press)
+        self.canvas.bind("<B1-Motion>", self._on_drag)
+        self.canvas.bind("<ButtonRelease-1>", self._on_release)
+        self.canvas.bind("<ButtonPress-3>", self._start_pan)
+        self.canvas.bind("<B3-Motion>", self._pan)
+        self.canvas.bind("<Motion>", self._on_hover)
+        self.canvas.bind("<MouseWheel>", lambda event: self._zoom(event, 1 if event.delta > 0 else -1))
+        self.canvas.bind("<Button-4>", lambda event: self._zoom(event, 1)) # Linux
+        self.canvas.bind("<Button-5>", lambda event: self._zoom(event, -1))
+        self.canvas.bind("<Configure>", lambda event: self.schedule_redraw())
+        self.top.protocol("WM_DELETE_WINDOW", self.close)
+
+        if app.floor_plan_image:
+            self._load_background(app.floor_plan_image, show_errors=False)
+        self.refresh()
+
+    # --- Coördinaten ---
+    @property
+    def scale(self):
+        return 2.0 ** self.zoom_level
+
+    def to_world(self, sx, sy):
+        return self.offset_x + sx / self.scale, self.offset_y + sy / self.scale
+
+    def to_screen(self, x, y):
+        return (x - self.offset_x) * self.scale, (y - self.offset_y) * self.scale
+
+    # --- Gegevens ---
+    def refresh(self):
+        """Bouwt de index opnieuw op uit de LED-data (na laden, undo/redo of bulkbewerking)."""
+        self.index = SpatialGrid.from_configs([led['vars_snapshot'] for led in self.app.led_data])
+        self.selection &= set(self.index.positions)
+        self.schedule_redraw()
+
+    def _set_positions(self, positions, label):
+        """Slaat nieuwe posities ({index: (x, y)}) op als één undo-stap."""
+        app = self.app
+        app.history.begin_group(label)
+        for i, (x, y) in positions.items():
+            old_config = app.led_data[i]['vars_snapshot']
+            new_config = dict(old_config, x=round(x, 1), y=round(y, 1))
+            app.history.push(diff_led_configs(i, old_config, new_config), label)
+            app.led_data[i]['vars_snapshot'] = new_config
+            self.index.insert(i, new_config['x'], new_config['y'])
+        app.history.end_group()
+        app._update_history_buttons()
+
+    def import_image(self):
+        file_path = filedialog.askopenfilename(parent=self.top, filetypes=[
+            ("Afbeeldingen", "*.png *.gif *.ppm *.pgm"), ("All Files", "*.*")])
+        if file_path and self._load_background(file_path):
+            self.app.floor_plan_image = file_path
+            self.schedule_redraw()
+
+    def _load_background(self, file_path, show_errors=True):
+        try:
+            self.background = tk.PhotoImage(file=file_path)
+        except tk.TclError as e:
+            if show_errors:
+                messagebox.showerror("Fout", f"Kan de afbeelding niet laden: {e}", parent=self.top)
+            return False
+        return True
+
+    def place_unplaced(self):
+        unplaced = [i for i in range(len(self.app.led_data)) if i not in self.index.positions]
+        if not unplaced:
+            messagebox.showinfo("Plattegrond", "Alle LEDs hebben al een positie.", parent=self.top)
+            return
+        spacing = 4 * self.LED_RADIUS / self.scale
+        x0, y0 = self.to_world(2 * self.LED_RADIUS, 2 * self.LED_RADIUS)
+        columns = max(1, int(self.canvas.winfo_width() / (4 * self.LED_RADIUS)) - 1)
+        self._set_positions({i: (x0 + (n % columns) * spacing, y0 + (n // columns) * spacing)
+                             for n, i in enumerate(unplaced)}, "Plaatsen")
+        self.schedule_redraw()
+
+    # --- Tekenen ---
+    def schedule_redraw(self):
+        # Meerdere wijzigingen (slepen, zoomen, resize) leiden tot één nieuwe weergave
+        if self._redraw_job is None:
+            self._redraw_job = self.top.after_idle(self.redraw)
+
+    def redraw(self):
+        self._redraw_job = None
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        self._draw_background(width, height)
+        self.canvas.delete("led")
+        self.items = {}
+        margin = self.LED_RADIUS / self.scale
+        x0, y0 = self.to_world(0, 0)
+        x1, y1 = self.to_world(width, height)
+        visible = self.index.query_rect(x0 - margin, y0 - margin, x1 + margin, y1 + margin)
+        r = self.LED_RADIUS
+        current = self.app.current_led_index
+        for i in visible:
+            sx, sy = self.to_screen(*self.index.positions[i])
+            self.items[i] = self.canvas.create_oval(
+                sx - r, sy - r, sx + r, sy + r, tags=("led",),
+                fill="#4a90e2" if i == current else "#ffb040",
+                outline="white" if i in self.selection else "black", width=2 if i in self.selection else 1)
+        self.status_label.config(text=f"{len(visible)} van {len(self.index)} geplaatste LEDs zichtbaar "
+                                      f"({len(self.app.led_data) - len(self.index)} zonder positie) | "
+                                      f"zoom {self.scale:g}x | {len(self.selection)} geselecteerd")
+
+    def _draw_background(self, width, height):
+        view = self.view_image
+        view.blank()
+        if self.background is None:
+            return
+        view.configure(width=width, height=height)
+        # Alleen het zichtbare deel van de afbeelding uitsnijden en schalen
+        sx0, sy0 = max(0, self.offset_x), max(0, self.offset_y)
+        x1, y1 = self.to_world(width, height)
+        sx1 = min(self.background.width(), int(-(-x1 // 1)))
+        sy1 = min(self.background.height(), int(-(-y1 // 1)))
+        if sx1 <= sx0 or sy1 <= sy0:
+            return
+        factor = 2 ** abs(self.zoom_level)
+        to_x, to_y = self.to_screen(sx0, sy0)
+        view.tk.call(view.name, "copy", self.background.name, "-from", sx0, sy0, sx1, sy1,
+                     "-to", int(to_x), int(to_y), "-zoom" if self.zoom_level >= 0 else "-subsample", factor, factor)
+
+    # --- Muis ---
+    def _hit(self, event):
+        x, y = self.to_world(event.x, event.y)
+        return self.index.nearest(x, y, self.LED_RADIUS / self.scale)
+
+    def _on_press(self, event):
+        led_index = self._hit(event)
+        self._press = (event.x, event.y, led_index)
+        if led_index is None:
+            self.canvas.create_rectangle(event.x, event.y, event.x, event.y, outline="white", dash=(3, 3), tags=("band",))
+
+    def _on_drag(self, event):
+        if self._press is None:
+            return
+        start_x, start_y, led_index = self._press
+        if led_index is None:
+            self.canvas.coords("band", start_x, start_y, event.x, event.y)
+        elif led_index in self.items:
+            r = self.LED_RADIUS
+            self.canvas.coords(self.items[led_index], event.x - r, event.y - r, event.x + r, event.y + r)
+
+    def _on_release(self, event):
+        if self._press is None:
+            return
+        start_x, start_y, led_index = self._press
+        self._press = None
+        moved = abs(event.x - start_x) > 3 or abs(event.y - start_y) > 3
+        if led_index is None:
+            self.canvas.delete("band")
+            x0, y0 = self.to_world(start_x, start_y)
+            x1, y1 = self.to_world(event.x, event.y)
+            self.selection = set(self.index.query_rect(x0, y0, x1, y1)) if moved else set()
+            self.bulk_button.config(state="normal" if self.selection else "disabled")
+        elif moved:
+            self._set_positions({led_index: self.to_world(event.x, event.y)}, f"Positie LED {led_index + 1}")
+        else:
+            self.app.select_led(led_index)
+        self.schedule_redraw()
+
+    def _on_hover(self, event):
+        self.canvas.delete("hover")
+        led_index = self._hit(event)
+        if led_index is None:
+            return
+        config = self.app.led_data[led_index]['vars_snapshot']
+        text = f"LED {led_index + 1} | pin {config.get('pin', '?')} | {config.get('light_type', '')}"
+        if str(config.get('group', '')).strip():
+            text += f" | groep {config['group']}"
+        self.canvas.create_text(event.x + 12, event.y - 12, text=text, anchor="sw", fill="white",
+                                font=('Arial', 8), tags=("hover",))
+
+    def _start_pan(self, event):
+        self._pan_start = (event.x, event.y, self.offset_x, self.offset_y)
+
+    def _pan(self, event):
+        start_x, start_y, offset_x, offset_y = self._pan_start
+        # Hele wereldpixels, zodat de uitsnede van de achtergrond precies op het raster valt
+        self.offset_x = offset_x - round((event.x - start_x) / self.scale)
+        self.offset_y = offset_y - round((event.y - start_y) / self.scale)
+        self.schedule_redraw()
+
+    def _zoom(self, event, direction):
+        level = max(self.MIN_ZOOM_LEVEL, min(self.MAX_ZOOM_LEVEL, self.zoom_level + direction))
+        if level == self.zoom_level:
+            return
+        # Houd het punt onder de muis op zijn plaats
+        x, y = self.to_world(event.x, event.y)
+        self.zoom_level = level
+        self.offset_x = round(x - event.x / self.scale)
+        self.offset_y = round(y - event.y / self.scale)
+        self.schedule_redraw()
+
+    def close(self):
+        if self._redraw_job is not None:
+            self.top.after_cancel(self._redraw_job)
+        self.app.floor_plan_window = None
+        self.top.destroy()
+
 class LedConfiguratorApp:
 
     # --- PLAATS DE open_nproject_url FUNCTIE HIER, VOOR DE __init__ METHODE ---
@@ -582,10 +5661,11 @@ class LedConfiguratorApp:
     # --- EINDE open_nproject_url FUNCTIE ---
 
     def __init__(self, master):
-        # Maximum aantal LEDs is nu gebaseerd op het aantal PWM-pinnen voor de Mega
         self.master = master
         master.title("Arduino LED Configuratie Generator (Modelspoor)")
-        self.num_leds = len(PWM_PINS) # Maximaal 15 LEDs
+        # Een nieuwe layout krijgt één LED per PWM-pin van de Mega; een geladen layout mag groter zijn
+        # (bijv. verdeeld over meerdere borden, zie partition_layout)
+        self.default_num_leds = len(PWM_PINS)
 
 # --- AANGEPASTE CODE HIER: tk.Text widget voor aanklikbare link ---
         # Gebruik een tk.Text widget in plaats van ttk.Label
@@ -621,9 +5701,26 @@ class LedConfiguratorApp:
 
         self.simulator = None # Instance van LedSimulator voor de geselecteerde LED
         self.simulation_running = False
-        self.simulation_start_time = 0
         self.simulation_speed_factor = 1.0 # 1.0 = real-time, 10.0 = 10x sneller
-        self.simulation_update_interval_ms = 50 # Update canvas elke 50ms (simulatie stappen zijn kleiner)
+        self.simulation_update_interval_ms = 50 # Kortste interval tussen schermupdates (tijdens fades)
+        self.simulation_timer_resolution_ms = 100 # De timers tonen tienden van seconden simulatietijd
+        self.simulation_tick_ms = 10 # Vast simulatieraster in ms simulatietijd (zie SimulationTimeline)
+        self.checkpoint_interval_s = 60 # Elke minuut simulatietijd een checkpoint voor de tijdlijn
+        self.timeline_range_hours = 24 # Bereik van de tijdlijn-schuif
+        self.sim_timeline = None # SimulationTimeline rond self.simulator
+        self.sim_worker = None # SimulationWorker die de tijdlijn op een eigen thread laat lopen
+        self._last_frame = None # Laatst opgehaald frame van de worker
+        self.profiler = None # TickProfiler, aangemaakt bij het eerste inschakelen van de overlay
+        self.profiling = False
+        self._profiler_job = None
+        self._planned_wake_perf = None # perf_counter-tijdstip waarop de volgende tick gepland staat
+        self.log_replay = None # SerialLogReplay die nu afgespeeld wordt (zie play_serial_log)
+        self._replay_job = None
+        self._replay_sim_ms = 0.0 # Afspeeltijd in de log
+        self._replay_started = 0.0
+        self.history = EditHistory() # Undo/redo van LED-bewerkingen
+        self.floor_plan_image = None # Pad van de plattegrond-afbeelding (opgeslagen in de layout)
+        self.floor_plan_window = None # Open FloorPlanWindow, of None
 
         # Initialiseer deze attributen naar None VOORDAT create_main_layout wordt aangeroepen
         self.speed_label = None
@@ -631,6 +5728,7 @@ class LedConfiguratorApp:
         self.off_timer_label = None
         self.mode_label = None # NIEUW: label voor de modus
         self._simulation_job = None # Initialize to None for the after_cancel check
+        self._display_cache = {} # Laatst getoonde widgetwaarden; Tk wordt alleen aangeroepen bij een wijziging
 
         self.create_main_layout()
         self.load_default_configs() # Laad initiële data en vul de LED-lijst
@@ -647,27 +5745,27 @@ class LedConfiguratorApp:
 
         ttk.Label(left_frame, text="Selecteer LED:", font=('Arial', 10, 'bold')).pack(pady=5)
 
-        # Scrollbare lijstbox voor LEDs
+        # Scrollbare lijstbox voor LEDs. Een Listbox tekent alleen de zichtbare regels, dus ook een layout
+        # met duizenden LEDs blijft vlot (geen knop per LED); de lijst wordt gevuld door _fill_led_list()
         self.led_list_frame = ttk.Frame(left_frame)
         self.led_list_frame.pack(fill="both", expand=True)
 
-        self.led_list_canvas = tk.Canvas(self.led_list_frame)
-        self.led_list_canvas.pack(side="left", fill="both", expand=True)
+        self.led_listbox = tk.Listbox(self.led_list_frame, exportselection=False, activestyle="none")
+        self.led_listbox.pack(side="left", fill="both", expand=True)
 
-        self.led_list_scrollbar = ttk.Scrollbar(self.led_list_frame, orient="vertical", command=self.led_list_canvas.yview)
+        self.led_list_scrollbar = ttk.Scrollbar(self.led_list_frame, orient="vertical", command=self.led_listbox.yview)
         self.led_list_scrollbar.pack(side="right", fill="y")
 
-        self.led_list_canvas.configure(yscrollcommand=self.led_list_scrollbar.set)
-        self.led_list_canvas.bind('<Configure>', lambda e: self.led_list_canvas.configure(scrollregion=self.led_list_canvas.bbox("all")))
+        self.led_listbox.configure(yscrollcommand=self.led_list_scrollbar.set)
+        self.led_listbox.bind("<<ListboxSelect>>", self._on_led_list_select)
 
-        self.led_list_inner_frame = ttk.Frame(self.led_list_canvas)
-        self.led_list_canvas.create_window((0, 0), window=self.led_list_inner_frame, anchor="nw")
+        bulk_button = ttk.Button(left_frame, text="Bulk Bewerken", command=self.bulk_edit_action)
+        bulk_button.pack(fill="x", pady=(5, 0))
+        ToolTip(bulk_button, "Pas een profiel of een veld in één keer toe op meerdere LEDs (op nummer, type, groep, pin of veldwaarde).")
 
-        self.led_buttons = [] # Lijst om knoppen voor elke LED bij te houden
-        for i in range(self.num_leds):
-            btn = ttk.Button(self.led_list_inner_frame, text=f"LED {i+1}", command=lambda idx=i: self.select_led(idx))
-            btn.pack(fill="x", pady=1)
-            self.led_buttons.append(btn)
+        floor_plan_button = ttk.Button(left_frame, text="Plattegrond", command=self.open_floor_plan_action)
+        floor_plan_button.pack(fill="x", pady=(5, 0))
+        ToolTip(floor_plan_button, "Plaats de LEDs op een afbeelding van de baan en selecteer ze door te klikken of te slepen.")
 
         # Midden: Bewerking van geselecteerde LED
         self.edit_frame = ttk.Frame(main_frame)
@@ -709,6 +5807,9 @@ class LedConfiguratorApp:
         self.pause_sim_button.pack(side=tk.LEFT, padx=2)
         self.reset_sim_button = ttk.Button(sim_controls_frame, text="Reset", command=self.reset_simulation, state="disabled")
         self.reset_sim_button.pack(side=tk.LEFT, padx=2)
+        replay_button = ttk.Button(sim_controls_frame, text="Log Afspelen", command=self.play_serial_log)
+        replay_button.pack(side=tk.LEFT, padx=2)
+        ToolTip(replay_button, "Speel een opgenomen seriële log (met tijdstempels) van de Arduino af voor de pin van deze LED.")
 
         ttk.Label(sim_controls_frame, text="Snelheid (x):").pack(side=tk.LEFT, padx=(10,2))
         
@@ -719,12 +5820,53 @@ class LedConfiguratorApp:
         self.speed_slider = ttk.Scale(sim_controls_frame, from_=0.1, to_=10.0, orient="horizontal", command=self.set_simulation_speed)
         self.speed_slider.set(self.simulation_speed_factor)
         self.speed_slider.pack(side=tk.LEFT, padx=2)
+
+        # Tijdlijn: spring naar een willekeurig moment (via checkpoints, zie SimulationTimeline)
+        timeline_frame = ttk.Frame(self.visual_frame)
+        timeline_frame.pack(fill="x", pady=5)
+        ttk.Label(timeline_frame, text="Tijdlijn:").pack(side=tk.LEFT, padx=(0, 2))
+        self.timeline_var = tk.DoubleVar(value=0.0)
+        self.timeline_scale = ttk.Scale(timeline_frame, from_=0, to_=self.timeline_range_hours * 3600, orient="horizontal",
+                                        variable=self.timeline_var, command=self.on_timeline_scrub)
+        self.timeline_scale.pack(side=tk.LEFT, fill="x", expand=True, padx=2)
+        ToolTip(self.timeline_scale, f"Sleep om naar een moment binnen de eerste {self.timeline_range_hours} uur simulatietijd te springen.")
+        self.timeline_label = ttk.Label(self.visual_frame, text=f"Simulatietijd: {format_sim_time(0)}", font=('Arial', 9))
+        self.timeline_label.pack(pady=(0, 5))
+        self.sim_metrics_label = ttk.Label(self.visual_frame, text="Frames gemist: 0 | Vertraging: 0 ms", font=('Arial', 8), foreground="gray")
+        self.sim_metrics_label.pack(pady=(0, 5))
+
+        # Profiler: overlay met metingen per tick, exporteerbaar als JSON
+        profiler_frame = ttk.Frame(self.visual_frame)
+        profiler_frame.pack(pady=(0, 5))
+        self.profiler_var = tk.BooleanVar(value=False)
+        profiler_check = ttk.Checkbutton(profiler_frame, text="Profiler", variable=self.profiler_var, command=self.toggle_profiler)
+        profiler_check.pack(side=tk.LEFT, padx=2)
+        ToolTip(profiler_check, "Toon per tick hoeveel tijd simulatie en weergave kosten, hoe laat ticks starten, het aantal Tk-aanroepen en het geheugengebruik.")
+        ttk.Button(profiler_frame, text="Exporteer Profiel", command=self.export_profile).pack(side=tk.LEFT, padx=2)
+        self.profiler_label = tk.Label(self.visual_frame, text="", font=('Courier', 8), justify=tk.LEFT, anchor="w",
+                                       bg="black", fg="#00ff00")
         
 
         # Knoppen onderaan (blijven onderaan het hoofdscherm)
         button_frame = ttk.Frame(self.master)
         button_frame.pack(pady=10)
 
+        self.undo_button = ttk.Button(button_frame, text="Ongedaan Maken", command=self.undo_edit, state="disabled")
+        self.undo_button.pack(side=tk.LEFT, padx=5)
+        self.redo_button = ttk.Button(button_frame, text="Opnieuw", command=self.redo_edit, state="disabled")
+        self.redo_button.pack(side=tk.LEFT, padx=5)
+        # Alleen op het hoofdvenster: in de heatmap, plattegrond of bulkbewerking doen deze toetsen niets met de LEDs
+        self.master.bind("<Control-z>", lambda event: self.undo_edit())
+        self.master.bind("<Control-y>", lambda event: self.redo_edit())
+        self.master.bind("<Control-Shift-Z>", lambda event: self.redo_edit())
+
+        ttk.Label(button_frame, text="Uitgang:").pack(side=tk.LEFT, padx=(5, 2))
+        self.output_backend_var = tk.StringVar(value="native")
+        backend_combo = ttk.Combobox(button_frame, textvariable=self.output_backend_var, values=list(OUTPUT_BACKENDS),
+                                     state="readonly", width=9)
+        backend_combo.pack(side=tk.LEFT, padx=2)
+        ToolTip(backend_combo, "native: de PWM-pinnen van het bord. pca9685/tlc5940: PWM-expanders; elke LED krijgt dan een kanaal in volgorde van de lijst en de pin wordt genegeerd.")
+
         generate_button = ttk.Button(button_frame, text="Genereer Arduino Code", command=self.generate_code_action)
         generate_button.pack(side=tk.LEFT, padx=5)
 
@@ -734,6 +5876,18 @@ class LedConfiguratorApp:
         load_button = ttk.Button(button_frame, text="Laad Configuraties", command=self.load_configs)
         load_button.pack(side=tk.LEFT, padx=5)
 
+        peak_button = ttk.Button(button_frame, text="Piekstroom Analyse", command=self.peak_current_action)
+        peak_button.pack(side=tk.LEFT, padx=5)
+        ToolTip(peak_button, "Simuleer de hele layout over meerdere dagen en toon de piekstroom en het aantal gelijktijdig brandende LEDs.")
+
+        heatmap_button = ttk.Button(button_frame, text="Layout Heatmap", command=self.open_heatmap_action)
+        heatmap_button.pack(side=tk.LEFT, padx=5)
+        ToolTip(heatmap_button, "Simuleer alle LEDs tegelijk en toon ze als heatmap (muiswiel: zoomen, slepen: verschuiven).")
+
+        boards_button = ttk.Button(button_frame, text="Verdeel over Borden", command=self.partition_boards_action)
+        boards_button.pack(side=tk.LEFT, padx=5)
+        ToolTip(boards_button, "Verdeel de LEDs over meerdere Arduino's en genereer per bord een sketch plus een bedradingsrapport.")
+
     def create_edit_panel(self, parent_frame):
         """Maakt de invoervelden en labels voor één LED-configuratie aan."""
         # We maken de widgets hier eenmalig aan, en vullen ze later met data
@@ -859,13 +6013,10 @@ class LedConfiguratorApp:
         self.led_number_label.config(text=f"Bewerk LED {led_index + 1}")
         self.enable_all_edit_fields() # Enable all fields before populating and toggling
 
-        # Update de knopstijlen
-        for i, btn in enumerate(self.led_buttons):
-            if i == led_index:
-                # Voor ttk.Button, gebruik 'state' om een 'pressed' uiterlijk te simuleren
-                btn.state(['pressed'])
-            else:
-                btn.state(['!pressed']) # Zorg dat de knop niet 'pressed' is
+        # Markeer de LED in de lijst (en scroll ernaartoe, bijv. na een klik op de plattegrond)
+        self.led_listbox.selection_clear(0, tk.END)
+        self.led_listbox.selection_set(led_index)
+        self.led_listbox.see(led_index)
 
         # Vul het bewerkingspaneel met de data van de geselecteerde LED
         self.populate_row(led_index)
@@ -876,6 +6027,23 @@ class LedConfiguratorApp:
         self.reset_simulation() # Reset de simulator state
         self.sim_canvas.itemconfig(self.sim_led_label, text=f"LED {led_index + 1}")
         self.start_simulation() # Start automatisch de simulatie voor de nieuwe LED
+        if self.floor_plan_window is not None:
+            self.floor_plan_window.schedule_redraw() # Geselecteerde LED markeren
+
+    def _fill_led_list(self):
+        """Vult de LED-lijst opnieuw met één regel per LED in self.led_data."""
+        self.led_listbox.delete(0, tk.END)
+        self.led_listbox.insert(tk.END, *(f"LED {i + 1}" for i in range(len(self.led_data))))
+
+    def _on_led_list_select(self, event):
+        selection = self.led_listbox.curselection()
+        if not selection or selection[0] == self.current_led_index:
+            return
+        self.select_led(selection[0])
+        if self.current_led_index != selection[0] and self.current_led_index is not None:
+            # Opslaan van de vorige LED mislukte: de markering terugzetten
+            self.led_listbox.selection_clear(0, tk.END)
+            self.led_listbox.selection_set(self.current_led_index)
 
     def populate_selected_led_from_profile(self):
         """Roept populate_row aan voor de geselecteerde LED, gebaseerd op het profiel."""
@@ -921,10 +6089,17 @@ class LedConfiguratorApp:
                 config[key] = tk_var.get()
             elif isinstance(tk_var, tk.BooleanVar):
                 config[key] = tk_var.get()
+        # Velden zonder invoerveld in het paneel (groep, positie op de plattegrond) blijven behouden
+        for key, value in self.led_data[self.current_led_index]['vars_snapshot'].items():
+            config.setdefault(key, value)
         
         # Voer validatie uit voor alleen DEZE LED
         # Belangrijk: config_to_validate is hier de data direct uit de UI StringVar/BooleanVar, dus strings/booleans
-        validated_config, warnings = self._validate_single_led_config(config, self.current_led_index)
+        # Dubbele pinnen alleen melden als de pin van deze LED gewijzigd is: een layout met meer LEDs dan
+        # PWM-pinnen (meerdere borden) deelt pinnen, en de sketch-generatie controleert alle pinnen toch
+        old_pin = str(self.led_data[self.current_led_index]['vars_snapshot'].get('pin', ''))
+        pin_index = None if str(config.get('pin', '')) != old_pin else {}
+        validated_config, warnings = self._validate_single_led_config(config, self.current_led_index, pin_index)
         
         if validated_config is None:
             return False # Validatie mislukt
@@ -935,11 +6110,134 @@ class LedConfiguratorApp:
         if warnings:
             messagebox.showwarning("Waarschuwing", "\n".join(warnings))
 
-        # Als validatie succesvol is, update self.led_data
+        # Als validatie succesvol is, update self.led_data (en leg de gewijzigde velden vast voor undo)
+        old_config = self.led_data[self.current_led_index]['vars_snapshot']
+        self.history.push(diff_led_configs(self.current_led_index, old_config, validated_config),
+                          f"LED {self.current_led_index + 1}")
         self.led_data[self.current_led_index]['vars_snapshot'] = validated_config # Sla de gevalideerde data op
+        self._update_history_buttons()
 
         return True # Opslaan succesvol
 
+    def bulk_edit_action(self, selection="alle"):
+        """Opent het venster voor bulkbewerking: selectie, profiel en/of één veldwijziging."""
+        if not self.save_current_led_config():
+            return # Eerst de lopende bewerking vastleggen
+
+        dialog = tk.Toplevel(self.master)
+        dialog.title("Bulk Bewerken")
+        dialog.transient(self.master)
+
+        selection_var = tk.StringVar(value=selection or "alle")
+        profile_var = tk.StringVar(value="(ongewijzigd)")
+        field_var = tk.StringVar(value="(geen)")
+        value_var = tk.StringVar()
+        count_label = ttk.Label(dialog, text="")
+
+        ttk.Label(dialog, text="Selectie:").grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        selection_entry = ttk.Entry(dialog, textvariable=selection_var, width=30)
+        selection_entry.grid(row=0, column=1, sticky="we", padx=5, pady=2)
+        ToolTip(selection_entry, "Bijv. 'alle', '1-5,8', 'type:Hal Licht', 'groep:Station', 'pin:2-7' of 'fade_in=True'; combineer met ';'.")
+        count_label.grid(row=1, column=1, sticky="w", padx=5)
+        ttk.Label(dialog, text="Profiel:").grid(row=2, column=0, sticky="w", padx=5, pady=2)
+        ttk.Combobox(dialog, textvariable=profile_var, values=["(ongewijzigd)"] + list(LIGHT_PROFILES),
+                     state="readonly").grid(row=2, column=1, sticky="we", padx=5, pady=2)
+        ttk.Label(dialog, text="Veld:").grid(row=3, column=0, sticky="w", padx=5, pady=2)
+        ttk.Combobox(dialog, textvariable=field_var, values=["(geen)"] + list(BULK_EDIT_FIELDS),
+                     state="readonly").grid(row=3, column=1, sticky="we", padx=5, pady=2)
+        ttk.Label(dialog, text="Waarde:").grid(row=4, column=0, sticky="w", padx=5, pady=2)
+        ttk.Entry(dialog, textvariable=value_var).grid(row=4, column=1, sticky="we", padx=5, pady=2)
+
+        def current_selection():
+            try:
+                return select_leds([led['vars_snapshot'] for led in self.led_data], selection_var.get())
+            except ValueError:
+                return None
+
+        def update_count(*_):
+            indices = current_selection()
+            count_label.config(text="Ongeldige selectie" if indices is None else f"{len(indices)} LED(s) geselecteerd")
+
+        def apply():
+            indices = current_selection()
+            if not indices:
+                messagebox.showwarning("Geen LEDs", "De selectie bevat geen LEDs.", parent=dialog)
+                return
+            profile = None if profile_var.get() == "(ongewijzigd)" else profile_var.get()
+            changes = {} if field_var.get() == "(geen)" else {field_var.get(): value_var.get()}
+            if self.apply_bulk_edit(indices, profile, changes):
+                dialog.destroy()
+
+        selection_var.trace_add("write", update_count)
+        update_count()
+        ttk.Button(dialog, text="Toepassen", command=apply).grid(row=5, column=1, sticky="e", padx=5, pady=5)
+
+    def apply_bulk_edit(self, indices, profile=None, changes=None):
+        """Valideert en past een bulkbewerking toe als één undo-stap; retourneert True bij succes."""
+        led_configs = [led['vars_snapshot'] for led in self.led_data]
+        try:
+            updated, errors, warnings = bulk_edit(led_configs, indices, profile, changes)
+        except ValueError as e:
+            messagebox.showerror("Fout", str(e))
+            return False
+        if errors:
+            shown = errors[:20] + ([f"... en nog {len(errors) - 20} fout(en)"] if len(errors) > 20 else [])
+            messagebox.showerror("Validatiefout", "Er is niets gewijzigd:\n" + "\n".join(shown))
+            return False
+        if warnings:
+            messagebox.showwarning("Waarschuwingen", "\n".join(warnings[:20]))
+
+        self.history.begin_group(f"Bulk ({len(updated)} LEDs)")
+        for i, config in updated.items():
+            self.history.push(diff_led_configs(i, led_configs[i], config), "Bulk")
+            self.led_data[i]['vars_snapshot'] = config
+        self.history.end_group()
+        self._update_history_buttons()
+        self._refresh_floor_plan()
+
+        # Eén keer het paneel en de simulatie verversen, alleen als de geselecteerde LED geraakt is
+        if self.current_led_index in updated:
+            target = self.current_led_index
+            self.current_led_index = None # De snapshot is al bijgewerkt; niet opnieuw opslaan
+            self.select_led(target)
+        return True
+
+    def undo_edit(self):
+        """Draait de laatste bewerking terug en toont de (eerste) LED die ze raakte."""
+        self._step_history(self.history.undo)
+
+    def redo_edit(self):
+        """Voert de laatst teruggedraaide bewerking opnieuw uit."""
+        self._step_history(self.history.redo)
+
+    def _step_history(self, step):
+        # Niet-opgeslagen invoer eerst vastleggen, anders zou die bij het wisselen verloren gaan
+        if not self.save_current_led_config():
+            return
+        result = step(self.led_data)
+        if result is None:
+            return
+        _, touched = result
+        target = self.current_led_index if self.current_led_index in touched else touched[0]
+        self.current_led_index = None # De snapshot is al bijgewerkt; select_led hoeft niets op te slaan
+        self.select_led(target)
+        self._update_history_buttons()
+        self._refresh_floor_plan()
+
+    def _refresh_floor_plan(self):
+        if self.floor_plan_window is not None:
+            self.floor_plan_window.refresh()
+
+    def _update_history_buttons(self):
+        if self.history.can_undo():
+            self.undo_button.config(state="normal", text=f"Ongedaan Maken ({self.history.undo_steps[-1][0]})")
+        else:
+            self.undo_button.config(state="disabled", text="Ongedaan Maken")
+        if self.history.can_redo():
+            self.redo_button.config(state="normal", text=f"Opnieuw ({self.history.redo_steps[-1][0]})")
+        else:
+            self.redo_button.config(state="disabled", text="Opnieuw")
+
     def populate_row(self, led_index, config_data=None):
         """Vult het bewerkingspaneel met configuratiegegevens en togglet de velden."""
         
@@ -1225,9 +6523,9 @@ class LedConfiguratorApp:
 
 
     def load_default_configs(self):
-        """Laadt standaardconfiguraties voor alle LEDs (15 stuks) en vult de led_data."""
+        """Laadt standaardconfiguraties (één LED per PWM-pin) en vult de led_data."""
         self.led_data = []
-        for i in range(self.num_leds):
+        for i in range(self.default_num_leds):
             # Gebruik het "Uitgeschakeld" profiel als basis
             default_config = LIGHT_PROFILES["Uitgeschakeld"].copy()
             # Wijs een PWM-pin toe uit de PWM_PINS lijst
@@ -1237,115 +6535,19 @@ class LedConfiguratorApp:
                 'id': f"LED_{i+1}",
                 'vars_snapshot': default_config
             })
+        self._fill_led_list()
         
-        if self.num_leds > 0:
+        if self.led_data:
             # Check if simulation_job is initialized before trying to cancel
             # This check is actually done inside stop_simulation now, but good to be explicit
             self.select_led(0) # Selecteer de eerste LED om mee te beginnen
 
-    def _validate_single_led_config(self, config, led_index):
+    def _validate_single_led_config(self, config, led_index, pin_index=None):
         """Valideert de configuratie van één LED en retourneert de opgeschoonde config."""
-        validated_config = config.copy()
-        errors = []
-        warnings = []
-        
-        # Validatie van 'pin'
-        # CONVERTEER ALTIJD NAAR STRING VOORDAT JE .isdigit() GEBRUIKT
-        pin_str = str(validated_config.get('pin', '')) 
-        
-        if not pin_str.isdigit():
-            errors.append(f"LED {led_index+1}: Pin moet een nummer zijn.")
-        else:
-            pin = int(pin_str)
-            if pin not in PWM_PINS:
-                errors.append(f"LED {led_index+1}: Pin {pin} is geen geldige Arduino Mega PWM pin ({PWM_PINS}).")
-            # Controleer op dubbele pinnen
-            for i, existing_led in enumerate(self.led_data):
-                if i != led_index and 'pin' in existing_led['vars_snapshot']:
-                    # Zorg ervoor dat de bestaande pin ook als int wordt vergeleken
-                    existing_pin = int(str(existing_led['vars_snapshot']['pin']))
-                    if existing_pin == pin:
-                        errors.append(f"LED {led_index+1}: Pin {pin} is al toegewezen aan LED {i+1}.")
-                        break
-            validated_config['pin'] = pin # Converteer naar int voor opslag en Arduino code
-
-        # Validatie van numerieke velden (tijden en helderheid)
-        time_fields = ['min_on_s', 'max_on_s', 'min_off_s', 'max_off_s',
-                       'min_fade_in_s', 'max_fade_in_s', 'min_fade_out_s', 'max_fade_out_s',
-                       'bright_interval_s']
-        ms_fields = ['blink_on_ms', 'blink_off_ms']
-        brightness_fields = ['min_bright', 'max_bright']
-
-        # Hulpfunctie voor numerieke validatie
-        def validate_numeric_field(field_name, min_val=0, max_val=float('inf')):
-            value_str = str(validated_config.get(field_name, '')) # Zorg dat het een string is
-            if value_str == '': # Lege string, behandel als 0 voor numerieke conversie
-                validated_config[field_name] = '0'
-                value = 0.0 # Gebruik float voor seconden
-            else:
-                try:
-                    # Check voor float of int, afhankelijk van het veld
-                    if '_s' in field_name:
-                        value = float(value_str)
-                    else:
-                        value = int(value_str)
+        if pin_index is None:
+            pin_index = build_pin_index([led['vars_snapshot'] for led in self.led_data])
+        validated_config, errors, warnings = validate_led_config(config, led_index, pin_index)
 
-                    if not (min_val <= value <= max_val):
-                        errors.append(f"LED {led_index+1}: '{field_name}' ({value}) moet tussen {min_val} en {max_val} zijn.")
-                    validated_config[field_name] = str(value) if '_s' in field_name else str(int(value)) # Sla als string op (voor UI consistentie)
-                except ValueError:
-                    errors.append(f"LED {led_index+1}: '{field_name}' moet een geldig nummer zijn.")
-        
-        for field in time_fields:
-            validate_numeric_field(field, 0)
-        for field in ms_fields:
-            validate_numeric_field(field, 0)
-        for field in brightness_fields:
-            validate_numeric_field(field, 0, 255)
-
-        # Validatie van min/max relaties
-        if float(validated_config.get('min_on_s', '0')) > float(validated_config.get('max_on_s', '0')):
-            errors.append(f"LED {led_index+1}: 'Min Aan' kan niet groter zijn dan 'Max Aan'.")
-        if float(validated_config.get('min_off_s', '0')) > float(validated_config.get('max_off_s', '0')):
-            errors.append(f"LED {led_index+1}: 'Min Uit' kan niet groter zijn dan 'Max Uit'.")
-        if float(validated_config.get('min_fade_in_s', '0')) > float(validated_config.get('max_fade_in_s', '0')):
-            errors.append(f"LED {led_index+1}: 'Min Fade In' kan niet groter zijn dan 'Max Fade In'.")
-        if float(validated_config.get('min_fade_out_s', '0')) > float(validated_config.get('max_fade_out_s', '0')):
-            errors.append(f"LED {led_index+1}: 'Min Fade Out' kan niet groter zijn dan 'Max Fade Out'.")
-        if int(float(validated_config.get('min_bright', '0'))) > int(float(validated_config.get('max_bright', '0'))): # Gebruik float voor consistentie met parse
-            errors.append(f"LED {led_index+1}: 'Min Helderheid' kan niet groter zijn dan 'Max Helderheid'.")
-        if int(validated_config.get('blink_on_ms', '0')) > 0 and int(validated_config.get('blink_off_ms', '0')) == 0:
-            warnings.append(f"LED {led_index+1}: 'Knipper Aan' is ingesteld, maar 'Knipper Uit' is 0ms. Dit kan onverwacht gedrag veroorzaken.")
-        if int(validated_config.get('blink_off_ms', '0')) > 0 and int(validated_config.get('blink_on_ms', '0')) == 0:
-            warnings.append(f"LED {led_index+1}: 'Knipper Uit' is ingesteld, maar 'Knipper Aan' is 0ms. Dit kan onverwacht gedrag veroorzaken.")
-
-        # Specifieke validatie voor Blinking mode
-        # Haal de light_type van de _gevalideerde_ configuratie op.
-        current_light_type = validated_config.get('light_type', 'Uitgeschakeld')
-        blinking_allowed_by_profile = LIGHT_PROFILES.get(current_light_type, {}).get('blinking', False)
-
-        if validated_config.get('blinking'): # Alleen als blinking is aangevinkt
-            # Als profiel knipperen niet toestaat, is dit een fout
-            if not blinking_allowed_by_profile:
-                errors.append(f"LED {led_index+1}: Knippermodus is alleen toegestaan voor het 'TV Simulatie' profiel. Schakel 'Knipperen?' uit of kies het 'TV Simulatie' profiel.")
-            else: # Als blinking wel toegestaan is door het profiel (d.w.z. TV Simulatie)
-                # Fading is niet toegestaan in knippermodus
-                if validated_config.get('fade_in') or validated_config.get('fade_out'):
-                    errors.append(f"LED {led_index+1}: Fading is niet toegestaan in knippermodus. Schakel 'Fade In?' en 'Fade Out?' uit.")
-                
-                # bright_interval_s heeft geen effect
-                if float(validated_config.get('bright_interval_s', '0')) > 0:
-                    warnings.append(f"LED {led_index+1}: 'Interval Helderheid' heeft geen effect in knippermodus en wordt genegeerd.")
-
-                # Zorg dat min_bright en max_bright geldig zijn voor knipperen
-                if not (0 <= int(float(validated_config.get('min_bright', '0'))) <= 255) or \
-                   not (0 <= int(float(validated_config.get('max_bright', '0'))) <= 255):
-                   errors.append(f"LED {led_index+1}: Min/Max Helderheid moet tussen 0 en 255 zijn voor knipperen.")
-                
-                # Zorg dat blink_on_ms en blink_off_ms zinvolle waarden hebben
-                if int(validated_config.get('blink_on_ms', '0')) <= 0 or int(validated_config.get('blink_off_ms', '0')) <= 0:
-                    errors.append(f"LED {led_index+1}: 'Knipper Aan (ms)' en 'Knipper Uit (ms)' moeten groter zijn dan 0 in knippermodus.")
-            
         if errors:
             # print(f"Validation errors for LED {led_index+1}: {errors}") # Debugging
             messagebox.showerror(f"Validatie Fout LED {led_index+1}", "\n".join(errors))
@@ -1365,10 +6567,15 @@ class LedConfiguratorApp:
         all_errors_present = False # Nieuwe vlag om aan te geven of er *fouten* waren
 
         # Verzamel en valideer alle configuraties
+        backend = self.output_backend_var.get()
+        pin_index = build_pin_index([led['vars_snapshot'] for led in self.led_data])
         for i, led_entry in enumerate(self.led_data):
             config_to_validate = led_entry['vars_snapshot']
+            if backend != "native": # Op een expander is de pin het kanaalnummer; dat kiest generate_arduino_code zelf
+                config_to_validate = dict(config_to_validate, pin=PWM_PINS[0])
+                pin_index = {}
             
-            validated_config, warnings = self._validate_single_led_config(config_to_validate, i)
+            validated_config, warnings = self._validate_single_led_config(config_to_validate, i, pin_index)
             
             if validated_config is None:
                 all_errors_present = True
@@ -1382,6 +6589,12 @@ class LedConfiguratorApp:
             # Als er fouten waren, is de messagebox al getoond in _validate_single_led_config.
             return # Stop als er fouten zijn
 
+        try:
+            build_sync_groups(final_led_configs) # Leden van een groep moeten één toestandsmachine kunnen delen
+        except ValueError as e:
+            messagebox.showerror("Validatiefout", str(e))
+            return
+
         if all_warnings:
             messagebox.showwarning("Waarschuwingen", "De volgende waarschuwingen zijn gevonden:\n" + "\n".join(all_warnings) + "\n\nDe code wordt wel gegenereerd.")
 
@@ -1390,13 +6603,86 @@ class LedConfiguratorApp:
                                                  filetypes=[("Arduino Sketch", "*.ino"), ("All Files", "*.*")])
         if file_path:
             try:
-                arduino_code = generate_arduino_code(final_led_configs)
-                with open(file_path, "w") as f:
-                    f.write(arduino_code)
-                messagebox.showinfo("Succes", f"Arduino code opgeslagen naar:\n{file_path}")
+                result = write_arduino_sketch(file_path, final_led_configs, backend=backend)
+                if result['written']:
+                    messagebox.showinfo("Succes", f"Arduino code opgeslagen naar:\n{file_path}\n\n"
+                                                  f"{result['rendered']} profiel(en) opnieuw gegenereerd, {result['reused']} ongewijzigd.\n"
+                                                  f"{format_sketch_sram(estimate_sketch_sram(final_led_configs, backend))}")
+                else:
+                    messagebox.showinfo("Ongewijzigd", f"De Arduino code in\n{file_path}\nis al actueel; het bestand is niet aangeraakt.")
             except Exception as e:
                 messagebox.showerror("Fout", f"Fout bij opslaan van code: {e}")
 
+    def peak_current_action(self):
+        """Voert de piekstroom analyse uit voor alle LEDs en toont het rapport in een apart venster."""
+        if not self.save_current_led_config():
+            return # Opslaan mislukt, niet verder gaan
+
+        days = simpledialog.askfloat("Piekstroom Analyse", "Aantal gesimuleerde dagen:", initialvalue=10.0,
+                                     minvalue=0.001, parent=self.master)
+        if days is None:
+            return
+        try:
+            result = sweep_peak_current([led['vars_snapshot'] for led in self.led_data], days * 86400000)
+        except (RuntimeError, ValueError) as e:
+            messagebox.showerror("Fout", str(e))
+            return
+
+        report_window = tk.Toplevel(self.master)
+        report_window.title("Piekstroom Analyse")
+        report_text = tk.Text(report_window, width=100, height=40, font=('Courier', 9))
+        report_text.pack(fill="both", expand=True)
+        report_text.insert(tk.END, format_peak_current_report(result))
+        report_text.config(state="disabled")
+
+    def open_floor_plan_action(self):
+        """Opent de plattegrond (of haalt hem naar voren als hij al open is)."""
+        if not self.save_current_led_config():
+            return # Opslaan mislukt, niet verder gaan
+        if self.floor_plan_window is None:
+            self.floor_plan_window = FloorPlanWindow(self)
+        else:
+            self.floor_plan_window.top.lift()
+
+    def open_heatmap_action(self):
+        """Opent de heatmap van de hele layout op de huidige simulatiesnelheid en retourneert het venster."""
+        if not self.save_current_led_config():
+            return None # Opslaan mislukt, niet verder gaan
+        return LayoutHeatmapWindow(self.master, [led['vars_snapshot'] for led in self.led_data],
+                            speed_factor=self.simulation_speed_factor,
+                            frame_interval_ms=self.simulation_update_interval_ms)
+
+    def partition_boards_action(self):
+        """Verdeelt alle LEDs over meerdere borden en schrijft per bord een sketch en het bedradingsrapport."""
+        if not self.save_current_led_config():
+            return # Opslaan mislukt, niet verder gaan
+
+        spec = simpledialog.askstring("Verdeel over Borden", f"Beschikbare borden ({', '.join(BOARD_TYPES)}):",
+                                      initialvalue="mega2560:2", parent=self.master)
+        if not spec:
+            return
+        led_configs = [led['vars_snapshot'] for led in self.led_data]
+        try:
+            plan = partition_layout(led_configs, parse_board_spec(spec))
+        except ValueError as e:
+            messagebox.showerror("Fout", str(e))
+            return
+        output_dir = filedialog.askdirectory(title="Map voor de sketches")
+        if not output_dir:
+            return
+        try:
+            write_board_sketches(plan, led_configs, output_dir)
+        except OSError as e:
+            messagebox.showerror("Fout", f"Fout bij opslaan van de sketches: {e}")
+            return
+
+        report_window = tk.Toplevel(self.master)
+        report_window.title("Bedradingsrapport")
+        report_text = tk.Text(report_window, width=100, height=40, font=('Courier', 9))
+        report_text.pack(fill="both", expand=True)
+        report_text.insert(tk.END, format_wiring_report(plan, led_configs))
+        report_text.config(state="disabled")
+
     def save_configs(self):
         """Slaat de huidige LED-configuraties en simulatieparameters op naar een JSON-bestand."""
         if self.current_led_index is None:
@@ -1410,15 +6696,11 @@ class LedConfiguratorApp:
         if file_path:
             try:
                 # Alleen de 'vars_snapshot' van elke LED opslaan
-                data_to_save = {
-                    "led_configurations": [led['vars_snapshot'] for led in self.led_data],
-                    "simulation_settings": {
-                        "simulation_speed_factor": self.simulation_speed_factor
-                        # We slaan de 'running' status niet op, simulatie begint altijd gepauzeerd na laden
-                    }
-                }
-                with open(file_path, "w") as f:
-                    json.dump(data_to_save, f, indent=4)
+                write_layout_file(file_path, [led['vars_snapshot'] for led in self.led_data], {
+                    "simulation_speed_factor": self.simulation_speed_factor,
+                    # We slaan de 'running' status niet op, simulatie begint altijd gepauzeerd na laden
+                    "floor_plan_image": self.floor_plan_image,
+                })
                 messagebox.showinfo("Succes", f"Configuraties opgeslagen naar:\n{file_path}")
             except Exception as e:
                 messagebox.showerror("Fout", f"Fout bij opslaan van configuraties: {e}")
@@ -1429,38 +6711,28 @@ class LedConfiguratorApp:
                                                filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")])
         if file_path:
             try:
-                with open(file_path, "r") as f:
-                    loaded_data = json.load(f)
-                
-                # Controleer of het een nieuw formaat is met simulation_settings
-                if isinstance(loaded_data, dict) and "led_configurations" in loaded_data:
-                    led_configs = loaded_data["led_configurations"]
-                    sim_settings = loaded_data.get("simulation_settings", {})
-                elif isinstance(loaded_data, list): # Ouder formaat
-                    led_configs = loaded_data
-                    sim_settings = {} # Geen sim settings in oud formaat
-                else:
-                    raise ValueError("Bestand bevat geen geldige lijst of dict van configuraties.")
-
-                if not isinstance(led_configs, list):
-                    raise ValueError("Bestand bevat geen geldige lijst van LED configuraties.")
+                led_configs, sim_settings = read_layout_file(file_path)
 
                 # Leeg bestaande data en vul met geladen data
                 self.led_data = []
                 for i, config_dict in enumerate(led_configs):
                     # Zorg ervoor dat geladen config een snapshot is
                     self.led_data.append({'id': f"LED_{i+1}", 'vars_snapshot': config_dict})
-                
-                # Als er meer LEDs geladen zijn dan PWM_PINS, truncaten we of waarschuwen we.
-                # Voor nu, als de geladen data minder is dan self.num_leds, vullen we aan met defaults
-                if len(self.led_data) < self.num_leds:
-                    for i in range(len(self.led_data), self.num_leds):
-                        default_config = LIGHT_PROFILES["Uitgeschakeld"].copy()
-                        default_config['pin'] = str(PWM_PINS[i])
-                        self.led_data.append({'id': f"LED_{i+1}", 'vars_snapshot': default_config})
-                elif len(self.led_data) > self.num_leds:
-                    messagebox.showwarning("Waarschuwing", f"Het geladen bestand bevat {len(self.led_data)} LEDs, maar dit programma ondersteunt maximaal {self.num_leds} LEDs (gebaseerd op Arduino Mega PWM pinnen). De extra LEDs worden genegeerd.")
-                    self.led_data = self.led_data[:self.num_leds] # Truncate
+                # De hele layout blijft behouden, ook met meer LEDs dan PWM-pinnen (zie partition_boards_action)
+                self._fill_led_list()
+
+                self.history.clear() # De stappen verwijzen naar LEDs van de vorige layout
+                self.current_led_index = None # De vorige selectie hoort bij de oude data
+                self._update_history_buttons()
+
+                # Plattegrond-afbeelding: een relatief pad is relatief t.o.v. het layoutbestand
+                image_path = sim_settings.get("floor_plan_image")
+                if image_path and not os.path.isabs(image_path):
+                    image_path = os.path.join(os.path.dirname(file_path), image_path)
+                self.floor_plan_image = image_path or None
+                if self.floor_plan_window is not None:
+                    self.floor_plan_window.close()
+                    self.open_floor_plan_action()
 
                 # Laad simulatie-instellingen
                 loaded_speed = sim_settings.get("simulation_speed_factor")
@@ -1503,42 +6775,156 @@ class LedConfiguratorApp:
             if not self.save_current_led_config():
                 return # Validatie mislukt, start simulatie niet
 
-            self.simulator = LedSimulator(self.led_data[self.current_led_index]['vars_snapshot'])
-            self.simulation_start_time = time.time() * 1000 # Huidige tijd in ms
+            # Na pauzeren of scrubben loopt dezelfde simulatie verder; bij een gewijzigde config begint een nieuwe
+            config = self.led_data[self.current_led_index]['vars_snapshot']
+            if self.sim_timeline is None or self.sim_timeline.simulators[0] is not self.simulator or self.simulator.config != config:
+                self._stop_sim_worker()
+                self.simulator = LedSimulator(config)
+                self.sim_timeline = SimulationTimeline([self.simulator], tick_ms=self.simulation_tick_ms,
+                                                       checkpoint_interval_ms=self.checkpoint_interval_s * 1000)
+                self.sim_worker = SimulationWorker(self.sim_timeline, speed_factor=self.simulation_speed_factor,
+                                                   frame_interval_ms=self.simulation_update_interval_ms)
+                self.sim_worker.start()
+            self.sim_worker.profiler = self.profiler if self.profiling else None
+            self.sim_worker.resume()
             self.simulation_running = True
             self.start_sim_button.config(state="disabled")
             self.pause_sim_button.config(state="normal")
             self.reset_sim_button.config(state="normal")
-            self._update_simulation() # Start de update loop
+            self._wake_simulation() # Start de update loop
 
     def pause_simulation(self):
         self.simulation_running = False
+        self._cancel_simulation_job() # De volgende wake-up kan ver weg gepland staan
+        if self.sim_worker:
+            self.sim_worker.pause()
         self.start_sim_button.config(state="normal")
         self.pause_sim_button.config(state="disabled")
 
     def reset_simulation(self):
         self.stop_simulation() # Stop eventuele lopende animatie, reset _simulation_job
-        if self.simulator:
+        if self.sim_worker and self.sim_timeline.simulators[0] is self.simulator:
+            self.sim_worker.reset() # Reset de tijdlijn (en dus de simulator) op de worker-thread
+        elif self.simulator:
             self.simulator.reset()
+        self.timeline_var.set(0.0)
+        self.timeline_label.config(text=f"Simulatietijd: {format_sim_time(0)}")
         
         # Geef 0 door als de huidige simulatietijd voor de reset-weergave
         self.update_simulation_display(0, LedSimulator.MODE_OFF, 0, 0, current_sim_time_ms=0) # Zet display op 0 helderheid en uit
 
         # Reset timers
-        self.on_timer_label.config(text="Aan: 0.0s / 0.0s")
-        self.off_timer_label.config(text="Uit: 0.0s / 0.0s")
-        self.mode_label.config(text="Modus: UIT") # NIEUW: Reset modus label
+        self._config_if_changed(self.on_timer_label, text="Aan: 0.0s / 0.0s")
+        self._config_if_changed(self.off_timer_label, text="Uit: 0.0s / 0.0s")
+        self._config_if_changed(self.mode_label, text="Modus: UIT") # NIEUW: Reset modus label
+
+    def toggle_profiler(self):
+        """Schakelt de profiler-overlay in of uit; de metingen blijven bewaard voor export."""
+        self.profiling = self.profiler_var.get()
+        if self.profiling:
+            if self.profiler is None:
+                self.profiler = TickProfiler()
+            self.profiler.start()
+            self.profiler_label.pack(fill="x", pady=(0, 5))
+            self._refresh_profiler_overlay()
+        else:
+            self.profiler.stop()
+            self.profiler_label.pack_forget()
+            if self._profiler_job is not None:
+                self.master.after_cancel(self._profiler_job)
+                self._profiler_job = None
+        if self.sim_worker:
+            self.sim_worker.profiler = self.profiler if self.profiling else None
+
+    def _refresh_profiler_overlay(self):
+        """Werkt de overlay eens per seconde bij (geheugen zonder snapshot; die volgt pas bij export)."""
+        self.profiler_label.config(text=self.profiler.format_overlay())
+        self._profiler_job = self.master.after(1000, self._refresh_profiler_overlay)
+
+    def export_profile(self):
+        """Slaat de verzamelde profielmetingen op als JSON."""
+        if self.profiler is None:
+            messagebox.showwarning("Geen Profiel", "Schakel eerst de profiler in en laat de simulatie even lopen.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".json",
+                                                 filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")])
+        if file_path:
+            try:
+                self.profiler.memory_snapshot() # De grootste allocaties alleen op verzoek, niet tijdens het tekenen
+                self.profiler.export_json(file_path)
+                messagebox.showinfo("Succes", f"Profiel opgeslagen naar:\n{file_path}")
+            except Exception as e:
+                messagebox.showerror("Fout", f"Fout bij opslaan van het profiel: {e}")
+
+    def play_serial_log(self):
+        """Speelt de seriële log van de echte Arduino af voor de pin van de geselecteerde LED."""
+        if self.current_led_index is None:
+            messagebox.showwarning("Geen LED Geselecteerd", "Selecteer eerst een LED om een log af te spelen.")
+            return
+        if not self.save_current_led_config():
+            return
+        config = self.led_data[self.current_led_index]['vars_snapshot']
+        if not str(config.get('pin', '')).isdigit():
+            messagebox.showwarning("Geen Pin", "Kies eerst een pin voor deze LED; de log wordt per pin afgespeeld.")
+            return
+        file_path = filedialog.askopenfilename(filetypes=[("Logbestanden", "*.log *.txt"), ("All Files", "*.*")])
+        if not file_path:
+            return
+        self.stop_simulation()
+        try:
+            self.log_replay = SerialLogReplay(file_path, int(config['pin']), config)
+        except OSError as e:
+            messagebox.showerror("Fout", f"Kan de log niet openen: {e}")
+            return
+        self.reset_sim_button.config(state="normal")
+        self._replay_sim_ms = 0.0
+        self._replay_started = time.perf_counter()
+        self._replay_tick()
+
+    def _replay_tick(self):
+        """Eén frame van de log-replay; de afspeeltijd volgt de snelheidsslider."""
+        now = time.perf_counter()
+        self._replay_sim_ms += (now - self._replay_started) * 1000 * self.simulation_speed_factor
+        self._replay_started = now
+        t_ms = self._replay_sim_ms
+        try:
+            brightness, mode, duration, phase_start = self.log_replay.state_at(t_ms)
+        except ValueError as e:
+            self._stop_log_replay()
+            messagebox.showerror("Fout in Log", str(e))
+            return
+        self.update_simulation_display(brightness, mode, duration, phase_start, current_sim_time_ms=t_ms)
+        self._config_if_changed(self.timeline_label, text=f"Log: {format_sim_time(int(t_ms))}")
+        if self.log_replay.finished:
+            self._stop_log_replay()
+            return
+        self._replay_job = self.master.after(self.simulation_update_interval_ms, self._replay_tick)
+
+    def _stop_log_replay(self):
+        if self._replay_job is not None:
+            self.master.after_cancel(self._replay_job)
+            self._replay_job = None
+        if self.log_replay:
+            self.log_replay.close()
+            self.log_replay = None
 
     def stop_simulation(self):
+        self._stop_log_replay()
         self.simulation_running = False
         self.start_sim_button.config(state="normal")
         self.pause_sim_button.config(state="disabled")
         self.reset_sim_button.config(state="disabled") # Disable reset button when simulation is fully stopped
         
         # Alleen after_cancel aanroepen als er daadwerkelijk een geplande job is
-        if self._simulation_job is not None:
-            self.master.after_cancel(self._simulation_job)
-            self._simulation_job = None # Reset de job ID
+        self._cancel_simulation_job()
+        if self.sim_worker:
+            self.sim_worker.pause()
+
+    def _stop_sim_worker(self):
+        if self.sim_worker:
+            self.sim_worker.stop()
+            self.sim_worker = None
+            self._last_frame = None
 
 
     def set_simulation_speed(self, value):
@@ -1546,33 +6932,130 @@ class LedConfiguratorApp:
         # Controleer of speed_label al is geïnitialiseerd
         if self.speed_label:
             self.speed_label.config(text=f"{self.simulation_speed_factor:.1f}x")
+        # Voorkom een sprong in simulatietijd: de nieuwe snelheid geldt vanaf het huidige moment
+        if self.sim_worker:
+            self.sim_worker.set_speed(self.simulation_speed_factor)
+            if self.simulation_running:
+                self._wake_simulation() # De geplande wake-up hoort bij de oude snelheid
+
+    def _cancel_simulation_job(self):
+        if self._simulation_job is not None:
+            self.master.after_cancel(self._simulation_job)
+            self._simulation_job = None # Reset de job ID
+
+    def _wake_simulation(self):
+        """Verwerkt de simulatie direct in plaats van op de geplande wake-up te wachten."""
+        self._cancel_simulation_job()
+        self._planned_wake_perf = None # Een directe wake-up is nooit te laat
+        self._update_simulation()
+
+    def _config_if_changed(self, widget, **options):
+        """Past widget-opties alleen aan als ze afwijken van wat er al getoond wordt."""
+        cache = self._display_cache.setdefault(str(widget), {})
+        changed = {key: value for key, value in options.items() if cache.get(key) != value}
+        if changed:
+            cache.update(changed)
+            widget.config(**changed)
+            if self.profiling:
+                self.profiler.count_tk()
+
+    def on_timeline_scrub(self, value):
+        """Springt via de tijdlijn naar een willekeurig moment in de simulatie."""
+        if self.sim_worker is None:
+            return
+        self.sim_worker.seek(float(value) * 1000) # Een lopende simulatie gaat vanaf hier verder
+        if self.simulation_running:
+            self._wake_simulation()
+        else:
+            self._poll_sim_frame()
+            self._show_simulator_state(self.sim_worker.sim_time_ms())
+
+    def _poll_sim_frame(self):
+        """Haalt het nieuwste frame van de worker op (als er een is) en werkt de prestatiecijfers bij."""
+        frame = self.sim_worker.latest_frame()
+        if frame is not None:
+            self._last_frame = frame
+        metrics = self.sim_worker.metrics
+        self._config_if_changed(self.sim_metrics_label,
+                                text=f"Frames gemist: {metrics['frames_dropped']} | "
+                                     f"Vertraging: {metrics['render_lag_ms']:.0f} ms "
+                                     f"(sim {metrics['sim_lag_ms']:.0f} ms)")
+
+    def _show_simulator_state(self, current_sim_time_ms):
+        """Toont het laatst opgehaalde frame en de positie op de tijdlijn."""
+        if self._last_frame is None:
+            return
+        brightness, mode, duration, phase_start, blink_state = self._last_frame['watched']
+        self.update_simulation_display(brightness, mode, duration, phase_start, current_sim_time_ms, blink_state)
+        if current_sim_time_ms <= self.timeline_range_hours * 3600 * 1000:
+            self.timeline_var.set(current_sim_time_ms / 1000.0)
+            if self.profiling:
+                self.profiler.count_tk()
+        self._config_if_changed(self.timeline_label, text=f"Simulatietijd: {format_sim_time(current_sim_time_ms)}")
 
     def _update_simulation(self):
         if not self.simulation_running:
             self._simulation_job = None # Zorg dat de job ID wordt gereset als simulatie stopt
             return
 
-        current_sim_time_ms = (time.time() * 1000 - self.simulation_start_time) * self.simulation_speed_factor
-        
-        # De simulator update zijn interne toestand en retourneert de huidige helderheid
-        brightness, current_mode, expected_duration_ms, phase_start_time_ms = self.simulator.update(current_sim_time_ms)
+        tick_start = time.perf_counter()
+        if self.profiling and self._planned_wake_perf is not None:
+            self.profiler.record_lateness((tick_start - self._planned_wake_perf) * 1000)
+
+        # De worker-thread laat de tijdlijn bijlopen; hier wordt alleen het nieuwste frame opgehaald
+        current_sim_time_ms = self.sim_worker.sim_time_ms()
+        self._poll_sim_frame()
+        frame_done = time.perf_counter()
 
         # Update de visualisatie
-        self.update_simulation_display(brightness, current_mode, expected_duration_ms, phase_start_time_ms, current_sim_time_ms)
+        self._show_simulator_state(current_sim_time_ms)
 
-        # Plan de volgende update en sla de job ID op
-        self._simulation_job = self.master.after(self.simulation_update_interval_ms, self._update_simulation)
+        if self.profiling:
+            tick_end = time.perf_counter()
+            self.profiler.record('frame', (frame_done - tick_start) * 1000)
+            self.profiler.record('weergave', (tick_end - frame_done) * 1000)
+            self.profiler.record('tick', (tick_end - tick_start) * 1000)
+            self.profiler.end_frame()
 
-    def update_simulation_display(self, brightness, current_mode, expected_duration_ms, phase_start_time_ms, current_sim_time_ms):
+        # Plan de volgende update en sla de job ID op
+        delay_ms = self._next_wake_delay_ms(current_sim_time_ms)
+        self._planned_wake_perf = time.perf_counter() + delay_ms / 1000.0
+        self._simulation_job = self.master.after(delay_ms, self._update_simulation)
+
+    def _next_wake_delay_ms(self, current_sim_time_ms):
+        """Wachttijd (echte ms) tot er op het scherm iets verandert.
+
+        Tijdens een fade verandert de helderheid elke tick, dus dan wordt met het kortste interval
+        bijgewerkt. Anders is het eerstvolgende moment de volgende fase- of knipperwissel (uit het
+        tijdwiel van de tijdlijn) of de volgende tiende seconde van de timers, wat het eerst komt.
+        """
+        frame = self._last_frame
+        if frame is None or frame['fading']:
+            return self.simulation_update_interval_ms
+        resolution = self.simulation_timer_resolution_ms
+        timer_wake_ms = (current_sim_time_ms // resolution + 1) * resolution
+        # De timers hoeven niet sneller bij te werken dan het update-interval
+        delay = max((timer_wake_ms - current_sim_time_ms) / self.simulation_speed_factor, self.simulation_update_interval_ms)
+        deadline = frame['next_deadline_ms']
+        if deadline is not None and deadline > current_sim_time_ms:
+            # Fase- en knipperwissels wel precies op tijd tonen (de worker publiceert dan een nieuw frame)
+            delay = min(delay, (deadline - current_sim_time_ms) / self.simulation_speed_factor)
+        return max(1, int(-(-delay // 1))) # Naar boven afgerond: niet wakker worden vóór de wissel
+
+    def update_simulation_display(self, brightness, current_mode, expected_duration_ms, phase_start_time_ms, current_sim_time_ms, blink_state=False):
         # Helderheid van de LED cirkel
         # Convergeer helderheid naar hexadecimale kleur
         hex_brightness = hex(brightness)[2:].zfill(2)
         color = f"#{hex_brightness}{hex_brightness}{hex_brightness}"
-        self.sim_canvas.itemconfig(self.sim_led_circle, fill=color)
+        if self._display_cache.get('led_fill') != color:
+            self._display_cache['led_fill'] = color
+            self.sim_canvas.itemconfig(self.sim_led_circle, fill=color)
+            if self.profiling:
+                self.profiler.count_tk()
 
         # Update de modus weergave
         mode_name = LedSimulator.MODE_NAMES.get(current_mode, "Onbekend")
-        self.mode_label.config(text=f"Modus: {mode_name}")
+        self._config_if_changed(self.mode_label, text=f"Modus: {mode_name}")
 
 
         # Update de timers
@@ -1586,31 +7069,384 @@ class LedConfiguratorApp:
         expected_duration_s = expected_duration_ms / 1000.0
 
         if current_mode == LedSimulator.MODE_ON:
-            self.on_timer_label.config(text=f"Aan: {elapsed_phase_time_s_sim:.1f}s / {expected_duration_s:.1f}s")
-            self.off_timer_label.config(text="Uit: ---")
+            self._config_if_changed(self.on_timer_label, text=f"Aan: {elapsed_phase_time_s_sim:.1f}s / {expected_duration_s:.1f}s")
+            self._config_if_changed(self.off_timer_label, text="Uit: ---")
         elif current_mode == LedSimulator.MODE_OFF:
-            self.on_timer_label.config(text="Aan: ---")
-            self.off_timer_label.config(text=f"Uit: {elapsed_phase_time_s_sim:.1f}s / {expected_duration_s:.1f}s")
+            self._config_if_changed(self.on_timer_label, text="Aan: ---")
+            self._config_if_changed(self.off_timer_label, text=f"Uit: {elapsed_phase_time_s_sim:.1f}s / {expected_duration_s:.1f}s")
         elif current_mode == LedSimulator.MODE_FADE_IN:
-            self.on_timer_label.config(text=f"Fading In: {elapsed_phase_time_s_sim:.1f}s / {expected_duration_s:.1f}s")
-            self.off_timer_label.config(text="---")
+            self._config_if_changed(self.on_timer_label, text=f"Fading In: {elapsed_phase_time_s_sim:.1f}s / {expected_duration_s:.1f}s")
+            self._config_if_changed(self.off_timer_label, text="---")
         elif current_mode == LedSimulator.MODE_FADE_OUT:
-            self.on_timer_label.config(text=f"Fading Uit: {elapsed_phase_time_s_sim:.1f}s / {expected_duration_s:.1f}s")
-            self.off_timer_label.config(text="---")
+            self._config_if_changed(self.on_timer_label, text=f"Fading Uit: {elapsed_phase_time_s_sim:.1f}s / {expected_duration_s:.1f}s")
+            self._config_if_changed(self.off_timer_label, text="---")
         elif current_mode == LedSimulator.MODE_BLINKING:
             # Voor knipperen tonen we de hoofdtijd van de "aan" periode (TV simulatie)
-            self.on_timer_label.config(text=f"Actieve periode: {elapsed_phase_time_s_sim:.1f}s / {expected_duration_s:.1f}s")
+            self._config_if_changed(self.on_timer_label, text=f"Actieve periode: {elapsed_phase_time_s_sim:.1f}s / {expected_duration_s:.1f}s")
             # De blink_state geeft aan of de korte knipper-cyclus AAN of UIT is
-            if self.simulator.blink_state: 
-                self.off_timer_label.config(text=f"Knipper: AAN (Helderheid: {brightness})") # Toon ook helderheid
+            if blink_state: 
+                self._config_if_changed(self.off_timer_label, text=f"Knipper: AAN (Helderheid: {brightness})") # Toon ook helderheid
             else:
-                self.off_timer_label.config(text=f"Knipper: UIT")
+                self._config_if_changed(self.off_timer_label, text="Knipper: UIT")
         else: # Onbekende modus of initiële staat
-            self.on_timer_label.config(text="Aan: 0.0s / 0.0s")
-            self.off_timer_label.config(text="Uit: 0.0s / 0.0s")
-
+            self._config_if_changed(self.on_timer_label, text="Aan: 0.0s / 0.0s")
+            self._config_if_changed(self.off_timer_label, text="Uit: 0.0s / 0.0s")
+
+
+def main(argv=None):
+    """Start de GUI, of een headless analyse als er een subcommando is opgegeven."""
+    parser = argparse.ArgumentParser(description="Arduino LED Simulatie Tool (Modelspoor)")
+    subparsers = parser.add_subparsers(dest="command")
+
+    peak_parser = subparsers.add_parser("piekstroom", help="Piekstroom- en gelijktijdigheidsanalyse over lange periodes")
+    peak_parser.add_argument("layout", help="Opgeslagen layout (JSON)")
+    peak_parser.add_argument("--dagen", type=float, default=10.0, help="Gesimuleerde duur in dagen (standaard 10)")
+    peak_parser.add_argument("--ma", type=float, default=20.0, help="Stroom per LED in mA bij helderheid 255 (standaard 20)")
+    peak_parser.add_argument("--resolutie-ms", type=int, default=10, help="Tijdsresolutie in ms (standaard 10)")
+    peak_parser.add_argument("--venster-ms", type=int, default=1000, help="Lengte van de tijdvensters in ms (standaard 1000)")
+    peak_parser.add_argument("--top", type=int, default=10, help="Aantal zwaarste vensters in het rapport (standaard 10)")
+    peak_parser.add_argument("--seed", type=int, default=None, help="Seed voor een reproduceerbare run")
+    peak_parser.add_argument("--json", action="store_true", help="Schrijf het resultaat als JSON")
+
+    bench_parser = subparsers.add_parser("benchmark", help="Meet simulator, validatie, codegeneratie en bestands-I/O")
+    bench_parser.add_argument("--groottes", type=int, nargs="+", default=list(BENCHMARK_SIZES),
+                              help="Aantallen LEDs (standaard 15 1000 100000)")
+    bench_parser.add_argument("--herhalingen", type=int, default=3, help="Beste van N pogingen (standaard 3)")
+    bench_parser.add_argument("--uitvoer", help="Schrijf de resultaten als JSON naar dit bestand (bijv. als nieuwe baseline)")
+    bench_parser.add_argument("--baseline", help="Vergelijk met eerder opgeslagen resultaten (JSON)")
+    bench_parser.add_argument("--tolerantie", type=float, default=0.2,
+                              help="Toegestane daling van de doorvoer t.o.v. de baseline (standaard 0.2 = 20%%)")
+    bench_parser.add_argument("--json", action="store_true", help="Schrijf het resultaat als JSON")
+
+    sim_parser = subparsers.add_parser("simuleer", help="Simuleer een layout headless, verdeeld over meerdere processen")
+    sim_parser.add_argument("layout", help="Opgeslagen layout (JSON)")
+    sim_parser.add_argument("--uren", type=float, default=24.0, help="Gesimuleerde duur in uren (standaard 24)")
+    sim_parser.add_argument("--shards", type=int, default=None, help="Aantal processen (standaard het aantal CPU-kernen)")
+    sim_parser.add_argument("--stap-s", type=float, default=1.0, help="Interval waarop het frame wordt uitgelezen, in s (standaard 1)")
+    sim_parser.add_argument("--seed", type=int, default=None, help="Seed voor een reproduceerbare run")
+    sim_parser.add_argument("--mmap", help="Publiceer elk frame ook in dit memory-mapped bestand (zie MmapFrameReader)")
+
+    udp_parser = subparsers.add_parser("udp", help="Stream een layout live als E1.31 (sACN) of Art-Net over UDP")
+    udp_parser.add_argument("layout", help="Opgeslagen layout (JSON)")
+    udp_parser.add_argument("--protocol", choices=["e131", "artnet"], default="e131", help="Protocol (standaard e131)")
+    udp_parser.add_argument("--host", default="127.0.0.1",
+                            help="Ontvanger (standaard 127.0.0.1); 'multicast' voor het E1.31-multicastadres per universe")
+    udp_parser.add_argument("--poort", type=int, default=None, help="UDP-poort (standaard 5568 voor E1.31, 6454 voor Art-Net)")
+    udp_parser.add_argument("--universe", type=int, default=1, help="Eerste universe (standaard 1)")
+    udp_parser.add_argument("--fps", type=float, default=40.0, help="Frames per seconde (standaard 40)")
+    udp_parser.add_argument("--snelheid", type=float, default=1.0, help="Simulatiesnelheid (standaard 1x)")
+    udp_parser.add_argument("--duur-s", type=float, default=None, help="Stop na zoveel seconden (standaard: tot Ctrl+C)")
+    udp_parser.add_argument("--seed", type=int, default=None, help="Seed voor een reproduceerbare run")
+    udp_parser.add_argument("--mmap", help="Publiceer elk frame ook in dit memory-mapped bestand (zie MmapFrameReader)")
+
+    output_parser = subparsers.add_parser("uitgang", help="Voorspel bustijd en verversing op een uitgang, optioneel met sketch")
+    output_parser.add_argument("layout", help="Opgeslagen layout (JSON)")
+    output_parser.add_argument("--backend", choices=list(OUTPUT_BACKENDS), default="pca9685", help="Uitgang (standaard pca9685)")
+    output_parser.add_argument("--duur-s", type=float, default=60.0, help="Gesimuleerde duur (standaard 60 s)")
+    output_parser.add_argument("--seed", type=int, default=None, help="Seed voor een reproduceerbare run")
+    output_parser.add_argument("--sketch", help="Schrijf ook de sketch voor deze uitgang naar dit .ino-bestand")
+    output_parser.add_argument("--json", action="store_true", help="Uitvoer als JSON")
+
+    bulk_parser = subparsers.add_parser("bulk", help="Pas een profiel of veld toe op een selectie LEDs in een layout")
+    bulk_parser.add_argument("layout", help="Opgeslagen layout (JSON)")
+    bulk_parser.add_argument("--selectie", default="alle", help="Bijv. '1-50', 'type:Hal Licht', 'groep:Station;fade_in=True'")
+    bulk_parser.add_argument("--profiel", choices=list(LIGHT_PROFILES), help="Profiel om toe te passen")
+    bulk_parser.add_argument("--zet", action="append", default=[], metavar="VELD=WAARDE", help="Veldwijziging (herhaalbaar)")
+    bulk_parser.add_argument("--uitvoer", help="Schrijf de layout hierheen (standaard: het invoerbestand overschrijven)")
+
+    boards_parser = subparsers.add_parser("borden", help="Verdeel een layout over meerdere borden, met een sketch per bord")
+    boards_parser.add_argument("layout", help="Opgeslagen layout (JSON); LEDs met hetzelfde 'group' blijven bij elkaar")
+    boards_parser.add_argument("--borden", required=True, help=f"Beschikbare borden, bijv. 'mega2560:2,uno' ({', '.join(BOARD_TYPES)})")
+    boards_parser.add_argument("--max-fades", type=float, default=None, help="Maximaal aantal LEDs tegelijk aan het faden per bord")
+    boards_parser.add_argument("--uitvoer", help="Map voor de sketches en bedrading.txt (standaard: alleen het rapport tonen)")
+
+    heatmap_parser = subparsers.add_parser("heatmap", help="Render de heatmap van de hele layout headless naar PPM-afbeeldingen")
+    heatmap_parser.add_argument("layout", help="Opgeslagen layout (JSON)")
+    heatmap_parser.add_argument("uitvoer", help="PPM-bestand; bij meerdere frames krijgt de naam een volgnummer (heatmap_0001.ppm)")
+    heatmap_parser.add_argument("--tijd-s", type=float, default=60.0, help="Simulatietijd van het (eerste) frame in s (standaard 60)")
+    heatmap_parser.add_argument("--frames", type=int, default=1, help="Aantal frames (standaard 1)")
+    heatmap_parser.add_argument("--stap-ms", type=int, default=1000, help="Simulatietijd tussen twee frames in ms (standaard 1000)")
+    heatmap_parser.add_argument("--schaal", type=int, default=1, help="Pixels per LED in elke richting (standaard 1)")
+    heatmap_parser.add_argument("--kolommen", type=int, default=None, help="LEDs per rij (standaard zo vierkant mogelijk)")
+    heatmap_parser.add_argument("--seed", type=int, default=None, help="Seed voor een reproduceerbare run")
+
+    log_parser = subparsers.add_parser("serieel-log", help="Vergelijk een seriële log van de Arduino met de simulator")
+    log_parser.add_argument("log", help="Opgenomen seriële uitvoer met tijdstempels (bijv. Serial Monitor met 'Show timestamp')")
+    log_parser.add_argument("layout", help="Opgeslagen layout (JSON) waarmee de sketch gegenereerd is")
+    log_parser.add_argument("--tolerantie-ms", type=int, default=100, help="Toegestane afwijking in faseduur (standaard 100 ms)")
+    log_parser.add_argument("--seed", type=int, default=None, help="Seed voor de simulatie waarmee vergeleken wordt")
+    log_parser.add_argument("--cache", nargs="?", const="", default=None, metavar="MAP",
+                            help="Bewaar de simulaties in een trace-cache (alleen met --seed; standaard in de gebruikerscache)")
+    log_parser.add_argument("--json", action="store_true", help="Uitvoer als JSON")
+
+    soak_parser = subparsers.add_parser("soak", help="Laat de sketch maanden lopen met 32-bit millis() en long-rekenkunde")
+    soak_parser.add_argument("layout", help="Opgeslagen layout (JSON)")
+    soak_parser.add_argument("--dagen", type=float, default=90.0, help="Gesimuleerde duur in dagen (standaard 90)")
+    soak_parser.add_argument("--loop-ms", type=int, default=1, help="Duur van één loop()-doorgang in ms (standaard 1)")
+    soak_parser.add_argument("--start-ms", type=int, default=0,
+                             help="millis() bij het opstarten, bijv. 4294000000 om snel over de 49,7-dagengrens te gaan")
+    soak_parser.add_argument("--seed", type=int, default=None, help="Seed voor een reproduceerbare run")
+    soak_parser.add_argument("--json", action="store_true", help="Uitvoer als JSON")
+
+    sweep_parser = subparsers.add_parser("sweep", help="Probeer alle combinaties van profielvelden en vergelijk kengetallen")
+    sweep_parser.add_argument("profiel", choices=list(LIGHT_PROFILES), help="Profiel als uitgangspunt")
+    sweep_parser.add_argument("--bereik", action="append", required=True, metavar="VELD=BEREIK",
+                              help="Bijv. 'min_on_s=10:40:10' of 'blink_on_ms=30,60,90' (herhaalbaar)")
+    sweep_parser.add_argument("--uren", type=float, default=24.0, help="Gesimuleerde duur per combinatie in uren (standaard 24)")
+    sweep_parser.add_argument("--processen", type=int, default=None, help="Aantal processen (standaard het aantal CPU-kernen)")
+    sweep_parser.add_argument("--seed", type=int, default=0, help="Seed voor alle combinaties (standaard 0)")
+    sweep_parser.add_argument("--cache", nargs="?", const="", default=None, metavar="MAP",
+                              help="Hergebruik traces uit een trace-cache (standaard in de gebruikerscache)")
+    sweep_parser.add_argument("--json", action="store_true", help="Eén JSON-object per regel")
+
+    flicker_parser = subparsers.add_parser("flikker", help="Spectrum, flikkerindex en stapgroottes van het helderheidsverloop (NumPy)")
+    flicker_parser.add_argument("layout", help="Opgeslagen layout (JSON)")
+    flicker_parser.add_argument("--selectie", default="alle", help="Welke LEDs, bijv. 'type:TV Simulatie' (zie bulk; standaard alle)")
+    flicker_parser.add_argument("--uren", type=float, default=1.0, help="Gesimuleerde duur in uren (standaard 1)")
+    flicker_parser.add_argument("--stap-ms", type=int, default=10, help="Bemonsteringsstap in ms (standaard 10)")
+    flicker_parser.add_argument("--venster-ms", type=int, default=1000, help="Venster voor de flikkerindex in ms (standaard 1000)")
+    flicker_parser.add_argument("--seed", type=int, default=None, help="Seed voor een reproduceerbare run")
+    flicker_parser.add_argument("--referentie",
+                                help="Vergelijk met een eerdere analyse (.json), een opname (.csv: tijd_ms,kanaal,helderheid) of een seriële log")
+    flicker_parser.add_argument("--tolerantie-db", type=float, default=3.0,
+                                help="Toegestaan spectraal verschil met de referentie (standaard 3 dB)")
+    flicker_parser.add_argument("--opname", help="Schrijf de gesimuleerde opname ook als CSV (bruikbaar als --referentie)")
+    flicker_parser.add_argument("--uitvoer", help="Schrijf de analyse als JSON naar dit bestand (bruikbaar als --referentie)")
+    flicker_parser.add_argument("--per-led", action="store_true", help="Toon elke LED, niet alleen de profielen")
+    flicker_parser.add_argument("--json", action="store_true", help="Uitvoer als JSON")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "piekstroom":
+        led_configs, _ = read_layout_file(args.layout)
+        result = sweep_peak_current(led_configs, args.dagen * 86400000, ma_per_led=args.ma,
+                                    resolution_ms=args.resolutie_ms, window_ms=args.venster_ms,
+                                    top_windows=args.top, seed=args.seed)
+        print(json.dumps(result, indent=4) if args.json else format_peak_current_report(result))
+        return
+
+    if args.command == "simuleer":
+        led_configs, _ = read_layout_file(args.layout)
+        duration_ms = int(args.uren * 3600000)
+        step_ms = max(1, int(args.stap_s * 1000))
+        started = time.perf_counter()
+        with ShardedSimulation(led_configs, num_shards=args.shards, seed=args.seed) as sim:
+            frame_writer = MmapFrameWriter(args.mmap, sim.num_leds) if args.mmap else None
+            ready = time.perf_counter()
+            lit_total = 0
+            max_lit = 0
+            frames = 0
+            for t_ms in range(step_ms, duration_ms + step_ms, step_ms):
+                sim.advance_to(min(t_ms, duration_ms))
+                if frame_writer:
+                    frame_writer.send_frame(sim.brightness, sim.time_ms)
+                lit = sim.lit_count()
+                lit_total += lit
+                max_lit = max(max_lit, lit)
+                frames += 1
+            elapsed = time.perf_counter() - ready
+            print(f"{sim.num_leds} LEDs over {sim.num_shards} shards, {format_sim_time(sim.time_ms)} gesimuleerd "
+                  f"in {elapsed:.2f} s (opstarten {ready - started:.2f} s)")
+            print(f"Doorvoer: {sim.num_leds * (sim.time_ms // sim.tick_ms) / max(elapsed, 1e-9):,.0f} LED-ticks/s "
+                  f"({sim.time_ms / 1000 / max(elapsed, 1e-9):,.0f}x realtime)")
+            print(f"Gemiddeld {lit_total / max(frames, 1):.1f} en maximaal {max_lit} LEDs tegelijk aan (per {args.stap_s:g} s)")
+            if frame_writer:
+                frame_writer.close()
+        return
+
+    if args.command == "udp":
+        led_configs, _ = read_layout_file(args.layout)
+        sims = build_simulators(led_configs, seed=args.seed)
+        timeline = SimulationTimeline(sims)
+        output = DmxUdpOutput(len(sims), protocol=args.protocol, host=None if args.host == "multicast" else args.host,
+                              port=args.poort, start_universe=args.universe)
+        outputs = [output]
+        if args.mmap:
+            outputs.append(MmapFrameWriter(args.mmap, len(sims)))
+        frame = bytearray(len(sims))
+        frame_s = 1.0 / args.fps
+        started = time.perf_counter()
+        next_frame = started
+        print(f"{len(sims)} LEDs in {len(output.universes)} universe(s) via {args.protocol}, {args.fps:g} fps (Ctrl+C om te stoppen)")
+        try:
+            while args.duur_s is None or next_frame - started < args.duur_s:
+                timeline.advance_to((time.perf_counter() - started) * 1000 * args.snelheid)
+                for i, sim in enumerate(sims):
+                    frame[i] = sim.current_brightness
+                for frame_output in outputs:
+                    frame_output.send_frame(frame, timeline.time_ms)
+                next_frame += frame_s
+                delay = next_frame - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_frame = time.perf_counter() # Achter: geen inhaalslag, gewoon verder vanaf nu
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for frame_output in outputs:
+                frame_output.close()
+        print(f"Verstuurd: {output.metrics['packets_sent']} pakketten in {output.metrics['frames']} frames "
+              f"({output.metrics['universes_unchanged']} keer een ongewijzigde universe overgeslagen)")
+        return
+
+    if args.command == "uitgang":
+        led_configs, _ = read_layout_file(args.layout)
+        try:
+            result = model_output_latency(led_configs, args.backend, duration_ms=int(args.duur_s * 1000), seed=args.seed)
+            result['sram'] = estimate_sketch_sram(led_configs, args.backend)
+            if args.sketch:
+                write_arduino_sketch(args.sketch, led_configs, backend=args.backend)
+        except ValueError as e:
+            parser.exit(1, f"{e}\n")
+        print(json.dumps(result, indent=4) if args.json else
+              format_output_latency_report(result) + "\n" + format_sketch_sram(result['sram']))
+        return
+
+    if args.command == "bulk":
+        led_configs, sim_settings = read_layout_file(args.layout)
+        try:
+            changes = dict(item.split("=", 1) for item in args.zet)
+        except ValueError:
+            parser.exit(1, "Gebruik --zet VELD=WAARDE.\n")
+        try:
+            indices = select_leds(led_configs, args.selectie)
+            updated, errors, warnings = bulk_edit(led_configs, indices, args.profiel, changes)
+        except ValueError as e:
+            parser.exit(1, f"{e}\n")
+        for warning in warnings:
+            print(f"Waarschuwing: {warning}")
+        if errors:
+            parser.exit(1, "Er is niets gewijzigd:\n" + "\n".join(errors) + "\n")
+        for i, config in updated.items():
+            led_configs[i] = config
+        write_layout_file(args.uitvoer or args.layout, led_configs, sim_settings)
+        print(f"{len(updated)} LED(s) bijgewerkt")
+        return
+
+    if args.command == "borden":
+        led_configs, _ = read_layout_file(args.layout)
+        try:
+            plan = partition_layout(led_configs, parse_board_spec(args.borden), max_fading=args.max_fades)
+        except ValueError as e:
+            parser.exit(1, f"{e}\n")
+        print(format_wiring_report(plan, led_configs))
+        if args.uitvoer:
+            for path in write_board_sketches(plan, led_configs, args.uitvoer):
+                print(f"Geschreven: {path}")
+        return
+
+    if args.command == "heatmap":
+        led_configs, _ = read_layout_file(args.layout)
+        start_ms = int(args.tijd_s * 1000)
+        times_ms = [start_ms + i * max(1, args.stap_ms) for i in range(max(1, args.frames))]
+        base, extension = os.path.splitext(args.uitvoer)
+        try:
+            for number, frame in enumerate(render_layout_heatmaps(led_configs, times_ms, columns=args.kolommen,
+                                                                  scale=args.schaal, seed=args.seed), start=1):
+                path = args.uitvoer if len(times_ms) == 1 else f"{base}_{number:04d}{extension or '.ppm'}"
+                with open(path, "wb") as f:
+                    f.write(frame['ppm'])
+                print(f"{path}: {format_sim_time(frame['sim_time_ms'])} | {frame['lit']}/{len(led_configs)} aan | "
+                      f"simulatie {frame['sim_ms']:.1f} ms | render {frame['render_ms']:.1f} ms")
+        except ValueError as e:
+            parser.exit(1, f"{e}\n")
+        return
+
+    if args.command == "serieel-log":
+        led_configs, _ = read_layout_file(args.layout)
+        cache = TraceCache(args.cache or None) if args.cache is not None else None
+        with open(args.log, "r", errors="replace") as f:
+            result = diff_serial_log(f, led_configs, tolerance_ms=args.tolerantie_ms, seed=args.seed, cache=cache)
+        print(json.dumps(result, indent=4) if args.json else format_serial_log_diff(result))
+        if cache is not None and not args.json:
+            print(f"Trace-cache: {cache.hits} uit de cache, {cache.misses} gesimuleerd ({cache.directory})")
+        if result['violation_count']:
+            parser.exit(1)
+        return
+
+    if args.command == "soak":
+        led_configs, _ = read_layout_file(args.layout)
+        try:
+            result = soak_test(led_configs, int(args.dagen * 86400000), seed=args.seed, loop_ms=args.loop_ms,
+                               start_ms=args.start_ms)
+        except ValueError as e:
+            parser.exit(1, f"{e}\n")
+        print(json.dumps(result, indent=4) if args.json else format_soak_report(result))
+        if any(result['counts'].values()):
+            parser.exit(1)
+        return
+
+    if args.command == "sweep":
+        try:
+            ranges = [parse_sweep_range(spec) for spec in args.bereik]
+            fields = [field for field, _ in ranges]
+            cache_dir = (args.cache or default_trace_cache_dir()) if args.cache is not None else None
+            rows = sweep_profile(dict(LIGHT_PROFILES[args.profiel], light_type=args.profiel), ranges, int(args.uren * 3600000), seed=args.seed,
+                                 processes=args.processen, cache_dir=cache_dir)
+            if not args.json:
+                print(format_sweep_row(None, fields, header=True))
+            for row in rows: # Elke rij zodra hij klaar is
+                print(json.dumps(row) if args.json else format_sweep_row(row, fields), flush=True)
+        except ValueError as e:
+            parser.exit(1, f"{e}\n")
+        return
+
+    if args.command == "flikker":
+        led_configs, _ = read_layout_file(args.layout)
+        duration_ms = int(args.uren * 3600000)
+        try:
+            indices = select_leds(led_configs, args.selectie)
+            started = time.perf_counter()
+            traces = record_layout_traces(led_configs, duration_ms, seed=args.seed, indices=indices)
+            recorded = time.perf_counter()
+            result = analyze_flicker([traces[i] for i in indices], duration_ms, args.stap_ms, args.venster_ms,
+                                     labels=[i + 1 for i in indices], groups=[led_configs[i].get('light_type') for i in indices],
+                                     pins=[led_configs[i].get('pin') for i in indices])
+            analyzed = time.perf_counter()
+            comparison = None
+            if args.referentie:
+                reference = analyze_flicker_reference(args.referentie, led_configs, args.stap_ms, args.venster_ms)
+                comparison = compare_flicker(result, reference, args.tolerantie_db)
+                result['comparison'] = comparison
+        except ValueError as e:
+            parser.exit(1, f"{e}\n")
+        if args.opname:
+            with open(args.opname, "w") as f:
+                write_brightness_capture(f, {i + 1: traces[i] for i in indices}) # Kanaal = LED-nummer (pinnen kunnen dubbel zijn)
+        if args.uitvoer:
+            with open(args.uitvoer, "w") as f:
+                json.dump(result, f, indent=4)
+        if args.json:
+            print(json.dumps(result, indent=4))
+        else:
+            print(format_flicker_report(result, comparison, per_led=args.per_led))
+            print(f"{len(indices)} LEDs opgenomen in {recorded - started:.2f} s, geanalyseerd in {analyzed - recorded:.2f} s")
+        deviating = [item['reference'] for item in comparison or [] if item['status'] == "afwijkend"]
+        if deviating:
+            parser.exit(1, f"Spectrum wijkt af van de referentie voor: {', '.join(map(str, deviating))}\n")
+        return
+
+    if args.command == "benchmark":
+        result = run_benchmarks(args.groottes, repeat=args.herhalingen)
+        comparison = None
+        if args.baseline:
+            with open(args.baseline, "r") as f:
+                comparison = compare_benchmarks(result, json.load(f), args.tolerantie)
+            result['comparison'] = comparison
+        if args.uitvoer:
+            with open(args.uitvoer, "w") as f:
+                json.dump(result, f, indent=4)
+        print(json.dumps(result, indent=4) if args.json else format_benchmark_report(result, comparison))
+        regressions = [item['scenario'] for item in comparison or [] if item['status'] == "regressie"]
+        if regressions:
+            parser.exit(1, f"Regressie in {len(regressions)} scenario('s): {', '.join(regressions)}\n")
+        return
 
-if __name__ == "__main__":
     root = tk.Tk()
     app = LedConfiguratorApp(root)
     root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
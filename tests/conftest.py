@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Het script staat los in de root van de repository; maak het importeerbaar voor de tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
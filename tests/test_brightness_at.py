@@ -0,0 +1,73 @@
+import pytest
+
+import Modelbaan_LED_Simulator as sim_module
+from Modelbaan_LED_Simulator import LIGHT_PROFILES, LedSimulator
+
+np = sim_module.np
+TICK_MS = 10
+
+
+def _simulator(profile, seed):
+    config = dict(LIGHT_PROFILES[profile])
+    config['light_type'] = profile
+    config['pin'] = '2'
+    return LedSimulator(config, seed=seed)
+
+
+@pytest.mark.parametrize('profile', ["Woonkamer Licht", "Hal Licht", "TV Simulatie", "Willekeurig Aan/Uit"])
+@pytest.mark.parametrize('seed', [1, 7, 42])
+def test_brightness_at_matches_stepping(profile, seed):
+    """brightness_at() voorspelt binnen een fase dezelfde helderheid als tick voor tick update()."""
+    sim = _simulator(profile, seed)
+    checked = 0
+    for t in range(0, 300_000, TICK_MS):
+        start, end = sim.phase_bounds()
+        if sim.current_mode == LedSimulator.MODE_BLINKING:
+            start = sim.last_blink_toggle_time
+        predicted = sim.brightness_at(t) if start <= t < end else None
+        mode = sim.current_mode
+        sim.update(t)
+        if predicted is not None and sim.current_mode == mode:
+            assert predicted == sim.current_brightness, (t, LedSimulator.MODE_NAMES[mode])
+            checked += 1
+    assert checked > 1000
+
+
+def test_brightness_at_does_not_change_state():
+    sim = _simulator("TV Simulatie", 3)
+    t = 0
+    while sim.current_mode != LedSimulator.MODE_BLINKING:
+        t += TICK_MS
+        sim.update(t)
+    state = sim.get_state()
+    start, end = sim.phase_bounds()
+    sim.brightness_at(list(range(int(sim.last_blink_toggle_time), int(end), TICK_MS)))
+    assert sim.get_state() == state
+
+
+def test_brightness_at_outside_phase_raises():
+    sim = _simulator("Hal Licht", 5)
+    _, end = sim.phase_bounds()
+    with pytest.raises(ValueError):
+        sim.brightness_at(end)
+
+
+@pytest.mark.skipif(np is None, reason="NumPy is niet geïnstalleerd")
+def test_brightness_at_numpy_scalars_and_arrays():
+    sim = _simulator("Woonkamer Licht", 11)
+    t = 0
+    while sim.current_mode != LedSimulator.MODE_FADE_IN:
+        t += TICK_MS
+        sim.update(t)
+    start, end = sim.phase_bounds()
+    times = list(range(int(start), int(end), TICK_MS))
+
+    expected = sim.brightness_at(times)
+    assert isinstance(expected, list)
+    vectorized = sim.brightness_at(np.asarray(times))
+    assert isinstance(vectorized, np.ndarray) and vectorized.tolist() == expected
+
+    # NumPy-scalars en 0-d arrays zijn gewone tijdstippen, geen gevectoriseerde invoer
+    for scalar in (np.float64(times[3]), np.int64(times[3]), np.asarray(times[3])):
+        value = sim.brightness_at(scalar)
+        assert type(value) is int and value == expected[3]
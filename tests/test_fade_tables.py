@@ -0,0 +1,76 @@
+import pytest
+
+import Modelbaan_LED_Simulator as sim_module
+from Modelbaan_LED_Simulator import FadeTableCache, LIGHT_PROFILES, LedSimulator, SimulationTimeline
+
+np = sim_module.np
+STEP_MS = sim_module.FADE_TABLE_STEP_MS
+
+
+def _map_range(x, duration, start, end):
+    return LedSimulator._map_range(None, x, 0, duration, start, end)
+
+
+@pytest.mark.parametrize('duration', [1, 7, 10, 99, 1000, 1234, 4999, 60_001, sim_module.FADE_TABLE_MAX_MS])
+def test_table_levels_match_map_range(duration):
+    """Elke tabelwaarde geeft voor elke begin- en eindhelderheid exact _map_range()."""
+    tables = FadeTableCache(max_bytes=1 << 20)
+    ticks = range(0, duration, STEP_MS)
+    if len(ticks) > 500:
+        ticks = list(ticks[:250]) + list(ticks[-250:])
+    rising = tables.offset(duration, True)
+    falling = tables.offset(duration, False)
+    for brightness in range(256):
+        for elapsed in ticks:
+            assert tables.level(rising, 0, brightness, elapsed) == _map_range(elapsed, duration, 0, brightness)
+            assert tables.level(falling, brightness, 0, elapsed) == _map_range(elapsed, duration, brightness, 0)
+
+
+def test_tables_are_shared_and_bounded():
+    tables = FadeTableCache(max_bytes=4 * 250) # Ruimte voor 250 waarden
+    first = tables.offset(1000, True)
+    assert tables.offset(1000, True) == first and tables.hits == 1
+    assert tables.offset(1000, False) != first
+    assert tables.offset(tables.max_duration_ms + 1, True) == -1
+    assert tables.offset(0, True) == -1
+    assert tables.offset(3000, True) == -1 # Groter dan de hele arena
+    assert tables.generation == 0 and tables.used == 200
+
+    offset = tables.offset(2000, True) # Past niet meer: de arena wordt geleegd
+    assert (offset, tables.generation, tables.clears, tables.used) == (0, 1, 1, 200)
+    assert list(tables.offsets) == [(2000, True)]
+
+
+@pytest.mark.skipif(np is None, reason="NumPy is niet geïnstalleerd")
+@pytest.mark.parametrize('max_bytes', [sim_module.FADE_TABLE_BYTES, 4 * 2000])
+def test_timeline_tables_match_per_led_update(monkeypatch, max_bytes):
+    """De tijdlijn geeft met gedeelde tabellen dezelfde helderheden als update() per LED, ook als de arena steeds leegloopt."""
+    monkeypatch.setattr(sim_module, 'FADE_TABLES', FadeTableCache(max_bytes=max_bytes))
+    monkeypatch.setattr(sim_module, 'FADE_VECTOR_MIN', 1)
+    timelines = []
+    for vectorize in (True, False):
+        sims = [LedSimulator(dict(LIGHT_PROFILES["Woonkamer Licht"], pin='2'), seed=i) for i in range(200)]
+        timelines.append((SimulationTimeline(sims, max_checkpoints=1, vectorize_fades=vectorize), sims))
+    for t in range(50, 120_000, 50):
+        levels = []
+        for timeline, sims in timelines:
+            timeline.advance_to(t)
+            levels.append([sim.current_brightness for sim in sims])
+        assert levels[0] == levels[1], t
+    if max_bytes < sim_module.FADE_TABLE_BYTES:
+        assert sim_module.FADE_TABLES.clears > 0
+
+
+@pytest.mark.skipif(np is None, reason="NumPy is niet geïnstalleerd")
+@pytest.mark.parametrize('tick_ms', [10, 15])
+def test_brightness_trace_matches_stepping(tick_ms):
+    """record_brightness_trace() (fades uit FADE_TABLES of fade_levels()) geeft dezelfde wisselpunten als update() per tick."""
+    config = dict(LIGHT_PROFILES["Woonkamer Licht"], pin='2')
+    times, levels = sim_module.record_brightness_trace(config, 600_000, seed=5, tick_ms=tick_ms)
+    sim = LedSimulator(config, seed=5)
+    expected = [(0, sim.current_brightness)]
+    for t in range(tick_ms, 600_001, tick_ms):
+        sim.update(t)
+        if sim.current_brightness != expected[-1][1]:
+            expected.append((t, sim.current_brightness))
+    assert list(zip(times.tolist(), levels.tolist())) == expected
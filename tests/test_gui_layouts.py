@@ -0,0 +1,96 @@
+import time
+import tkinter as tk
+from tkinter import filedialog, messagebox
+
+import pytest
+
+from Modelbaan_LED_Simulator import LedConfiguratorApp, make_benchmark_layout, select_leds, write_layout_file
+
+LARGE_LAYOUT = 3000 # Ruim meer LEDs dan de 15 PWM-pinnen van één Mega
+
+
+@pytest.fixture
+def app(monkeypatch):
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("Geen display beschikbaar voor Tk")
+    root.withdraw()
+    for name in ("showinfo", "showwarning", "showerror"):
+        monkeypatch.setattr(messagebox, name, lambda *args, **kwargs: None)
+    app = LedConfiguratorApp(root)
+    yield app
+    app.stop_simulation()
+    root.destroy()
+
+
+def _load_layout(app, monkeypatch, tmp_path, num_leds, placed=0):
+    layout = make_benchmark_layout(num_leds)
+    for i in range(placed): # De eerste LEDs in een raster op de plattegrond
+        layout[i]['x'], layout[i]['y'] = 20.0 * (i % 60), 20.0 * (i // 60)
+    path = tmp_path / "layout.json"
+    write_layout_file(str(path), layout, {})
+    monkeypatch.setattr(filedialog, "askopenfilename", lambda **kwargs: str(path))
+    app.load_configs()
+
+
+def test_app_holds_the_whole_layout(app, monkeypatch, tmp_path):
+    _load_layout(app, monkeypatch, tmp_path, LARGE_LAYOUT)
+    assert len(app.led_data) == LARGE_LAYOUT
+    assert app.led_listbox.size() == LARGE_LAYOUT
+    # De pinnen herhalen zich; wisselen van LED mag daar niet op vastlopen
+    app.select_led(LARGE_LAYOUT - 1)
+    assert app.current_led_index == LARGE_LAYOUT - 1
+    assert app.led_listbox.curselection() == (LARGE_LAYOUT - 1,)
+
+
+def test_bulk_edit_reaches_every_led(app, monkeypatch, tmp_path):
+    _load_layout(app, monkeypatch, tmp_path, LARGE_LAYOUT)
+    indices = select_leds([led['vars_snapshot'] for led in app.led_data], "alle")
+    assert len(indices) == LARGE_LAYOUT
+    assert app.apply_bulk_edit(indices, profile="Hal Licht")
+    assert all(led['vars_snapshot']['light_type'] == "Hal Licht" for led in app.led_data)
+    app.undo_edit()
+    assert app.led_data[-1]['vars_snapshot']['light_type'] != "Hal Licht"
+
+
+def test_heatmap_window_gets_the_whole_layout(app, monkeypatch, tmp_path):
+    _load_layout(app, monkeypatch, tmp_path, LARGE_LAYOUT)
+    window = app.open_heatmap_action()
+    try:
+        assert window.renderer.num_leds == LARGE_LAYOUT
+        deadline = time.monotonic() + 10
+        while window._last_frame is None and time.monotonic() < deadline:
+            app.master.update()
+            time.sleep(0.01)
+        assert len(window._last_frame['brightness']) == LARGE_LAYOUT
+    finally:
+        window.close()
+
+
+def test_floor_plan_loads_and_draws_a_large_layout(app, monkeypatch, tmp_path):
+    _load_layout(app, monkeypatch, tmp_path, LARGE_LAYOUT, placed=LARGE_LAYOUT - 500)
+    app.open_floor_plan_action()
+    window = app.floor_plan_window
+    try:
+        app.master.update()
+        window.redraw()
+        assert len(window.index) == LARGE_LAYOUT - 500
+        width, height = window.canvas.winfo_width(), window.canvas.winfo_height()
+        x0, y0 = window.to_world(0, 0)
+        x1, y1 = window.to_world(width, height)
+        margin = window.LED_RADIUS / window.scale
+        # Alleen de zichtbare LEDs zijn canvas-items
+        assert set(window.items) == set(window.index.query_rect(x0 - margin, y0 - margin, x1 + margin, y1 + margin))
+        assert 0 < len(window.items) < LARGE_LAYOUT
+
+        window.zoom_level = window.MIN_ZOOM_LEVEL # Uitgezoomd: de hele plattegrond in beeld
+        window.redraw()
+        assert len(window.items) == len(window.index)
+
+        window.place_unplaced()
+        assert len(window.index) == LARGE_LAYOUT
+        app.select_led(LARGE_LAYOUT - 1) # Een LED die pas net een positie kreeg
+        window.redraw()
+    finally:
+        window.close()
@@ -0,0 +1,52 @@
+import pytest
+
+from Modelbaan_LED_Simulator import (HeatmapRenderer, _heatmap_channel_tables, main, make_benchmark_layout,
+                                     render_layout_heatmaps, write_layout_file)
+
+
+def _parse_ppm(data):
+    magic, width, height, maxval, pixels = data.split(maxsplit=4)
+    assert magic == b"P6" and maxval == b"255"
+    width, height = int(width), int(height)
+    assert len(pixels) == 3 * width * height
+    return width, height, pixels
+
+
+@pytest.mark.parametrize('scale', [1, 3])
+def test_renderer_places_each_led_in_its_block(scale):
+    brightness = bytes(range(0, 250, 25)) # 10 LEDs in een raster van 4 breed
+    renderer = HeatmapRenderer(len(brightness), columns=4)
+    width, height, pixels = _parse_ppm(renderer.render(brightness, scale))
+    assert (width, height) == (4 * scale, 3 * scale)
+    red, green, blue = _heatmap_channel_tables()
+    for y in range(height):
+        for x in range(width):
+            index = (y // scale) * 4 + x // scale
+            value = brightness[index] if index < len(brightness) else 0 # Opvulling is zwart (uit)
+            offset = 3 * (y * width + x)
+            assert pixels[offset:offset + 3] == bytes((red[value], green[value], blue[value]))
+
+
+def test_render_layout_heatmaps_covers_the_whole_layout():
+    layout = make_benchmark_layout(5000)
+    frames = list(render_layout_heatmaps(layout, [60000, 61000], seed=3))
+    assert [frame['sim_time_ms'] for frame in frames] == [60000, 61000]
+    for frame in frames:
+        width, height, _ = _parse_ppm(frame['ppm'])
+        assert width * height >= 5000
+        assert 0 < frame['lit'] < 5000
+
+
+def test_render_layout_heatmaps_rejects_empty_layout():
+    with pytest.raises(ValueError):
+        next(render_layout_heatmaps([], [0]))
+
+
+def test_heatmap_cli_writes_numbered_frames(tmp_path, capsys):
+    layout_path = tmp_path / "layout.json"
+    write_layout_file(str(layout_path), make_benchmark_layout(2000), {})
+    main(["heatmap", str(layout_path), str(tmp_path / "heatmap.ppm"), "--frames", "2", "--schaal", "2", "--seed", "1"])
+    for number in (1, 2):
+        width, height, _ = _parse_ppm((tmp_path / f"heatmap_{number:04d}.ppm").read_bytes())
+        assert (width, height) == (90, 90) # 45 x 45 LEDs, 2 pixels per LED
+    assert "/2000 aan" in capsys.readouterr().out
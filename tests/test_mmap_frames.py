@@ -0,0 +1,76 @@
+import multiprocessing
+import struct
+
+import pytest
+
+from Modelbaan_LED_Simulator import MMAP_HEADER_SIZE, MmapFrameReader, MmapFrameWriter
+
+NUM_LEDS = 300
+
+
+def _frame(frame_number):
+    return bytes([frame_number % 256]) * NUM_LEDS
+
+
+def _write_frames(file_path, count, ready):
+    writer = MmapFrameWriter(file_path, NUM_LEDS, ring_size=4)
+    ready.set()
+    for frame_number in range(count):
+        writer.send_frame(_frame(frame_number), sim_time_ms=frame_number * 10)
+    writer.close()
+
+
+def test_round_trip_and_ring(tmp_path):
+    path = str(tmp_path / "frames.bin")
+    writer = MmapFrameWriter(path, NUM_LEDS, ring_size=4)
+    reader = MmapFrameReader(path)
+    assert reader.latest() is None
+    for frame_number in range(10):
+        writer.send_frame(_frame(frame_number), sim_time_ms=frame_number * 10)
+
+    assert reader.latest() == (9, 90, _frame(9))
+    assert [frame[0] for frame in reader.recent(10)] == [6, 7, 8, 9] # Alleen wat nog in de ring staat
+    assert reader.read_frame(2) is None # Overschreven door frame 6
+    reader.close()
+    writer.close()
+
+
+def test_reader_rejects_slot_in_progress(tmp_path):
+    path = str(tmp_path / "frames.bin")
+    writer = MmapFrameWriter(path, NUM_LEDS, ring_size=4)
+    writer.send_frame(_frame(0))
+    # Een schrijver die midden in een frame stopt laat een oneven seq achter
+    seq = struct.unpack_from("<Q", writer.buffer, MMAP_HEADER_SIZE)[0]
+    struct.pack_into("<Q", writer.buffer, MMAP_HEADER_SIZE, seq + 1)
+    reader = MmapFrameReader(path, timeout_s=0.05)
+    with pytest.raises(RuntimeError):
+        reader.read_frame(0)
+    reader.close()
+    writer.close()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="Vereist fork")
+def test_concurrent_reader_never_sees_a_torn_frame(tmp_path):
+    path = str(tmp_path / "frames.bin")
+    context = multiprocessing.get_context("fork")
+    ready = context.Event()
+    process = context.Process(target=_write_frames, args=(path, 200_000, ready))
+    process.start()
+    try:
+        ready.wait(5)
+        reader = MmapFrameReader(path, timeout_s=5.0)
+        reads = 0
+        while process.is_alive() or reads == 0:
+            result = reader.latest()
+            if result is None:
+                continue
+            frame_number, sim_time_ms, data = result
+            # Een gescheurd frame zou bytes van twee frames of een verkeerde sim-tijd bevatten
+            assert data == _frame(frame_number)
+            assert sim_time_ms == frame_number * 10
+            reads += 1
+        reader.close()
+    finally:
+        process.join(10)
+    assert process.exitcode == 0
+    assert reads > 0
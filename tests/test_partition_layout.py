@@ -0,0 +1,70 @@
+import pytest
+
+from Modelbaan_LED_Simulator import (BOARD_TYPES, fading_load, make_benchmark_layout, parse_board_spec,
+                                     partition_layout)
+
+
+def _check_plan(plan, layout):
+    placed = sorted(led['led_index'] for board in plan['boards'] for led in board['leds'])
+    assert placed == list(range(len(layout))) # Elke LED precies één keer
+    for board in plan['boards']:
+        spec = BOARD_TYPES[board['type']]
+        pins = [led['pin'] for led in board['leds']]
+        assert len(pins) == len(set(pins)) <= len(spec['pwm_pins'])
+        assert set(pins) <= set(spec['pwm_pins'])
+        assert board['sram_bytes'] <= spec['sram_bytes']
+        assert board['fading_load'] <= board['max_fading'] + 1e-9
+        assert [config['pin'] for config in board['configs']] == pins
+
+
+def test_partition_places_every_led_once():
+    layout = make_benchmark_layout(40)
+    plan = partition_layout(layout, parse_board_spec("mega2560:3,uno"))
+    _check_plan(plan, layout)
+
+
+def test_groups_stay_on_one_board():
+    layout = make_benchmark_layout(20)
+    for i in range(5, 11):
+        layout[i]['group'] = "station"
+    plan = partition_layout(layout, parse_board_spec("uno:2,mega2560"))
+    _check_plan(plan, layout)
+    boards = {board['name'] for board in plan['boards'] for led in board['leds'] if led['group'] == "station"}
+    assert len(boards) == 1
+    assert plan['warnings'] == []
+
+
+def test_oversized_group_is_split_with_warning():
+    layout = make_benchmark_layout(10)
+    for config in layout:
+        config['group'] = "dorp"
+    plan = partition_layout(layout, parse_board_spec("uno:2"))
+    _check_plan(plan, layout)
+    assert len(plan['warnings']) == 1 and "dorp" in plan['warnings'][0]
+
+
+def test_existing_pins_are_kept():
+    layout = make_benchmark_layout(6)
+    layout[0]['pin'] = '11'
+    layout[1]['pin'] = '3'
+    plan = partition_layout(layout, ["uno"])
+    pins = {led['led_index']: led['pin'] for led in plan['boards'][0]['leds']}
+    assert pins[0] == 11 and pins[1] == 3
+
+
+def test_max_fading_limits_each_board():
+    layout = [dict(config) for config in make_benchmark_layout(10) if fading_load(config) > 0] * 3
+    plan = partition_layout(layout, parse_board_spec("mega2560:4"), max_fading=0.5)
+    _check_plan(plan, layout)
+    assert all(board['max_fading'] == 0.5 for board in plan['boards'])
+    assert sum(1 for board in plan['boards'] if board['leds']) > 1 # Past op pinnen op één bord, niet op fades
+
+
+def test_layout_that_does_not_fit_raises():
+    with pytest.raises(ValueError):
+        partition_layout(make_benchmark_layout(16), ["mega2560"])
+
+
+def test_invalid_board_spec_raises():
+    with pytest.raises(ValueError):
+        parse_board_spec("mega2560,due")
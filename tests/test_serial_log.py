@@ -0,0 +1,47 @@
+from Modelbaan_LED_Simulator import LedSimulator, parse_serial_log
+
+
+def test_millis_wrap_is_continuous():
+    lines = [
+        "[4294967000] LED 2 start FADE_IN naar 200",
+        "[4294967290] LED 2 einde FADE_IN, nu AAN op helderheid 200",
+        "[200] LED 2 start FADE_OUT", # millis() is intussen overgelopen
+        "[1200] LED 2 einde FADE_OUT, nu UIT",
+    ]
+    transitions = list(parse_serial_log(lines))
+    assert [t for t, _, _, _ in transitions] == [0, 290, 496, 1496]
+    assert [mode for _, _, mode, _ in transitions] == [
+        LedSimulator.MODE_FADE_IN, LedSimulator.MODE_ON, LedSimulator.MODE_FADE_OUT, LedSimulator.MODE_OFF]
+    assert transitions[0][3] == 200 and transitions[2][3] is None
+
+
+def test_small_step_back_is_not_a_wrap():
+    # Een teller die een beetje terugloopt (bijv. een reset van de logger) is geen overloop van 2^32
+    lines = ["[5000] LED 3 DIRECT AAN", "[4000] LED 3 DIRECT UIT"]
+    assert [t for t, _, _, _ in parse_serial_log(lines)] == [0, -1000]
+
+
+def test_wraps_accumulate():
+    lines = ["[4294967000] LED 2 DIRECT AAN", "[100] LED 2 DIRECT UIT",
+             "[4294967000] LED 2 DIRECT AAN", "[100] LED 2 DIRECT UIT"]
+    times = [t for t, _, _, _ in parse_serial_log(lines)]
+    assert times == [0, 396, 1 << 32, (1 << 32) + 396]
+
+
+def test_untimed_transitions_are_counted_and_skipped():
+    lines = [
+        "12:00:00.000 -> LED 2 DIRECT AAN",
+        "LED 2 DIRECT UIT", # Overgang zonder tijdstempel
+        "Setup klaar", # Geen overgang
+        "12:00:01.500 -> LED 2 DIRECT AAN",
+    ]
+    stats = {}
+    transitions = list(parse_serial_log(lines, stats))
+    assert [(t, pin, mode) for t, pin, mode, _ in transitions] == [
+        (0, 2, LedSimulator.MODE_ON), (1500, 2, LedSimulator.MODE_ON)]
+    assert stats == {'lines': 4, 'transitions': 2, 'skipped': 2, 'untimed': 1}
+
+
+def test_clock_without_date_crosses_midnight():
+    lines = ["23:59:59.000 -> LED 2 DIRECT AAN", "00:00:01.000 -> LED 2 DIRECT UIT"]
+    assert [t for t, _, _, _ in parse_serial_log(lines)] == [0, 2000]
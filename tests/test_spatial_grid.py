@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from Modelbaan_LED_Simulator import SpatialGrid, make_benchmark_layout
+
+NUM_LEDS = 5000
+
+
+def _placed_layout(seed=0):
+    rng = random.Random(seed)
+    layout = make_benchmark_layout(NUM_LEDS)
+    for i, config in enumerate(layout):
+        if i % 10: # Elke tiende LED heeft (nog) geen positie
+            config['x'], config['y'] = rng.uniform(0, 4000), rng.uniform(0, 3000)
+    return layout
+
+
+def _inside(layout, x0, y0, x1, y1):
+    return [i for i, config in enumerate(layout) if 'x' in config
+            and min(x0, x1) <= config['x'] <= max(x0, x1) and min(y0, y1) <= config['y'] <= max(y0, y1)]
+
+
+def test_from_configs_indexes_every_placed_led():
+    layout = _placed_layout()
+    grid = SpatialGrid.from_configs(layout)
+    assert len(grid) == NUM_LEDS - NUM_LEDS // 10
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_query_rect_matches_brute_force(seed):
+    layout = _placed_layout(seed)
+    grid = SpatialGrid.from_configs(layout)
+    rng = random.Random(seed)
+    for _ in range(50):
+        # Van een klein zichtbaar deel tot (meer dan) de hele plattegrond, hoeken in willekeurige volgorde
+        x0, x1 = rng.uniform(-500, 4500), rng.uniform(-500, 4500)
+        y0, y1 = rng.uniform(-500, 3500), rng.uniform(-500, 3500)
+        assert grid.query_rect(x0, y0, x1, y1) == _inside(layout, x0, y0, x1, y1)
+
+
+def test_nearest_and_moves():
+    layout = _placed_layout()
+    grid = SpatialGrid.from_configs(layout)
+    x, y = layout[1]['x'], layout[1]['y']
+    assert grid.nearest(x + 0.5, y, radius=0.6) == 1
+    grid.insert(1, -100.0, -100.0) # Verslepen
+    assert 1 not in grid.query_rect(x - 1, y - 1, x + 1, y + 1)
+    assert grid.nearest(-99.0, -100.0, radius=2) == 1
+    grid.remove(1)
+    assert grid.nearest(-99.0, -100.0, radius=2) is None
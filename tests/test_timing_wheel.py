@@ -0,0 +1,70 @@
+import math
+import random
+
+import pytest
+
+from Modelbaan_LED_Simulator import TimingWheel
+
+
+class ReferenceScheduler:
+    """Eenvoudige planner om TimingWheel tegen te toetsen: een dict van key -> deadline."""
+
+    def __init__(self, tick_ms):
+        self.tick_ms = tick_ms
+        self.deadlines = {}
+
+    def due_tick(self, key):
+        return math.ceil(self.deadlines[key] / self.tick_ms)
+
+    def pop_due(self, now_ms):
+        target = now_ms // self.tick_ms
+        due = [key for key in self.deadlines if self.due_tick(key) <= target]
+        for key in due:
+            del self.deadlines[key]
+        return due
+
+
+@pytest.mark.parametrize('seed', range(8))
+@pytest.mark.parametrize('slots,levels', [(4, 2), (64, 4)])
+def test_timing_wheel_matches_reference(seed, slots, levels):
+    rng = random.Random(seed)
+    wheel = TimingWheel(tick_ms=10, slots=slots, levels=levels)
+    reference = ReferenceScheduler(10)
+    now = 0
+    for _ in range(3000):
+        action = rng.random()
+        if action < 0.5:
+            key = rng.randrange(200)
+            # Korte, middellange en verre deadlines (voorbij alle niveaus: de overflow-heap)
+            horizon = rng.choice([50, 5_000, 50_000_000])
+            deadline = now + rng.randrange(-20, horizon)
+            wheel.schedule(key, deadline)
+            reference.deadlines[key] = deadline
+        elif action < 0.6:
+            key = rng.randrange(200)
+            wheel.cancel(key)
+            reference.deadlines.pop(key, None)
+        else:
+            now += rng.choice([0, 10, 37, 640, 100_000, 30_000_000])
+            expected = reference.pop_due(now)
+            ticks = {key: math.ceil(wheel.deadline(key) / 10) for key in expected}
+            due = wheel.pop_due(now)
+            assert sorted(due) == sorted(expected)
+            order = [ticks[key] for key in due]
+            assert order == sorted(order), "Sleutels moeten in volgorde van tick worden afgeleverd"
+        assert len(wheel) == len(reference.deadlines)
+        expected_next = min(reference.deadlines.values(), default=None)
+        if expected_next is None:
+            assert wheel.next_deadline() is None
+        else:
+            # Binnen één tick is de volgorde niet vastgelegd; de vroegste tick moet kloppen
+            assert math.ceil(wheel.next_deadline() / 10) == math.ceil(expected_next / 10)
+
+
+def test_reschedule_replaces_previous_deadline():
+    wheel = TimingWheel(tick_ms=10)
+    wheel.schedule('a', 100)
+    wheel.schedule('a', 500)
+    assert wheel.pop_due(200) == []
+    assert wheel.pop_due(500) == ['a']
+    assert len(wheel) == 0